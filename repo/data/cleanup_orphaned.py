@@ -4,15 +4,29 @@
 调用 libgitmusic.commands.cleanup 中的逻辑
 """
 
+import dataclasses
 import os
 import sys
 from pathlib import Path
 
 # 导入核心库
 sys.path.append(str(Path(__file__).parent.parent))
-from libgitmusic.events import EventEmitter
+from libgitmusic.context import create_context
 from libgitmusic.commands.cleanup import cleanup_logic
 
+# 环境变量 -> Context 字段
+PATH_OVERRIDES = {
+    "GITMUSIC_CACHE_ROOT": "cache_root",
+    "GITMUSIC_METADATA_FILE": "metadata_file",
+}
+
+# 环境变量 -> transport 配置项
+TRANSPORT_OVERRIDES = {
+    "GITMUSIC_REMOTE_USER": "user",
+    "GITMUSIC_REMOTE_HOST": "host",
+    "GITMUSIC_REMOTE_DATA_ROOT": "remote_data_root",
+}
+
 
 def main():
     import argparse
@@ -37,36 +51,34 @@ def main():
     )
     args = parser.parse_args()
 
-    # 从环境变量获取路径
-    cache_root_path = os.environ.get("GITMUSIC_CACHE_ROOT")
-    metadata_file_path = os.environ.get("GITMUSIC_METADATA_FILE")
-    remote_user = os.environ.get("GITMUSIC_REMOTE_USER", "white_elephant")
-    remote_host = os.environ.get("GITMUSIC_REMOTE_HOST", "debian-server")
-    remote_data_root = os.environ.get("GITMUSIC_REMOTE_DATA_ROOT", "/srv/music/data")
-
-    if not cache_root_path or not metadata_file_path:
-        EventEmitter.error(
-            "Missing required environment variables (GITMUSIC_CACHE_ROOT, GITMUSIC_METADATA_FILE)"
-        )
-        return 1
-
-    cache_root = Path(cache_root_path)
-    metadata_file = Path(metadata_file_path)
+    # 从配置创建上下文，环境变量（CLI 注入）覆盖其中的路径与远端设置
+    context = create_context()
+    overrides = {
+        field: Path(os.environ[env])
+        for env, field in PATH_OVERRIDES.items()
+        if os.environ.get(env)
+    }
+    remote = {
+        key: os.environ[env]
+        for env, key in TRANSPORT_OVERRIDES.items()
+        if os.environ.get(env)
+    }
+    if remote:
+        transport = {**context.config.get("transport", {}), **remote}
+        overrides["config"] = {**context.config, "transport": transport}
+    if overrides:
+        context = dataclasses.replace(context, **overrides)
 
     # 调用库函数
     exit_code = cleanup_logic(
-        metadata_file=metadata_file,
-        cache_root=cache_root,
+        context,
         mode=args.mode,
         confirm=args.confirm,
         dry_run=args.dry_run,
-        remote_user=remote_user,
-        remote_host=remote_host,
-        remote_data_root=remote_data_root,
     )
 
     return exit_code
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
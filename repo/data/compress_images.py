@@ -58,9 +58,11 @@ def main():
             continue
 
         cover_oid = entry["cover_oid"]
-        cover_path = object_store.get_cover_path(cover_oid)
+        # 封面可能是松散文件或在 pack 中，按内容读取，不依赖文件路径
+        cover_name = f"{cover_oid.split(':')[-1]}.jpg"
+        cover_size = object_store.cover_size(cover_oid)
 
-        if not cover_path or not cover_path.exists():
+        if cover_size is None:
             EventEmitter.log(
                 "warn",
                 f"Cover file not found for OID: {cover_oid}, entry: {entry.get('title', 'unknown')}",
@@ -69,10 +71,10 @@ def main():
             continue
 
         # 检查文件大小是否超过阈值
-        file_size_kb = cover_path.stat().st_size / 1024
+        file_size_kb = cover_size / 1024
         if file_size_kb < args.min_size_kb:
             EventEmitter.item_event(
-                cover_path.name,
+                cover_name,
                 "skipped",
                 f"Size: {file_size_kb:.1f}KB < {args.min_size_kb}KB",
             )
@@ -81,17 +83,18 @@ def main():
 
         # 读取原始封面数据
         try:
-            with open(cover_path, "rb") as f:
-                original_data = f.read()
+            original_data = object_store.read_cover(cover_oid)
+            if original_data is None:
+                raise FileNotFoundError(cover_oid)
         except Exception as e:
             EventEmitter.error(
-                f"Failed to read cover file: {str(e)}", {"path": str(cover_path)}
+                f"Failed to read cover file: {str(e)}", {"oid": cover_oid}
             )
             EventEmitter.batch_progress("compress_images", i + 1, len(entries))
             continue
 
         EventEmitter.item_event(
-            cover_path.name, "compressing", f"Original: {len(original_data)} bytes"
+            cover_name, "compressing", f"Original: {len(original_data)} bytes"
         )
 
         # 压缩封面
@@ -103,7 +106,7 @@ def main():
             )
         except Exception as e:
             EventEmitter.error(
-                f"Failed to compress cover: {str(e)}", {"path": str(cover_path)}
+                f"Failed to compress cover: {str(e)}", {"oid": cover_oid}
             )
             EventEmitter.batch_progress("compress_images", i + 1, len(entries))
             continue
@@ -111,7 +114,7 @@ def main():
         # 检查压缩是否有效（大小减少）
         if len(compressed_data) >= len(original_data):
             EventEmitter.item_event(
-                cover_path.name,
+                cover_name,
                 "skipped",
                 f"No size reduction: {len(compressed_data)} >= {len(original_data)} bytes",
             )
@@ -127,7 +130,7 @@ def main():
         # 如果哈希相同，跳过（压缩未改变内容）
         if new_oid == cover_oid:
             EventEmitter.item_event(
-                cover_path.name, "skipped", "Hash unchanged after compression"
+                cover_name, "skipped", "Hash unchanged after compression"
             )
             EventEmitter.batch_progress("compress_images", i + 1, len(entries))
             continue
@@ -157,7 +160,7 @@ def main():
 
             size_reduction = 100 * (1 - len(compressed_data) / len(original_data))
             EventEmitter.item_event(
-                cover_path.name,
+                cover_name,
                 "success",
                 f"Compressed: {len(original_data)} → {len(compressed_data)} bytes ({size_reduction:.1f}% saved)",
             )
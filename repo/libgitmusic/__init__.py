@@ -1,40 +1,79 @@
 """
 GitMusic核心库 - 音乐管理系统的底层组件
+
+公开名称按需加载（PEP 562）：import libgitmusic 不会导入 mutagen 等重量级依赖，
+首次访问 libgitmusic.AudioIO 等属性时才导入对应子模块。
 """
 
-from .events import EventEmitter
-from .metadata import MetadataManager
-from .transport import TransportAdapter
-from .audio import AudioIO
-from .object_store import ObjectStore
-from .hash_utils import HashUtils
-from .locking import LockManager
-from .git import (
-    GitOperations,
-    git_add,
-    git_commit,
-    git_push,
-    git_pull,
-    git_commit_and_push,
-)
-from .context import Context, create_context
-from .exceptions import (
-    GitMusicError,
-    ValidationError,
-    TransportError,
-    IOError,
-    LockError,
-    ConfigurationError,
-    CommandError,
-)
-from .results import (
-    Result,
-    StoreResult,
-    RemoteResult,
-    VerifyResult,
-    CleanupResult,
-    ReleaseResult,
-)
+import importlib
+from typing import TYPE_CHECKING
+
+# 公开名称 -> 所在子模块
+_LAZY_ATTRS = {
+    "EventEmitter": ".events",
+    "MetadataManager": ".metadata",
+    "TransportAdapter": ".transport",
+    "AudioIO": ".audio",
+    "ObjectStore": ".object_store",
+    "HashUtils": ".hash_utils",
+    "LockManager": ".locking",
+    "GitOperations": ".git",
+    "git_add": ".git",
+    "git_commit": ".git",
+    "git_push": ".git",
+    "git_pull": ".git",
+    "git_commit_and_push": ".git",
+    "Context": ".context",
+    "create_context": ".context",
+    "GitMusicError": ".exceptions",
+    "ValidationError": ".exceptions",
+    "TransportError": ".exceptions",
+    "IOError": ".exceptions",
+    "LockError": ".exceptions",
+    "ConfigurationError": ".exceptions",
+    "CommandError": ".exceptions",
+    "Result": ".results",
+    "StoreResult": ".results",
+    "RemoteResult": ".results",
+    "VerifyResult": ".results",
+    "CleanupResult": ".results",
+    "ReleaseResult": ".results",
+}
+
+if TYPE_CHECKING:
+    from .events import EventEmitter
+    from .metadata import MetadataManager
+    from .transport import TransportAdapter
+    from .audio import AudioIO
+    from .object_store import ObjectStore
+    from .hash_utils import HashUtils
+    from .locking import LockManager
+    from .git import (
+        GitOperations,
+        git_add,
+        git_commit,
+        git_push,
+        git_pull,
+        git_commit_and_push,
+    )
+    from .context import Context, create_context
+    from .exceptions import (
+        GitMusicError,
+        ValidationError,
+        TransportError,
+        IOError,
+        LockError,
+        ConfigurationError,
+        CommandError,
+    )
+    from .results import (
+        Result,
+        StoreResult,
+        RemoteResult,
+        VerifyResult,
+        CleanupResult,
+        ReleaseResult,
+    )
 
 __all__ = [
     "EventEmitter",
@@ -66,3 +105,16 @@ __all__ = [
     "CleanupResult",
     "ReleaseResult",
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
@@ -1,4 +1,6 @@
+import io
 import os
+import struct
 import subprocess
 import tempfile
 import hashlib
@@ -9,8 +11,24 @@ from mutagen.mp3 import MP3
 from mutagen.id3 import ID3
 from mutagen.id3 import APIC, TIT2, TPE1, TALB, TDRC, USLT, TXXX
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 from .events import EventEmitter
 from .hash_utils import HashUtils
+from .tracing import add_bytes, traced
+
+# ID3 标签总长度对齐到该值（常见文件系统块大小），使音频数据从块边界开始，
+# 满足 reflink 的对齐要求；对齐产生的填充也为后续原地修改标签预留空间
+ID3_ALIGNMENT = 4096
+# 标签后至少保留的填充字节数
+ID3_MIN_PADDING = 1024
+# linux/fs.h: _IOW(0x94, 13, struct file_clone_range)
+FICLONERANGE = 0x4020940D
+_CLONE_RANGE = struct.Struct("=qQQQ")
+_COPY_CHUNK = 1024 * 1024
 
 
 class AudioIO:
@@ -60,7 +78,7 @@ class AudioIO:
 
             stderr_lines = []
 
-            # 读取stderr的辅助函数（实时打印进度）
+            # 读取stderr的辅助函数（保留输出用于错误信息）
             def read_stderr():
                 try:
                     while True:
@@ -70,9 +88,8 @@ class AudioIO:
                         # 解码为字符串并移除尾部换行符
                         line_str = line.decode("utf-8", errors="replace").rstrip("\n")
                         stderr_lines.append(line_str)
-                        # 实时打印ffmpeg进度信息（CLI会将其显示为灰色文本）
-                        if line_str:
-                            print(line_str, flush=True)
+                        # ffmpeg输出默认丢弃，开启后作为debug日志事件
+                        EventEmitter.tool_output("ffmpeg", line_str)
                 except Exception:
                     pass
 
@@ -239,6 +256,294 @@ class AudioIO:
         return filename
 
     @staticmethod
+    def metadata_frames(metadata: dict, cover_data: Optional[bytes]) -> List[Any]:
+        """
+        根据元数据构建 ID3 帧列表
+
+        Args:
+            metadata: 元数据字典
+            cover_data: 封面图片数据（可选）
+
+        Returns:
+            mutagen ID3 帧列表
+        """
+        frames = []
+        # 标题
+        if title := metadata.get("title"):
+            frames.append(TIT2(encoding=3, text=title))
+
+        # 艺术家
+        if artists := metadata.get("artists"):
+            if isinstance(artists, list):
+                artists_text = "/".join(artists)
+            else:
+                artists_text = str(artists)
+            frames.append(TPE1(encoding=3, text=artists_text))
+
+        # 专辑
+        if album := metadata.get("album"):
+            frames.append(TALB(encoding=3, text=album))
+
+        # 日期
+        if date := metadata.get("date"):
+            frames.append(TDRC(encoding=3, text=date))
+
+        # 歌词
+        if uslt := metadata.get("uslt"):
+            frames.append(USLT(encoding=3, lang="eng", desc="", text=uslt))
+
+        # 元数据哈希，用于增量更新检测
+        if metadata_hash := metadata.get("metadata_hash"):
+            frames.append(TXXX(encoding=3, desc="METADATA_HASH", text=metadata_hash))
+
+        # 封面
+        if cover_data:
+            frames.append(
+                APIC(
+                    encoding=3,
+                    mime="image/jpeg",
+                    type=3,  # 封面
+                    desc="Front Cover",
+                    data=bytes(cover_data),
+                )
+            )
+        return frames
+
+    @staticmethod
+    def render_id3_tag(
+        metadata: dict,
+        cover_data: Optional[bytes],
+        alignment: int = ID3_ALIGNMENT,
+        min_padding: int = ID3_MIN_PADDING,
+        total_size: Optional[int] = None,
+    ) -> bytes:
+        """
+        在内存中渲染完整的 ID3v2 标签（含填充）
+
+        Args:
+            metadata: 元数据字典
+            cover_data: 封面图片数据（可选）
+            alignment: 标签总长度的对齐值
+            min_padding: 至少保留的填充字节数
+            total_size: 指定标签总长度（原地重写时使用），忽略 alignment 与
+                        min_padding；放不下时返回的标签会超过该长度
+
+        Returns:
+            ID3v2 标签字节，未指定 total_size 时长度为 alignment 的整数倍
+        """
+        tags = ID3()
+        for frame in AudioIO.metadata_frames(metadata, cover_data):
+            tags.add(frame)
+
+        def pad(info):
+            # 写入空缓冲区时可用空间为 0，info.padding 即为 -(标签所需字节数)
+            needed = -info.padding
+            if total_size is not None:
+                return max(total_size - needed, 0)
+            total = needed + min_padding
+            total += -total % alignment
+            return total - needed
+
+        buf = io.BytesIO()
+        tags.save(buf, v1=0, padding=pad)
+        return buf.getvalue()
+
+    @staticmethod
+    def _id3v2_size(header: bytes) -> int:
+        """根据 10 字节文件头计算 ID3v2 标签总长度（含头部和 footer），无标签返回 0"""
+        if len(header) < 10 or header[:3] != b"ID3":
+            return 0
+        # 同步安全整数：每字节低 7 位有效
+        tag_size = 0
+        for b in header[6:10]:
+            tag_size = (tag_size << 7) | (b & 0x7F)
+        total = 10 + tag_size
+        if header[5] & 0x10:  # footer
+            total += 10
+        return total
+
+    @staticmethod
+    def retag_in_place(
+        path: Path, metadata: dict, cover_data: Optional[bytes]
+    ) -> bool:
+        """
+        在原有 ID3v2 标签占用的空间内重写标签，音频帧保持不动
+
+        新标签通过调整填充长度与旧标签等长；放不下（或文件没有 ID3v2 标签）时
+        不做任何修改并返回 False，由调用方回退到完整重建。
+
+        Args:
+            path: 发布文件路径
+            metadata: 元数据字典
+            cover_data: 封面图片数据（可选）
+
+        Returns:
+            是否已原地重写
+        """
+        with open(path, "r+b") as f:
+            header = f.read(10)
+            old_size = AudioIO._id3v2_size(header)
+            if old_size == 0 or header[5] & 0x10:
+                return False
+
+            tag = AudioIO.render_id3_tag(metadata, cover_data, total_size=old_size)
+            if len(tag) != old_size:
+                return False
+
+            f.seek(0)
+            f.write(tag)
+            f.flush()
+            os.fsync(f.fileno())
+
+        EventEmitter.item_event(str(path), "retagged", "")
+        return True
+
+    @staticmethod
+    def audio_payload_range(path: Path) -> Tuple[int, int]:
+        """
+        定位文件中的音频数据范围，跳过开头的 ID3v2 标签和末尾的 ID3v1 标签
+
+        Args:
+            path: 音频文件路径
+
+        Returns:
+            (起始偏移, 结束偏移)
+        """
+        size = os.path.getsize(path)
+        start, end = 0, size
+        with open(path, "rb") as f:
+            start = AudioIO._id3v2_size(f.read(10))
+            if size - start >= 128:
+                f.seek(size - 128)
+                if f.read(3) == b"TAG":
+                    end = size - 128
+        return min(start, end), end
+
+    @staticmethod
+    def copy_range(
+        src_fd: int, dst_fd: int, src_offset: int, length: int, dst_offset: int
+    ) -> str:
+        """
+        将源文件的一段数据复制到目标文件的指定位置
+
+        依次尝试 FICLONERANGE（btrfs/xfs 等 CoW 文件系统共享数据块）、
+        copy_file_range（内核态复制，部分文件系统同样会共享块）和普通读写。
+
+        Args:
+            src_fd: 源文件描述符
+            dst_fd: 目标文件描述符（可写）
+            src_offset: 源偏移
+            length: 字节数
+            dst_offset: 目标偏移
+
+        Returns:
+            实际使用的方式：reflink, copy_file_range 或 copy
+        """
+        if length <= 0:
+            return "copy"
+
+        method = None
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(
+                    dst_fd,
+                    FICLONERANGE,
+                    _CLONE_RANGE.pack(src_fd, src_offset, length, dst_offset),
+                )
+                return "reflink"
+            except OSError:
+                # 长度未对齐且不到源文件末尾（如存在 ID3v1）时，只克隆对齐部分
+                aligned = length - length % ID3_ALIGNMENT
+                if 0 < aligned < length:
+                    try:
+                        fcntl.ioctl(
+                            dst_fd,
+                            FICLONERANGE,
+                            _CLONE_RANGE.pack(src_fd, src_offset, aligned, dst_offset),
+                        )
+                        method = "reflink"
+                        src_offset += aligned
+                        dst_offset += aligned
+                        length -= aligned
+                    except OSError:
+                        pass
+
+        copy_file_range = getattr(os, "copy_file_range", None)
+        if copy_file_range is not None:
+            try:
+                while length > 0:
+                    copied = copy_file_range(
+                        src_fd, dst_fd, length, src_offset, dst_offset
+                    )
+                    if copied == 0:
+                        break
+                    src_offset += copied
+                    dst_offset += copied
+                    length -= copied
+                if length == 0:
+                    return method or "copy_file_range"
+            except OSError:
+                pass
+
+        while length > 0:
+            chunk = os.pread(src_fd, min(length, _COPY_CHUNK), src_offset)
+            if not chunk:
+                raise IOError("Unexpected end of source file")
+            os.pwrite(dst_fd, chunk, dst_offset)
+            src_offset += len(chunk)
+            dst_offset += len(chunk)
+            length -= len(chunk)
+        return method or "copy"
+
+    @staticmethod
+    @traced("embed_metadata")
+    def build_tagged_file(
+        src_audio: Path, metadata: dict, cover_data: Optional[bytes], out_path: Path
+    ) -> str:
+        """
+        生成带标签的发布文件：预渲染对齐的 ID3 标签，再把缓存对象中的音频数据
+        以 reflink / copy_file_range 方式拼接在其后，避免整文件读入内存和二次重写
+
+        Args:
+            src_audio: 源音频文件路径（无元数据的纯净音频）
+            metadata: 元数据字典
+            cover_data: 封面图片数据（可选）
+            out_path: 输出文件路径
+
+        Returns:
+            音频数据的复制方式：reflink, copy_file_range 或 copy
+        """
+        tag = AudioIO.render_id3_tag(metadata, cover_data)
+        start, end = AudioIO.audio_payload_range(src_audio)
+
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_fd, temp_path_str = tempfile.mkstemp(dir=out_path.parent, suffix=".tmp")
+        temp_path = Path(temp_path_str)
+        try:
+            with open(src_audio, "rb") as src:
+                os.pwrite(temp_fd, tag, 0)
+                method = AudioIO.copy_range(
+                    src.fileno(), temp_fd, start, end - start, len(tag)
+                )
+            os.close(temp_fd)
+            temp_fd = None
+            os.replace(temp_path, out_path)
+            add_bytes(read=end - start, written=len(tag) + end - start)
+        except Exception as e:
+            if temp_fd is not None:
+                os.close(temp_fd)
+            if temp_path.exists():
+                temp_path.unlink()
+            EventEmitter.error(
+                f"Failed to build release file: {str(e)}", {"path": str(out_path)}
+            )
+            raise e
+
+        EventEmitter.item_event(str(out_path), "metadata_embedded", method)
+        return method
+
+    @staticmethod
+    @traced("embed_metadata")
     def embed_metadata(
         src_audio: Path, metadata: dict, cover_data: Optional[bytes], out_path: Path
     ):
@@ -253,7 +558,9 @@ class AudioIO:
         """
         # 先复制原始音频到目标路径（原子写入）
         with open(src_audio, "rb") as f:
-            AudioIO.atomic_write(f.read(), out_path)
+            data = f.read()
+        AudioIO.atomic_write(data, out_path)
+        add_bytes(read=len(data), written=len(data))
 
         # 使用 mutagen 写入标签
         try:
@@ -263,45 +570,8 @@ class AudioIO:
 
             tags = audio.tags
             if tags is not None:
-                # 标题
-                if title := metadata.get("title"):
-                    tags.add(TIT2(encoding=3, text=title))
-
-                # 艺术家
-                if artists := metadata.get("artists"):
-                    if isinstance(artists, list):
-                        artists_text = "/".join(artists)
-                    else:
-                        artists_text = str(artists)
-                    tags.add(TPE1(encoding=3, text=artists_text))
-
-                # 专辑
-                if album := metadata.get("album"):
-                    tags.add(TALB(encoding=3, text=album))
-
-                # 日期
-                if date := metadata.get("date"):
-                    tags.add(TDRC(encoding=3, text=date))
-
-                # 歌词
-                if uslt := metadata.get("uslt"):
-                    tags.add(USLT(encoding=3, lang="eng", desc="", text=uslt))
-
-                # 元数据哈希，用于增量更新检测
-                if metadata_hash := metadata.get("metadata_hash"):
-                    tags.add(TXXX(encoding=3, desc="METADATA_HASH", text=metadata_hash))
-
-                # 封面
-                if cover_data:
-                    tags.add(
-                        APIC(
-                            encoding=3,
-                            mime="image/jpeg",
-                            type=3,  # 封面
-                            desc="Front Cover",
-                            data=cover_data,
-                        )
-                    )
+                for frame in AudioIO.metadata_frames(metadata, cover_data):
+                    tags.add(frame)
 
             audio.save()
             EventEmitter.item_event(str(out_path), "metadata_embedded", "")
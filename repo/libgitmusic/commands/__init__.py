@@ -1,44 +1,108 @@
-from .publish import publish_logic, execute_publish, extract_metadata_from_file
-from .checkout import checkout_logic, execute_checkout
-from .sync import sync_logic, analyze_sync_diff, execute_sync, sync_with_retry
-from .verify import (
-    verify_logic,
-    verify_local_cache,
-    verify_release_files,
-    verify_custom_path,
-)
-from .cleanup import (
-    cleanup_logic,
-    analyze_orphaned_files,
-    scan_remote_orphaned,
-    delete_local_orphaned,
-    delete_remote_orphaned,
-)
-from .release import (
-    release_logic,
-    execute_release,
-    calculate_metadata_hash,
-    generate_release_filename,
-    scan_existing_releases,
-)
-from .analyze import (
-    analyze_logic,
-    execute_analyze,
-    calculate_statistics,
-    find_duplicates,
-    search_entries,
-    filter_missing_fields,
-)
-from .download import (
-    download_logic,
-    execute_download,
-    fetch_metadata,
-    download_audio,
-)
-from .compress_images import (
-    compress_images_logic,
-    execute_compress_images,
-)
+"""
+命令实现（库函数）
+
+各命令函数按需加载（PEP 562）：访问 libgitmusic.commands.release_logic 等名称时
+才导入对应的命令模块。
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+# 公开名称 -> 所在命令模块
+_LAZY_ATTRS = {
+    "publish_logic": ".publish",
+    "execute_publish": ".publish",
+    "extract_metadata_from_file": ".publish",
+    "checkout_logic": ".checkout",
+    "execute_checkout": ".checkout",
+    "sync_logic": ".sync",
+    "analyze_sync_diff": ".sync",
+    "execute_sync": ".sync",
+    "sync_with_retry": ".sync",
+    "verify_logic": ".verify",
+    "verify_local_cache": ".verify",
+    "verify_release_files": ".verify",
+    "verify_custom_path": ".verify",
+    "verify_cover_packs": ".verify",
+    "cleanup_logic": ".cleanup",
+    "analyze_orphaned_files": ".cleanup",
+    "scan_remote_orphaned": ".cleanup",
+    "delete_local_orphaned": ".cleanup",
+    "delete_remote_orphaned": ".cleanup",
+    "release_logic": ".release",
+    "execute_release": ".release",
+    "run_release": ".release",
+    "build_release_plan": ".release",
+    "build_release_plans": ".release",
+    "calculate_metadata_hash": ".release",
+    "generate_release_filename": ".release",
+    "scan_existing_releases": ".release",
+    "analyze_logic": ".analyze",
+    "execute_analyze": ".analyze",
+    "calculate_statistics": ".analyze",
+    "find_duplicates": ".analyze",
+    "search_entries": ".analyze",
+    "filter_missing_fields": ".analyze",
+    "download_logic": ".download",
+    "execute_download": ".download",
+    "fetch_metadata": ".download",
+    "download_audio": ".download",
+    "compress_images_logic": ".compress_images",
+    "execute_compress_images": ".compress_images",
+    "repack_logic": ".repack",
+    "logs_logic": ".logs",
+    "reshard_logic": ".reshard",
+}
+
+if TYPE_CHECKING:
+    from .publish import publish_logic, execute_publish, extract_metadata_from_file
+    from .checkout import checkout_logic, execute_checkout
+    from .sync import sync_logic, analyze_sync_diff, execute_sync, sync_with_retry
+    from .verify import (
+        verify_logic,
+        verify_local_cache,
+        verify_release_files,
+        verify_custom_path,
+        verify_cover_packs,
+    )
+    from .cleanup import (
+        cleanup_logic,
+        analyze_orphaned_files,
+        scan_remote_orphaned,
+        delete_local_orphaned,
+        delete_remote_orphaned,
+    )
+    from .release import (
+        release_logic,
+        execute_release,
+        run_release,
+        build_release_plan,
+        build_release_plans,
+        calculate_metadata_hash,
+        generate_release_filename,
+        scan_existing_releases,
+    )
+    from .analyze import (
+        analyze_logic,
+        execute_analyze,
+        calculate_statistics,
+        find_duplicates,
+        search_entries,
+        filter_missing_fields,
+    )
+    from .download import (
+        download_logic,
+        execute_download,
+        fetch_metadata,
+        download_audio,
+    )
+    from .compress_images import (
+        compress_images_logic,
+        execute_compress_images,
+    )
+    from .repack import repack_logic
+    from .logs import logs_logic
+    from .reshard import reshard_logic
 
 __all__ = [
     "publish_logic",
@@ -54,6 +118,7 @@ __all__ = [
     "verify_local_cache",
     "verify_release_files",
     "verify_custom_path",
+    "verify_cover_packs",
     "cleanup_logic",
     "analyze_orphaned_files",
     "scan_remote_orphaned",
@@ -61,6 +126,9 @@ __all__ = [
     "delete_remote_orphaned",
     "release_logic",
     "execute_release",
+    "run_release",
+    "build_release_plan",
+    "build_release_plans",
     "calculate_metadata_hash",
     "generate_release_filename",
     "scan_existing_releases",
@@ -76,4 +144,20 @@ __all__ = [
     "download_audio",
     "compress_images_logic",
     "execute_compress_images",
+    "repack_logic",
+    "logs_logic",
+    "reshard_logic",
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
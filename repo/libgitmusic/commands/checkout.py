@@ -1,5 +1,11 @@
 from pathlib import Path
 from ..audio import AudioIO
+from ..packfile import PackStore
+from ..object_index import ObjectIndex
+from ..layout import ShardLayout
+
+# 检出条目数达到该值时，先扫描一次缓存目录建立索引，避免逐条 stat
+INDEX_MIN_ITEMS = 64
 
 
 def checkout_logic(
@@ -78,6 +84,17 @@ def execute_checkout(repo_root, items, force=False, progress_callback=None):
     """执行检出动作"""
     work_dir = repo_root.parent / "work"
     cache_root = repo_root.parent / "cache"
+    cover_packs = PackStore(cache_root / "covers" / "pack")
+    layout = ShardLayout.load(cache_root)
+    audio_index = None
+    cover_index = None
+    if len(items) >= INDEX_MIN_ITEMS:
+        audio_index = ObjectIndex.from_directory(
+            cache_root / "objects" / "sha256", ".mp3", depth=layout.depth
+        )
+        cover_index = ObjectIndex.from_directory(
+            cache_root / "covers" / "sha256", ".jpg", depth=layout.depth
+        )
     results = []
 
     for entry in items:
@@ -93,24 +110,37 @@ def execute_checkout(repo_root, items, force=False, progress_callback=None):
             progress_callback(filename)
 
         audio_hash = entry["audio_oid"].split(":")[1]
-        src_audio = (
-            cache_root / "objects" / "sha256" / audio_hash[:2] / f"{audio_hash}.mp3"
+        src_audio = layout.object_path(
+            cache_root / "objects" / "sha256", audio_hash, ".mp3"
         )
 
         cover_data = None
         if entry.get("cover_oid"):
             cover_hash = entry["cover_oid"].split(":")[1]
-            cover_path = (
-                cache_root / "covers" / "sha256" / cover_hash[:2] / f"{cover_hash}.jpg"
+            cover_path = layout.object_path(
+                cache_root / "covers" / "sha256", cover_hash, ".jpg"
             )
-            if cover_path.exists():
+            if (
+                cover_index.contains_oid(cover_hash)
+                if cover_index is not None
+                else cover_path.exists()
+            ):
                 with open(cover_path, "rb") as f:
                     cover_data = f.read()
-
-        if src_audio.exists():
+            else:
+                packed = cover_packs.read(cover_hash)
+                if packed is not None:
+                    cover_data = bytes(packed)
+
+        if (
+            audio_index.contains_oid(audio_hash)
+            if audio_index is not None
+            else src_audio.exists()
+        ):
             AudioIO.embed_metadata(src_audio, entry, cover_data, out_path)
             results.append((filename, "success"))
         else:
             results.append((filename, "error: source missing"))
 
+    cover_packs.close()
     return results
@@ -1,12 +1,14 @@
 import subprocess
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from send2trash import send2trash
 
 from ..events import EventEmitter
 from ..metadata import MetadataManager
 from ..object_store import ObjectStore
+from ..object_index import ObjectIndex
 from ..transport import TransportAdapter
+from ..gc import GarbageCollector
 
 
 def analyze_orphaned_files(
@@ -44,19 +46,33 @@ def analyze_orphaned_files(
     # 2. 扫描本地缓存目录
     orphaned_files = []
     if mode in ["local", "both"]:
-        # 扫描音频对象目录
-        for obj_file in object_store.objects_dir.rglob("*.mp3"):
-            if obj_file.is_file():
-                file_hash = obj_file.stem  # 文件名就是哈希值
-                if file_hash not in referenced_oids:
-                    orphaned_files.append(obj_file)
-
-        # 扫描封面目录
-        for cover_file in object_store.covers_dir.rglob("*.jpg"):
-            if cover_file.is_file():
-                file_hash = cover_file.stem  # 文件名就是哈希值
-                if file_hash not in referenced_oids:
-                    orphaned_files.append(cover_file)
+        # 一次目录扫描建立索引（每个分片目录一次 readdir，无逐文件 stat）
+        audio_index = ObjectIndex.from_directory(
+            object_store.objects_dir / "sha256",
+            ".mp3",
+            bloom=False,
+            depth=object_store.layout.depth,
+        )
+        for digest in audio_index:
+            file_hash = digest.hex()  # 文件名就是哈希值
+            if file_hash not in referenced_oids:
+                orphaned_files.append(
+                    object_store._get_object_path(f"sha256:{file_hash}")
+                )
+
+        # 扫描封面目录（pack 中的封面由 repack 按引用集合清理）
+        cover_index = ObjectIndex.from_directory(
+            object_store.covers_dir / "sha256",
+            ".jpg",
+            bloom=False,
+            depth=object_store.layout.depth,
+        )
+        for digest in cover_index:
+            file_hash = digest.hex()
+            if file_hash not in referenced_oids:
+                orphaned_files.append(
+                    object_store._get_object_path(f"sha256:{file_hash}.jpg")
+                )
 
     EventEmitter.item_event(
         "analysis",
@@ -201,81 +217,94 @@ def delete_remote_orphaned(
 
 
 def cleanup_logic(
-    metadata_file: Path,
-    cache_root: Path,
+    context: "Context",
     mode: str = "local",
     confirm: bool = False,
     dry_run: bool = False,
-    remote_user: str = "",
-    remote_host: str = "",
-    remote_data_root: str = "",
+    grace_period_days: Optional[float] = None,
+    include_history: Optional[bool] = None,
 ) -> int:
     """
-    Cleanup 命令的核心业务逻辑
+    Cleanup 命令的核心业务逻辑（基于 GarbageCollector 的标记-清除）
 
     Args:
-        metadata_file: 元数据文件路径
-        cache_root: 缓存根目录
+        context: 上下文对象
         mode: 清理模式 (local, server, both)
         confirm: 确认执行删除操作
         dry_run: 仅显示分析结果
-        remote_user: 远端用户名
-        remote_host: 远端主机
-        remote_data_root: 远端数据根目录
+        grace_period_days: 宽限期（天），None 时使用配置 gc.grace_period_days
+        include_history: 是否保护 Git 历史版本元数据引用的对象，None 时使用配置
 
     Returns:
         退出码 (0=成功, 1=错误)
     """
-    metadata_mgr = MetadataManager(metadata_file)
-    object_store = ObjectStore(cache_root)
-
-    # 分析孤立文件
-    orphaned_files, remote_orphaned = analyze_orphaned_files(
-        metadata_mgr, object_store, mode
-    )
-
-    # 如果需要扫描远端
+    transport = None
     if mode in ["server", "both"]:
-        if not all([remote_user, remote_host, remote_data_root]):
+        transport_cfg = context.transport_config
+        if not all(
+            [
+                transport_cfg.get("user"),
+                transport_cfg.get("host"),
+                transport_cfg.get("remote_data_root"),
+            ]
+        ):
             EventEmitter.error("服务器模式需要提供远程连接参数")
             return 1
+        transport = TransportAdapter(context)
 
-        transport = TransportAdapter(remote_user, remote_host, remote_data_root)
-        # 重新加载 referenced_oids（需要从metadata中提取）
-        entries = metadata_mgr.load_all()
-        referenced_oids = set()
-        for e in entries:
-            audio_oid = e.get("audio_oid", "")
-            if audio_oid and ":" in audio_oid:
-                referenced_oids.add(audio_oid.split(":", 1)[1])
-            cover_oid = e.get("cover_oid", "")
-            if cover_oid and ":" in cover_oid:
-                referenced_oids.add(cover_oid.split(":", 1)[1])
-
-        remote_orphaned = scan_remote_orphaned(
-            transport, remote_data_root, referenced_oids
-        )
+    gc = GarbageCollector(
+        context,
+        transport=transport,
+        grace_period_days=grace_period_days,
+        include_history=include_history,
+    )
+
+    # 标记并扫描（本地与远端并行）
+    plan = gc.collect(mode)
+    orphaned = plan["local"]
+    remote_orphaned = plan["remote"]
+    young = plan["young_local"] + plan["young_remote"]
+
+    # 扫描结果即使不删除也要保存，下次只需检查新对象
+    gc.save_state()
 
     # 统计总数
-    total_orphaned = len(orphaned_files) + len(remote_orphaned)
+    total_orphaned = len(orphaned) + len(remote_orphaned)
 
     # 如果没有孤儿文件，返回
     if total_orphaned == 0:
-        EventEmitter.result("ok", message="No orphaned files found")
+        message = "No orphaned files found"
+        if young:
+            message += f" ({young} unreferenced objects within grace period)"
+        EventEmitter.result("ok", message=message, artifacts={"young_count": young})
         return 0
 
+    cache_root = context.cache_root
+
     # 如果是dry-run或未确认，显示统计信息
     if dry_run or not confirm:
         # 构建条目列表供CLI显示
         entries = []
-        for f in orphaned_files:
+        for kind, hexdigest, path in orphaned:
+            if path is None:
+                entries.append(
+                    {
+                        "type": "local",
+                        "file": f"{hexdigest}.jpg",
+                        "name": f"{hexdigest}.jpg",
+                        "path": "covers/pack",
+                    }
+                )
+                continue
             entries.append(
                 {
                     "type": "local",
-                    "file": str(f),
-                    "name": f.name,
+                    "file": str(path),
+                    "name": path.name,
                     "path": str(
-                        f.relative_to(cache_root) if f.is_relative_to(cache_root) else f
+                        path.relative_to(cache_root)
+                        if path.is_relative_to(cache_root)
+                        else path
                     ),
                 }
             )
@@ -290,13 +319,17 @@ def cleanup_logic(
             )
 
         artifacts = {
-            "local_orphaned_count": len(orphaned_files),
+            "local_orphaned_count": len(orphaned),
             "remote_orphaned_count": len(remote_orphaned),
             "total_orphaned_count": total_orphaned,
+            "young_count": young,
             "entries": entries,  # CLI会显示这个字段
         }
-        if orphaned_files:
-            artifacts["local_orphaned_files"] = [str(f) for f in orphaned_files]
+        if orphaned:
+            artifacts["local_orphaned_files"] = [
+                str(path) if path else f"{hexdigest}.jpg"
+                for _, hexdigest, path in orphaned
+            ]
         if remote_orphaned:
             artifacts["remote_orphaned_files"] = [f[1] for f in remote_orphaned]
 
@@ -308,24 +341,21 @@ def cleanup_logic(
         return 0
 
     # 执行清理
-    deleted_count = 0
-
-    # 删除本地文件
-    deleted_count += delete_local_orphaned(orphaned_files)
+    result = gc.delete(plan)
+    gc.save_state()
 
-    # 删除远端文件
-    if mode in ["server", "both"]:
-        deleted_count += delete_remote_orphaned(
-            remote_orphaned, remote_user, remote_host, remote_data_root
-        )
+    local_deleted = result.data["local_deleted"] + result.data["packed_deleted"]
+    remote_deleted = result.data["remote_deleted"]
+    deleted_count = local_deleted + remote_deleted
 
     EventEmitter.result(
         "ok",
         message=f"Cleaned up {deleted_count} orphaned files",
         artifacts={
             "deleted_count": deleted_count,
-            "local_deleted": len(orphaned_files),
-            "remote_deleted": len(remote_orphaned),
+            "local_deleted": local_deleted,
+            "remote_deleted": remote_deleted,
+            "young_count": young,
         },
     )
     return 0
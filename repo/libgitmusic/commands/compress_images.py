@@ -25,6 +25,7 @@ def compress_images_logic(
         (需要压缩的条目列表, 错误消息)
     """
     entries = metadata_mgr.load_all()
+    object_store.ensure_index(len(entries))
     EventEmitter.phase_start("compress_images", total_items=len(entries))
 
     entries_to_compress = []
@@ -35,9 +36,11 @@ def compress_images_logic(
             continue
 
         cover_oid = entry["cover_oid"]
-        cover_path = object_store.get_cover_path(cover_oid)
+        # 封面可能是松散文件，也可能位于pack中，统一通过对象存储访问
+        cover_size = object_store.cover_size(cover_oid)
+        cover_path = object_store._get_object_path(cover_oid + ".jpg")
 
-        if not cover_path or not cover_path.exists():
+        if cover_size is None:
             EventEmitter.log(
                 "warn",
                 f"Cover file not found for OID: {cover_oid}, entry: {entry.get('title', 'unknown')}",
@@ -46,7 +49,7 @@ def compress_images_logic(
             continue
 
         # 检查文件大小是否超过阈值
-        file_size_kb = cover_path.stat().st_size / 1024
+        file_size_kb = cover_size / 1024
         if file_size_kb < min_size_kb:
             EventEmitter.item_event(
                 cover_path.name,
@@ -58,8 +61,9 @@ def compress_images_logic(
 
         # 读取原始封面数据
         try:
-            with open(cover_path, "rb") as f:
-                original_data = f.read()
+            original_data = object_store.read_cover(cover_oid)
+            if original_data is None:
+                raise FileNotFoundError(cover_oid)
         except Exception as e:
             EventEmitter.error(
                 f"Failed to read cover file: {str(e)}", {"path": str(cover_path)}
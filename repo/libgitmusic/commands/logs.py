@@ -0,0 +1,101 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..events import EventEmitter
+from ..log_archive import ArchivePolicy, LogArchive, parse_time
+
+# query 缺省返回的事件数
+DEFAULT_QUERY_LIMIT = 100
+
+
+def logs_logic(
+    logs_dir: Path,
+    policy: ArchivePolicy,
+    action: str = "query",
+    types: Optional[List[str]] = None,
+    levels: Optional[List[str]] = None,
+    item: Optional[str] = None,
+    command: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    text: Optional[str] = None,
+    limit: int = DEFAULT_QUERY_LIMIT,
+    exclude: Optional[Path] = None,
+) -> Dict:
+    """
+    Logs 命令的核心业务逻辑：查询、归档或列出事件日志
+
+    Args:
+        logs_dir: 日志目录
+        policy: 归档策略
+        action: query（查询事件）、archive（执行归档维护）或 index（列出归档摘要）
+        types: 事件类型过滤
+        levels: 日志级别过滤
+        item: item id 过滤
+        command: 命令名过滤
+        since: 起始时间（ISO 或相对时间，如 2h、7d）
+        until: 结束时间
+        text: 子串过滤
+        limit: 最多返回的事件数（取最近的匹配）
+        exclude: 查询时跳过的日志文件（当前命令的日志）
+
+    Returns:
+        结果字典，action 为 query 时含 events 列表；参数错误时含 error
+    """
+    archive = LogArchive(logs_dir, policy)
+
+    if action == "archive":
+        result = archive.maintain()
+        EventEmitter.result(
+            "ok",
+            message=f"归档 {len(result['archived'])} 个日志，清理 {len(result['pruned'])} 个旧归档",
+            artifacts=result,
+        )
+        return result
+
+    if action == "index":
+        entries = archive.index()
+        for entry in entries:
+            entry.pop("item_ids", None)
+        EventEmitter.result(
+            "ok", message=f"{len(entries)} 个归档日志", artifacts={"archives": entries}
+        )
+        return {"archives": entries}
+
+    if action != "query":
+        EventEmitter.error(f"未知的 logs 子命令: {action}")
+        return {"error": f"unknown action: {action}"}
+
+    try:
+        since_dt = parse_time(since) if since else None
+        until_dt = parse_time(until) if until else None
+    except ValueError as e:
+        EventEmitter.error(f"无效的时间参数: {e}")
+        return {"error": str(e)}
+
+    stats: Dict = {}
+    events = list(
+        archive.query(
+            types=types,
+            levels=levels,
+            item=item,
+            command=command,
+            since=since_dt,
+            until=until_dt,
+            text=text,
+            limit=limit,
+            exclude=exclude,
+            # logs 命令的日志里是以前的查询结果，除非显式查询它
+            skip_commands=() if command == "logs" else ("logs",),
+            stats=stats,
+        )
+    )
+    EventEmitter.result(
+        "ok",
+        message=(
+            f"找到 {len(events)} 个事件（扫描 {stats['files_scanned']} 个日志，"
+            f"按索引跳过 {stats['files_skipped']} 个）"
+        ),
+        artifacts={"events": events, **stats},
+    )
+    return {"events": events, **stats}
@@ -7,6 +7,7 @@ from mutagen.id3 import ID3
 from mutagen.id3._frames import TPE1, TIT2, TALB, TDRC, USLT, TXXX, APIC
 from ..audio import AudioIO
 from ..events import EventEmitter
+from ..layout import ShardLayout
 
 
 def extract_metadata_from_file(audio_path: Path) -> dict:
@@ -92,137 +93,209 @@ def _ensure_required_metadata(metadata: dict, audio_path: Path) -> dict:
     return metadata
 
 
-def publish_logic(metadata_mgr, changed_only=False, progress_callback=None):
-    """Publish 命令的核心业务逻辑"""
-    # 从metadata_mgr的context获取工作目录
-    work_dir = metadata_mgr.context.work_dir
-    files = list(work_dir.glob("*.mp3"))
+def list_publish_files(work_dir: Path) -> list:
+    """列出工作目录中待发布的 MP3 文件"""
+    return list(work_dir.glob("*.mp3"))
 
-    if not files:
-        return [], "工作目录为空"
 
-    existing_entries = {e["audio_oid"]: e for e in metadata_mgr.load_all()}
-    to_process = []
+def analyze_file(f: Path, existing_entries: dict, changed_only=False):
+    """
+    分析单个文件：读取标签、计算音频哈希并与已有元数据比较
 
-    for i, f in enumerate(files):
-        # 从ID3标签读取元数据
-        metadata = extract_metadata_from_file(f)
-        title = metadata.get("title", f.stem)
-        artists = metadata.get("artists", ["Unknown"])
+    Args:
+        f: MP3 文件路径
+        existing_entries: audio_oid -> 已有元数据条目
+        changed_only: 为 True 时未变化的文件返回 None
 
-        audio_oid = AudioIO.get_audio_hash(f)
-        existing = existing_entries.get(audio_oid)
-        is_changed = False
-        reason = ""
+    Returns:
+        待处理项字典，或 None（未变化且 changed_only）
+    """
+    # 从ID3标签读取元数据
+    metadata = extract_metadata_from_file(f)
+    title = metadata.get("title", f.stem)
+    artists = metadata.get("artists", ["Unknown"])
 
-        # 需要比较的所有字段
-        fields_to_compare = ["title", "artists", "album", "date", "uslt"]
+    audio_oid = AudioIO.get_audio_hash(f)
+    existing = existing_entries.get(audio_oid)
+    is_changed = False
+    reason = ""
 
-        if not existing:
-            is_changed = True
-            reason = "New File"
-            field_changes = {}
-            for field in fields_to_compare:
-                if field in metadata:
-                    field_changes[field] = {"old": None, "new": metadata[field]}
-        else:
-            field_changes = {}
-            for field in fields_to_compare:
-                existing_value = existing.get(field)
-                new_value = metadata.get(field)
-
-                # 特殊处理艺术家字段：比较集合
-                if field == "artists":
-                    if set(existing_value or []) != set(new_value or []):
-                        field_changes[field] = {"old": existing_value, "new": new_value}
-                # 其他字段直接比较
-                elif existing_value != new_value:
-                    field_changes[field] = {"old": existing_value, "new": new_value}
+    # 需要比较的所有字段
+    fields_to_compare = ["title", "artists", "album", "date", "uslt"]
 
-            if field_changes:
-                is_changed = True
-                reason = "Metadata Mismatch"
-            else:
-                field_changes = None
-
-        if not changed_only or is_changed:
-            to_process.append(
-                {
-                    "path": f,
-                    "audio_oid": audio_oid,
-                    "title": title,
-                    "artists": artists,
-                    "album": metadata.get("album"),
-                    "date": metadata.get("date"),
-                    "uslt": metadata.get("uslt"),
-                    "is_changed": is_changed,
-                    "reason": reason,
-                    "field_changes": field_changes if is_changed else None,
-                    "existing": existing,
-                }
-            )
+    if not existing:
+        is_changed = True
+        reason = "New File"
+        field_changes = {}
+        for field in fields_to_compare:
+            if field in metadata:
+                field_changes[field] = {"old": None, "new": metadata[field]}
+    else:
+        field_changes = {}
+        for field in fields_to_compare:
+            existing_value = existing.get(field)
+            new_value = metadata.get(field)
+
+            # 特殊处理艺术家字段：比较集合
+            if field == "artists":
+                if set(existing_value or []) != set(new_value or []):
+                    field_changes[field] = {"old": existing_value, "new": new_value}
+            # 其他字段直接比较
+            elif existing_value != new_value:
+                field_changes[field] = {"old": existing_value, "new": new_value}
 
+        if field_changes:
+            is_changed = True
+            reason = "Metadata Mismatch"
+        else:
+            field_changes = None
+
+    if changed_only and not is_changed:
+        return None
+    return {
+        "path": f,
+        "audio_oid": audio_oid,
+        "title": title,
+        "artists": artists,
+        "album": metadata.get("album"),
+        "date": metadata.get("date"),
+        "uslt": metadata.get("uslt"),
+        "is_changed": is_changed,
+        "reason": reason,
+        "field_changes": field_changes if is_changed else None,
+        "existing": existing,
+    }
+
+
+def iter_publish_items(metadata_mgr, files, changed_only=False, progress_callback=None):
+    """
+    逐个分析文件并产出待处理项（流式版本的 publish_logic）
+
+    Args:
+        metadata_mgr: 元数据管理器
+        files: list_publish_files 返回的文件列表
+        changed_only: 只产出有变化的项
+        progress_callback: 进度回调 (已分析数, 总数)
+
+    Yields:
+        待处理项字典；无法分析的文件（如损坏的 MP3）发出 failed 事件后跳过，
+        其余文件照常发布
+    """
+    existing_entries = {e["audio_oid"]: e for e in metadata_mgr.load_all()}
+    for i, f in enumerate(files):
+        try:
+            item = analyze_file(f, existing_entries, changed_only)
+        except Exception as e:
+            # 下游阶段已在提交前面的文件，中止会留下发布了一半、未提交的状态
+            EventEmitter.item_event(f.name, "failed", f"Analysis failed: {str(e)}")
+            EventEmitter.error(f"分析失败，已跳过 {f.name}: {str(e)}", {"file": str(f)})
+            item = None
         # 调用进度回调
         if progress_callback:
             progress_callback(i + 1, len(files))
+        if item is not None:
+            yield item
+
+
+def publish_logic(metadata_mgr, changed_only=False, progress_callback=None):
+    """Publish 命令的核心业务逻辑"""
+    # 从metadata_mgr的context获取工作目录
+    work_dir = metadata_mgr.context.work_dir
+    files = list_publish_files(work_dir)
 
+    if not files:
+        return [], "工作目录为空"
+
+    to_process = list(
+        iter_publish_items(metadata_mgr, files, changed_only, progress_callback)
+    )
     return to_process, None
 
 
+def store_item_objects(item, cache_root: Path, layout: ShardLayout) -> dict:
+    """
+    把一项的封面与音频写入对象库（publish 的存储阶段）
+
+    Args:
+        item: 待处理项
+        cache_root: 缓存根目录
+        layout: 对象分片布局
+
+    Returns:
+        附加 cover_oid 字段的新字典（不修改传入的 item）
+    """
+    # 1. 封面
+    cover_data = AudioIO.extract_cover(item["path"])
+    cover_oid = None
+    if cover_data:
+        cover_hash = hashlib.sha256(cover_data).hexdigest()
+        cover_oid = f"sha256:{cover_hash}"
+        cover_path = layout.object_path(
+            cache_root / "covers" / "sha256", cover_hash, ".jpg"
+        )
+        AudioIO.atomic_write(cover_data, cover_path)
+
+    # 2. 音频
+    audio_hash = item["audio_oid"].split(":")[1]
+    obj_path = layout.object_path(
+        cache_root / "objects" / "sha256", audio_hash, ".mp3"
+    )
+    if not obj_path.exists():
+        with open(item["path"], "rb") as f:
+            AudioIO.atomic_write(f.read(), obj_path)
+
+    return {**item, "cover_oid": cover_oid}
+
+
+def commit_item(metadata_mgr, item) -> dict:
+    """
+    更新一项的元数据并把源文件移入回收站（publish 的提交阶段，需串行执行）
+
+    Args:
+        metadata_mgr: 元数据管理器
+        item: 经过 store_item_objects 的待处理项
+
+    Returns:
+        同一个 item
+    """
+    # 3. 元数据
+    entry = item["existing"] or {
+        "audio_oid": item["audio_oid"],
+        "created_at": datetime.datetime.now(datetime.timezone.utc)
+        .isoformat()
+        .replace("+00:00", "Z"),
+    }
+
+    # 更新所有元数据字段（仅当有值时）
+    entry.update({"cover_oid": item.get("cover_oid")})
+
+    # 基本字段
+    if "title" in item:
+        entry["title"] = item["title"]
+    if "artists" in item:
+        entry["artists"] = item["artists"]
+
+    # 可选字段（仅当有值时更新）
+    if item.get("album"):
+        entry["album"] = item["album"]
+    if item.get("date"):
+        entry["date"] = item["date"]
+    if item.get("uslt"):
+        entry["uslt"] = item["uslt"]
+    metadata_mgr.update_entry(item["audio_oid"], entry)
+
+    # 4. 清理
+    send2trash(str(item["path"]))
+    return item
+
+
 def execute_publish(metadata_mgr, items, progress_callback=None):
     """执行真正的发布动作"""
     # 从metadata_mgr的context获取缓存根目录
     cache_root = metadata_mgr.context.cache_root
+    layout = ShardLayout.load(cache_root, metadata_mgr.context.config)
 
     for item in items:
         if progress_callback:
             progress_callback(item["path"].name)
-
-        # 1. 封面
-        cover_data = AudioIO.extract_cover(item["path"])
-        cover_oid = None
-        if cover_data:
-            cover_hash = hashlib.sha256(cover_data).hexdigest()
-            cover_oid = f"sha256:{cover_hash}"
-            cover_path = (
-                cache_root / "covers" / "sha256" / cover_hash[:2] / f"{cover_hash}.jpg"
-            )
-            AudioIO.atomic_write(cover_data, cover_path)
-
-        # 2. 音频
-        audio_hash = item["audio_oid"].split(":")[1]
-        obj_path = (
-            cache_root / "objects" / "sha256" / audio_hash[:2] / f"{audio_hash}.mp3"
-        )
-        if not obj_path.exists():
-            with open(item["path"], "rb") as f:
-                AudioIO.atomic_write(f.read(), obj_path)
-
-        # 3. 元数据
-        entry = item["existing"] or {
-            "audio_oid": item["audio_oid"],
-            "created_at": datetime.datetime.now(datetime.timezone.utc)
-            .isoformat()
-            .replace("+00:00", "Z"),
-        }
-
-        # 更新所有元数据字段（仅当有值时）
-        entry.update({"cover_oid": cover_oid})
-
-        # 基本字段
-        if "title" in item:
-            entry["title"] = item["title"]
-        if "artists" in item:
-            entry["artists"] = item["artists"]
-
-        # 可选字段（仅当有值时更新）
-        if item.get("album"):
-            entry["album"] = item["album"]
-        if item.get("date"):
-            entry["date"] = item["date"]
-        if item.get("uslt"):
-            entry["uslt"] = item["uslt"]
-        metadata_mgr.update_entry(item["audio_oid"], entry)
-
-        # 4. 清理
-        send2trash(str(item["path"]))
+        commit_item(metadata_mgr, store_item_objects(item, cache_root, layout))
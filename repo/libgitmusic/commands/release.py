@@ -1,15 +1,97 @@
 import os
 import json
 import hashlib
+import threading
 import concurrent.futures
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Set, Tuple
 from datetime import datetime
 
 from ..events import EventEmitter
 from ..audio import AudioIO
-from ..metadata import MetadataManager
+from ..git import GitOperations
+from ..metadata import MetadataManager, diff_metadata, parse_metadata_lines
 from ..object_store import ObjectStore
+from ..release_manifest import ReleaseManifest
+from ..release_profiles import ReleaseProfile, flat_filename, load_release_profiles
+from ..tracing import traced
+from ..transcode import TranscodeCache, build_tagged_transcode, read_metadata_hash
+from .verify import move_to_trash
+
+# 发布文件生成方式：
+#   auto   - 预渲染 ID3 标签，音频数据通过 reflink / copy_file_range 拼接
+#   legacy - 整文件复制后由 mutagen 重写标签
+RELEASE_COPY_MODES = ("auto", "legacy")
+
+# 文件名冲突处理策略（冲突在规划阶段于内存中解决）：
+#   suffix    - 按 (created_at, audio_oid) 排序，后者依次追加 _1, _2 ...
+#   overwrite - 同名条目中只保留排序最后的一个
+#   skip      - 同名条目中只保留排序最前的一个，且不覆盖磁盘上已存在的文件
+CONFLICT_STRATEGIES = ("suffix", "overwrite", "skip")
+
+# 并行执行方式：auto 根据 workers 和条目数量在线程池/进程池之间选择
+RELEASE_EXECUTORS = ("auto", "thread", "process")
+# auto 模式下启用进程池的最小条目数（进程启动和对象存储初始化有固定开销）
+PROCESS_MIN_ENTRIES = 64
+# 进程池每个任务处理的条目数
+RELEASE_CHUNK_SIZE = 32
+# 每个 worker 缓存的封面数量
+COVER_CACHE_SIZE = 64
+
+
+class CoverCache:
+    """按 cover_oid 缓存封面字节的 LRU（同一专辑的曲目通常共用一个封面）"""
+
+    def __init__(self, object_store: ObjectStore, maxsize: int = COVER_CACHE_SIZE):
+        """
+        初始化缓存
+
+        Args:
+            object_store: 对象存储实例
+            maxsize: 最多缓存的封面数量（每个尺寸单独计数）
+        """
+        self.object_store = object_store
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[str, Optional[int]], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cover_oid: str, max_width: Optional[int] = None) -> Optional[bytes]:
+        """
+        读取封面，不存在返回 None（不缓存缺失结果）
+
+        Args:
+            cover_oid: 封面对象 ID
+            max_width: 最大宽度，缺省时返回原图。缩放结果同样缓存，
+                       多个发布配置共用一次读取
+
+        Returns:
+            封面数据
+        """
+        key = (cover_oid, max_width)
+        with self._lock:
+            data = self._data.get(key)
+            if data is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        if max_width:
+            data = self.get(cover_oid)
+            if data is not None:
+                data = AudioIO.compress_cover(data, max_width=max_width)
+        else:
+            data = self.object_store.read_cover(cover_oid)
+        if data is not None:
+            with self._lock:
+                self._data[key] = data
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return data
 
 
 def calculate_metadata_hash(metadata: Dict) -> str:
@@ -34,6 +116,25 @@ def calculate_metadata_hash(metadata: Dict) -> str:
     return f"sha256:{hash_obj.hexdigest()}"
 
 
+def profile_metadata_hash(metadata: Dict, profile: Optional[ReleaseProfile]) -> str:
+    """
+    计算条目在指定发布配置下的哈希值
+
+    裁剪标签或缩放封面的配置把配置项一并计入哈希，修改配置后文件会重新生成；
+    完整标签的配置与 calculate_metadata_hash 一致，兼容已有的发布文件。
+
+    Args:
+        metadata: 元数据字典
+        profile: 发布配置（None 表示默认配置）
+
+    Returns:
+        哈希字符串 (sha256:hexdigest)
+    """
+    if profile is None or profile.is_plain:
+        return calculate_metadata_hash(metadata)
+    return calculate_metadata_hash(dict(metadata, release_profile=profile.signature()))
+
+
 def extract_existing_metadata_hash(file_path: Path) -> Optional[str]:
     """
     从现有文件中提取嵌入的元数据哈希
@@ -45,6 +146,10 @@ def extract_existing_metadata_hash(file_path: Path) -> Optional[str]:
         元数据哈希 (sha256:hexdigest) 或 None
     """
     try:
+        if file_path.suffix.lower() != ".mp3":
+            # 转码生成的 m4a / opus 文件
+            return read_metadata_hash(file_path)
+
         from mutagen.mp3 import MP3
         from mutagen.id3 import ID3
 
@@ -63,6 +168,52 @@ def extract_existing_metadata_hash(file_path: Path) -> Optional[str]:
     return None
 
 
+def read_release_hash(
+    file_path: Path,
+    manifest: Optional[ReleaseManifest] = None,
+    st: Optional[os.stat_result] = None,
+    key: Optional[str] = None,
+) -> Optional[str]:
+    """
+    获取发布文件的元数据哈希：stat 与清单一致时直接采用清单记录，
+    否则回退到读取 ID3 标签并刷新清单
+
+    Args:
+        file_path: 发布文件路径
+        manifest: 发布清单（可选）
+        st: 文件 stat 结果（可选，缺省时重新 stat）
+        key: 清单中的文件名（相对发布目录的路径，缺省时为 file_path.name）
+
+    Returns:
+        元数据哈希 (sha256:hexdigest) 或 None
+    """
+    if manifest is None:
+        return extract_existing_metadata_hash(file_path)
+    if key is None:
+        key = file_path.name
+
+    if st is None:
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            manifest.remove(key)
+            return None
+
+    cached = manifest.cached_hash(key, st)
+    if cached is not None:
+        return cached
+
+    metadata_hash = extract_existing_metadata_hash(file_path)
+    if metadata_hash:
+        record = manifest.get(key) or {}
+        manifest.record(
+            key, metadata_hash, audio_oid=record.get("audio_oid"), st=st
+        )
+    else:
+        manifest.remove(key)
+    return metadata_hash
+
+
 def generate_release_filename(metadata: Dict) -> str:
     """
     生成发布文件名：艺术家 - 标题.mp3
@@ -73,67 +224,150 @@ def generate_release_filename(metadata: Dict) -> str:
     Returns:
         安全的文件名
     """
-    artists = metadata.get("artists", ["Unknown"])
-    if isinstance(artists, list):
-        artist_str = ", ".join(artists)
-    else:
-        artist_str = str(artists)
+    return flat_filename(metadata)
 
-    title = metadata.get("title", "Unknown")
 
-    if artist_str and artist_str != "Unknown":
-        filename = f"{artist_str} - {title}.mp3"
-    else:
-        filename = f"{title}.mp3"
+@dataclass
+class ReleasePlan:
+    """发布文件名分配结果"""
 
-    return AudioIO.sanitize_filename(filename)
+    # audio_oid -> 分配的文件名
+    filenames: Dict[str, str] = field(default_factory=dict)
+    # 因同名冲突不生成文件的 audio_oid
+    dropped: Set[str] = field(default_factory=set)
+    # 文件名所依据的发布配置（None 表示默认平铺布局）
+    profile: Optional[ReleaseProfile] = None
 
+    def filename_for(self, entry: Dict) -> Optional[str]:
+        """
+        返回条目对应的发布文件名
 
-def handle_filename_conflict(
-    target_path: Path, strategy: str = "suffix"
-) -> Optional[Path]:
+        Args:
+            entry: 元数据条目
+
+        Returns:
+            文件名；条目在冲突中被舍弃时返回 None。不在计划中的条目使用默认文件名
+        """
+        audio_oid = entry.get("audio_oid")
+        if audio_oid in self.dropped:
+            return None
+        filename = self.filenames.get(audio_oid)
+        if filename:
+            return filename
+        if self.profile is not None:
+            return self.profile.filename(entry)
+        return generate_release_filename(entry)
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+
+def _plan_order_key(entry: Dict) -> Tuple[str, str]:
+    return entry.get("created_at") or "", entry.get("audio_oid") or ""
+
+
+def build_release_plan(
+    entries: List[Dict],
+    conflict_strategy: str = "suffix",
+    profile: Optional[ReleaseProfile] = None,
+) -> ReleasePlan:
     """
-    处理文件名冲突
+    预先为所有条目分配发布文件名
+
+    文件名只由元数据决定：同名（不区分大小写，兼容大小写不敏感的文件系统）的条目
+    按 (created_at, audio_oid) 排序后确定性地解决冲突，不访问文件系统。
+    应基于完整的元数据构建，使筛选子集时文件名保持不变。
 
     Args:
-        target_path: 目标文件路径
-        strategy: 冲突处理策略 ('overwrite', 'suffix', 'skip')
+        entries: 元数据条目列表
+        conflict_strategy: 冲突处理策略（见 CONFLICT_STRATEGIES）
+        profile: 发布配置，决定路径模板（缺省时为平铺布局）
 
     Returns:
-        处理后的文件路径，如果策略为 'skip' 且文件存在则返回 None
+        ReleasePlan 实例
     """
-    if not target_path.exists():
-        return target_path
-
-    if strategy == "overwrite":
-        EventEmitter.log("warn", f"Overwriting existing file: {target_path}")
-        return target_path
+    if conflict_strategy not in CONFLICT_STRATEGIES:
+        raise ValueError(f"Unknown conflict strategy: {conflict_strategy}")
+    naming = profile.filename if profile is not None else generate_release_filename
+
+    groups: Dict[str, List[Tuple[Dict, str]]] = {}
+    for entry in entries:
+        if not entry.get("audio_oid"):
+            continue
+        filename = naming(entry)
+        groups.setdefault(filename.casefold(), []).append((entry, filename))
+
+    plan = ReleasePlan(profile=profile)
+    # 先占用所有基础文件名，避免 "A_1.mp3" 这类本身存在的名字被后缀分配覆盖
+    claimed = set(groups)
+    for key in sorted(groups):
+        members = sorted(groups[key], key=lambda item: _plan_order_key(item[0]))
+        if len(members) > 1:
+            EventEmitter.log(
+                "warn",
+                f"{len(members)} entries share filename {members[0][1]} "
+                f"({conflict_strategy})",
+            )
 
-    elif strategy == "suffix":
+        if conflict_strategy != "suffix":
+            keep = members[-1] if conflict_strategy == "overwrite" else members[0]
+            for entry, filename in members:
+                if entry is keep[0]:
+                    plan.filenames[entry["audio_oid"]] = filename
+                else:
+                    plan.dropped.add(entry["audio_oid"])
+            continue
+
+        first_entry, base = members[0]
+        plan.filenames[first_entry["audio_oid"]] = base
         counter = 1
-        while True:
-            new_path = target_path.with_name(
-                f"{target_path.stem}_{counter}{target_path.suffix}"
-            )
-            if not new_path.exists():
-                EventEmitter.log("info", f"Using alternative filename: {new_path}")
-                return new_path
-            counter += 1
+        for entry, filename in members[1:]:
+            stem, suffix = os.path.splitext(filename)
+            while True:
+                candidate = f"{stem}_{counter}{suffix}"
+                counter += 1
+                if candidate.casefold() not in claimed:
+                    break
+            claimed.add(candidate.casefold())
+            plan.filenames[entry["audio_oid"]] = candidate
 
-    elif strategy == "skip":
-        EventEmitter.log("info", f"Skipping existing file: {target_path}")
-        return None  # 表示跳过
+    return plan
 
-    else:
-        raise ValueError(f"Unknown conflict strategy: {strategy}")
 
+def build_release_plans(
+    entries: List[Dict],
+    profiles: List[ReleaseProfile],
+    conflict_strategy: str = "suffix",
+) -> Dict[str, ReleasePlan]:
+    """
+    为每个发布配置分别分配文件名
 
+    Args:
+        entries: 元数据条目列表（应为完整元数据）
+        profiles: 发布配置列表
+        conflict_strategy: 冲突处理策略
+
+    Returns:
+        配置名 -> ReleasePlan
+    """
+    return {
+        profile.name: build_release_plan(entries, conflict_strategy, profile)
+        for profile in profiles
+    }
+
+
+@traced("release_entry")
 def process_single_entry(
     entry: Dict,
     object_store: ObjectStore,
     release_dir: Path,
     conflict_strategy: str = "suffix",
     incremental: bool = False,
+    copy_mode: str = "auto",
+    manifest: Optional[ReleaseManifest] = None,
+    cover_cache: Optional[CoverCache] = None,
+    filename: Optional[str] = None,
+    profile: Optional[ReleaseProfile] = None,
 ) -> bool:
     """
     处理单个元数据条目，生成发布文件
@@ -144,6 +378,11 @@ def process_single_entry(
         release_dir: 发布目录
         conflict_strategy: 文件名冲突处理策略
         incremental: 是否增量模式
+        copy_mode: 文件生成方式（见 RELEASE_COPY_MODES）
+        manifest: 发布清单（可选），生成成功后记录文件信息
+        cover_cache: 封面缓存（可选）
+        filename: 规划阶段分配的文件名（相对 release_dir，缺省时使用默认文件名）
+        profile: 发布配置，决定嵌入的标签与封面尺寸（缺省时为完整标签、原图）
 
     Returns:
         是否成功
@@ -156,46 +395,86 @@ def process_single_entry(
             )
             return False
 
-        # 生成文件名
-        filename = generate_release_filename(entry)
+        # 文件名在规划阶段已唯一分配，这里只写入指定路径
+        if filename is None:
+            filename = (
+                profile.filename(entry)
+                if profile is not None
+                else generate_release_filename(entry)
+            )
         target_path = release_dir / filename
 
+        current_hash = profile_metadata_hash(entry, profile)
+
         # 检查是否需要生成（增量模式）
         if incremental and target_path.exists():
-            existing_hash = extract_existing_metadata_hash(target_path)
-            current_hash = calculate_metadata_hash(entry)
+            existing_hash = read_release_hash(target_path, manifest, key=filename)
 
             if existing_hash and existing_hash == current_hash:
                 EventEmitter.item_event(filename, "skipped", "Metadata unchanged")
                 return True
 
-        # 处理文件名冲突
-        if target_path.exists():
-            resolved_path = handle_filename_conflict(target_path, conflict_strategy)
-            if resolved_path is None:  # skip
-                return True
-            target_path = resolved_path
+        if conflict_strategy == "skip" and target_path.exists():
+            EventEmitter.item_event(filename, "skipped", "File exists")
+            return True
 
-        # 获取音频路径
-        audio_path = object_store.get_audio_path(audio_oid)
-        if not audio_path or not audio_path.exists():
-            EventEmitter.error(f"Audio object not found: {audio_oid}")
-            return False
+        # 文件仍是由同一音频对象生成（清单记录且 stat 一致）时，只需重写标签
+        transcode = profile.transcode if profile is not None else None
+        retag = False
+        if incremental and manifest is not None and target_path.suffix == ".mp3":
+            record = manifest.get(filename)
+            if record and record.get("audio_oid") == audio_oid:
+                try:
+                    st = os.stat(target_path)
+                    retag = manifest.cached_hash(filename, st) is not None
+                except FileNotFoundError:
+                    pass
 
         # 获取封面数据
         cover_data = None
         cover_oid = entry.get("cover_oid")
-        if cover_oid:
-            cover_path = object_store.get_cover_path(cover_oid)
-            if cover_path and cover_path.exists():
-                with open(cover_path, "rb") as f:
-                    cover_data = f.read()
+        cover_size = profile.cover_size if profile is not None else None
+        if cover_oid and cover_size != 0:
+            if cover_cache is not None:
+                cover_data = cover_cache.get(cover_oid, cover_size)
             else:
+                cover_data = object_store.read_cover(cover_oid)
+                if cover_data is not None and cover_size:
+                    cover_data = AudioIO.compress_cover(cover_data, max_width=cover_size)
+            if cover_data is None:
                 EventEmitter.log("warn", f"Cover object not found: {cover_oid}")
 
-        # 嵌入元数据并生成文件
-        EventEmitter.item_event(filename, "generating")
-        AudioIO.embed_metadata(audio_path, entry, cover_data, target_path)
+        # 嵌入元数据（含 METADATA_HASH）并生成文件
+        if profile is not None:
+            tag_metadata = profile.tag_metadata(entry)
+        else:
+            tag_metadata = dict(entry)
+        tag_metadata["metadata_hash"] = current_hash
+        if not (
+            retag and AudioIO.retag_in_place(target_path, tag_metadata, cover_data)
+        ):
+            # 获取音频路径
+            audio_path = object_store.get_audio_path(audio_oid)
+            if not audio_path or not audio_path.exists():
+                EventEmitter.error(f"Audio object not found: {audio_oid}")
+                return False
+
+            EventEmitter.item_event(filename, "generating")
+            if transcode is not None:
+                # 转码结果按 (audio_oid, 参数) 缓存，元数据变化只需重新写入标签
+                cache = TranscodeCache(object_store.context.cache_root)
+                source = cache.get(audio_oid, transcode)
+                if source is None:
+                    source = cache.transcode(audio_path, audio_oid, transcode)
+                build_tagged_transcode(source, tag_metadata, cover_data, target_path)
+            elif copy_mode == "legacy":
+                AudioIO.embed_metadata(
+                    audio_path, tag_metadata, cover_data, target_path
+                )
+            else:
+                AudioIO.build_tagged_file(
+                    audio_path, tag_metadata, cover_data, target_path
+                )
 
         # 设置文件时间戳（如果元数据中有创建时间）
         created_at = entry.get("created_at")
@@ -210,6 +489,10 @@ def process_single_entry(
                     "debug", f"Failed to set timestamp for {filename}: {str(e)}"
                 )
 
+        # 时间戳设置之后再记录，保证清单中的 mtime 与文件一致
+        if manifest is not None:
+            manifest.record(filename, current_hash, audio_oid=audio_oid)
+
         EventEmitter.item_event(filename, "success", f"OID: {audio_oid[:16]}...")
         return True
 
@@ -218,29 +501,243 @@ def process_single_entry(
         return False
 
 
-def scan_existing_releases(release_dir: Path) -> Dict[str, str]:
+def _iter_release_files(
+    root: Path, recursive: bool = False, prefix: str = "", suffix: str = ".mp3"
+) -> Iterator[Tuple[str, os.DirEntry]]:
+    """遍历发布目录中的音频文件，产出 (相对路径, DirEntry)，跳过 .trash 等隐藏目录"""
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return
+    for dir_entry in entries:
+        relative = f"{prefix}{dir_entry.name}"
+        if dir_entry.is_dir():
+            if recursive and not dir_entry.name.startswith("."):
+                yield from _iter_release_files(
+                    Path(dir_entry.path), recursive, relative + "/", suffix
+                )
+            continue
+        if dir_entry.name.endswith(suffix) and dir_entry.is_file():
+            yield relative, dir_entry
+
+
+def scan_existing_releases(
+    release_dir: Path,
+    manifest: Optional[ReleaseManifest] = None,
+    recursive: bool = False,
+    suffix: str = ".mp3",
+) -> Dict[str, str]:
     """
     扫描现有发布文件，提取元数据哈希
 
     Args:
         release_dir: 发布目录
+        manifest: 发布清单（可选），提供时仅对 stat 变化的文件读取标签，
+                  并清除已不存在文件的记录
+        recursive: 是否扫描子目录（路径模板含目录层级的发布配置）
+        suffix: 发布文件扩展名（转码配置为 .m4a / .opus）
 
     Returns:
-        字典：文件名 -> 元数据哈希
+        字典：文件名（相对 release_dir 的路径）-> 元数据哈希
     """
     existing_hashes = {}
+    seen = []
 
-    for mp3_file in release_dir.glob("*.mp3"):
+    for relative, dir_entry in _iter_release_files(
+        release_dir, recursive, suffix=suffix
+    ):
+        seen.append(relative)
         try:
-            metadata_hash = extract_existing_metadata_hash(mp3_file)
+            metadata_hash = read_release_hash(
+                Path(dir_entry.path), manifest, st=dir_entry.stat(), key=relative
+            )
             if metadata_hash:
-                existing_hashes[mp3_file.name] = metadata_hash
+                existing_hashes[relative] = metadata_hash
         except Exception as e:
-            EventEmitter.log("debug", f"Failed to scan {mp3_file}: {str(e)}")
+            EventEmitter.log("debug", f"Failed to scan {dir_entry.path}: {str(e)}")
+
+    if manifest is not None:
+        manifest.retain(seen)
 
     return existing_hashes
 
 
+def _prune_empty_dirs(release_dir: Path, filenames: List[str]) -> None:
+    """删除文件移走后留下的空子目录（不删除 release_dir 本身）"""
+    for filename in filenames:
+        if "/" not in filename:
+            continue
+        parent = (release_dir / filename).parent
+        while parent != release_dir:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+
+
+def reconcile_release_dir(
+    release_dir: Path,
+    plan: ReleasePlan,
+    manifest: ReleaseManifest,
+    entries: List[Dict],
+    remove_stale: bool = True,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    让发布目录跟随文件名计划：文件名变化的条目原地改名，
+    audio_oid 已不在计划中的文件移入 release_dir/.trash
+
+    改名分两步（先改为临时名再改为目标名），使互换名字的条目也能正确处理。
+    只对清单中记录了 audio_oid 的文件改名；目标名已被占用时，清单中记录的
+    占用文件一并改为它自己的计划文件名，其余占用文件（未知来源、或已不在计划中）
+    移入回收站，不会被直接覆盖。
+
+    Args:
+        release_dir: 发布目录
+        plan: 文件名分配计划
+        manifest: 发布清单
+        entries: 本次处理的条目（只对其中的条目改名）
+        remove_stale: 是否清理已失效的文件（存在筛选条件时应关闭）
+        dry_run: 只统计不执行
+
+    Returns:
+        {"renamed": 改名数量, "trashed": 移入回收站数量}
+    """
+    files_by_oid: Dict[str, List[str]] = {}
+    for filename, record in manifest.items():
+        audio_oid = record.get("audio_oid")
+        if audio_oid:
+            files_by_oid.setdefault(audio_oid, []).append(filename)
+
+    selected = {entry.get("audio_oid") for entry in entries}
+    renames: List[Tuple[str, str]] = []
+    stale: List[str] = []
+    for audio_oid, filenames in files_by_oid.items():
+        target = plan.filenames.get(audio_oid)
+        if target is None:
+            stale.extend(filenames)
+            continue
+        if target in filenames:
+            stale.extend(f for f in filenames if f != target)
+            continue
+        others = sorted(filenames)
+        if audio_oid in selected and (release_dir / others[0]).exists():
+            renames.append((others[0], target))
+            others = others[1:]
+        stale.extend(others)
+
+    if not remove_stale:
+        stale = []
+
+    # 目标名的占用者：清单记录的条目跟随计划改名，无法改名的移入回收站
+    moving = {old for old, _ in renames}
+    removed = set(stale)
+    displaced: List[str] = []
+    pending = list(renames)
+    while pending:
+        _, new = pending.pop()
+        if new in moving or new in removed or not os.path.lexists(release_dir / new):
+            continue
+        audio_oid = (manifest.get(new) or {}).get("audio_oid")
+        target = plan.filenames.get(audio_oid)
+        # 同一 audio_oid 在目标名已有文件时，占用者是多余的副本
+        duplicate = target is not None and (
+            (manifest.get(target) or {}).get("audio_oid") == audio_oid
+            and os.path.lexists(release_dir / target)
+        )
+        if target is not None and target != new and not duplicate:
+            renames.append((new, target))
+            moving.add(new)
+            pending.append((new, target))
+        else:
+            displaced.append(new)
+            removed.add(new)
+
+    stats = {"renamed": len(renames), "trashed": len(stale) + len(displaced)}
+    if dry_run or not (renames or stale):
+        return stats
+
+    trash_root = release_dir / ".trash"
+    for filename in stale:
+        path = release_dir / filename
+        if path.exists() and not move_to_trash(path, trash_root):
+            stats["trashed"] -= 1
+            continue
+        manifest.remove(filename)
+        EventEmitter.item_event(filename, "trashed", "No longer in metadata")
+    for filename in displaced:
+        if not move_to_trash(release_dir / filename, trash_root):
+            # 无法移走时目标仍被占用，第二步会跳过该改名
+            stats["trashed"] -= 1
+            continue
+        manifest.remove(filename)
+        EventEmitter.item_event(filename, "trashed", "Name taken by a renamed release file")
+
+    # 第一步：全部改为临时名，释放原名（清单记录同样先迁到临时名，
+    # 链式改名时目标名的旧记录不会被覆盖）
+    staged: List[Tuple[Path, str, str]] = []
+    for i, (old, new) in enumerate(renames):
+        temp_path = release_dir / f".rename-{os.getpid()}-{i}.tmp"
+        try:
+            os.rename(release_dir / old, temp_path)
+            manifest.rename(old, temp_path.name)
+            staged.append((temp_path, old, new))
+        except OSError as e:
+            EventEmitter.error(f"Failed to rename {old}: {str(e)}")
+            stats["renamed"] -= 1
+
+    # 第二步：改为目标名（目标仍被占用时不覆盖，恢复原名）
+    for temp_path, old, new in staged:
+        try:
+            if os.path.lexists(release_dir / new):
+                raise FileExistsError(f"{new} is still occupied")
+            (release_dir / new).parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, release_dir / new)
+            manifest.rename(temp_path.name, new)
+            EventEmitter.item_event(new, "renamed", f"from {old}")
+        except OSError as e:
+            EventEmitter.error(f"Failed to rename {old} to {new}: {str(e)}")
+            stats["renamed"] -= 1
+            # 尽量恢复原名，清单记录仍然有效；原名已被占用时保留临时名，不覆盖
+            try:
+                if os.path.lexists(release_dir / old):
+                    raise FileExistsError(f"{old} is occupied")
+                os.rename(temp_path, release_dir / old)
+                manifest.rename(temp_path.name, old)
+            except OSError:
+                manifest.remove(temp_path.name)
+
+    _prune_empty_dirs(release_dir, stale + [old for _, old, _ in staged])
+    manifest.save()
+    return stats
+
+
+def metadata_changes_since(
+    metadata_file: Path, revision: str, entries: Optional[List[Dict]] = None
+) -> Optional[Dict[str, Set[str]]]:
+    """
+    比较 Git 提交中的 metadata.jsonl 与当前元数据，得到变化的 audio_oid
+
+    Args:
+        metadata_file: 元数据文件路径（位于 Git 工作副本中）
+        revision: 起始提交（哈希或引用）
+        entries: 当前元数据条目（缺省时读取 metadata_file）
+
+    Returns:
+        diff_metadata 的结果；提交或文件不存在时返回 None
+    """
+    content = GitOperations(metadata_file.parent).show_file(
+        revision, f"./{metadata_file.name}"
+    )
+    if content is None:
+        return None
+    if entries is None:
+        with open(metadata_file, "r", encoding="utf-8") as f:
+            entries = parse_metadata_lines(f.read())
+    return diff_metadata(parse_metadata_lines(content), entries)
+
+
 def release_logic(
     metadata_mgr: MetadataManager,
     object_store: ObjectStore,
@@ -254,6 +751,9 @@ def release_logic(
     dry_run: bool = False,
     force: bool = False,
     workers: int = 1,
+    plans: Optional[Dict[str, ReleasePlan]] = None,
+    profiles: Optional[List[ReleaseProfile]] = None,
+    since: Optional[str] = None,
 ) -> Tuple[List[Dict], Optional[str]]:
     """
     Release命令的核心业务逻辑
@@ -269,14 +769,45 @@ def release_logic(
         hash_filter: 哈希过滤器
         search_filter: 搜索过滤器
         dry_run: 是否干跑模式
+        plans: 各发布配置的文件名分配计划（缺省时基于全部元数据构建）
+        profiles: 发布配置列表（缺省时为写入 release_dir 的默认平铺布局）
+        since: 起始提交。提供时只生成与该提交相比新增或变化的条目（以及发布清单中
+               缺失的输出），不扫描发布目录；无法比较时退回完整的增量扫描
 
     Returns:
-        (要处理的条目列表, 错误消息)
+        (要处理的条目列表, 错误消息)。增量模式下任一配置需要生成的条目都会返回
     """
     # 加载所有元数据
     all_entries = metadata_mgr.load_all()
     EventEmitter.log("info", f"Loaded {len(all_entries)} metadata entries")
 
+    changed_oids: Optional[Set[str]] = None
+    if since:
+        changes = metadata_changes_since(metadata_mgr.file_path, since, all_entries)
+        if changes is None:
+            EventEmitter.log(
+                "warn",
+                f"Cannot read metadata at {since}, falling back to a full incremental scan",
+            )
+            mode = "incremental"
+        else:
+            changed_oids = changes["added"] | changes["changed"]
+            EventEmitter.log(
+                "info",
+                f"Since {since}: {len(changes['added'])} added, "
+                f"{len(changes['changed'])} changed, {len(changes['removed'])} removed",
+            )
+
+    if profiles is None:
+        profiles = [ReleaseProfile.default(release_dir)]
+
+    # 文件名基于全部元数据分配，筛选不会改变已分配的名字
+    if plans is None:
+        try:
+            plans = build_release_plans(all_entries, profiles, conflict_strategy)
+        except ValueError as e:
+            return [], str(e)
+
     # 限制数量
     if limit and limit > 0:
         all_entries = all_entries[:limit]
@@ -337,27 +868,78 @@ def release_logic(
         all_entries = filtered_entries
         EventEmitter.log("info", f"Selected {len(all_entries)} entries by search")
 
-    # 增量模式：计算需要生成的条目
-    if mode == "incremental":
+    # 跟随文件名变化改名、清理失效文件（有筛选条件时只改名，不清理）
+    filtered = bool(
+        (limit and limit > 0) or line_filter or hash_filter or search_filter
+    )
+    incremental = mode == "incremental"
+    if incremental and changed_oids is None:
         EventEmitter.phase_start("scan")
         EventEmitter.log("info", "扫描现有发布文件")
-        existing_hashes = scan_existing_releases(release_dir)
-        EventEmitter.log("info", f"Found {len(existing_hashes)} existing release files")
 
-        entries_to_process = []
-        for entry in all_entries:
-            filename = generate_release_filename(entry)
-            current_hash = calculate_metadata_hash(entry)
+    # 增量模式下任一配置需要生成的条目
+    pending: Set[int] = set()
+    for profile in profiles:
+        plan = plans[profile.name]
+        label = f"[{profile.name}] " if len(profiles) > 1 else ""
+        manifest = ReleaseManifest(profile.release_dir)
+        reconciled = reconcile_release_dir(
+            profile.release_dir,
+            plan,
+            manifest,
+            all_entries,
+            remove_stale=not filtered,
+            dry_run=dry_run,
+        )
+        if reconciled["renamed"] or reconciled["trashed"]:
+            prefix = "Dry run: pending" if dry_run else "Reconciled release files:"
+            EventEmitter.log(
+                "info",
+                f"{label}{prefix} {reconciled['renamed']} renamed, "
+                f"{reconciled['trashed']} trashed",
+            )
 
-            if (
-                filename in existing_hashes
-                and existing_hashes[filename] == current_hash
-            ):
-                # 文件存在且哈希匹配，跳过
-                continue
+        if changed_oids is not None:
+            # 删除与改名已由清单完成，只需生成变化的条目和清单中缺失的输出
+            for entry in all_entries:
+                filename = plan.filename_for(entry)
+                if filename is not None and (
+                    entry.get("audio_oid") in changed_oids or filename not in manifest
+                ):
+                    pending.add(id(entry))
+            continue
+
+        if not incremental:
+            continue
+
+        existing_hashes = scan_existing_releases(
+            profile.release_dir,
+            manifest,
+            recursive=profile.nested,
+            suffix=profile.extension,
+        )
+        manifest.save()
+        EventEmitter.log(
+            "info", f"{label}Found {len(existing_hashes)} existing release files"
+        )
 
-            entries_to_process.append(entry)
+        for entry in all_entries:
+            filename = plan.filename_for(entry)
+            if filename is None:
+                # 同名冲突中被舍弃的条目
+                continue
+            # 文件存在且哈希匹配时跳过
+            if existing_hashes.get(filename) != profile_metadata_hash(entry, profile):
+                pending.add(id(entry))
 
+    if changed_oids is not None:
+        entries_to_process = [entry for entry in all_entries if id(entry) in pending]
+        EventEmitter.log(
+            "info",
+            f"Since {since}: {len(entries_to_process)}/{len(all_entries)} need generation",
+        )
+    elif incremental:
+        entries_to_process = [entry for entry in all_entries if id(entry) in pending]
         EventEmitter.log(
             "info",
             f"Incremental mode: {len(entries_to_process)}/{len(all_entries)} need generation",
@@ -368,6 +950,323 @@ def release_logic(
     return entries_to_process, None
 
 
+def chunk_entries(
+    entries: List[Dict], chunk_size: int = RELEASE_CHUNK_SIZE
+) -> List[List[Dict]]:
+    """
+    按封面（无封面时按专辑）分组后切块，使共用封面的曲目落在同一任务中，
+    提高 worker 封面缓存的命中率
+
+    Args:
+        entries: 条目列表
+        chunk_size: 每块最大条目数
+
+    Returns:
+        条目块列表
+    """
+    groups: Dict[str, List[Dict]] = {}
+    for entry in entries:
+        key = entry.get("cover_oid") or f"album:{entry.get('album') or ''}"
+        groups.setdefault(key, []).append(entry)
+
+    chunks: List[List[Dict]] = []
+    current: List[Dict] = []
+    for group in groups.values():
+        for i in range(0, len(group), chunk_size):
+            part = group[i : i + chunk_size]
+            if current and len(current) + len(part) > chunk_size:
+                chunks.append(current)
+                current = []
+            current.extend(part)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def resolve_executor(executor: str, workers: int, total: int) -> str:
+    """
+    确定实际使用的执行方式
+
+    Args:
+        executor: 请求的执行方式（见 RELEASE_EXECUTORS）
+        workers: 并行数
+        total: 条目数
+
+    Returns:
+        serial, thread 或 process
+    """
+    if executor not in RELEASE_EXECUTORS:
+        raise ValueError(f"Unknown executor: {executor}")
+    if workers <= 1 or total <= 1:
+        return "serial"
+    if executor == "auto":
+        # ID3 渲染由纯 Python 的 mutagen 完成，受 GIL 限制，批量时使用进程池
+        return "process" if total >= PROCESS_MIN_ENTRIES else "thread"
+    return executor
+
+
+def _release_entry(
+    entry: Dict,
+    outputs: List[Tuple[str, Optional[str]]],
+    object_store: ObjectStore,
+    profiles: Dict[str, ReleaseProfile],
+    manifests: Dict[str, ReleaseManifest],
+    conflict_strategy: str,
+    incremental: bool,
+    copy_mode: str,
+    cover_cache: CoverCache,
+) -> bool:
+    """
+    把一个条目分发到各发布配置，封面经缓存只读取（每个尺寸只缩放）一次
+
+    Args:
+        entry: 元数据条目
+        outputs: [(配置名, 分配的文件名), ...]，文件名为 None 表示转码失败
+        object_store: 对象存储实例
+        profiles: 配置名 -> ReleaseProfile
+        manifests: 配置名 -> 发布清单
+        conflict_strategy: 文件名冲突处理策略
+        incremental: 是否增量模式
+        copy_mode: 文件生成方式
+        cover_cache: 封面缓存
+
+    Returns:
+        是否所有配置都成功
+    """
+    success = True
+    for name, filename in outputs:
+        if filename is None:
+            # 转码阶段已失败
+            success = False
+            continue
+        profile = profiles[name]
+        if not process_single_entry(
+            entry,
+            object_store,
+            profile.release_dir,
+            conflict_strategy,
+            incremental=incremental,
+            copy_mode=copy_mode,
+            manifest=manifests[name],
+            cover_cache=cover_cache,
+            filename=filename,
+            profile=profile,
+        ):
+            success = False
+    return success
+
+
+def _output_up_to_date(
+    entry: Dict, profile: ReleaseProfile, manifest: ReleaseManifest, filename: str
+) -> bool:
+    """清单记录与文件 stat 一致且哈希未变时，该输出无需重新生成"""
+    try:
+        st = os.stat(profile.release_dir / filename)
+    except FileNotFoundError:
+        return False
+    return manifest.cached_hash(filename, st) == profile_metadata_hash(entry, profile)
+
+
+def _run_transcode_stage(
+    targets: List[Tuple[Dict, List[Tuple[str, Optional[str]]]]],
+    object_store: ObjectStore,
+    profiles: Dict[str, ReleaseProfile],
+    manifests: Dict[str, ReleaseManifest],
+    incremental: bool,
+    workers: Optional[int],
+) -> List[Tuple[Dict, List[Tuple[str, Optional[str]]]]]:
+    """
+    生成阶段之前补齐转码缓存：只转码缓存中没有的 (audio_oid, 参数)，
+    增量模式下跳过已是最新的输出
+
+    Args:
+        targets: [(条目, [(配置名, 文件名), ...]), ...]
+        object_store: 对象存储实例
+        profiles: 配置名 -> ReleaseProfile
+        manifests: 配置名 -> 发布清单
+        incremental: 是否增量模式
+        workers: 同时运行的 ffmpeg 进程数
+
+    Returns:
+        targets，转码失败的输出文件名替换为 None
+    """
+    jobs = []
+    for entry, outputs in targets:
+        audio_oid = entry.get("audio_oid")
+        for name, filename in outputs:
+            profile = profiles[name]
+            if profile.transcode is None or not audio_oid:
+                continue
+            if incremental and _output_up_to_date(
+                entry, profile, manifests[name], filename
+            ):
+                continue
+            audio_path = object_store.get_audio_path(audio_oid)
+            if audio_path and audio_path.exists():
+                jobs.append((audio_oid, audio_path, profile.transcode))
+    if not jobs:
+        return targets
+
+    cache = TranscodeCache(object_store.context.cache_root)
+    EventEmitter.phase_start("transcode", total_items=len(jobs))
+    failures = cache.ensure(
+        jobs,
+        workers=workers,
+        progress=lambda done, total: EventEmitter.batch_progress(
+            "transcode", done, total
+        ),
+    )
+    if not failures:
+        return targets
+
+    return [
+        (
+            entry,
+            [
+                (name, None)
+                if (entry.get("audio_oid"), profiles[name].transcode) in failures
+                else (name, filename)
+                for name, filename in outputs
+            ],
+        )
+        for entry, outputs in targets
+    ]
+
+
+# 进程池 worker 的状态（每个子进程一份）
+_worker_state: Dict = {}
+
+
+def _init_release_worker(
+    context,
+    profiles: List[ReleaseProfile],
+    conflict_strategy: str,
+    incremental: bool,
+    copy_mode: str,
+):
+    """进程池 worker 初始化：重建对象存储、封面缓存和清单快照，并缓冲事件"""
+    events: List[Dict] = []
+    EventEmitter.capture(events.append)
+    object_store = ObjectStore(context)
+    _worker_state.update(
+        events=events,
+        object_store=object_store,
+        cover_cache=CoverCache(object_store),
+        profiles={profile.name: profile for profile in profiles},
+        manifests={
+            profile.name: ReleaseManifest(profile.release_dir, track_changes=True)
+            for profile in profiles
+        },
+        conflict_strategy=conflict_strategy,
+        incremental=incremental,
+        copy_mode=copy_mode,
+    )
+
+
+def _release_chunk(
+    targets: List[Tuple[Dict, List[Tuple[str, Optional[str]]]]],
+) -> Tuple[int, List[Dict], Dict[str, List], Tuple[int, int]]:
+    """
+    在 worker 中处理一个条目块
+
+    Args:
+        targets: [(条目, [(配置名, 分配的文件名), ...]), ...]
+
+    Returns:
+        (成功数, 缓冲的事件, 配置名 -> 清单变更, (封面缓存命中数, 未命中数))
+    """
+    state = _worker_state
+    cover_cache = state["cover_cache"]
+    hits, misses = cover_cache.hits, cover_cache.misses
+    success_count = 0
+    for entry, outputs in targets:
+        if _release_entry(
+            entry,
+            outputs,
+            state["object_store"],
+            state["profiles"],
+            state["manifests"],
+            state["conflict_strategy"],
+            state["incremental"],
+            state["copy_mode"],
+            cover_cache,
+        ):
+            success_count += 1
+
+    events = list(state["events"])
+    state["events"].clear()
+    changes = {
+        name: manifest.drain_changes() for name, manifest in state["manifests"].items()
+    }
+    return (
+        success_count,
+        events,
+        changes,
+        (cover_cache.hits - hits, cover_cache.misses - misses),
+    )
+
+
+def _execute_in_processes(
+    targets: List[Tuple[Dict, List[Tuple[str, Optional[str]]]]],
+    object_store: ObjectStore,
+    profiles: List[ReleaseProfile],
+    conflict_strategy: str,
+    incremental: bool,
+    copy_mode: str,
+    workers: int,
+    manifests: Dict[str, ReleaseManifest],
+    report_progress,
+) -> int:
+    """用进程池生成发布文件，返回成功数"""
+    # worker 从磁盘加载清单快照
+    for manifest in manifests.values():
+        manifest.save()
+
+    outputs_by_entry = {id(entry): outputs for entry, outputs in targets}
+    chunks = [
+        [(entry, outputs_by_entry[id(entry)]) for entry in chunk]
+        for chunk in chunk_entries([entry for entry, _ in targets])
+    ]
+    success_count = 0
+    hits = misses = 0
+
+    initargs = (
+        object_store.context,
+        profiles,
+        conflict_strategy,
+        incremental,
+        copy_mode,
+    )
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_release_worker, initargs=initargs
+    ) as executor:
+        futures = {executor.submit(_release_chunk, chunk): chunk for chunk in chunks}
+
+        for future in concurrent.futures.as_completed(futures):
+            chunk = futures[future]
+            try:
+                succeeded, events, changes, (chunk_hits, chunk_misses) = future.result()
+            except Exception as e:
+                EventEmitter.error(
+                    f"Error processing entries: {str(e)}", {"entries": len(chunk)}
+                )
+                succeeded, events, changes, chunk_hits, chunk_misses = 0, [], {}, 0, 0
+
+            for event in events:
+                EventEmitter.forward(event)
+            for name, profile_changes in changes.items():
+                manifests[name].apply_changes(profile_changes)
+            success_count += succeeded
+            hits += chunk_hits
+            misses += chunk_misses
+            report_progress(len(chunk))
+
+    EventEmitter.log(
+        "debug", f"Cover cache: {hits} hits, {misses} misses across {workers} workers"
+    )
+    return success_count
+
+
 def execute_release(
     entries: List[Dict],
     object_store: ObjectStore,
@@ -376,77 +1275,242 @@ def execute_release(
     incremental: bool = False,
     progress_callback=None,
     workers: int = 1,
+    copy_mode: str = "auto",
+    executor: str = "auto",
+    plans: Optional[Dict[str, ReleasePlan]] = None,
+    profiles: Optional[List[ReleaseProfile]] = None,
+    transcode_workers: Optional[int] = None,
 ) -> Tuple[int, int]:
     """
     执行真正的发布动作
 
+    每个条目只处理一次，依次写入所有发布配置（封面读取与缩放经缓存共享），
+    每个配置的增量清单保存在各自的发布目录中。
+
     Args:
         entries: 要处理的条目列表
         object_store: 对象存储实例
-        release_dir: 发布目录
-        conflict_strategy: 文件名冲突处理策略
+        release_dir: 发布目录（未指定 profiles 时使用）
+        conflict_strategy: 文件名冲突处理策略（见 CONFLICT_STRATEGIES）
         incremental: 是否增量模式
         progress_callback: 进度回调函数
+        workers: 并行数
+        copy_mode: 文件生成方式（见 RELEASE_COPY_MODES）
+        executor: 并行执行方式（见 RELEASE_EXECUTORS）
+        plans: 各发布配置的文件名分配计划（缺省时基于 entries 构建）
+        profiles: 发布配置列表（缺省时为写入 release_dir 的默认平铺布局）
+        transcode_workers: 转码阶段同时运行的 ffmpeg 进程数（缺省为 CPU 核数）
 
     Returns:
         (成功数, 总数)
     """
+    if copy_mode not in RELEASE_COPY_MODES:
+        raise ValueError(f"Unknown copy mode: {copy_mode}")
+    mode = resolve_executor(executor, workers, len(entries))
+
     if not entries:
         EventEmitter.result("ok", message="All releases are up to date")
         return 0, 0
 
-    EventEmitter.phase_start("generate", total_items=len(entries))
+    if profiles is None:
+        profiles = [ReleaseProfile.default(release_dir)]
+    if plans is None:
+        plans = build_release_plans(entries, profiles, conflict_strategy)
+
+    # 规划阶段：每个条目在每个配置下的文件名唯一且确定，worker 之间无需协调
+    targets: List[Tuple[Dict, List[Tuple[str, Optional[str]]]]] = []
+    dropped = 0
+    for entry in entries:
+        outputs = []
+        for profile in profiles:
+            filename = plans[profile.name].filename_for(entry)
+            if filename is None:
+                EventEmitter.item_event(
+                    profile.filename(entry),
+                    "skipped",
+                    f"Filename conflict ({conflict_strategy})",
+                )
+            else:
+                outputs.append((profile.name, filename))
+        if outputs:
+            targets.append((entry, outputs))
+        else:
+            dropped += 1
+
+    profiles_by_name = {profile.name: profile for profile in profiles}
+    manifests = {
+        profile.name: ReleaseManifest(profile.release_dir) for profile in profiles
+    }
+
+    # 转码在生成之前完成，生成阶段只复制缓存的转码结果并写入标签
+    targets = _run_transcode_stage(
+        targets,
+        object_store,
+        profiles_by_name,
+        manifests,
+        incremental,
+        transcode_workers,
+    )
 
-    success_count = 0
     total_entries = len(entries)
+    EventEmitter.phase_start("generate", total_items=total_entries)
+    EventEmitter.log("debug", f"Release executor: {mode} ({workers} workers)")
+    if len(profiles) > 1:
+        EventEmitter.log(
+            "debug", f"Release profiles: {', '.join(profiles_by_name)}"
+        )
 
-    if workers <= 1:
-        # 串行处理
-        for i, entry in enumerate(entries):
-            success = process_single_entry(
-                entry,
+    # 冲突中被舍弃的条目按跳过处理，不计为失败
+    success_count = dropped
+    completed = [dropped]
+
+    def report_progress(count: int = 1):
+        completed[0] += count
+        EventEmitter.batch_progress("generate", completed[0], total_entries)
+        if progress_callback:
+            progress_callback(completed[0], total_entries)
+
+    try:
+        if mode == "process":
+            success_count += _execute_in_processes(
+                targets,
                 object_store,
-                release_dir,
+                profiles,
                 conflict_strategy,
-                incremental=incremental,
+                incremental,
+                copy_mode,
+                workers,
+                manifests,
+                report_progress,
             )
+            return success_count, total_entries
 
-            if success:
-                success_count += 1
+        # 批量生成时用一次目录扫描替代逐条目的 stat
+        object_store.ensure_index(len(targets))
+        cover_cache = CoverCache(object_store)
 
-            EventEmitter.batch_progress("generate", i + 1, total_entries)
-
-            if progress_callback:
-                progress_callback(i + 1, total_entries)
-    else:
-        # 并行处理
-        def process_entry_wrapper(entry):
-            return process_single_entry(
+        def process_target(
+            target: Tuple[Dict, List[Tuple[str, Optional[str]]]]
+        ) -> bool:
+            entry, outputs = target
+            return _release_entry(
                 entry,
+                outputs,
                 object_store,
-                release_dir,
+                profiles_by_name,
+                manifests,
                 conflict_strategy,
-                incremental=incremental,
+                incremental,
+                copy_mode,
+                cover_cache,
             )
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = []
-            for entry in entries:
-                future = executor.submit(process_entry_wrapper, entry)
-                futures.append(future)
-
-            # 等待所有任务完成，并更新进度
-            completed = 0
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    success = future.result()
-                    if success:
-                        success_count += 1
-                except Exception as e:
-                    EventEmitter.error(f"Error processing entry: {str(e)}")
-                completed += 1
-                EventEmitter.batch_progress("generate", completed, total_entries)
-                if progress_callback:
-                    progress_callback(completed, total_entries)
+        if mode == "serial":
+            for target in targets:
+                if process_target(target):
+                    success_count += 1
+                report_progress()
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(process_target, t) for t in targets]
+
+                # 等待所有任务完成，并更新进度
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        if future.result():
+                            success_count += 1
+                    except Exception as e:
+                        EventEmitter.error(f"Error processing entry: {str(e)}")
+                    report_progress()
+    finally:
+        # 中途失败也保留已生成文件的记录
+        for manifest in manifests.values():
+            manifest.save()
 
     return success_count, total_entries
+
+
+def run_release(
+    context,
+    mode: str = "incremental",
+    conflict_strategy: str = "suffix",
+    workers: int = 1,
+    copy_mode: str = "auto",
+    executor: str = "auto",
+    dry_run: bool = False,
+    limit: Optional[int] = None,
+    line_filter: Optional[str] = None,
+    hash_filter: Optional[str] = None,
+    search_filter: Optional[str] = None,
+    since: Optional[str] = None,
+) -> Tuple[int, int]:
+    """
+    非交互地执行一次完整发布（发布配置、文件名规划、生成），
+    供 release/create_release.py 与服务器队列处理器使用
+
+    Args:
+        context: Context 对象
+        mode: 生成模式 ('local', 'incremental')
+        conflict_strategy: 文件名冲突处理策略
+        workers: 并行数
+        copy_mode: 文件生成方式
+        executor: 并行执行方式
+        dry_run: 只计算需要生成的条目
+        limit: 最大处理数量
+        line_filter: 行号过滤器
+        hash_filter: 哈希过滤器
+        search_filter: 搜索过滤器
+        since: 起始提交，只生成此后元数据有变化的条目（按增量方式执行）
+
+    Returns:
+        (成功数, 总数)；干跑模式下为 (0, 需要生成的条目数)
+
+    Raises:
+        ValueError: 发布配置或筛选参数无效
+    """
+    from ..context import Context
+
+    if not isinstance(context, Context):
+        raise TypeError("context must be an instance of Context")
+
+    metadata_mgr = MetadataManager(context)
+    object_store = ObjectStore(context)
+    profiles = load_release_profiles(context.config, context.release_dir)
+    for profile in profiles:
+        profile.release_dir.mkdir(parents=True, exist_ok=True)
+
+    plans = build_release_plans(metadata_mgr.load_all(), profiles, conflict_strategy)
+    entries, error = release_logic(
+        metadata_mgr,
+        object_store,
+        context.release_dir,
+        mode=mode,
+        conflict_strategy=conflict_strategy,
+        limit=limit,
+        line_filter=line_filter,
+        hash_filter=hash_filter,
+        search_filter=search_filter,
+        dry_run=dry_run,
+        plans=plans,
+        profiles=profiles,
+        since=since,
+    )
+    if error:
+        raise ValueError(error)
+    if dry_run:
+        return 0, len(entries)
+
+    release_config = context.config.get("release", {}) or {}
+    return execute_release(
+        entries,
+        object_store,
+        context.release_dir,
+        conflict_strategy=conflict_strategy,
+        incremental=(mode == "incremental" or bool(since)),
+        workers=workers,
+        copy_mode=copy_mode,
+        executor=executor,
+        plans=plans,
+        profiles=profiles,
+        transcode_workers=release_config.get("transcode_workers"),
+    )
@@ -0,0 +1,25 @@
+from ..events import EventEmitter
+from ..object_store import ObjectStore
+
+
+def repack_logic(object_store: ObjectStore, dry_run: bool = False) -> int:
+    """
+    Repack 命令的核心业务逻辑：将松散封面合并进 pack
+
+    Args:
+        object_store: 对象存储
+        dry_run: 仅统计，不写入
+
+    Returns:
+        退出码 (0=成功, 1=失败)
+    """
+    EventEmitter.log("info", "Repacking cover objects")
+    result = object_store.repack_covers(dry_run=dry_run)
+
+    if not result.success:
+        EventEmitter.result("error", message=result.message, artifacts=result.data)
+        return 1
+
+    status = "warn" if result.data.get("corrupted") else "ok"
+    EventEmitter.result(status, message=result.message, artifacts=result.data)
+    return 0
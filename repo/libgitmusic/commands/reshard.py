@@ -0,0 +1,43 @@
+from ..events import EventEmitter
+from ..layout import ShardLayout
+from ..object_store import ObjectStore
+
+
+def reshard_logic(
+    object_store: ObjectStore,
+    depth: int,
+    width: int,
+    dry_run: bool = False,
+) -> int:
+    """
+    Reshard 命令的核心业务逻辑：在线迁移对象存储的分片布局
+
+    Args:
+        object_store: 对象存储
+        depth: 目标分片层数
+        width: 目标每层十六进制字符数
+        dry_run: 仅统计，不迁移
+
+    Returns:
+        退出码 (0=成功, 1=失败)
+    """
+    try:
+        new_layout = ShardLayout(depth, width)
+    except ValueError as e:
+        EventEmitter.error(str(e))
+        return 1
+
+    current = object_store.layout
+    EventEmitter.log(
+        "info",
+        f"Resharding object store: depth={current.depth}, width={current.width} "
+        f"-> depth={depth}, width={width}",
+    )
+    result = object_store.reshard(new_layout, dry_run=dry_run)
+
+    if not result.success:
+        EventEmitter.result("error", message=result.message, artifacts=result.data)
+        return 1
+
+    EventEmitter.result("ok", message=result.message, artifacts=result.data)
+    return 0
@@ -1,10 +1,130 @@
+import tempfile
 import time
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Set, Tuple, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from ..events import EventEmitter
 from ..transport import TransportAdapter
+from ..layout import ShardLayout, parse_relative_path
+from ..packfile import PackStore, read_idx_digests
+
+# 封面 pack 文件后缀
+PACK_SUFFIXES = (".pack", ".idx")
+
+
+def order_for_transfer(rel_paths: List[str]) -> List[List[str]]:
+    """
+    将待传输文件分批：idx 文件必须在对应 pack 传输完成后才出现在对端，
+    否则对端读者可能看到没有 pack 的 idx
+
+    Args:
+        rel_paths: 相对路径列表
+
+    Returns:
+        批次列表，批次之间需顺序执行
+    """
+    idx_files = [f for f in rel_paths if f.endswith(".idx")]
+    others = [f for f in rel_paths if not f.endswith(".idx")]
+    return [batch for batch in (others, idx_files) if batch]
+
+
+def _pack_name(rel_path: str) -> str:
+    """pack 文件名（pack-<校验和>.pack / .idx），与所在目录无关"""
+    return rel_path.rsplit("/", 1)[-1]
+
+
+def _key_files(rel_paths) -> Dict[Tuple[str, str], str]:
+    """将相对路径映射为与布局无关的键：对象为 (类型, 哈希)，pack 为 ("pack", 文件名)"""
+    keyed = {}
+    for rel_path in rel_paths:
+        parsed = parse_relative_path(rel_path)
+        if parsed is not None:
+            keyed[parsed] = rel_path
+        elif rel_path.endswith(PACK_SUFFIXES):
+            keyed[("pack", _pack_name(rel_path))] = rel_path
+    return keyed
+
+
+def _local_pack_contents(cache_root: Path) -> Dict[str, Set[Tuple[str, str]]]:
+    """本地每个 pack（按不带后缀的文件名）包含的封面键"""
+    store = PackStore(cache_root / "covers" / "pack")
+    try:
+        return {
+            reader.idx_path.stem: {
+                ("cover", digest.hex()) for digest, _, _ in reader.iter_entries()
+            }
+            for reader in store.readers
+        }
+    finally:
+        store.close()
+
+
+def _remote_pack_contents(
+    transport: TransportAdapter, remote_packs, known: Dict[str, Set[Tuple[str, str]]]
+) -> Dict[str, Set[Tuple[str, str]]]:
+    """
+    远端每个 pack 包含的封面键：本地已有同名 pack 时直接复用，否则下载 idx 读取
+
+    无法读取 idx 的 pack 不出现在结果中（内容未知，按需要传输处理）
+    """
+    contents = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rel_path in sorted(p for p in remote_packs if p.endswith(".idx")):
+            stem = _pack_name(rel_path)[: -len(".idx")]
+            if stem in known:
+                contents[stem] = known[stem]
+                continue
+            idx_path = Path(tmp) / _pack_name(rel_path)
+            try:
+                transport.download(rel_path, idx_path)
+                digests = read_idx_digests(idx_path)
+            except Exception as e:
+                EventEmitter.log("warn", f"无法读取远端 pack 索引 {rel_path}: {str(e)}")
+                continue
+            contents[stem] = {("cover", digest.hex()) for digest in digests}
+    return contents
+
+
+def _needed(
+    key: Tuple[str, str],
+    keyed_other: Dict[Tuple[str, str], str],
+    packed_other: Set[Tuple[str, str]],
+    pack_contents: Dict[str, Set[Tuple[str, str]]],
+) -> bool:
+    """
+    判断一端的文件是否需要传到另一端
+
+    Args:
+        key: 文件键
+        keyed_other: 另一端的文件键
+        packed_other: 另一端 pack 中的封面键
+        pack_contents: 本端各 pack 的内容
+
+    Returns:
+        另一端没有该文件，且（对象）不在另一端的 pack 中、（pack）带有另一端缺少的对象
+    """
+    if key in keyed_other:
+        return False
+    kind, value = key
+    if kind == "cover":
+        return key not in packed_other
+    if kind == "pack":
+        contents = pack_contents.get(value.rsplit(".", 1)[0])
+        if contents is None:
+            return True
+        # 对象全部已在另一端（松散或打包）的 pack 不再传输，
+        # 避免把对端 repack 时删除的旧 pack 传回去
+        return any(c not in keyed_other and c not in packed_other for c in contents)
+    return True
+
+
+def _target_path(key: Tuple[str, str], rel_path: str, layout: ShardLayout) -> str:
+    """计算对象在目标端布局下的相对路径"""
+    kind, value = key
+    if kind == "pack":
+        return rel_path
+    return layout.relative_path(kind, value)
 
 
 def analyze_sync_diff(
@@ -24,14 +144,17 @@ def analyze_sync_diff(
     # 列出本地文件（分别统计音频和封面）
     local_audio = set()
     local_covers = set()
+    local_packs = set()
 
     for p in cache_root.rglob("*"):
         if p.is_file():
             rel_path = str(p.relative_to(cache_root)).replace("\\", "/")
-            if p.suffix == ".mp3":
+            if p.suffix == ".mp3" and rel_path.startswith("objects/"):
                 local_audio.add(rel_path)
-            elif p.suffix == ".jpg":
+            elif p.suffix == ".jpg" and rel_path.startswith("covers/sha256/"):
                 local_covers.add(rel_path)
+            elif p.suffix in PACK_SUFFIXES and rel_path.startswith("covers/pack/"):
+                local_packs.add(rel_path)
 
     EventEmitter.log("info", f"本地音频数: {len(local_audio)}")
     EventEmitter.log("info", f"本地封面数: {len(local_covers)}")
@@ -43,44 +166,77 @@ def analyze_sync_diff(
     # 远程文件路径已经是相对路径，不需要转换
     remote_audio = {f for f in remote_objects if f.endswith(".mp3")}
     remote_covers_set = {f for f in remote_covers if f.endswith(".jpg")}
+    remote_packs = {f for f in remote_covers if f.endswith(PACK_SUFFIXES)}
 
     EventEmitter.log("info", f"远程音频数: {len(remote_audio)}")
     EventEmitter.log("info", f"远程封面数: {len(remote_covers_set)}")
 
     # 合并本地和远程文件集（用于计算差异）
-    local_files = local_audio.union(local_covers)
-    remote_files = remote_audio.union(remote_covers_set)
-
-    # 计算待上传的文件（分类）
-    to_upload_all = list(local_files - remote_files)
+    # 两端的分片布局可能不同，按 (类型, 哈希) 比较而不是按路径比较；
+    # pack 文件名由内容校验和决定，按文件名比较。pack 中的封面同样算作该端已有
+    local_files = local_audio.union(local_covers, local_packs)
+    remote_files = remote_audio.union(remote_covers_set, remote_packs)
+    local_keyed = _key_files(local_files)
+    remote_keyed = _key_files(remote_files)
+    local_pack_contents = _local_pack_contents(cache_root)
+    remote_pack_contents = _remote_pack_contents(
+        transport, remote_packs, local_pack_contents
+    )
+    local_packed = set().union(*local_pack_contents.values())
+    remote_packed = set().union(*remote_pack_contents.values())
+
+    local_layout = ShardLayout.load(cache_root)
+    remote_layout = transport.get_remote_layout()
+    if not isinstance(remote_layout, ShardLayout):
+        # 兼容未实现布局查询的传输实现
+        remote_layout = ShardLayout.legacy()
+
+    # 计算待上传的文件（分类），并映射到远端布局下的路径
+    upload_targets = {
+        rel_path: _target_path(key, rel_path, remote_layout)
+        for key, rel_path in local_keyed.items()
+        if _needed(key, remote_keyed, remote_packed, local_pack_contents)
+    }
+    to_upload_all = list(upload_targets)
     to_upload_audio = [f for f in to_upload_all if f.endswith(".mp3")]
     to_upload_covers = [f for f in to_upload_all if f.endswith(".jpg")]
+    to_upload_packs = [f for f in to_upload_all if f.endswith(PACK_SUFFIXES)]
 
-    # 计算待下载的文件（分类）
-    to_download_all = list(remote_files - local_files)
+    # 计算待下载的文件（分类），并映射到本地布局下的路径
+    download_targets = {
+        rel_path: _target_path(key, rel_path, local_layout)
+        for key, rel_path in remote_keyed.items()
+        if _needed(key, local_keyed, local_packed, remote_pack_contents)
+    }
+    to_download_all = list(download_targets)
     to_download_audio = [f for f in to_download_all if f.endswith(".mp3")]
     to_download_covers = [f for f in to_download_all if f.endswith(".jpg")]
+    to_download_packs = [f for f in to_download_all if f.endswith(PACK_SUFFIXES)]
 
     # 准备详细的分析结果
     analysis_result = {
         "local": {
             "audio": len(local_audio),
             "covers": len(local_covers),
+            "packs": len(local_packs),
             "total": len(local_files),
         },
         "remote": {
             "audio": len(remote_audio),
             "covers": len(remote_covers_set),
+            "packs": len(remote_packs),
             "total": len(remote_files),
         },
         "to_upload": {
             "audio": len(to_upload_audio),
             "covers": len(to_upload_covers),
+            "packs": len(to_upload_packs),
             "total": len(to_upload_all),
         },
         "to_download": {
             "audio": len(to_download_audio),
             "covers": len(to_download_covers),
+            "packs": len(to_download_packs),
             "total": len(to_download_all),
         },
         "to_upload_list": to_upload_all,
@@ -89,6 +245,10 @@ def analyze_sync_diff(
         "to_upload_covers": to_upload_covers,
         "to_download_audio": to_download_audio,
         "to_download_covers": to_download_covers,
+        "to_upload_packs": to_upload_packs,
+        "to_download_packs": to_download_packs,
+        "upload_targets": upload_targets,
+        "download_targets": download_targets,
     }
 
     EventEmitter.result(
@@ -131,6 +291,8 @@ def execute_sync(
     workers: int = 4,
     retries: int = 3,
     dry_run: bool = False,
+    upload_targets: Optional[Dict[str, str]] = None,
+    download_targets: Optional[Dict[str, str]] = None,
 ) -> Tuple[int, int]:
     """
     执行同步操作
@@ -144,6 +306,9 @@ def execute_sync(
         workers: 并行线程数
         retries: 重试次数
         dry_run: 仅显示差异，不执行同步
+        upload_targets: 本地相对路径 -> 远端相对路径（两端分片布局不同时），
+            缺省时使用相同路径
+        download_targets: 远端相对路径 -> 本地相对路径
 
     Returns:
         (处理文件数, 错误数)
@@ -151,6 +316,8 @@ def execute_sync(
     # 处理默认值
     to_upload = to_upload or []
     to_download = to_download or []
+    upload_targets = upload_targets or {}
+    download_targets = download_targets or {}
 
     if dry_run:
         EventEmitter.log("info", "Dry-run模式，不执行实际同步")
@@ -166,35 +333,38 @@ def execute_sync(
         def upload_task(rel_path: str):
             local_path = cache_root / rel_path
             try:
-                transport.upload(local_path, rel_path)
+                transport.upload(local_path, upload_targets.get(rel_path, rel_path))
                 # transport.upload内部已发出item_event
                 return True
             except Exception as e:
                 EventEmitter.error(f"上传失败: {str(e)}", {"file": rel_path})
                 return False
 
-        with ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = {
-                executor.submit(upload_task, rel_path): rel_path
-                for rel_path in to_upload
-            }
-
-            processed = 0
-            errors = 0
-            for future in as_completed(futures):
-                rel_path = futures[future]
-                try:
-                    if future.result():
-                        processed += 1
-                    else:
+        processed = 0
+        errors = 0
+        for batch in order_for_transfer(to_upload):
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(upload_task, rel_path): rel_path
+                    for rel_path in batch
+                }
+
+                for future in as_completed(futures):
+                    rel_path = futures[future]
+                    try:
+                        if future.result():
+                            processed += 1
+                        else:
+                            errors += 1
+                    except Exception as e:
+                        EventEmitter.error(
+                            f"上传任务异常: {str(e)}", {"file": rel_path}
+                        )
                         errors += 1
-                except Exception as e:
-                    EventEmitter.error(f"上传任务异常: {str(e)}", {"file": rel_path})
-                    errors += 1
 
-                EventEmitter.batch_progress(
-                    "upload", processed + errors, len(to_upload)
-                )
+                    EventEmitter.batch_progress(
+                        "upload", processed + errors, len(to_upload)
+                    )
 
         total_processed += processed
         total_errors += errors
@@ -205,7 +375,7 @@ def execute_sync(
         EventEmitter.phase_start("download", total_items=len(to_download))
 
         def download_task(rel_path: str):
-            local_path = cache_root / rel_path
+            local_path = cache_root / download_targets.get(rel_path, rel_path)
             try:
                 if sync_with_retry(transport.download, rel_path, local_path, retries):
                     EventEmitter.item_event(rel_path, "downloaded", "")
@@ -216,28 +386,31 @@ def execute_sync(
                 EventEmitter.error(f"下载失败: {str(e)}", {"file": rel_path})
                 return False
 
-        with ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = {
-                executor.submit(download_task, rel_path): rel_path
-                for rel_path in to_download
-            }
-
-            processed = 0
-            errors = 0
-            for future in as_completed(futures):
-                rel_path = futures[future]
-                try:
-                    if future.result():
-                        processed += 1
-                    else:
+        processed = 0
+        errors = 0
+        for batch in order_for_transfer(to_download):
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(download_task, rel_path): rel_path
+                    for rel_path in batch
+                }
+
+                for future in as_completed(futures):
+                    rel_path = futures[future]
+                    try:
+                        if future.result():
+                            processed += 1
+                        else:
+                            errors += 1
+                    except Exception as e:
+                        EventEmitter.error(
+                            f"下载任务异常: {str(e)}", {"file": rel_path}
+                        )
                         errors += 1
-                except Exception as e:
-                    EventEmitter.error(f"下载任务异常: {str(e)}", {"file": rel_path})
-                    errors += 1
 
-                EventEmitter.batch_progress(
-                    "download", processed + errors, len(to_download)
-                )
+                    EventEmitter.batch_progress(
+                        "download", processed + errors, len(to_download)
+                    )
 
         total_processed += processed
         total_errors += errors
@@ -300,6 +473,8 @@ def sync_logic(
         workers=workers,
         retries=retries,
         dry_run=False,
+        upload_targets=analysis.get("upload_targets"),
+        download_targets=analysis.get("download_targets"),
     )
 
     # 最终结果
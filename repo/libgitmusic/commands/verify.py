@@ -1,4 +1,5 @@
 from pathlib import Path
+import hashlib
 import shutil
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
@@ -6,6 +7,8 @@ from ..events import EventEmitter
 from ..hash_utils import HashUtils
 from ..metadata import MetadataManager
 from ..audio import AudioIO
+from ..packfile import PackStore
+from ..layout import ShardLayout
 
 
 def move_to_trash(file_path: Path, trash_root: Path) -> bool:
@@ -54,11 +57,11 @@ def verify_local_cache(
                 target_hashes.add(oid)
 
         # 只查找匹配的音频文件
+        layout = ShardLayout.load(cache_root)
         files = []
         for hex_hash in target_hashes:
-            # 构建文件路径: objects/sha256/aa/oid.mp3
-            subdir = hex_hash[:2]
-            mp3_path = objects_dir / subdir / f"{hex_hash}.mp3"
+            # 构建文件路径: objects/sha256/<分片>/oid.mp3
+            mp3_path = layout.object_path(objects_dir, hex_hash, ".mp3")
             if mp3_path.exists():
                 files.append(mp3_path)
             else:
@@ -86,7 +89,51 @@ def verify_local_cache(
 
         EventEmitter.batch_progress("verify", i + 1, len(files))
 
-    return errors, len(files)
+    total = len(files)
+    if not audio_oids:
+        pack_errors, pack_total = verify_cover_packs(cache_root / "covers" / "pack")
+        errors.extend(pack_errors)
+        total += pack_total
+
+    return errors, total
+
+
+def verify_cover_packs(pack_dir: Path) -> Tuple[List, int]:
+    """
+    验证封面 pack 中每个对象的哈希
+
+    Args:
+        pack_dir: pack 目录
+
+    Returns:
+        (错误列表, 验证对象数)
+    """
+    packs = PackStore(pack_dir)
+    errors = []
+    total = 0
+    try:
+        entries = [
+            (reader, digest, offset, length)
+            for reader in packs.readers
+            for digest, offset, length in reader.iter_entries()
+        ]
+        for i, (reader, digest, offset, length) in enumerate(entries):
+            hex_hash = digest.hex()
+            display_name = f"{hex_hash}.jpg"
+            EventEmitter.item_event(display_name, "checking", reader.pack_path.name)
+
+            actual = hashlib.sha256(reader.read_at(offset, length)).hexdigest()
+            if actual == hex_hash:
+                EventEmitter.item_event(display_name, "success")
+            else:
+                errors.append((display_name, hex_hash, {}))
+
+            EventEmitter.batch_progress("verify", i + 1, len(entries))
+        total = len(entries)
+    finally:
+        packs.close()
+
+    return errors, total
 
 
 def verify_release_files(
@@ -269,10 +316,10 @@ def verify_logic(
                     objects_dir = cache_root / "objects" / "sha256"
                     covers_dir = cache_root / "covers" / "sha256"
                     # 检查文件是否存在
-                    subdir = hex_hash[:2]
+                    layout = ShardLayout.load(cache_root)
                     possible_paths = [
-                        objects_dir / subdir / f"{hex_hash}.mp3",
-                        covers_dir / subdir / f"{hex_hash}.jpg",
+                        layout.object_path(objects_dir, hex_hash, ".mp3"),
+                        layout.object_path(covers_dir, hex_hash, ".jpg"),
                     ]
                     for path in possible_paths:
                         if path.exists():
@@ -188,8 +188,6 @@ def create_context(config_path: Optional[str] = None) -> Context:
     Returns:
         初始化的 Context 对象
     """
-    import yaml
-
     # 确定项目根目录
     if config_path:
         config_file = Path(config_path).resolve()
@@ -206,8 +204,12 @@ def create_context(config_path: Optional[str] = None) -> Context:
 
     # 加载配置
     if config_file.exists():
+        # yaml 较重，只在确实有配置文件时导入；有 libyaml 时用 C 实现解析
+        import yaml
+
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
         with open(config_file, "r", encoding="utf-8") as f:
-            config = yaml.safe_load(f)
+            config = yaml.load(f, Loader=loader)
     else:
         config = {}
 
@@ -0,0 +1,247 @@
+"""
+常驻进程（cli.py serve）的本地套接字协议
+
+客户端连接 Unix 套接字，发送一行 JSON 请求：
+
+    {"command": "analyze", "args": ["--mode", "stats"], "cwd": "/path"}
+
+服务端以 JSONL 事件流应答：命令执行期间产生的全部事件，最后一行为
+
+    {"type": "daemon_done", "exit_code": 0}
+
+特殊命令：ping 返回一条 daemon_status 事件；shutdown 在应答后停止服务。
+
+连接由独立线程处理，但 EventEmitter 的监听器是进程级的，命令本身串行执行，
+后到的请求排队等待。客户端中途断开时命令继续执行到结束，事件仍写入日志文件。
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# 套接字文件名（位于项目根目录），可用环境变量覆盖完整路径
+DEFAULT_SOCKET_NAME = ".gitmusic-daemon.sock"
+DAEMON_SOCKET_ENV = "GITMUSIC_DAEMON_SOCKET"
+# 请求结束事件类型
+DONE_EVENT = "daemon_done"
+# 单个请求行的最大字节数
+MAX_REQUEST_SIZE = 1024 * 1024
+
+# 处理函数：(请求, 发送事件的回调) -> 退出码
+RequestHandler = Callable[[Dict, Callable[[Dict], None]], int]
+
+
+def is_supported() -> bool:
+    """当前平台是否支持 Unix 套接字"""
+    return hasattr(socket, "AF_UNIX")
+
+
+def default_socket_path(project_root: Path) -> Path:
+    """
+    常驻进程的套接字路径
+
+    Args:
+        project_root: 项目根目录
+
+    Returns:
+        环境变量 GITMUSIC_DAEMON_SOCKET 指定的路径，缺省为 <项目根>/.gitmusic-daemon.sock
+    """
+    override = os.environ.get(DAEMON_SOCKET_ENV)
+    if override:
+        return Path(override)
+    return Path(project_root) / DEFAULT_SOCKET_NAME
+
+
+class _Connection(socketserver.StreamRequestHandler):
+    """处理一个客户端连接（一个请求）"""
+
+    def handle(self):
+        server: "_UnixServer" = self.server
+        closed = False
+
+        def send(event: Dict) -> None:
+            nonlocal closed
+            if closed:
+                return
+            try:
+                line = json.dumps(event, ensure_ascii=False) + "\n"
+                self.wfile.write(line.encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError, OSError):
+                # 客户端已断开：命令继续执行，不再发送
+                closed = True
+
+        try:
+            request = json.loads(self.rfile.readline(MAX_REQUEST_SIZE))
+            command = request["command"]
+        except (ValueError, KeyError, TypeError) as e:
+            send({"type": "error", "message": f"Invalid daemon request: {e}"})
+            send({"type": DONE_EVENT, "exit_code": 2})
+            return
+
+        if command == "ping":
+            send(server.daemon.status())
+            send({"type": DONE_EVENT, "exit_code": 0})
+            return
+        if command == "shutdown":
+            send({"type": DONE_EVENT, "exit_code": 0})
+            threading.Thread(target=server.shutdown, daemon=True).start()
+            return
+
+        with server.daemon.command_lock:
+            server.daemon.requests_served += 1
+            try:
+                exit_code = server.daemon.handler(request, send)
+            except Exception as e:
+                send({"type": "error", "message": f"Daemon command failed: {e}"})
+                exit_code = 1
+        send({"type": DONE_EVENT, "exit_code": exit_code})
+
+
+if is_supported():
+
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+        daemon: "DaemonServer"
+
+
+class DaemonServer:
+    """常驻进程的套接字服务端"""
+
+    def __init__(self, socket_path: Path, handler: RequestHandler):
+        """
+        初始化服务端
+
+        Args:
+            socket_path: Unix 套接字路径
+            handler: 执行命令的处理函数，返回退出码
+        """
+        self.socket_path = Path(socket_path)
+        self.handler = handler
+        self.command_lock = threading.Lock()
+        self.requests_served = 0
+        self.started = time.time()
+        self._server = None
+
+    def status(self) -> Dict:
+        """ping 请求的应答事件"""
+        return {
+            "type": "daemon_status",
+            "pid": os.getpid(),
+            "socket": str(self.socket_path),
+            "uptime_sec": round(time.time() - self.started, 1),
+            "requests_served": self.requests_served,
+            "busy": self.command_lock.locked(),
+        }
+
+    def bind(self) -> None:
+        """
+        绑定套接字：清理上次异常退出留下的套接字文件，已有服务在运行时报错
+
+        Raises:
+            RuntimeError: 平台不支持或已有常驻进程在监听
+        """
+        if not is_supported():
+            raise RuntimeError("Unix sockets are not supported on this platform")
+        if self.socket_path.exists():
+            if ping(self.socket_path) is not None:
+                raise RuntimeError(f"Daemon already running on {self.socket_path}")
+            self.socket_path.unlink()
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self._server = _UnixServer(str(self.socket_path), _Connection)
+        self._server.daemon = self
+        os.chmod(self.socket_path, 0o600)
+
+    def serve_forever(self) -> None:
+        """处理请求直到收到 shutdown 或调用 shutdown()，退出时删除套接字文件"""
+        if self._server is None:
+            self.bind()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def shutdown(self) -> None:
+        """从其他线程停止服务"""
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def _connect(socket_path: Path, timeout: Optional[float]) -> Optional[socket.socket]:
+    if not is_supported():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(socket_path))
+    except (FileNotFoundError, ConnectionRefusedError, OSError):
+        sock.close()
+        return None
+    return sock
+
+
+def request(
+    socket_path: Path,
+    command: str,
+    args: Optional[List[str]] = None,
+    on_event: Optional[Callable[[Dict], None]] = None,
+    timeout: Optional[float] = None,
+) -> Optional[int]:
+    """
+    向常驻进程发送一个命令并逐个回调返回的事件
+
+    Args:
+        socket_path: Unix 套接字路径
+        command: 命令名
+        args: 命令参数
+        on_event: 事件回调（不含 daemon_done）
+        timeout: 套接字超时（秒），None 表示一直等待命令结束
+
+    Returns:
+        命令退出码；没有常驻进程在监听时返回 None（调用方应在本进程内执行）
+    """
+    sock = _connect(Path(socket_path), timeout)
+    if sock is None:
+        return None
+    payload = {"command": command, "args": list(args or []), "cwd": os.getcwd()}
+    with sock, sock.makefile("rb") as reader:
+        sock.sendall((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+        for line in reader:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get("type") == DONE_EVENT:
+                return int(event.get("exit_code", 0))
+            if on_event is not None:
+                on_event(event)
+    # 连接在结束事件之前断开：常驻进程异常退出，命令可能已部分执行，不再回退
+    if on_event is not None:
+        on_event({"type": "error", "message": "Daemon connection closed unexpectedly"})
+    return 1
+
+
+def ping(socket_path: Path, timeout: float = 2.0) -> Optional[Dict]:
+    """
+    查询常驻进程状态
+
+    Returns:
+        daemon_status 事件；没有常驻进程在监听时返回 None
+    """
+    status = []
+    try:
+        code = request(socket_path, "ping", on_event=status.append, timeout=timeout)
+    except OSError:
+        return None
+    if code is None or not status:
+        return None
+    return status[0]
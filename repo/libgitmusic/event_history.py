@@ -0,0 +1,137 @@
+"""
+CLI 事件历史（EventHistory）
+
+只在内存中保留最近的事件（环形缓冲）和最近的错误，摘要所需的统计量在事件到达时
+增量累加，因此长时间运行的 REPL 或大批量命令的内存占用保持不变。完整历史以
+EventEmitter 写出的 JSONL 日志为准，需要时用 read_log 逐行读取。
+"""
+
+import json
+from collections import Counter, deque
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+# 内存中保留的最近事件数
+EVENT_HISTORY_SIZE = 1000
+# 内存中保留的最近错误数（错误总数单独计数）
+ERROR_HISTORY_SIZE = 200
+
+
+class EventHistory:
+    """有界事件历史与增量汇总"""
+
+    def __init__(
+        self, maxlen: int = EVENT_HISTORY_SIZE, max_errors: int = ERROR_HISTORY_SIZE
+    ):
+        """
+        初始化事件历史
+
+        Args:
+            maxlen: 保留的最近事件数
+            max_errors: 保留的最近错误数
+        """
+        self.events = deque(maxlen=maxlen)
+        self.errors = deque(maxlen=max_errors)
+        # 事件类型 -> 次数
+        self.type_counts = Counter()
+        # item_event 状态 -> 次数
+        self.item_counts = Counter()
+        # 记录过的错误总数（含已被挤出 errors 的）
+        self.error_total = 0
+
+    def add(self, event: Dict) -> Optional[Dict]:
+        """
+        记录一个事件并更新统计
+
+        Args:
+            event: 事件字典
+
+        Returns:
+            事件对应的错误信息（error 事件或状态为 error 的 item_event），否则 None
+        """
+        self.events.append(event)
+        etype = event.get("type")
+        self.type_counts[etype] += 1
+
+        error_info = None
+        if etype == "error":
+            error_info = {
+                "type": "event_error",
+                "message": event.get("message", ""),
+                "context": event.get("context", {}),
+                "timestamp": event.get("ts", ""),
+            }
+        elif etype == "item_event":
+            status = event.get("status", "")
+            self.item_counts[status] += 1
+            if status == "error":
+                error_info = {
+                    "type": "item_error",
+                    "item_id": event.get("id", ""),
+                    "message": event.get("message", ""),
+                    "timestamp": event.get("ts", ""),
+                }
+        if error_info is not None:
+            self.add_error(error_info)
+        return error_info
+
+    def add_error(self, error_info: Dict):
+        """记录一条错误信息（如步骤异常）"""
+        self.errors.append(error_info)
+        self.error_total += 1
+
+    def clear(self):
+        """清空历史与统计（每个命令开始时调用）"""
+        self.events.clear()
+        self.errors.clear()
+        self.type_counts.clear()
+        self.item_counts.clear()
+        self.error_total = 0
+
+    def tail(self, count: int) -> List[Dict]:
+        """返回最近 count 个事件（按时间顺序）"""
+        if count <= 0:
+            return []
+        start = max(len(self.events) - count, 0)
+        return [self.events[i] for i in range(start, len(self.events))]
+
+    @property
+    def items_processed(self) -> int:
+        """item_event 总数"""
+        return self.type_counts["item_event"]
+
+    @property
+    def error_count(self) -> int:
+        """error 事件与状态为 error 的 item_event 总数"""
+        return self.type_counts["error"] + self.item_counts["error"]
+
+    @property
+    def warning_count(self) -> int:
+        """状态为 warn 的 item_event 总数"""
+        return self.item_counts["warn"]
+
+    @property
+    def errors_dropped(self) -> int:
+        """因超出容量未保留在内存中的错误数"""
+        return self.error_total - len(self.errors)
+
+    @staticmethod
+    def read_log(log_path: Path) -> Iterator[Dict]:
+        """
+        逐行读取 JSONL 日志中的完整事件历史
+
+        Args:
+            log_path: EventEmitter 写出的日志文件
+
+        Yields:
+            事件字典（跳过无法解析的行）
+        """
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
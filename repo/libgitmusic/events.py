@@ -1,19 +1,214 @@
 from pathlib import Path
+import atexit
 import json
 import datetime
+import collections
+import os
 import sys
+import threading
+import time
+
+from . import tracing
 
 # 全局事件监听器列表
 _event_listeners = []
 
+# 后台写入缓冲区容量（写满时 emit 阻塞等待，不丢事件）
+EVENT_QUEUE_SIZE = 10000
+# 批量写入后的最长 flush 间隔（秒）
+EVENT_FLUSH_INTERVAL = 0.2
+# 立即写出的事件类型（emit 返回前已写入并 flush）
+URGENT_EVENT_TYPES = ("error", "result")
+
+# batch_progress 每个阶段每秒最多输出的事件数（<=0 表示不限制），首个与最终事件总会输出
+PROGRESS_RATE = 4.0
+
+# 进度节流状态：phase -> {"started", "emitted", "pending"}
+_progress_state = {}
+_progress_lock = threading.Lock()
+
+# 日志文件中需要过滤的字段名（包含即过滤）
+SENSITIVE_KEYS = ("password", "secret", "key", "token", "credential")
+# 字段名 -> 是否敏感
+_sensitive_key_cache = {}
+# (sys.argv[0], 命令名)，避免每个事件都构造 Path
+_cmd_cache = (None, "")
+# (事件, 过滤后的 JSON 行)：同一事件写入标准输出与日志文件时只过滤、序列化一次
+_line_cache = (None, "")
+
+# 单个日志文件的大小上限（按字符数近似），超过后切换到 <命令>-<时间戳>.<序号>.jsonl，0 表示不切换
+LOG_FILE_MAX_BYTES = 64 * 1024 * 1024
+_log_rotate_lock = threading.Lock()
+
+# 写到标准输出的目标标记（写入时再解析 sys.stdout，兼容被替换的 stdout）
+_STDOUT = object()
+
+
+class _EventWriter:
+    """后台线程批量写入 JSONL 行，按定时或显式 flush 刷新
+
+    调用方只负责序列化并追加到缓冲区，文件写入与 flush 在写线程中按目标合并完成，
+    热循环中的事件不再逐条触发系统调用。线程在第一次写入时启动，进程退出时由
+    atexit 排空。
+    """
+
+    def __init__(
+        self, maxsize: int = EVENT_QUEUE_SIZE, flush_interval: float = EVENT_FLUSH_INTERVAL
+    ):
+        self.maxsize = maxsize
+        self.flush_interval = flush_interval
+        self._reset()
+
+    def _reset(self) -> None:
+        # deque.append 是原子操作，写入方无需加锁
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self._wake = False
+        self._thread = None
+        self._closed = False
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                thread = threading.Thread(
+                    target=self._run, name="gitmusic-event-writer", daemon=True
+                )
+                thread.start()
+                self._thread = thread
+
+    def _notify(self) -> None:
+        with self._cond:
+            self._wake = True
+            self._cond.notify_all()
+
+    def write(self, target, line: str) -> None:
+        """
+        提交一行 JSONL
+
+        Args:
+            target: 文本文件对象，或 _STDOUT
+            line: 不含换行符的 JSON 字符串
+        """
+        if self._closed:
+            # 写线程已停止（退出阶段的事件），直接同步写出
+            self._write_batch([(target, line)])
+            return
+        self._ensure_thread()
+        self._pending.append((target, line))
+        if len(self._pending) >= self.maxsize:
+            # 缓冲区已满：唤醒写线程并等待其取走
+            self._notify()
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._pending) < self.maxsize
+                    or not self._thread.is_alive(),
+                    timeout=1.0,
+                )
+
+    def flush(self) -> None:
+        """阻塞直到此前提交的行全部写出并 flush"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._pending.append(done)
+        self._notify()
+        while not done.wait(1.0):
+            # 写线程已退出（例如解释器关闭）时不再等待
+            if not self._thread.is_alive():
+                return
+
+    def close(self) -> None:
+        """排空缓冲区并停止写线程"""
+        self._closed = True
+        thread = self._thread
+        if thread is None:
+            return
+        self._notify()
+        thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._wake:
+                    self._cond.wait(self.flush_interval)
+                self._wake = False
+            self._drain()
+            with self._cond:
+                # 唤醒因缓冲区满而等待的写入方
+                self._cond.notify_all()
+            if self._closed:
+                self._drain()
+                return
+
+    def _drain(self) -> None:
+        """写出缓冲区中的全部行，遇到 flush 标记时先写出此前的行再通知等待方"""
+        batch = []
+        while True:
+            try:
+                item = self._pending.popleft()
+            except IndexError:
+                break
+            if isinstance(item, threading.Event):
+                self._write_batch(batch)
+                batch = []
+                item.set()
+            else:
+                batch.append(item)
+        self._write_batch(batch)
+
+    @staticmethod
+    def _write_batch(batch) -> None:
+        """按目标合并写入并 flush"""
+        if not batch:
+            return
+        chunks = {}
+        for target, line in batch:
+            chunks.setdefault(target, []).append(line)
+        for target, lines in chunks.items():
+            data = "\n".join(lines) + "\n"
+            try:
+                if target is _STDOUT:
+                    try:
+                        # 尝试使用UTF-8编码输出，避免控制台编码问题
+                        sys.stdout.buffer.write(data.encode("utf-8"))
+                        sys.stdout.buffer.flush()
+                    except Exception:
+                        # 如果失败，回退到普通write（可能会在Windows控制台出错）
+                        sys.stdout.write(data)
+                        sys.stdout.flush()
+                else:
+                    target.write(data)
+                    target.flush()
+            except Exception:
+                # 文件已被关闭等情况，丢弃这些行
+                pass
+
+
+_writer = _EventWriter()
+atexit.register(_writer.close)
+if hasattr(os, "register_at_fork"):
+    # fork 出的子进程没有写线程，丢弃继承的队列
+    os.register_at_fork(after_in_child=_writer._reset)
+
 
 class EventEmitter:
     """统一事件输出类，所有脚本通过此类输出 JSONL 事件流"""
 
     # 日志配置
     _log_file = None
+    # 当前日志文件名前缀（不含分片序号与后缀）、分片序号、已写入的字符数
+    _log_base = None
+    _log_part = 0
+    _log_bytes = 0
+    _log_max_bytes = LOG_FILE_MAX_BYTES
     _log_only_mode = False
     _logs_dir = Path.cwd() / "logs"
+    # 进度事件节流与外部工具输出
+    _progress_rate = PROGRESS_RATE
+    _tool_output = os.environ.get("GITMUSIC_TOOL_OUTPUT") == "1"
 
     @staticmethod
     def setup_logging(logs_dir=None, log_only=False):
@@ -28,6 +223,33 @@ class EventEmitter:
         # 确保日志目录存在
         EventEmitter._logs_dir.mkdir(parents=True, exist_ok=True)
 
+    @staticmethod
+    def set_progress_rate(rate):
+        """设置每个阶段每秒最多输出的 batch_progress 事件数
+
+        Args:
+            rate: 每秒事件数，<=0 表示不节流
+        """
+        EventEmitter._progress_rate = rate
+
+    @staticmethod
+    def set_tool_output(enabled):
+        """是否把外部工具（ffmpeg 等）的输出行作为 debug 日志事件发出
+
+        Args:
+            enabled: True 时发出，False 时丢弃（默认，可用环境变量 GITMUSIC_TOOL_OUTPUT=1 开启）
+        """
+        EventEmitter._tool_output = bool(enabled)
+
+    @staticmethod
+    def set_log_rotation(max_bytes):
+        """设置单个日志文件的大小上限，超过后切换到新的分片文件
+
+        Args:
+            max_bytes: 上限（字节，按字符数近似），<=0 表示不切换
+        """
+        EventEmitter._log_max_bytes = max_bytes
+
     @staticmethod
     def register_listener(listener):
         """注册事件监听器，listener(event_dict)"""
@@ -39,6 +261,21 @@ class EventEmitter:
         if listener in _event_listeners:
             _event_listeners.remove(listener)
 
+    @staticmethod
+    def capture(listener):
+        """将事件全部交给 listener：清除已有监听器并停止写日志文件
+
+        用于子进程（如 release 的进程池 worker）缓冲事件，再由父进程 forward，
+        避免多个进程同时写控制台和日志文件。
+
+        Args:
+            listener: 事件回调 listener(event_dict)
+        """
+        _event_listeners.clear()
+        # fork 继承的文件对象仍由父进程负责关闭
+        EventEmitter._log_file = None
+        _event_listeners.append(listener)
+
     @staticmethod
     def start_log_file(command_name=None):
         """开始记录日志到文件
@@ -49,44 +286,92 @@ class EventEmitter:
             command_name = Path(sys.argv[0]).stem
         timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
         EventEmitter._logs_dir.mkdir(parents=True, exist_ok=True)
-        log_filename = EventEmitter._logs_dir / f"{command_name}-{timestamp}.jsonl"
+        EventEmitter._log_base = EventEmitter._logs_dir / f"{command_name}-{timestamp}"
+        EventEmitter._log_part = 0
+        EventEmitter._log_bytes = 0
+        log_filename = EventEmitter._log_base.with_name(
+            EventEmitter._log_base.name + ".jsonl"
+        )
         try:
             EventEmitter._log_file = open(log_filename, "a", encoding="utf-8")
         except Exception as e:
             sys.stderr.write(f"无法打开日志文件 {log_filename}: {e}\n")
             EventEmitter._log_file = None
 
+    @staticmethod
+    def _rotate_log_file(current):
+        """当前日志文件超过大小上限：切换到下一个分片，写出已排队的行后关闭旧文件"""
+        with _log_rotate_lock:
+            # 其他线程已经切换过
+            if EventEmitter._log_file is not current or EventEmitter._log_base is None:
+                return
+            EventEmitter._log_part += 1
+            base = EventEmitter._log_base
+            log_filename = base.with_name(f"{base.name}.{EventEmitter._log_part}.jsonl")
+            try:
+                EventEmitter._log_file = open(log_filename, "a", encoding="utf-8")
+            except Exception as e:
+                sys.stderr.write(f"无法打开日志文件 {log_filename}: {e}\n")
+                return
+            EventEmitter._log_bytes = 0
+        _writer.flush()
+        try:
+            current.close()
+        except Exception:
+            pass
+
     @staticmethod
     def stop_logging():
-        """停止日志记录，关闭文件"""
+        """停止日志记录，写出队列中的事件后关闭文件"""
         if EventEmitter._log_file is not None:
+            _writer.flush()
             try:
                 EventEmitter._log_file.close()
             except Exception:
                 pass
             EventEmitter._log_file = None
+        EventEmitter._log_base = None
+
+    @staticmethod
+    def flush():
+        """阻塞直到已提交的事件全部写入日志文件和标准输出"""
+        _writer.flush()
 
     @staticmethod
     def _filter_sensitive_data(event_dict):
         """过滤敏感数据，如密码、密钥等"""
-        sensitive_keys = ["password", "secret", "key", "token", "credential"]
         filtered = event_dict.copy()
-        for key in list(filtered.keys()):
-            key_lower = key.lower()
-            for sensitive in sensitive_keys:
-                if sensitive in key_lower:
-                    filtered[key] = "[FILTERED]"
-                    break
+        for key in event_dict:
+            sensitive = _sensitive_key_cache.get(key)
+            if sensitive is None:
+                key_lower = key.lower()
+                sensitive = any(word in key_lower for word in SENSITIVE_KEYS)
+                _sensitive_key_cache[key] = sensitive
+            if sensitive:
+                filtered[key] = "[FILTERED]"
         return filtered
 
     @staticmethod
     def emit(event_type, **kwargs):
+        global _cmd_cache
+        argv0 = sys.argv[0] if sys.argv else ""
+        if _cmd_cache[0] != argv0:
+            _cmd_cache = (argv0, Path(argv0).stem)
         event = {
             "type": event_type,
             "ts": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-            "cmd": Path(sys.argv[0]).stem,
+            "cmd": _cmd_cache[1],
             **kwargs,
         }
+        EventEmitter.forward(event)
+
+    @staticmethod
+    def forward(event):
+        """分发一个已构建的事件（例如子进程缓冲后转交给父进程的事件）
+
+        Args:
+            event: 完整的事件字典（含 type、ts、cmd）
+        """
         # 调用所有监听器
         for listener in _event_listeners:
             try:
@@ -95,23 +380,59 @@ class EventEmitter:
                 pass
 
         # 写入日志文件（如果启用）
-        if EventEmitter._log_file is not None:
-            filtered_event = EventEmitter._filter_sensitive_data(event)
-            json_str = json.dumps(filtered_event, ensure_ascii=False)
-            EventEmitter._log_file.write(json_str + "\n")
-            EventEmitter._log_file.flush()
+        wrote = EventEmitter.write_log(event)
 
         # 只有在没有监听器时才输出JSONL（例如脚本独立运行）
         if not _event_listeners:
-            json_str = json.dumps(event, ensure_ascii=False)
-            try:
-                # 尝试使用UTF-8编码输出，避免控制台编码问题
-                sys.stdout.buffer.write(json_str.encode("utf-8"))
-                sys.stdout.buffer.write(b"\n")
-                sys.stdout.buffer.flush()
-            except:
-                # 如果失败，回退到普通print（可能会在Windows控制台出错）
-                print(json_str, flush=True)
+            _writer.write(_STDOUT, json.dumps(event, ensure_ascii=False))
+            wrote = True
+
+        # 错误与结果不等待定时 flush（监听器经 write_stdout 提交的行一并写出）
+        if event.get("type") in URGENT_EVENT_TYPES and (wrote or _line_cache[0] is event):
+            _writer.flush()
+
+    @staticmethod
+    def _filtered_line(event):
+        """过滤敏感数据并序列化为 JSON 行（同一事件连续调用时复用结果）"""
+        global _line_cache
+        cached_event, line = _line_cache
+        if cached_event is not event:
+            line = json.dumps(EventEmitter._filter_sensitive_data(event), ensure_ascii=False)
+            _line_cache = (event, line)
+        return line
+
+    @staticmethod
+    def write_stdout(event):
+        """过滤敏感数据后把事件提交到标准输出（由后台线程批量写入）
+
+        供接管了输出的监听器使用（如 CLI 的 --log-only 模式），
+        error 与 result 事件在 emit 返回前写出。
+
+        Args:
+            event: 完整的事件字典
+        """
+        _writer.write(_STDOUT, EventEmitter._filtered_line(event))
+
+    @staticmethod
+    def write_log(event):
+        """过滤敏感数据后把事件提交到日志文件（由后台线程写入）
+
+        Args:
+            event: 完整的事件字典
+
+        Returns:
+            是否已提交（未启用日志文件时为 False）
+        """
+        log_file = EventEmitter._log_file
+        if log_file is None:
+            return False
+        line = EventEmitter._filtered_line(event)
+        _writer.write(log_file, line)
+        if EventEmitter._log_max_bytes > 0:
+            EventEmitter._log_bytes += len(line) + 1
+            if EventEmitter._log_bytes >= EventEmitter._log_max_bytes:
+                EventEmitter._rotate_log_file(log_file)
+        return True
 
     @staticmethod
     def log(level, message):
@@ -119,26 +440,141 @@ class EventEmitter:
 
     @staticmethod
     def phase_start(phase, total_items=0):
+        # 同名阶段重新开始：先补发上一轮被节流的进度，再重新计时
+        EventEmitter.end_progress(phase)
+        with _progress_lock:
+            _progress_state[phase] = {
+                "started": time.monotonic(),
+                "emitted": None,
+                "pending": None,
+            }
+        tracing.set_phase(phase)
         EventEmitter.emit("phase_start", phase=phase, total_items=total_items)
 
     @staticmethod
     def batch_progress(phase, processed, total_items, rate_per_sec=0):
+        """输出阶段进度（按阶段节流）
+
+        每个阶段每秒最多输出 _progress_rate 个事件；首个事件与 processed >= total_items
+        的最终事件总会输出，被节流的最新进度由 end_progress 补发。rate_per_sec 为 0 时
+        按阶段开始以来的平均速率计算，并附带预计剩余秒数 eta_sec。
+
+        Args:
+            phase: 阶段名
+            processed: 已处理数量
+            total_items: 总数量
+            rate_per_sec: 调用方给出的速率（可选）
+        """
+        now = time.monotonic()
+        final = bool(total_items) and processed >= total_items
+        with _progress_lock:
+            state = _progress_state.get(phase)
+            if state is None:
+                state = {"started": now, "emitted": None, "pending": None}
+                _progress_state[phase] = state
+            rate = EventEmitter._progress_rate
+            if (
+                not final
+                and rate > 0
+                and state["emitted"] is not None
+                and now - state["emitted"] < 1.0 / rate
+            ):
+                state["pending"] = (processed, total_items, rate_per_sec)
+                return
+            state["emitted"] = now
+            state["pending"] = None
+            started = state["started"]
+            if final:
+                # 下一轮同名阶段重新计时
+                del _progress_state[phase]
+        EventEmitter._emit_progress(
+            phase, processed, total_items, rate_per_sec, now - started
+        )
+
+    @staticmethod
+    def end_progress(phase=None):
+        """补发被节流的最新进度
+
+        Args:
+            phase: 阶段名，None 表示全部阶段
+        """
+        pending = []
+        now = time.monotonic()
+        with _progress_lock:
+            phases = list(_progress_state) if phase is None else [phase]
+            for name in phases:
+                state = _progress_state.get(name)
+                if state is None or state["pending"] is None:
+                    continue
+                pending.append((name, *state["pending"], now - state["started"]))
+                state["pending"] = None
+                state["emitted"] = now
+        for name, processed, total_items, rate_per_sec, elapsed in pending:
+            EventEmitter._emit_progress(
+                name, processed, total_items, rate_per_sec, elapsed
+            )
+
+    @staticmethod
+    def _emit_progress(phase, processed, total_items, rate_per_sec, elapsed):
+        if not rate_per_sec and elapsed > 0:
+            rate_per_sec = round(processed / elapsed, 2)
+        eta_sec = None
+        if rate_per_sec and total_items:
+            eta_sec = round(max(total_items - processed, 0) / rate_per_sec, 1)
         EventEmitter.emit(
             "batch_progress",
             phase=phase,
             processed=processed,
             total_items=total_items,
             rate_per_sec=rate_per_sec,
+            eta_sec=eta_sec,
         )
 
+    @staticmethod
+    def tool_output(tool, line):
+        """外部工具（如 ffmpeg）的一行输出
+
+        默认丢弃；set_tool_output(True) 后作为 debug 级 log 事件发出（带 source 字段）。
+
+        Args:
+            tool: 工具名
+            line: 输出行
+        """
+        if EventEmitter._tool_output and line:
+            EventEmitter.emit("log", level="debug", message=line, source=tool)
+
     @staticmethod
     def item_event(item_id, status, message=""):
         EventEmitter.emit("item_event", id=item_id, status=status, message=message)
 
+    @staticmethod
+    def span(name, **attrs):
+        """计时一段代码（墙钟/CPU 时间、读写字节数、子进程数）
+
+        span 嵌套在当前阶段下，按路径汇总后随 result 事件的 spans 字段输出。
+
+        Args:
+            name: span 名称
+            **attrs: 附加到 Chrome trace 事件的属性
+
+        Returns:
+            上下文管理器，产出的 Span 对象可调用 add_bytes(read=, written=)
+        """
+        return tracing.span(name, **attrs)
+
     @staticmethod
     def result(status, message="", artifacts=None):
+        EventEmitter.end_progress()
+        fields = {}
+        spans = tracing.summary()
+        if spans:
+            fields["spans"] = spans
         EventEmitter.emit(
-            "result", status=status, message=message, artifacts=artifacts or {}
+            "result",
+            status=status,
+            message=message,
+            artifacts=artifacts or {},
+            **fields,
         )
 
     @staticmethod
@@ -0,0 +1,464 @@
+"""
+对象存储垃圾回收（标记-清除）
+
+- 标记：从当前元数据（可选再加上 Git 历史中的元数据版本）收集被引用的对象，
+  只构建一次标记集合，本地和远端共用
+- 清除：本地与远端并行扫描，未被引用且超过宽限期的对象才会被清除
+- 增量：扫描结果持久化到 cache_root/gc-state.json
+    * 本地按分片目录记录 mtime，目录未变化时直接复用上次的清单，
+      只有新增对象才需要 stat 以确定首次出现时间
+    * 已处理过的历史版本不再重复读取
+    * 每个对象记录首次发现时间（first_seen），宽限期按此计算
+
+宽限期用于保护刚写入、尚未提交到元数据的对象（例如 publish 进行到一半）。
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .events import EventEmitter
+from .git import GitOperations
+from .metadata import MetadataManager, parse_metadata_lines
+from .object_store import ObjectStore
+from .results import Result
+from .transport import TransportAdapter
+
+STATE_VERSION = 1
+DEFAULT_GRACE_PERIOD_DAYS = 7
+
+
+def _oid_hex(oid: str) -> Optional[str]:
+    """提取 oid 的十六进制部分（sha256:hex -> hex）"""
+    if not oid or ":" not in oid:
+        return None
+    return oid.split(":", 1)[1]
+
+
+def extract_referenced_oids(entries: List[Dict]) -> Set[str]:
+    """
+    从元数据条目中提取被引用的对象哈希
+
+    Args:
+        entries: 元数据条目列表
+
+    Returns:
+        十六进制哈希集合（不含 sha256: 前缀）
+    """
+    referenced = set()
+    for entry in entries:
+        for key in ("audio_oid", "cover_oid"):
+            hexdigest = _oid_hex(entry.get(key, ""))
+            if hexdigest:
+                referenced.add(hexdigest)
+    return referenced
+
+
+class GarbageCollector:
+    """对象存储垃圾回收器"""
+
+    def __init__(
+        self,
+        context: "Context",
+        metadata_mgr: Optional[MetadataManager] = None,
+        object_store: Optional[ObjectStore] = None,
+        transport: Optional[TransportAdapter] = None,
+        grace_period_days: Optional[float] = None,
+        include_history: Optional[bool] = None,
+    ):
+        """
+        初始化垃圾回收器
+
+        Args:
+            context: 上下文对象，包含所有路径和配置
+            metadata_mgr: 元数据管理器，None 时从 context 创建
+            object_store: 对象存储，None 时从 context 创建
+            transport: 传输适配器，None 表示不处理远端
+            grace_period_days: 宽限期（天），None 时读取配置 gc.grace_period_days
+            include_history: 是否把 Git 历史中的元数据也计入标记，None 时读取配置
+        """
+        from .context import Context
+
+        if not isinstance(context, Context):
+            raise TypeError("context must be an instance of Context")
+
+        self.context = context
+        gc_config = context.config.get("gc", {}) or {}
+        if grace_period_days is None:
+            grace_period_days = gc_config.get(
+                "grace_period_days", DEFAULT_GRACE_PERIOD_DAYS
+            )
+        if include_history is None:
+            include_history = gc_config.get("include_history", False)
+
+        self.grace_seconds = float(grace_period_days) * 86400
+        self.include_history = bool(include_history)
+        self.history_depth = int(gc_config.get("history_depth", 0) or 0)
+
+        self.metadata_mgr = metadata_mgr or MetadataManager(context)
+        self.object_store = object_store or ObjectStore(context)
+        self.transport = transport
+        self.state_file = context.cache_root / "gc-state.json"
+        self.state = self._load_state()
+
+    # ------------------------------------------------------------------
+    # 状态持久化
+    # ------------------------------------------------------------------
+
+    def _empty_state(self) -> Dict:
+        return {
+            "version": STATE_VERSION,
+            "local": {},
+            "packed": {},
+            "remote": {},
+            "history": {"revisions": [], "oids": []},
+            "last_run": None,
+        }
+
+    def _load_state(self) -> Dict:
+        if not self.state_file.exists():
+            return self._empty_state()
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") != STATE_VERSION:
+                raise ValueError(f"unsupported version {state.get('version')}")
+        except Exception as e:
+            EventEmitter.log("warn", f"Ignoring GC state file: {str(e)}")
+            return self._empty_state()
+        base = self._empty_state()
+        base.update(state)
+        return base
+
+    def save_state(self) -> None:
+        """原子地写入状态文件"""
+        self.state["last_run"] = time.time()
+        tmp_path = self.state_file.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, separators=(",", ":"))
+        os.replace(tmp_path, self.state_file)
+
+    # ------------------------------------------------------------------
+    # 标记
+    # ------------------------------------------------------------------
+
+    def mark(self) -> Set[str]:
+        """
+        构建标记集合
+
+        Returns:
+            被引用对象的十六进制哈希集合
+        """
+        EventEmitter.phase_start("gc_mark")
+        marked = extract_referenced_oids(self.metadata_mgr.load_all())
+        EventEmitter.log("info", f"Found {len(marked)} referenced OIDs in metadata")
+
+        if self.include_history:
+            historic = self._mark_history()
+            new_refs = len(historic - marked)
+            marked |= historic
+            EventEmitter.log(
+                "info", f"Git history adds {new_refs} additional referenced OIDs"
+            )
+        return marked
+
+    def _mark_history(self) -> Set[str]:
+        """读取元数据文件的历史版本，已处理过的版本直接复用缓存结果"""
+        metadata_file = self.context.metadata_file
+        git = GitOperations(metadata_file.parent)
+        revisions = git.list_revisions(
+            metadata_file.name, max_count=self.history_depth or None
+        )
+
+        history = self.state["history"]
+        seen = set(history.get("revisions", []))
+        oids = set(history.get("oids", []))
+        pending = [rev for rev in revisions if rev not in seen]
+
+        if pending:
+            EventEmitter.phase_start("gc_history", total_items=len(pending))
+        for i, rev in enumerate(pending):
+            content = git.show_file(rev, f"./{metadata_file.name}")
+            if content is not None:
+                oids |= extract_referenced_oids(parse_metadata_lines(content))
+            seen.add(rev)
+            EventEmitter.batch_progress("gc_history", i + 1, len(pending))
+
+        history["revisions"] = sorted(seen)
+        history["oids"] = sorted(oids)
+        return oids
+
+    # ------------------------------------------------------------------
+    # 本地清单（增量）
+    # ------------------------------------------------------------------
+
+    def _scan_local(self, now: float) -> Tuple[Dict[str, Dict[str, float]], Dict]:
+        """
+        增量扫描本地松散对象
+
+        Returns:
+            (字典 kind -> {hex: first_seen}, 新的分片状态)
+        """
+        local_state = self.state["local"]
+        fresh_state = {}
+        inventory = {"audio": {}, "cover": {}}
+        reused = 0
+        rescanned = 0
+
+        for kind, root, suffix in (
+            ("audio", self.object_store.objects_dir / "sha256", ".mp3"),
+            ("cover", self.object_store.covers_dir / "sha256", ".jpg"),
+        ):
+            for shard_key, shard in self.object_store.layout.iter_shard_dirs(root):
+                key = f"{kind}/{shard_key}"
+                mtime_ns = shard.stat().st_mtime_ns
+                cached = local_state.get(key)
+                if cached and cached.get("mtime_ns") == mtime_ns:
+                    objects = cached["objects"]
+                    reused += 1
+                else:
+                    previous = cached["objects"] if cached else {}
+                    objects = {}
+                    with os.scandir(shard.path) as it:
+                        for entry in it:
+                            if not entry.name.endswith(suffix):
+                                continue
+                            hexdigest = entry.name[: -len(suffix)]
+                            if hexdigest in previous:
+                                objects[hexdigest] = previous[hexdigest]
+                            else:
+                                # 只有新对象需要 stat
+                                try:
+                                    objects[hexdigest] = min(
+                                        entry.stat().st_mtime, now
+                                    )
+                                except FileNotFoundError:
+                                    continue
+                    rescanned += 1
+                fresh_state[key] = {"mtime_ns": mtime_ns, "objects": objects}
+                inventory[kind].update(objects)
+
+        EventEmitter.log(
+            "debug", f"GC local scan: {rescanned} shards rescanned, {reused} reused"
+        )
+        return inventory, fresh_state
+
+    def _scan_packed(
+        self, loose_covers: Dict[str, float], now: float
+    ) -> Dict[str, float]:
+        """打包封面的清单；首次出现时间沿用其松散阶段（上次扫描）的记录"""
+        previous = self.state["packed"]
+        previous_loose = {}
+        for key, shard in self.state["local"].items():
+            if key.startswith("cover/"):
+                previous_loose.update(shard["objects"])
+
+        packed = {}
+        for digest in self.object_store.cover_packs.iter_digests():
+            hexdigest = digest.hex()
+            if hexdigest in packed:
+                continue
+            first_seen = loose_covers.get(
+                hexdigest, previous_loose.get(hexdigest, now)
+            )
+            packed[hexdigest] = previous.get(hexdigest, first_seen)
+        self.state["packed"] = packed
+        return packed
+
+    # ------------------------------------------------------------------
+    # 清除
+    # ------------------------------------------------------------------
+
+    def _is_expired(self, first_seen: float, now: float) -> bool:
+        return now - first_seen >= self.grace_seconds
+
+    def sweep_local(self, marked: Set[str], now: float) -> Tuple[List[Tuple], int]:
+        """
+        找出本地可回收对象
+
+        Args:
+            marked: 标记集合
+            now: 当前时间戳
+
+        Returns:
+            (候选列表 [(kind, hex, path 或 None 表示打包对象)], 宽限期内保留数)
+        """
+        EventEmitter.phase_start("gc_sweep_local")
+        inventory, fresh_local = self._scan_local(now)
+        # 刚被 repack 的封面只存在于上次的松散清单中，需先于替换状态读取
+        packed = self._scan_packed(inventory["cover"], now)
+        self.state["local"] = fresh_local
+
+        candidates = []
+        young = 0
+        for kind, objects in inventory.items():
+            for hexdigest, first_seen in objects.items():
+                if hexdigest in marked:
+                    continue
+                if not self._is_expired(first_seen, now):
+                    young += 1
+                    continue
+                suffix = ".jpg" if kind == "cover" else ""
+                path = self.object_store._get_object_path(
+                    f"sha256:{hexdigest}{suffix}"
+                )
+                candidates.append((kind, hexdigest, path))
+
+        for hexdigest, first_seen in packed.items():
+            if hexdigest in marked or hexdigest in inventory["cover"]:
+                continue
+            if not self._is_expired(first_seen, now):
+                young += 1
+                continue
+            candidates.append(("cover", hexdigest, None))
+
+        EventEmitter.item_event(
+            "local_sweep",
+            "done",
+            message=f"Found {len(candidates)} collectable objects locally",
+        )
+        return candidates, young
+
+    def sweep_remote(self, marked: Set[str], now: float) -> Tuple[List[Tuple], int]:
+        """
+        找出远端可回收对象（一次 find 列出对象及 mtime）
+
+        Args:
+            marked: 标记集合
+            now: 当前时间戳
+
+        Returns:
+            (候选列表 [(kind, 相对路径)], 宽限期内保留数)
+        """
+        if self.transport is None:
+            return [], 0
+
+        EventEmitter.phase_start("gc_sweep_remote")
+        previous = self.state["remote"]
+        listing = {}
+        listing.update(self.transport.list_remote_objects("objects"))
+        listing.update(self.transport.list_remote_objects("covers"))
+
+        remote_state = {}
+        candidates = []
+        young = 0
+        for rel_path, mtime in listing.items():
+            first_seen = previous.get(rel_path, min(mtime, now) if mtime else now)
+            remote_state[rel_path] = first_seen
+            hexdigest = Path(rel_path).stem
+            if hexdigest in marked:
+                continue
+            if not self._is_expired(first_seen, now):
+                young += 1
+                continue
+            kind = "cover" if rel_path.endswith(".jpg") else "audio"
+            candidates.append((kind, rel_path))
+
+        self.state["remote"] = remote_state
+        EventEmitter.item_event(
+            "remote_scan",
+            "done",
+            message=f"Found {len(candidates)} collectable objects remotely",
+        )
+        return candidates, young
+
+    def collect(self, mode: str = "local") -> Dict:
+        """
+        标记并扫描，得到回收计划（不删除）
+
+        Args:
+            mode: 回收范围 (local, server, both)
+
+        Returns:
+            计划字典：marked、local、remote、young_local、young_remote
+        """
+        now = time.time()
+        marked = self.mark()
+
+        do_local = mode in ("local", "both")
+        do_remote = mode in ("server", "both") and self.transport is not None
+
+        local, young_local = [], 0
+        remote, young_remote = [], 0
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            local_future = (
+                executor.submit(self.sweep_local, marked, now) if do_local else None
+            )
+            remote_future = (
+                executor.submit(self.sweep_remote, marked, now) if do_remote else None
+            )
+            if local_future is not None:
+                local, young_local = local_future.result()
+            if remote_future is not None:
+                remote, young_remote = remote_future.result()
+
+        return {
+            "marked": marked,
+            "local": local,
+            "remote": remote,
+            "young_local": young_local,
+            "young_remote": young_remote,
+        }
+
+    def delete(self, plan: Dict) -> Result:
+        """
+        执行回收计划
+
+        Args:
+            plan: collect() 的返回值
+
+        Returns:
+            Result: data 中包含 local_deleted、packed_deleted、remote_deleted
+        """
+        from send2trash import send2trash
+
+        local_deleted = 0
+        loose = [c for c in plan["local"] if c[2] is not None]
+        packed_drop = {c[1] for c in plan["local"] if c[2] is None}
+
+        if loose:
+            EventEmitter.phase_start("cleanup_delete_local", total_items=len(loose))
+        for i, (kind, hexdigest, path) in enumerate(loose):
+            EventEmitter.item_event(path.name, "deleting_local")
+            try:
+                send2trash(str(path))
+                local_deleted += 1
+            except Exception as e:
+                EventEmitter.error(f"Failed to delete local file {path}: {str(e)}")
+            EventEmitter.batch_progress("cleanup_delete_local", i + 1, len(loose))
+
+        packed_deleted = 0
+        if packed_drop:
+            # 打包对象无法单独删除，通过重新打包剔除
+            keep = {d.hex() for d in self.object_store.cover_packs.iter_digests()}
+            keep -= packed_drop
+            keep |= {c.stem for c in self.object_store.iter_loose_covers()}
+            result = self.object_store.repack_covers(keep=keep)
+            if result.success:
+                packed_deleted = result.data.get("dropped", 0)
+
+        remote_deleted = 0
+        if plan["remote"] and self.transport is not None:
+            rel_paths = [rel_path for _, rel_path in plan["remote"]]
+            EventEmitter.phase_start(
+                "cleanup_delete_remote", total_items=len(rel_paths)
+            )
+            remote_deleted = self.transport.delete_remote_files(rel_paths)
+            for rel_path in rel_paths:
+                self.state["remote"].pop(rel_path, None)
+
+        for hexdigest in packed_drop:
+            self.state["packed"].pop(hexdigest, None)
+
+        return Result(
+            True,
+            f"Collected {local_deleted + packed_deleted + remote_deleted} objects",
+            data={
+                "local_deleted": local_deleted,
+                "packed_deleted": packed_deleted,
+                "remote_deleted": remote_deleted,
+            },
+        )
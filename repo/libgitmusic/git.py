@@ -166,6 +166,48 @@ class GitOperations:
         except subprocess.CalledProcessError:
             return None
 
+    def list_revisions(self, path: str, max_count: Optional[int] = None) -> List[str]:
+        """
+        列出修改过指定文件的提交（新到旧）
+
+        Args:
+            path: 文件路径（相对于仓库根目录或当前目录）
+            max_count: 最多返回的提交数，None表示不限制
+
+        Returns:
+            提交哈希列表，不是Git仓库或失败时返回空列表
+        """
+        args = ["log", "--format=%H"]
+        if max_count:
+            args.append(f"--max-count={max_count}")
+        args += ["--", path]
+        try:
+            result = self._run_git(args, check=False)
+        except OSError:
+            return []
+        if result.returncode != 0:
+            return []
+        return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
+    def show_file(self, revision: str, path: str) -> Optional[str]:
+        """
+        读取指定提交中的文件内容
+
+        Args:
+            revision: 提交哈希或引用
+            path: 文件路径（相对于当前目录时需以 ./ 开头）
+
+        Returns:
+            文件内容，文件在该提交中不存在时返回None
+        """
+        try:
+            result = self._run_git(["show", f"{revision}:{path}"], check=False)
+        except OSError:
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout
+
 
 # 简化函数接口
 def git_add(repo_root: Path, paths: List[str]) -> bool:
@@ -5,6 +5,7 @@ import threading
 from pathlib import Path
 from typing import Dict, Any, Optional
 from .events import EventEmitter
+from .tracing import add_bytes, traced
 
 
 class HashUtils:
@@ -26,19 +27,24 @@ class HashUtils:
         "0",
     ]
 
+    # get_ffmpeg_version 的缓存（进程内只执行一次 ffmpeg -version）
+    _ffmpeg_version: Optional[str] = None
+
     @classmethod
     def get_ffmpeg_version(cls) -> str:
         """获取ffmpeg版本信息"""
-        try:
-            result = subprocess.run(
-                ["ffmpeg", "-version"], capture_output=True, text=True, check=True
-            )
-            first_line = result.stdout.split("\n")[0]
-            return first_line.strip()
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return "unknown"
+        if cls._ffmpeg_version is None:
+            try:
+                result = subprocess.run(
+                    ["ffmpeg", "-version"], capture_output=True, text=True, check=True
+                )
+                cls._ffmpeg_version = result.stdout.split("\n")[0].strip()
+            except (subprocess.CalledProcessError, FileNotFoundError):
+                cls._ffmpeg_version = "unknown"
+        return cls._ffmpeg_version
 
     @classmethod
+    @traced("hash_audio_frames")
     def hash_audio_frames(
         cls,
         path: Path,
@@ -85,7 +91,7 @@ class HashUtils:
             stdout_chunks = []
             stderr_lines = []
 
-            # 读取stderr的辅助函数（实时打印进度）
+            # 读取stderr的辅助函数（保留输出用于错误信息）
             def read_stderr():
                 try:
                     while True:
@@ -95,9 +101,8 @@ class HashUtils:
                         # 解码为字符串并移除尾部换行符
                         line_str = line.decode("utf-8", errors="replace").rstrip("\n")
                         stderr_lines.append(line_str)
-                        # 实时打印ffmpeg进度信息（CLI会将其显示为灰色文本）
-                        if line_str:
-                            print(line_str, flush=True)
+                        # ffmpeg输出默认丢弃，开启后作为debug日志事件
+                        EventEmitter.tool_output("ffmpeg", line_str)
                 except Exception:
                     pass
 
@@ -113,6 +118,7 @@ class HashUtils:
                     break
                 stdout_chunks.append(chunk)
                 sha256_obj.update(chunk)
+                add_bytes(read=len(chunk))
 
             # 等待进程结束
             returncode = process.wait(timeout=30)
@@ -0,0 +1,218 @@
+"""
+对象存储分片布局（ShardLayout）
+
+对象按哈希前缀分片存放：
+
+    objects/sha256/<p1>/<p2>/.../<hex>.mp3
+    covers/sha256/<p1>/<p2>/.../<hex>.jpg
+
+depth 为分片层数（至少 1 层，对象不直接放在 sha256/ 下），width 为每层使用的十六进制
+字符数。默认 depth=1, width=2，即历史布局 objects/sha256/aa/<hex>.mp3（每层 256 个目录）。
+
+布局的权威来源是 cache_root/layout.json：
+    - 存在时以其为准（reshard 迁移完成后写入）
+    - 不存在且缓存中已有对象时，视为历史默认布局
+    - 不存在且缓存为空时，使用配置 object_store.shard_depth / shard_width，
+      并写入 layout.json 固化
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+LAYOUT_FILE = "layout.json"
+DEFAULT_DEPTH = 1
+DEFAULT_WIDTH = 2
+
+# 对象类型 -> (顶层目录, 后缀)
+OBJECT_KINDS = {
+    "audio": ("objects", ".mp3"),
+    "cover": ("covers", ".jpg"),
+}
+
+
+@dataclass(frozen=True)
+class ShardLayout:
+    """分片布局：depth 层，每层 width 个十六进制字符"""
+
+    depth: int = DEFAULT_DEPTH
+    width: int = DEFAULT_WIDTH
+
+    def __post_init__(self):
+        # 扫描（对象索引、GC）只遍历分片目录，depth=0 的对象不会被看到
+        if self.depth < 1 or self.width < 1 or self.depth * self.width > 16:
+            raise ValueError(
+                f"Invalid shard layout: depth={self.depth}, width={self.width}"
+            )
+
+    @classmethod
+    def legacy(cls) -> "ShardLayout":
+        """历史默认布局（objects/sha256/aa/<hex>）"""
+        return cls(DEFAULT_DEPTH, DEFAULT_WIDTH)
+
+    @property
+    def is_legacy(self) -> bool:
+        return self == ShardLayout.legacy()
+
+    def shard_parts(self, hexdigest: str) -> Tuple[str, ...]:
+        """返回哈希对应的分片目录名序列"""
+        w = self.width
+        return tuple(hexdigest[i * w : (i + 1) * w] for i in range(self.depth))
+
+    def object_path(self, root: Path, hexdigest: str, suffix: str) -> Path:
+        """
+        计算对象路径
+
+        Args:
+            root: 分片根目录，例如 cache_root/objects/sha256
+            hexdigest: 十六进制哈希
+            suffix: 文件后缀
+
+        Returns:
+            对象文件路径
+        """
+        return root.joinpath(*self.shard_parts(hexdigest), f"{hexdigest}{suffix}")
+
+    def relative_path(self, kind: str, hexdigest: str) -> str:
+        """
+        对象相对于数据根目录的路径（本地 cache_root 或远端 remote_data_root）
+
+        Args:
+            kind: 对象类型 (audio, cover)
+            hexdigest: 十六进制哈希
+
+        Returns:
+            相对路径（使用 / 分隔）
+        """
+        top, suffix = OBJECT_KINDS[kind]
+        parts = ("sha256",) + self.shard_parts(hexdigest) + (f"{hexdigest}{suffix}",)
+        return "/".join((top,) + parts)
+
+    def glob_pattern(self, suffix: str) -> str:
+        """分片根目录下匹配所有对象的 glob 模式"""
+        return "*/" * self.depth + f"*{suffix}"
+
+    def iter_shard_dirs(self, root: Path) -> Iterator[Tuple[str, os.DirEntry]]:
+        """
+        遍历最底层分片目录
+
+        Args:
+            root: 分片根目录
+
+        Yields:
+            (相对 root 的分片键，如 "ab/cd", DirEntry)
+        """
+
+        def walk(path: str, prefix: str, level: int):
+            try:
+                entries = list(os.scandir(path))
+            except FileNotFoundError:
+                return
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                key = f"{prefix}/{entry.name}" if prefix else entry.name
+                if level == self.depth:
+                    yield key, entry
+                else:
+                    yield from walk(entry.path, key, level + 1)
+
+        yield from walk(str(root), "", 1)
+
+    def to_dict(self) -> Dict:
+        return {"depth": self.depth, "width": self.width}
+
+    def save(self, data_root: Path) -> None:
+        """原子地写入 layout.json"""
+        path = Path(data_root) / LAYOUT_FILE
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ShardLayout":
+        return cls(
+            int(data.get("depth", DEFAULT_DEPTH)), int(data.get("width", DEFAULT_WIDTH))
+        )
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "ShardLayout":
+        """从配置 object_store.shard_depth / shard_width 读取布局"""
+        store_config = (config or {}).get("object_store", {}) or {}
+        return cls(
+            int(store_config.get("shard_depth", DEFAULT_DEPTH)),
+            int(store_config.get("shard_width", DEFAULT_WIDTH)),
+        )
+
+    @classmethod
+    def read(cls, data_root: Path) -> Optional["ShardLayout"]:
+        """读取 layout.json，不存在返回 None"""
+        path = Path(data_root) / LAYOUT_FILE
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def load(cls, cache_root: Path, config: Optional[Dict] = None) -> "ShardLayout":
+        """
+        确定缓存目录当前使用的布局
+
+        Args:
+            cache_root: 缓存根目录
+            config: 完整配置字典
+
+        Returns:
+            ShardLayout 实例
+        """
+        cache_root = Path(cache_root)
+        layout = cls.read(cache_root)
+        if layout is not None:
+            return layout
+
+        configured = cls.from_config(config)
+        if configured.is_legacy or _has_objects(cache_root):
+            # 已有对象的缓存只能通过 reshard 迁移，不能直接切换布局
+            return cls.legacy()
+
+        cache_root.mkdir(parents=True, exist_ok=True)
+        configured.save(cache_root)
+        return configured
+
+
+def parse_relative_path(rel_path: str) -> Optional[Tuple[str, str]]:
+    """
+    从对象相对路径中解析 (kind, hex)，与布局无关
+
+    Args:
+        rel_path: 例如 objects/sha256/ab/cd/<hex>.mp3
+
+    Returns:
+        (kind, hexdigest)，无法识别时返回 None
+    """
+    parts = rel_path.replace("\\", "/").split("/")
+    if len(parts) < 3 or parts[1] != "sha256":
+        return None
+    for kind, (top, suffix) in OBJECT_KINDS.items():
+        if parts[0] == top and parts[-1].endswith(suffix):
+            return kind, parts[-1][: -len(suffix)]
+    return None
+
+
+def _has_objects(cache_root: Path) -> bool:
+    """缓存中是否已有分片目录"""
+    for top, _ in OBJECT_KINDS.values():
+        root = cache_root / top / "sha256"
+        try:
+            with os.scandir(root) as it:
+                if any(entry.is_dir() for entry in it):
+                    return True
+        except FileNotFoundError:
+            continue
+    return False
@@ -0,0 +1,529 @@
+"""
+事件日志归档（LogArchive）
+
+logs_dir 下每次命令运行写出 <命令>-<时间戳>.jsonl（超过大小上限时续写
+<命令>-<时间戳>.<序号>.jsonl）。归档维护：
+
+    - 压缩：保留最近 keep_recent 个未压缩日志便于直接查看，更早且空闲超过
+      ARCHIVE_MIN_IDLE 秒的日志压缩到 logs_dir/archive/（gzip，或安装了
+      zstandard 包时可选 zstd），同时向 archive/index.jsonl 追加一行摘要
+    - 清理：删除早于 max_age_days 的归档；归档总大小超过 max_total_mb 时从最旧的删起
+
+索引摘要记录命令、时间范围、事件类型 / 日志级别 / item 状态计数、错误数与
+item id 列表（超过 MAX_INDEXED_ITEMS 个时不记录）。query 先用摘要排除不可能匹配的
+归档，只流式解压剩下的文件，达到 limit 后立即停止。
+
+配置（config.yaml）：
+
+    logging:
+      archive:
+        keep_recent: 20
+        max_file_mb: 64
+        max_age_days: 90
+        max_total_mb: 1024
+        compression: gzip
+"""
+
+import datetime
+import importlib.util
+import io
+import json
+import os
+import re
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .events import EventEmitter
+
+ARCHIVE_DIR = "archive"
+INDEX_FILE = "index.jsonl"
+# 最近修改距今不足该秒数的日志可能仍在写入，不归档
+ARCHIVE_MIN_IDLE = 600
+# 索引中记录的 item id 上限，超过时该归档按 item 查询需要解压扫描
+MAX_INDEXED_ITEMS = 5000
+
+DEFAULT_KEEP_RECENT = 20
+DEFAULT_MAX_FILE_MB = 64
+DEFAULT_MAX_AGE_DAYS = 90
+DEFAULT_MAX_TOTAL_MB = 1024
+
+_SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+_LOG_NAME = re.compile(r"^(?P<command>.+)-(?P<stamp>\d{8}-\d{6})(?:\.(?P<part>\d+))?\.jsonl$")
+# 相对时间：30m、12h、7d
+_RELATIVE_TIME = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@dataclass
+class ArchivePolicy:
+    """归档策略"""
+
+    keep_recent: int = DEFAULT_KEEP_RECENT
+    max_file_mb: float = DEFAULT_MAX_FILE_MB
+    max_age_days: float = DEFAULT_MAX_AGE_DAYS
+    max_total_mb: float = DEFAULT_MAX_TOTAL_MB
+    compression: str = "gzip"
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "ArchivePolicy":
+        """
+        从配置的 logging.archive 段读取策略
+
+        Args:
+            config: 完整配置字典
+
+        Returns:
+            ArchivePolicy 实例，未配置的项使用默认值
+        """
+        section = ((config or {}).get("logging") or {}).get("archive") or {}
+        policy = cls()
+        for name in ("keep_recent", "max_file_mb", "max_age_days", "max_total_mb"):
+            if section.get(name) is not None:
+                setattr(policy, name, type(getattr(policy, name))(section[name]))
+        if section.get("compression"):
+            policy.compression = str(section["compression"]).lower()
+        if policy.compression not in _SUFFIXES:
+            raise ValueError(f"Unsupported log compression: {policy.compression}")
+        if policy.compression == "zstd" and importlib.util.find_spec("zstandard") is None:
+            EventEmitter.log("warn", "zstandard is not installed, compressing logs with gzip")
+            policy.compression = "gzip"
+        return policy
+
+
+def parse_time(value: str, now: Optional[float] = None) -> datetime.datetime:
+    """
+    解析查询时间：ISO 时间（无时区按本地时间）或相对时间（30m、12h、7d 表示多久以前）
+
+    Args:
+        value: 时间字符串
+        now: 当前时间戳（测试用）
+
+    Returns:
+        带时区的 datetime
+
+    Raises:
+        ValueError: 无法解析
+    """
+    match = _RELATIVE_TIME.match(value.strip())
+    if match:
+        seconds = float(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+        now = time.time() if now is None else now
+        return datetime.datetime.fromtimestamp(now - seconds).astimezone()
+    return _aware(datetime.datetime.fromisoformat(value.strip()))
+
+
+def _aware(dt: datetime.datetime) -> datetime.datetime:
+    return dt if dt.tzinfo is not None else dt.astimezone()
+
+
+def _utc_iso(dt: datetime.datetime) -> str:
+    """统一为 UTC、微秒精度的 ISO 字符串，可按字典序比较"""
+    return dt.astimezone(datetime.timezone.utc).isoformat(timespec="microseconds")
+
+
+def _event_level(event: Dict) -> Optional[str]:
+    """事件的日志级别：log 事件取 level 字段，error 事件视为 error"""
+    etype = event.get("type")
+    if etype == "log":
+        return event.get("level")
+    if etype == "error":
+        return "error"
+    return None
+
+
+def _event_time(event: Dict) -> Optional[datetime.datetime]:
+    ts = event.get("ts")
+    if not isinstance(ts, str):
+        return None
+    try:
+        return _aware(datetime.datetime.fromisoformat(ts))
+    except ValueError:
+        return None
+
+
+def summarize(events: Iterable[Dict]) -> Dict:
+    """
+    统计一个日志的索引摘要
+
+    Args:
+        events: 事件迭代器
+
+    Returns:
+        {events, start, end, types, levels, statuses, errors, item_ids}
+    """
+    types, levels, statuses = Counter(), Counter(), Counter()
+    items = set()
+    start = end = None
+    count = 0
+    for event in events:
+        count += 1
+        etype = event.get("type", "")
+        types[etype] += 1
+        level = _event_level(event)
+        if level is not None:
+            levels[level] += 1
+        if etype == "item_event":
+            statuses[event.get("status", "")] += 1
+            if items is not None and event.get("id") is not None:
+                items.add(str(event["id"]))
+                if len(items) > MAX_INDEXED_ITEMS:
+                    items = None
+        ts = _event_time(event)
+        if ts is not None:
+            start = ts if start is None or ts < start else start
+            end = ts if end is None or ts > end else end
+    return {
+        "events": count,
+        "start": _utc_iso(start) if start else None,
+        "end": _utc_iso(end) if end else None,
+        "types": dict(types),
+        "levels": dict(levels),
+        "statuses": dict(statuses),
+        "errors": types["error"] + statuses["error"],
+        "item_ids": sorted(items) if items is not None else None,
+    }
+
+
+def _read_events(lines: Iterable[str]) -> Iterator[Dict]:
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(event, dict):
+            yield event
+
+
+def _open_text(path: Path):
+    """按后缀打开日志（未压缩、gzip 或 zstd），返回文本流"""
+    name = path.name
+    if name.endswith(".gz"):
+        import gzip
+
+        return gzip.open(path, "rt", encoding="utf-8")
+    if name.endswith(".zst"):
+        import zstandard
+
+        raw = open(path, "rb")
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _open_compressed_writer(path: Path, compression: str):
+    if compression == "zstd":
+        import zstandard
+
+        raw = open(path, "wb")
+        writer = zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(writer, encoding="utf-8")
+    import gzip
+
+    return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+
+
+class LogArchive:
+    """logs_dir 的归档、清理与查询"""
+
+    def __init__(self, logs_dir: Path, policy: Optional[ArchivePolicy] = None):
+        """
+        初始化归档
+
+        Args:
+            logs_dir: 日志目录
+            policy: 归档策略，None 使用默认值
+        """
+        self.logs_dir = Path(logs_dir)
+        self.policy = policy or ArchivePolicy()
+        self.archive_dir = self.logs_dir / ARCHIVE_DIR
+        self.index_path = self.archive_dir / INDEX_FILE
+
+    def raw_logs(self) -> List[Path]:
+        """logs_dir 下未压缩的命令日志，按修改时间从旧到新"""
+        try:
+            entries = [
+                e for e in os.scandir(self.logs_dir)
+                if e.is_file() and _LOG_NAME.match(e.name)
+            ]
+        except FileNotFoundError:
+            return []
+        entries.sort(key=lambda e: (e.stat().st_mtime, e.name))
+        return [Path(e.path) for e in entries]
+
+    def index(self) -> List[Dict]:
+        """
+        读取归档索引（同一文件的重复行取最后一条，忽略文件已被删除的条目）
+
+        Returns:
+            索引条目列表，按开始时间从旧到新
+        """
+        entries: Dict[str, Dict] = {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for entry in _read_events(f):
+                    if "file" in entry:
+                        entries[entry["file"]] = entry
+        except FileNotFoundError:
+            return []
+        alive = [e for e in entries.values() if (self.archive_dir / e["file"]).exists()]
+        alive.sort(key=lambda e: (e.get("start") or "", e["file"]))
+        return alive
+
+    def _write_index(self, entries: List[Dict]) -> None:
+        tmp = self.index_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.index_path)
+
+    def archive_file(self, path: Path) -> Optional[Dict]:
+        """
+        压缩一个日志到归档目录并追加索引，成功后删除原文件
+
+        Args:
+            path: 未压缩的日志文件
+
+        Returns:
+            索引条目；文件已被其他进程归档时返回 None
+        """
+        match = _LOG_NAME.match(path.name)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        target = self.archive_dir / (
+            path.name[: -len(".jsonl")] + _SUFFIXES[self.policy.compression]
+        )
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+
+        def copy_lines(src, dst):
+            for line in src:
+                dst.write(line)
+                yield line
+
+        try:
+            with open(path, "r", encoding="utf-8") as src, _open_compressed_writer(
+                tmp, self.policy.compression
+            ) as dst:
+                summary = summarize(_read_events(copy_lines(src, dst)))
+        except FileNotFoundError:
+            tmp.unlink(missing_ok=True)
+            return None
+        os.replace(tmp, target)
+
+        entry = {
+            "file": target.name,
+            "command": match.group("command") if match else path.stem,
+            "raw_bytes": path.stat().st_size,
+            "bytes": target.stat().st_size,
+            **summary,
+        }
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        path.unlink(missing_ok=True)
+        return entry
+
+    def prune(self, now: Optional[float] = None) -> List[str]:
+        """
+        按年龄与总大小删除旧归档，并重写索引
+
+        Args:
+            now: 当前时间戳（测试用）
+
+        Returns:
+            被删除的归档文件名
+        """
+        now = time.time() if now is None else now
+        entries = self.index()
+        cutoff = now - self.policy.max_age_days * 86400
+        max_total = self.policy.max_total_mb * 1024 * 1024
+        total = sum(e.get("bytes", 0) for e in entries)
+        removed = []
+        kept = []
+        # 从最旧的开始删除
+        for entry in entries:
+            path = self.archive_dir / entry["file"]
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if mtime < cutoff or total > max_total:
+                path.unlink(missing_ok=True)
+                total -= entry.get("bytes", 0)
+                removed.append(entry["file"])
+            else:
+                kept.append(entry)
+        if removed:
+            self._write_index(kept)
+        return removed
+
+    def maintain(self, now: Optional[float] = None) -> Dict:
+        """
+        执行一次归档维护：压缩超出 keep_recent 且已空闲的日志，再清理旧归档
+
+        Args:
+            now: 当前时间戳（测试用）
+
+        Returns:
+            {"archived": [...], "pruned": [...]}
+        """
+        now = time.time() if now is None else now
+        raw = self.raw_logs()
+        archived = []
+        candidates = raw[: max(0, len(raw) - self.policy.keep_recent)]
+        for path in candidates:
+            try:
+                if now - path.stat().st_mtime < ARCHIVE_MIN_IDLE:
+                    continue
+            except FileNotFoundError:
+                continue
+            entry = self.archive_file(path)
+            if entry is not None:
+                archived.append(entry["file"])
+        pruned = self.prune(now) if archived or self.index_path.exists() else []
+        if archived or pruned:
+            EventEmitter.log(
+                "debug", f"Log archive: {len(archived)} compressed, {len(pruned)} pruned"
+            )
+        return {"archived": archived, "pruned": pruned}
+
+    def query(
+        self,
+        types: Optional[List[str]] = None,
+        levels: Optional[List[str]] = None,
+        item: Optional[str] = None,
+        command: Optional[str] = None,
+        since: Optional[datetime.datetime] = None,
+        until: Optional[datetime.datetime] = None,
+        text: Optional[str] = None,
+        limit: Optional[int] = None,
+        exclude: Optional[Path] = None,
+        skip_commands: Iterable[str] = (),
+        stats: Optional[Dict] = None,
+    ) -> Iterator[Dict]:
+        """
+        跨归档与未压缩日志查询事件，按文件时间从旧到新产出
+
+        指定 limit 时从最新的日志往回读，取最近的 limit 个匹配，仍按从旧到新产出。
+
+        Args:
+            types: 事件类型（任一匹配）
+            levels: 日志级别（任一匹配；log 事件取 level 字段，error 事件视为 error）
+            item: item_event 的 id（子串匹配）
+            command: 命令名
+            since: 起始时间（含）
+            until: 结束时间（含）
+            text: 在事件 JSON 中做子串匹配
+            limit: 最多产出的事件数（保留最新的）
+            exclude: 跳过的日志文件（例如当前命令正在写的日志）
+            skip_commands: 跳过这些命令的日志（例如 logs 命令自身的查询结果）
+            stats: 传入字典时写入 files_scanned / files_skipped
+
+        Yields:
+            匹配的事件，附加 "_log" 字段标明来源文件
+        """
+        stats = stats if stats is not None else {}
+        stats.setdefault("files_scanned", 0)
+        stats.setdefault("files_skipped", 0)
+        if limit is not None and limit <= 0:
+            return
+        since_iso = _utc_iso(since) if since else None
+        until_iso = _utc_iso(until) if until else None
+        # 子串预筛只适用于 JSON 中不需要转义的 item id
+        item_prefilter = item is not None and not any(c in item for c in '"\\')
+
+        def index_may_match(entry: Dict) -> bool:
+            if entry.get("command") in skip_commands:
+                return False
+            if command and entry.get("command") != command:
+                return False
+            # 索引中的时间为统一格式的 UTC ISO 字符串，可直接按字典序比较
+            if since_iso and entry.get("end") and entry["end"] < since_iso:
+                return False
+            if until_iso and entry.get("start") and entry["start"] > until_iso:
+                return False
+            if types and not any(entry.get("types", {}).get(t) for t in types):
+                return False
+            if levels and not any(entry.get("levels", {}).get(lv) for lv in levels):
+                return False
+            if item is not None:
+                if not entry.get("types", {}).get("item_event"):
+                    return False
+                ids = entry.get("item_ids")
+                if ids is not None and not any(item in i for i in ids):
+                    return False
+            return True
+
+        sources: List[Path] = []
+        for entry in self.index():
+            if index_may_match(entry):
+                sources.append(self.archive_dir / entry["file"])
+            else:
+                stats["files_skipped"] += 1
+        for path in self.raw_logs():
+            if exclude is not None and path.resolve() == Path(exclude).resolve():
+                continue
+            name = _LOG_NAME.match(path.name).group("command")
+            if name in skip_commands or (command and name != command):
+                stats["files_skipped"] += 1
+                continue
+            sources.append(path)
+
+        def scan(path: Path) -> Iterator[Dict]:
+            stats["files_scanned"] += 1
+            try:
+                stream = _open_text(path)
+            except (FileNotFoundError, ImportError) as e:
+                EventEmitter.log("warn", f"Cannot read log {path.name}: {e}")
+                return
+            with stream:
+                for line in stream:
+                    # 子串预筛：未命中的行不解析 JSON
+                    if text and text not in line:
+                        continue
+                    if item_prefilter and item not in line:
+                        continue
+                    event = next(_read_events([line]), None)
+                    if event is None or not self._matches(
+                        event, types, levels, item, since, until
+                    ):
+                        continue
+                    yield {**event, "_log": path.name}
+
+        if limit is None:
+            for path in sources:
+                yield from scan(path)
+            return
+
+        # 从最新的日志往回读，每个文件只保留最后几个匹配，凑够 limit 即停止
+        chunks: List[List[Dict]] = []
+        remaining = limit
+        for path in reversed(sources):
+            matches = deque(scan(path), maxlen=remaining)
+            if matches:
+                chunks.append(list(matches))
+                remaining -= len(matches)
+                if remaining <= 0:
+                    break
+        for chunk in reversed(chunks):
+            yield from chunk
+
+    @staticmethod
+    def _matches(event, types, levels, item, since, until) -> bool:
+        etype = event.get("type")
+        if types and etype not in types:
+            return False
+        if levels and _event_level(event) not in levels:
+            return False
+        if item is not None and (
+            etype != "item_event" or item not in str(event.get("id", ""))
+        ):
+            return False
+        if since or until:
+            ts = _event_time(event)
+            if ts is None or (since and ts < since) or (until and ts > until):
+                return False
+        return True
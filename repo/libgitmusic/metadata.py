@@ -4,10 +4,19 @@ import re
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional, Iterator
+from typing import List, Dict, Optional, Iterator, Set
 from .events import EventEmitter
 from .exceptions import ValidationError
 from .results import VerifyResult
+from .tracing import add_bytes, traced
+
+# 修改时间距今至少这么多秒的元数据文件才缓存解析结果
+METADATA_CACHE_MIN_AGE = 2.0
+
+
+def _copy_entry(entry: Dict) -> Dict:
+    """复制条目（列表字段一并复制），调用方修改返回值不会影响缓存"""
+    return {k: list(v) if isinstance(v, list) else v for k, v in entry.items()}
 
 
 class ValidationError(ValueError):
@@ -16,6 +25,52 @@ class ValidationError(ValueError):
     pass
 
 
+def parse_metadata_lines(content: str) -> List[Dict]:
+    """
+    解析 metadata.jsonl 文本（如 Git 历史版本），跳过空行与无法解析的行
+
+    Args:
+        content: 文件内容
+
+    Returns:
+        元数据条目列表
+    """
+    entries = []
+    for line in content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return entries
+
+
+def diff_metadata(old_entries: List[Dict], new_entries: List[Dict]) -> Dict[str, Set[str]]:
+    """
+    按 audio_oid 比较两个版本的元数据
+
+    Args:
+        old_entries: 旧版本条目
+        new_entries: 新版本条目
+
+    Returns:
+        {"added": 新增的 OID, "changed": 字段有变化的 OID, "removed": 已删除的 OID}
+    """
+    old_by_oid = {e.get("audio_oid"): e for e in old_entries if e.get("audio_oid")}
+    new_by_oid = {e.get("audio_oid"): e for e in new_entries if e.get("audio_oid")}
+    return {
+        "added": set(new_by_oid) - set(old_by_oid),
+        "changed": {
+            oid
+            for oid, entry in new_by_oid.items()
+            if oid in old_by_oid and old_by_oid[oid] != entry
+        },
+        "removed": set(old_by_oid) - set(new_by_oid),
+    }
+
+
 class MetadataManager:
     """元数据管理模块，负责 metadata.jsonl 的读写、校验及锁机制"""
 
@@ -35,6 +90,8 @@ class MetadataManager:
         self.file_path = context.metadata_file
         self.lock_path = context.metadata_file.with_suffix(".lock")
         self._has_lock = False
+        # load_all 的解析缓存：(文件 stat 签名, 条目列表)
+        self._cache: Optional[tuple] = None
 
     def acquire_lock(self, timeout=10):
         """获取文件锁（兼容 Windows/Linux 的简单实现）"""
@@ -60,18 +117,38 @@ class MetadataManager:
                 os.remove(self.lock_path)
             self._has_lock = False
 
+    @traced("metadata_load")
     def load_all(self) -> List[Dict]:
-        """加载所有元数据条目"""
-        if not self.file_path.exists():
+        """加载所有元数据条目
+
+        文件的 stat 签名（mtime、大小、inode）与上次解析时一致时直接返回缓存的副本，
+        常驻进程中重复加载无需重新解析。修改时间距今不足 METADATA_CACHE_MIN_AGE 秒的
+        文件不缓存（时间戳粒度内的同尺寸改写无法从 stat 区分）。
+        """
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            self._cache = None
             return []
 
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if self._cache is not None and self._cache[0] == key:
+            return [_copy_entry(entry) for entry in self._cache[1]]
+
         entries = []
         with open(self.file_path, "r", encoding="utf-8") as f:
             for line in f:
                 if line.strip():
                     entries.append(json.loads(line))
+        add_bytes(read=st.st_size)
+
+        if time.time_ns() - st.st_mtime_ns >= METADATA_CACHE_MIN_AGE * 1e9:
+            self._cache = (key, entries)
+            return [_copy_entry(entry) for entry in entries]
+        self._cache = None
         return entries
 
+    @traced("metadata_save")
     def save_all(self, entries: List[Dict]):
         """保存所有元数据条目（原子写入）"""
         # 检查重复 audio_oid
@@ -101,6 +178,7 @@ class MetadataManager:
                 # 保持统一的字段顺序
                 ordered_entry = self._order_fields(entry)
                 f.write(json.dumps(ordered_entry, ensure_ascii=False) + "\n")
+        add_bytes(written=temp_path.stat().st_size)
         os.replace(temp_path, self.file_path)
 
     def _order_fields(self, entry: Dict) -> Dict:
@@ -0,0 +1,352 @@
+"""
+运行指标（Prometheus 文本格式）
+
+MetricsRegistry 收集计数器、仪表与直方图，输出 Prometheus 文本格式（0.0.4），
+可以写成 node_exporter textfile collector 读取的 .prom 文件，或由本地 HTTP 端点
+（GET /metrics）提供。不依赖 prometheus_client。
+
+EventMetrics 作为 EventEmitter 监听器，从事件流推导指标（result 事件的 spans 是整个命令的
+累计汇总，同一命令的多个 result 只计入增量，command_finished 后重新开始）：
+
+    gitmusic_items_total{command,status}        item_event 次数
+    gitmusic_errors_total{command}              error 事件次数
+    gitmusic_results_total{command,status}      result 事件次数
+    gitmusic_span_calls_total{span}             result 中 spans 汇总的调用次数
+                                                （hash_audio_frames 即哈希的对象数）
+    gitmusic_span_seconds_total{span}           span 墙钟时间
+    gitmusic_span_bytes_total{span,direction}   span 读写字节数（transport_upload 即上传量）
+    gitmusic_command_duration_seconds{command}  命令耗时直方图（CLI 在命令结束时记录）
+
+发布队列（QueueDaemon）另外记录队列深度、构建次数与耗时、排队延迟，见 release_queue.py。
+"""
+
+import bisect
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 默认直方图桶（秒）：覆盖单文件操作到整库发布
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    """带标签的指标基类"""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(名称后缀, 标签串, 值) 列表"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class _ScalarMetric(_Metric):
+    """每组标签对应一个数值的指标（计数器与仪表）"""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("", _format_labels(self.labelnames, k), v) for k, v in items]
+
+
+class Counter(_ScalarMetric):
+    """单调递增计数器"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_ScalarMetric):
+    """可增可减的瞬时值"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """累积桶直方图"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各桶计数（非累积）, 总和, 次数]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                labels = _format_labels(
+                    self.labelnames + ("le",), key + (_format_value(bound),)
+                )
+                samples.append(("_bucket", labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """指标注册表：按名称取得或创建指标，并输出文本格式"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, labelnames, **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered with a different type")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get(Counter, name, help, tuple(labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help, tuple(labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get(Histogram, name, help, tuple(labelnames), buckets=buckets)
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return "".join(m.render() + "\n" for m in metrics)
+
+    def write_textfile(self, path: Path) -> None:
+        """
+        原子地写出 textfile collector 文件（同目录临时文件 + 改名，采集时不会读到半个文件）
+
+        Args:
+            path: 目标文件，node_exporter 只读取 .prom 后缀
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve_http(self, port: int, host: str = "127.0.0.1"):
+        """
+        在后台线程提供 GET /metrics
+
+        Args:
+            port: 端口，0 表示自动分配
+            host: 监听地址，默认只监听本机
+
+        Returns:
+            HTTP 服务器对象（server_address 为实际地址，shutdown() 停止）
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 采集请求不写入标准错误
+                pass
+
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name="metrics-http", daemon=True
+        ).start()
+        return server
+
+
+class EventMetrics:
+    """EventEmitter 监听器：从事件流更新指标"""
+
+    def __init__(self, registry: MetricsRegistry):
+        """
+        初始化并注册事件指标
+
+        Args:
+            registry: 指标注册表
+        """
+        self.registry = registry
+        # 当前命令名（CLI 的事件 cmd 字段都是脚本名，由调用方设置真实命令名）
+        self.command: Optional[str] = None
+        self.items = registry.counter(
+            "gitmusic_items_total", "Item events by command and status", ("command", "status")
+        )
+        self.errors = registry.counter(
+            "gitmusic_errors_total", "Error events by command", ("command",)
+        )
+        self.results = registry.counter(
+            "gitmusic_results_total", "Result events by command and status", ("command", "status")
+        )
+        self.span_calls = registry.counter(
+            "gitmusic_span_calls_total", "Traced span invocations", ("span",)
+        )
+        self.span_seconds = registry.counter(
+            "gitmusic_span_seconds_total", "Wall-clock seconds spent in traced spans", ("span",)
+        )
+        self.span_bytes = registry.counter(
+            "gitmusic_span_bytes_total", "Bytes read or written inside traced spans", ("span", "direction")
+        )
+        self.durations = registry.histogram(
+            "gitmusic_command_duration_seconds", "Command wall-clock duration", ("command",)
+        )
+        # 本命令已计入的 span 累计值：span 路径 -> 各字段
+        self._spans_seen: Dict[str, Dict[str, float]] = {}
+
+    def _command(self, event: Dict) -> str:
+        return self.command or str(event.get("cmd") or "unknown")
+
+    def __call__(self, event: Dict) -> None:
+        etype = event.get("type")
+        if etype == "item_event":
+            self.items.inc(command=self._command(event), status=str(event.get("status", "")))
+        elif etype == "error":
+            self.errors.inc(command=self._command(event))
+        elif etype == "result":
+            self.results.inc(command=self._command(event), status=str(event.get("status", "")))
+            self._record_spans(event.get("spans") or {})
+
+    def _record_spans(self, spans: Dict) -> None:
+        fields = ("count", "wall_sec", "bytes_read", "bytes_written")
+        for path, stats in spans.items():
+            if not isinstance(stats, dict):
+                continue
+            # 累计汇总：只计入自上一个 result 以来的增量
+            seen = self._spans_seen.setdefault(path, dict.fromkeys(fields, 0))
+            delta = {}
+            for key in fields:
+                current = stats.get(key, 0) or 0
+                delta[key] = max(0, current - seen[key])
+                seen[key] = max(seen[key], current)
+            # 路径为 阶段/外层/名称，按名称汇总（埋点名称是固定集合）
+            name = path.rsplit("/", 1)[-1]
+            self.span_calls.inc(delta["count"], span=name)
+            self.span_seconds.inc(delta["wall_sec"], span=name)
+            self.span_bytes.inc(delta["bytes_read"], span=name, direction="read")
+            self.span_bytes.inc(delta["bytes_written"], span=name, direction="written")
+
+    def command_finished(self, command: str, seconds: float) -> None:
+        """记录一次命令的耗时；之后的 result 属于新命令，span 累计值重新开始"""
+        self.durations.observe(seconds, command=command)
+        self._spans_seen = {}
+
+
+def register_observer(registry: Optional[MetricsRegistry] = None) -> EventMetrics:
+    """
+    创建 EventMetrics 并注册为 EventEmitter 监听器
+
+    Args:
+        registry: 指标注册表，None 时新建
+
+    Returns:
+        EventMetrics 实例（registry 属性为所用注册表）
+    """
+    from .events import EventEmitter
+
+    observer = EventMetrics(registry or MetricsRegistry())
+    EventEmitter.register_listener(observer)
+    return observer
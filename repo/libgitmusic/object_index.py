@@ -0,0 +1,237 @@
+"""
+对象存在性索引（ObjectIndex）
+
+在内存中维护一组 32 字节 sha256 摘要，用于替代逐个 Path.exists() 的 stat 调用。
+
+结构：
+    - 基础集合：所有摘要按字节序拼接成一个 bytes，二分查找，O(log n)，
+      每个对象只占 32 字节，适合数十万对象的缓存
+    - 增量集合：build 之后新增的摘要（store_* 写入时同步），普通 set
+    - 删除集合：build 之后被删除的摘要
+    - 可选 Bloom 过滤器：绝大多数“不存在”的查询可以 O(1) 直接返回
+
+摘要本身是均匀分布的哈希值，Bloom 过滤器的 k 个位置直接取自摘要的不同片段，
+无需再次哈希。
+"""
+
+import bisect
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Set
+
+from .packfile import oid_to_digest
+
+_DIGEST_SIZE = 32
+
+
+class _DigestArray:
+    """把拼接的摘要 blob 包装成可供 bisect 使用的只读序列"""
+
+    __slots__ = ("_blob", "_count")
+
+    def __init__(self, blob: bytes):
+        self._blob = blob
+        self._count = len(blob) // _DIGEST_SIZE
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> bytes:
+        start = i * _DIGEST_SIZE
+        return self._blob[start : start + _DIGEST_SIZE]
+
+
+class BloomFilter:
+    """针对均匀分布摘要的 Bloom 过滤器"""
+
+    def __init__(self, capacity: int, bits_per_item: int = 10, hashes: int = 6):
+        """
+        初始化过滤器
+
+        Args:
+            capacity: 预期元素数量
+            bits_per_item: 每个元素分配的位数（10 位约 1% 误判率）
+            hashes: 位置数量 k，最大 8（摘要最多切出 8 个 32 位片段）
+        """
+        self.num_bits = max(64, capacity * bits_per_item)
+        self.hashes = min(hashes, _DIGEST_SIZE // 4)
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, digest: bytes) -> Iterator[int]:
+        for i in range(self.hashes):
+            chunk = int.from_bytes(digest[i * 4 : i * 4 + 4], "big")
+            yield chunk % self.num_bits
+
+    def add(self, digest: bytes) -> None:
+        for pos in self._positions(digest):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest: bytes) -> bool:
+        for pos in self._positions(digest):
+            if not self._bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class ObjectIndex:
+    """对象存在性索引：排序摘要数组 + 增量集合 + 可选 Bloom 过滤器"""
+
+    def __init__(self, digests: Iterable[bytes] = (), bloom: bool = True):
+        """
+        构建索引
+
+        Args:
+            digests: 初始摘要集合（32 字节 bytes，可重复、无序）
+            bloom: 是否构建 Bloom 过滤器
+        """
+        unique = sorted(set(digests))
+        self._base = _DigestArray(b"".join(unique))
+        self._added: Set[bytes] = set()
+        self._removed: Set[bytes] = set()
+        self._bloom: Optional[BloomFilter] = None
+        if bloom:
+            # 预留增量空间，避免 add 较多时误判率上升过快
+            self._bloom = BloomFilter(capacity=len(unique) + 1024)
+            for digest in unique:
+                self._bloom.add(digest)
+
+    @classmethod
+    def from_oids(cls, oids: Iterable[str], bloom: bool = True) -> "ObjectIndex":
+        """
+        从 oid 列表构建索引（如元数据引用或远端清单）
+
+        Args:
+            oids: oid 列表（sha256:hex、hex 或带 .jpg 后缀）
+            bloom: 是否构建 Bloom 过滤器
+
+        Returns:
+            ObjectIndex 实例，无法解析的 oid 会被忽略
+        """
+
+        def _digests():
+            for oid in oids:
+                if not oid:
+                    continue
+                try:
+                    digest = oid_to_digest(oid)
+                except ValueError:
+                    continue
+                if len(digest) == _DIGEST_SIZE:
+                    yield digest
+
+        return cls(_digests(), bloom=bloom)
+
+    @classmethod
+    def from_directory(
+        cls, root: Path, suffix: str, bloom: bool = True, depth: int = 1
+    ) -> "ObjectIndex":
+        """
+        通过一次目录扫描构建索引（root/<分片>/.../<hex><suffix>）
+
+        Args:
+            root: 分片目录的上级目录，例如 objects/sha256
+            suffix: 文件后缀，例如 ".mp3"
+            bloom: 是否构建 Bloom 过滤器
+            depth: 分片层数（见 ShardLayout）
+
+        Returns:
+            ObjectIndex 实例
+        """
+        return cls(_scan_digests(Path(root), suffix, depth), bloom=bloom)
+
+    def _in_base(self, digest: bytes) -> bool:
+        i = bisect.bisect_left(self._base, digest)
+        return i < len(self._base) and self._base[i] == digest
+
+    def __contains__(self, digest: bytes) -> bool:
+        if digest in self._added:
+            return True
+        if self._bloom is not None and digest not in self._bloom:
+            return False
+        if digest in self._removed:
+            return False
+        return self._in_base(digest)
+
+    def contains_oid(self, oid: str) -> bool:
+        """按 oid 检查对象是否存在"""
+        try:
+            return oid_to_digest(oid) in self
+        except ValueError:
+            return False
+
+    def add(self, digest: bytes) -> None:
+        """记录新写入的对象"""
+        self._removed.discard(digest)
+        if not self._in_base(digest):
+            self._added.add(digest)
+            if self._bloom is not None:
+                self._bloom.add(digest)
+
+    def discard(self, digest: bytes) -> None:
+        """记录被删除的对象（Bloom 过滤器不支持删除，由删除集合屏蔽）"""
+        self._added.discard(digest)
+        if self._in_base(digest):
+            self._removed.add(digest)
+
+    def __len__(self) -> int:
+        return len(self._base) - len(self._removed) + len(self._added)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for i in range(len(self._base)):
+            digest = self._base[i]
+            if digest not in self._removed:
+                yield digest
+        yield from self._added
+
+
+def _scan_digests(root: Path, suffix: str, depth: int = 1) -> Iterator[bytes]:
+    """用 os.scandir 遍历分片目录，产出摘要（每个目录一次 readdir，无逐文件 stat）"""
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if depth > 0:
+            if entry.is_dir():
+                yield from _scan_digests(Path(entry.path), suffix, depth - 1)
+            continue
+        name = entry.name
+        if not name.endswith(suffix):
+            continue
+        try:
+            digest = bytes.fromhex(name[: -len(suffix)])
+        except ValueError:
+            continue
+        if len(digest) == _DIGEST_SIZE:
+            yield digest
+
+
+def directory_fingerprint(root: Path, depth: int = 1) -> tuple:
+    """
+    分片目录树的修改指纹：根目录与各级分片目录的 mtime（不列出对象文件）
+
+    对象写入或删除会改变其所在分片目录的 mtime，新建分片目录会改变上级目录的 mtime，
+    因此指纹不变即可认为基于同一目录构建的索引仍然有效。
+
+    Args:
+        root: 分片目录的上级目录，例如 objects/sha256
+        depth: 分片层数（见 ShardLayout）
+
+    Returns:
+        可比较的指纹元组
+    """
+    return tuple(_dir_mtimes(str(root), depth))
+
+
+def _dir_mtimes(root: str, depth: int) -> Iterator[tuple]:
+    try:
+        st = os.stat(root)
+    except FileNotFoundError:
+        yield (root, None)
+        return
+    yield (root, st.st_mtime_ns)
+    if depth <= 0:
+        return
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if entry.is_dir():
+            yield from _dir_mtimes(entry.path, depth - 1)
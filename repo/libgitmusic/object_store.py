@@ -1,15 +1,26 @@
 import hashlib
+import os
 import shutil
+import time
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Set
 from .events import EventEmitter
-from .results import StoreResult
+from .results import StoreResult, Result
 from .exceptions import IOError
+from .packfile import PackStore, PackWriter, oid_to_digest
+from .object_index import ObjectIndex, directory_fingerprint
+from .layout import ShardLayout
 
 
 class ObjectStore:
     """对象存储管理器，负责音频和封面对象的存储、检索和校验"""
 
+    # 预计查询次数达到该值时，ensure_index 才会构建内存索引
+    INDEX_MIN_LOOKUPS = 64
+    # 目录最近修改距今不足该秒数时，索引不在常驻进程的请求之间复用
+    # （时间戳粒度内的再次修改无法从 mtime 区分）
+    INDEX_REUSE_MIN_AGE = 2.0
+
     def __init__(self, context: "Context"):
         """
         初始化对象存储
@@ -26,11 +37,24 @@ class ObjectStore:
         self.cache_root = context.cache_root
         self.objects_dir = context.cache_root / "objects"
         self.covers_dir = context.cache_root / "covers"
+        self.cover_pack_dir = self.covers_dir / "pack"
 
         # 确保目录存在
         self.objects_dir.mkdir(parents=True, exist_ok=True)
         self.covers_dir.mkdir(parents=True, exist_ok=True)
 
+        # 分片布局（layout.json > 配置 > 历史默认）
+        self.layout = ShardLayout.load(self.cache_root, context.config)
+
+        # 封面pack集合（可选，未执行过repack时为空）
+        self.cover_packs = PackStore(self.cover_pack_dir)
+
+        # 内存存在性索引（可选，build_index 后生效）
+        self._audio_index: Optional[ObjectIndex] = None
+        self._cover_index: Optional[ObjectIndex] = None
+        # 构建索引时的目录指纹（由清单构建的索引为 None，无法校验）
+        self._index_fingerprint: Optional[tuple] = None
+
     def _get_object_path(self, oid: str) -> Path:
         """根据对象ID获取存储路径"""
         # oid格式: "sha256:hexdigest"，提取hexdigest部分
@@ -39,16 +63,37 @@ class ObjectStore:
         else:
             hexdigest = oid
 
+        return self._path_in_layout(hexdigest, self.layout)
+
+    def _path_in_layout(self, hexdigest: str, layout: ShardLayout) -> Path:
+        """按指定布局计算对象路径（hexdigest 可带 .jpg 后缀）"""
         # 根据文件类型确定目录
         if hexdigest.endswith(".jpg"):
             # 封面文件可能在covers目录，但oid不包含.jpg
             hexdigest = hexdigest[:-4]
-            # 实际存储结构: covers/sha256/前两个字符/完整哈希.jpg
-            return self.covers_dir / "sha256" / hexdigest[:2] / f"{hexdigest}.jpg"
+            # 实际存储结构: covers/sha256/<分片>/完整哈希.jpg
+            return layout.object_path(self.covers_dir / "sha256", hexdigest, ".jpg")
         else:
             # 音频文件或其他对象
-            # 实际存储结构: objects/sha256/前两个字符/完整哈希.mp3
-            return self.objects_dir / "sha256" / hexdigest[:2] / f"{hexdigest}.mp3"
+            # 实际存储结构: objects/sha256/<分片>/完整哈希.mp3
+            return layout.object_path(self.objects_dir / "sha256", hexdigest, ".mp3")
+
+    def _locate(self, oid: str) -> Optional[Path]:
+        """
+        查找松散对象的实际位置
+
+        迁移期间（或其他进程仍持有旧布局时）对象可能仍位于历史布局，
+        当前布局下找不到时回退检查历史布局。
+        """
+        path = self._get_object_path(oid)
+        if path.exists():
+            return path
+        if not self.layout.is_legacy:
+            hexdigest = oid[7:] if oid.startswith("sha256:") else oid
+            legacy_path = self._path_in_layout(hexdigest, ShardLayout.legacy())
+            if legacy_path.exists():
+                return legacy_path
+        return None
 
     def store_audio(self, temp_path: Path, compute_hash: bool = True) -> StoreResult:
         """
@@ -73,7 +118,7 @@ class ObjectStore:
 
             target_path = self._get_object_path(oid)
 
-            if target_path.exists():
+            if self._audio_exists(oid, target_path):
                 EventEmitter.log("debug", f"Audio object already exists: {oid}")
                 return StoreResult(
                     success=True,
@@ -87,6 +132,8 @@ class ObjectStore:
             with open(temp_path, "rb") as f:
                 AudioIO.atomic_write(f.read(), target_path)
 
+            if self._audio_index is not None:
+                self._audio_index.add(oid_to_digest(oid))
             EventEmitter.item_event(oid, "stored", "audio")
             return StoreResult(
                 success=True,
@@ -125,7 +172,8 @@ class ObjectStore:
 
             target_path = self._get_object_path(oid + ".jpg")
 
-            if target_path.exists():
+            # 新写入总是落为松散对象，已打包的对象无需重复写入
+            if self._cover_exists(oid, target_path):
                 EventEmitter.log("debug", f"Cover object already exists: {oid}")
                 return StoreResult(
                     success=True,
@@ -138,6 +186,8 @@ class ObjectStore:
 
             AudioIO.atomic_write(cover_data, target_path)
 
+            if self._cover_index is not None:
+                self._cover_index.add(oid_to_digest(oid))
             EventEmitter.item_event(oid, "stored", "cover")
             return StoreResult(
                 success=True,
@@ -155,21 +205,449 @@ class ObjectStore:
                 error=IOError(str(e))
             )
 
+    def build_index(
+        self,
+        audio_oids: Optional[list] = None,
+        cover_oids: Optional[list] = None,
+        bloom: bool = True,
+    ) -> Tuple[int, int]:
+        """
+        构建内存存在性索引，之后的 exists/get_*_path 不再逐个 stat
+
+        索引是构建时刻的快照，之后由 store_* 和 repack 同步维护；
+        其他途径（外部进程、transport 下载、直接写入）产生的变化由
+        refresh_index 按目录指纹发现并丢弃索引。
+
+        Args:
+            audio_oids: 已知的音频对象清单（如远端列表），None 表示扫描本地目录
+            cover_oids: 已知的封面对象清单，None 表示扫描本地目录和pack
+            bloom: 是否构建 Bloom 过滤器
+
+        Returns:
+            (音频对象数, 封面对象数)
+        """
+        # 先取指纹再扫描：扫描期间发生的写入会使之后的 refresh_index 丢弃索引
+        fingerprint = None
+        if audio_oids is None and cover_oids is None:
+            fingerprint = self.inventory_fingerprint()
+            newest = max(
+                (mtime for part in fingerprint for _, mtime in part if mtime),
+                default=0,
+            )
+            if time.time_ns() - newest < self.INDEX_REUSE_MIN_AGE * 1e9:
+                fingerprint = None
+        self._index_fingerprint = fingerprint
+        if audio_oids is not None:
+            self._audio_index = ObjectIndex.from_oids(audio_oids, bloom=bloom)
+        else:
+            self._audio_index = ObjectIndex.from_directory(
+                self.objects_dir / "sha256",
+                ".mp3",
+                bloom=bloom,
+                depth=self.layout.depth,
+            )
+
+        if cover_oids is not None:
+            self._cover_index = ObjectIndex.from_oids(cover_oids, bloom=bloom)
+        else:
+            loose = ObjectIndex.from_directory(
+                self.covers_dir / "sha256",
+                ".jpg",
+                bloom=False,
+                depth=self.layout.depth,
+            )
+            self._cover_index = ObjectIndex(
+                list(loose) + list(self.cover_packs.iter_digests()), bloom=bloom
+            )
+
+        EventEmitter.log(
+            "debug",
+            f"Object index built: {len(self._audio_index)} audio, "
+            f"{len(self._cover_index)} covers",
+        )
+        return len(self._audio_index), len(self._cover_index)
+
+    def ensure_index(self, lookups: int) -> bool:
+        """
+        预计查询次数较多时构建索引（一次目录扫描替代逐个 stat）；
+        已有索引时先按目录指纹校验，对象目录变化过则重建
+
+        Args:
+            lookups: 预计的存在性查询次数
+
+        Returns:
+            索引是否可用
+        """
+        if self.refresh_index():
+            return True
+        if lookups < self.INDEX_MIN_LOOKUPS:
+            return False
+        self.build_index()
+        return True
+
+    def drop_index(self) -> None:
+        """丢弃内存索引，恢复逐个 stat 检查"""
+        self._audio_index = None
+        self._cover_index = None
+        self._index_fingerprint = None
+
+    def inventory_fingerprint(self) -> tuple:
+        """对象目录与封面 pack 目录的修改指纹（只 stat 目录，不列出对象文件）"""
+        depth = self.layout.depth
+        return (
+            directory_fingerprint(self.objects_dir / "sha256", depth),
+            directory_fingerprint(self.covers_dir / "sha256", depth),
+            directory_fingerprint(self.cover_pack_dir, 0),
+        )
+
+    def refresh_index(self) -> bool:
+        """
+        校验索引：目录自索引构建以来未变化则保留索引，否则丢弃
+        （包括本进程自己写入后，保守地在下次需要时重建）。
+        每个命令开始时以及 ensure_index 复用索引前调用
+
+        Returns:
+            索引是否保留
+        """
+        if not self.has_index:
+            return False
+        if (
+            self._index_fingerprint is None
+            or self._index_fingerprint != self.inventory_fingerprint()
+        ):
+            self.drop_index()
+            return False
+        self.cover_packs.reload()
+        return True
+
+    @property
+    def has_index(self) -> bool:
+        return self._audio_index is not None and self._cover_index is not None
+
+    def _audio_exists(self, oid: str, path: Path) -> bool:
+        if self._audio_index is not None:
+            return self._audio_index.contains_oid(oid)
+        return path.exists() or self._locate(oid) is not None
+
+    def _cover_exists(self, oid: str, path: Path) -> bool:
+        if self._cover_index is not None:
+            return self._cover_index.contains_oid(oid)
+        return (
+            path.exists()
+            or self.cover_packs.contains(oid)
+            or self._locate(oid + ".jpg") is not None
+        )
+
     def get_audio_path(self, oid: str) -> Optional[Path]:
         """获取音频对象文件路径，如果不存在则返回None"""
-        path = self._get_object_path(oid)
-        return path if path.exists() else None
+        if self._audio_index is not None:
+            if not self._audio_index.contains_oid(oid):
+                return None
+            return self._get_object_path(oid)
+        return self._locate(oid)
 
     def get_cover_path(self, oid: str) -> Optional[Path]:
-        """获取封面对象文件路径，如果不存在则返回None"""
+        """获取封面对象文件路径，如果不存在则返回None
+
+        打包的封面没有独立文件，同样返回 None；读取内容应使用 read_cover/open_cover。
+        """
         # 使用_get_object_path，传入带.jpg后缀的oid以匹配存储结构
         path = self._get_object_path(oid + ".jpg")
-        return path if path.exists() else None
+        if self._cover_index is not None:
+            if not self._cover_index.contains_oid(oid):
+                return None
+            if not self.cover_packs.contains(oid):
+                return path
+        return self._locate(oid + ".jpg")
+
+    def open_cover(self, oid: str):
+        """
+        零拷贝读取封面内容
+
+        Returns:
+            打包对象返回指向 mmap 的 memoryview，松散对象返回 bytes，不存在返回 None
+        """
+        path = self._get_object_path(oid + ".jpg")
+        if self._cover_index is not None and not self._cover_index.contains_oid(oid):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        packed = self.cover_packs.read(oid)
+        if packed is not None:
+            return packed
+        located = self._locate(oid + ".jpg")
+        return located.read_bytes() if located is not None else None
+
+    def read_cover(self, oid: str) -> Optional[bytes]:
+        """读取封面内容（bytes），不存在返回None"""
+        data = self.open_cover(oid)
+        if data is None:
+            return None
+        return data if isinstance(data, bytes) else bytes(data)
+
+    def cover_size(self, oid: str) -> Optional[int]:
+        """获取封面对象大小（字节），不存在返回None"""
+        path = self._get_object_path(oid + ".jpg")
+        if self._cover_index is not None and not self._cover_index.contains_oid(oid):
+            return None
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            pass
+        size = self.cover_packs.size(oid)
+        if size is None:
+            located = self._locate(oid + ".jpg")
+            if located is not None:
+                size = located.stat().st_size
+        return size
 
     def exists(self, oid: str) -> bool:
         """检查对象是否存在"""
         path = self._get_object_path(oid)
-        return path.exists()
+        if oid.endswith(".jpg"):
+            return self._cover_exists(oid[:-4], path)
+        return self._audio_exists(oid, path)
+
+    def iter_loose_covers(self):
+        """遍历松散封面文件"""
+        return (self.covers_dir / "sha256").glob(self.layout.glob_pattern(".jpg"))
+
+    def repack_covers(
+        self, keep: Optional[Set[str]] = None, dry_run: bool = False
+    ) -> Result:
+        """
+        将松散封面和已有pack合并为单个新pack
+
+        Args:
+            keep: 需要保留的封面哈希集合（hexdigest）；None 表示全部保留
+            dry_run: 仅统计，不写入
+
+        Returns:
+            Result: data 中包含 loose、packed、dropped、pack 等统计
+        """
+        loose_files = []
+        for cover_file in self.iter_loose_covers():
+            if cover_file.is_file():
+                loose_files.append(cover_file)
+
+        packed_count = sum(reader.count for reader in self.cover_packs.readers)
+        stats = {
+            "loose": len(loose_files),
+            "packed": packed_count,
+            "packs_before": len(self.cover_packs.readers),
+            "dropped": 0,
+            "corrupted": 0,
+            "pack": None,
+        }
+
+        if not loose_files and (keep is None and len(self.cover_packs.readers) <= 1):
+            return Result(True, "Nothing to repack", data=stats)
+
+        if dry_run:
+            return Result(True, f"Would repack {len(loose_files)} loose covers", data=stats)
+
+        EventEmitter.phase_start("repack", total_items=len(loose_files) + packed_count)
+        writer = PackWriter(self.cover_pack_dir)
+        processed = 0
+        packed_loose = []
+        dropped = []
+        try:
+            # 已有pack中的对象（已在写入时校验过）
+            for reader in self.cover_packs.readers:
+                for digest, offset, length in reader.iter_entries():
+                    if keep is not None and digest.hex() not in keep:
+                        stats["dropped"] += 1
+                        dropped.append(digest)
+                    else:
+                        writer.add(digest, reader.read_at(offset, length))
+                    processed += 1
+                    EventEmitter.batch_progress(
+                        "repack", processed, len(loose_files) + packed_count
+                    )
+
+            # 松散对象：打包前校验哈希，损坏的对象保持原样不打包
+            for cover_file in loose_files:
+                hexdigest = cover_file.stem
+                processed += 1
+                if keep is not None and hexdigest not in keep:
+                    stats["dropped"] += 1
+                    dropped.append(bytes.fromhex(hexdigest))
+                    packed_loose.append(cover_file)
+                    continue
+                data = cover_file.read_bytes()
+                if hashlib.sha256(data).hexdigest() != hexdigest:
+                    stats["corrupted"] += 1
+                    EventEmitter.error(
+                        f"Hash mismatch for cover {cover_file.name}, not packed",
+                        {"path": str(cover_file)},
+                    )
+                    continue
+                writer.add(bytes.fromhex(hexdigest), data)
+                packed_loose.append(cover_file)
+                EventEmitter.batch_progress(
+                    "repack", processed, len(loose_files) + packed_count
+                )
+
+            result = writer.finish()
+        except Exception as e:
+            writer.abort()
+            EventEmitter.error(f"Failed to repack covers: {str(e)}")
+            return Result(False, str(e), data=stats, error=IOError(str(e)))
+
+        # 新pack已落盘，移除旧pack和已打包的松散对象
+        new_files = set(result) if result else set()
+        old_files = [p for p in self.cover_packs.pack_files() if p not in new_files]
+        self.cover_packs.close()
+        for old in sorted(old_files, key=lambda p: p.suffix != ".idx"):
+            # 先删除idx，使读者不再看到即将删除的pack
+            try:
+                old.unlink()
+            except FileNotFoundError:
+                pass
+        for cover_file in packed_loose:
+            try:
+                cover_file.unlink()
+            except FileNotFoundError:
+                pass
+        self._prune_empty_dirs(self.covers_dir / "sha256")
+        self.cover_packs.reload()
+        if self._cover_index is not None:
+            for digest in dropped:
+                self._cover_index.discard(digest)
+
+        if result:
+            stats["pack"] = result[0].name
+            EventEmitter.item_event(result[0].name, "packed", f"{len(writer)} covers")
+        return Result(
+            True,
+            f"Packed {len(writer)} covers into {stats['pack'] or 'no pack'}",
+            data=stats,
+        )
+
+    @staticmethod
+    def _prune_empty_dirs(root: Path) -> None:
+        """删除空的分片目录"""
+        if not root.exists():
+            return
+        for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+            if Path(dirpath) == root or filenames:
+                continue
+            # 自底向上处理，子目录刚被删除时 dirnames 仍非空，交给 rmdir 判断
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+    def reshard(self, new_layout: ShardLayout, dry_run: bool = False) -> Result:
+        """
+        在线迁移分片布局
+
+        三个阶段，任意时刻对象都至少在当前生效的布局中可见：
+            1. 为每个对象在新布局下创建硬链接（不支持硬链接时复制）
+            2. 原子地写入 layout.json，切换生效布局
+            3. 补链迁移期间新写入旧布局的对象，然后删除旧路径
+
+        Args:
+            new_layout: 目标布局
+            dry_run: 仅统计需要迁移的对象数
+
+        Returns:
+            Result: data 中包含 linked、copied、removed、objects 等统计
+        """
+        old_layout = self.layout
+        stats = {
+            "from": old_layout.to_dict(),
+            "to": new_layout.to_dict(),
+            "objects": 0,
+            "linked": 0,
+            "copied": 0,
+            "removed": 0,
+        }
+        if new_layout == old_layout:
+            return Result(True, "Layout unchanged", data=stats)
+
+        roots = [
+            (self.objects_dir / "sha256", ".mp3"),
+            (self.covers_dir / "sha256", ".jpg"),
+        ]
+
+        def old_objects():
+            for root, suffix in roots:
+                for path in root.glob(old_layout.glob_pattern(suffix)):
+                    hexdigest = path.stem
+                    # 新旧布局的 glob 可能重叠，只处理确实位于旧布局位置的对象
+                    if path != old_layout.object_path(root, hexdigest, suffix):
+                        continue
+                    yield path, new_layout.object_path(root, hexdigest, suffix)
+
+        def link(src: Path, dst: Path) -> None:
+            if dst.exists():
+                return
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(src, dst)
+                stats["linked"] += 1
+            except OSError:
+                from .audio import AudioIO
+
+                AudioIO.atomic_write(src.read_bytes(), dst)
+                stats["copied"] += 1
+
+        pending = list(old_objects())
+        stats["objects"] = len(pending)
+        if dry_run:
+            return Result(True, f"Would reshard {len(pending)} objects", data=stats)
+
+        # 阶段1：创建新布局链接
+        EventEmitter.phase_start("reshard_link", total_items=len(pending))
+        for i, (src, dst) in enumerate(pending):
+            try:
+                link(src, dst)
+            except Exception as e:
+                EventEmitter.error(
+                    f"Failed to link object: {str(e)}", {"path": str(src)}
+                )
+                return Result(False, str(e), data=stats, error=IOError(str(e)))
+            EventEmitter.batch_progress("reshard_link", i + 1, len(pending))
+
+        # 阶段2：切换布局
+        new_layout.save(self.cache_root)
+        self.layout = new_layout
+        EventEmitter.log(
+            "info",
+            f"Switched object layout to depth={new_layout.depth}, "
+            f"width={new_layout.width}",
+        )
+
+        # 阶段3：补链并删除旧路径
+        stragglers = list(old_objects())
+        EventEmitter.phase_start("reshard_unlink", total_items=len(stragglers))
+        for i, (src, dst) in enumerate(stragglers):
+            try:
+                link(src, dst)
+                src.unlink()
+                stats["removed"] += 1
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                EventEmitter.error(
+                    f"Failed to remove old object path: {str(e)}",
+                    {"path": str(src)},
+                )
+            EventEmitter.batch_progress("reshard_unlink", i + 1, len(stragglers))
+
+        for root, _ in roots:
+            self._prune_empty_dirs(root)
+
+        return Result(
+            True,
+            f"Resharded {stats['objects']} objects "
+            f"(depth={new_layout.depth}, width={new_layout.width})",
+            data=stats,
+        )
 
     def copy_to_workdir(
         self,
@@ -193,11 +671,8 @@ class ObjectStore:
 
         cover_data = None
         if cover_oid:
-            cover_path = self.get_cover_path(cover_oid)
-            if cover_path:
-                with open(cover_path, "rb") as f:
-                    cover_data = f.read()
-            else:
+            cover_data = self.read_cover(cover_oid)
+            if cover_data is None:
                 EventEmitter.log("warn", f"Cover object not found: {cover_oid}")
 
         from .audio import AudioIO
@@ -217,7 +692,9 @@ class ObjectStore:
         total = 0
 
         # 检查objects目录下的sha256子目录及其两级子目录
-        for obj_file in self.objects_dir.glob("sha256/*/*.mp3"):
+        for obj_file in (self.objects_dir / "sha256").glob(
+            self.layout.glob_pattern(".mp3")
+        ):
             if obj_file.is_file():
                 total += 1
                 expected_hash = obj_file.stem  # 去掉.mp3扩展名
@@ -232,7 +709,9 @@ class ObjectStore:
                     )
 
         # 检查covers目录下的sha256子目录及其两级子目录
-        for cover_file in self.covers_dir.glob("sha256/*/*.jpg"):
+        for cover_file in (self.covers_dir / "sha256").glob(
+            self.layout.glob_pattern(".jpg")
+        ):
             if cover_file.is_file():
                 total += 1
                 expected_hash = cover_file.stem  # 去掉.jpg扩展名
@@ -246,4 +725,21 @@ class ObjectStore:
                         {"expected": expected_hash, "actual": actual_hash},
                     )
 
+        # 检查pack中的封面（直接在mmap上计算哈希）
+        for reader in self.cover_packs.readers:
+            for digest, offset, length in reader.iter_entries():
+                total += 1
+                expected_hash = digest.hex()
+                actual_hash = hashlib.sha256(
+                    reader.read_at(offset, length)
+                ).hexdigest()
+                if actual_hash != expected_hash:
+                    errors.append(
+                        f"Cover hash mismatch: {expected_hash} in {reader.pack_path.name}"
+                    )
+                    EventEmitter.error(
+                        f"Hash mismatch for packed cover {expected_hash}",
+                        {"expected": expected_hash, "actual": actual_hash},
+                    )
+
         return total, len(errors), errors
@@ -0,0 +1,389 @@
+"""
+封面对象打包存储（Packfile）
+
+参考 Git pack 的设计，将大量小体积封面对象合并为只追加的 pack 文件，
+并配套一个按 oid 排序的 idx 索引文件（oid -> offset, length）。
+
+文件格式（均为大端序）：
+
+    pack-<checksum>.pack
+        header   : b"GMPK" + u32 version + u32 count
+        objects  : 原始对象字节依次拼接
+        trailer  : 32 字节，header+objects 的 SHA256
+
+    pack-<checksum>.idx
+        header   : b"GMIX" + u32 version + u32 count
+        fanout   : 256 个 u32，fanout[i] 为首字节 <= i 的对象累计数
+        entries  : count 个 (32 字节 digest, u64 offset, u64 length)，按 digest 排序
+        trailer  : 32 字节，对应 pack 文件的 checksum
+
+读取通过 mmap 完成，返回的 memoryview 直接引用映射内存，不产生额外拷贝。
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .events import EventEmitter
+
+PACK_MAGIC = b"GMPK"
+IDX_MAGIC = b"GMIX"
+PACK_VERSION = 1
+
+_HEADER = struct.Struct(">4sII")
+_FANOUT = struct.Struct(">256I")
+_ENTRY = struct.Struct(">32sQQ")
+
+
+def oid_to_digest(oid: str) -> bytes:
+    """将 oid（sha256:hex 或 hex）转换为 32 字节摘要"""
+    if oid.startswith("sha256:"):
+        oid = oid[7:]
+    if oid.endswith(".jpg"):
+        oid = oid[:-4]
+    return bytes.fromhex(oid)
+
+
+def read_idx_digests(idx_path: Path) -> List[bytes]:
+    """
+    读取 idx 文件中的全部对象摘要（不需要对应的 pack，用于比较远端 pack 的内容）
+
+    Args:
+        idx_path: idx 文件路径
+
+    Returns:
+        按摘要排序的 32 字节摘要列表
+
+    Raises:
+        ValueError: 不是有效的 idx 文件
+    """
+    data = Path(idx_path).read_bytes()
+    if len(data) < _HEADER.size + _FANOUT.size:
+        raise ValueError(f"Invalid pack index: {idx_path}")
+    magic, version, count = _HEADER.unpack_from(data, 0)
+    entries_offset = _HEADER.size + _FANOUT.size
+    if (
+        magic != IDX_MAGIC
+        or version != PACK_VERSION
+        or len(data) < entries_offset + count * _ENTRY.size
+    ):
+        raise ValueError(f"Invalid pack index: {idx_path}")
+    return [
+        _ENTRY.unpack_from(data, entries_offset + i * _ENTRY.size)[0]
+        for i in range(count)
+    ]
+
+
+class PackWriter:
+    """pack 写入器：收集对象后一次性写出 pack 与 idx"""
+
+    def __init__(self, pack_dir: Path):
+        """
+        初始化写入器
+
+        Args:
+            pack_dir: pack 文件所在目录
+        """
+        self.pack_dir = Path(pack_dir)
+        self.pack_dir.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.pack_dir / f"tmp-{os.getpid()}-{id(self)}.pack"
+        self._file = open(self._tmp_path, "wb")
+        self._entries: Dict[bytes, Tuple[int, int]] = {}
+        # 先写占位头，count 在 finish 时回填
+        self._write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0))
+        self._offset = _HEADER.size
+
+    def _write(self, data) -> None:
+        self._file.write(data)
+
+    def add(self, digest: bytes, data) -> bool:
+        """
+        追加一个对象
+
+        Args:
+            digest: 32 字节对象摘要
+            data: 对象内容（bytes 或 memoryview）
+
+        Returns:
+            是否实际写入（重复对象会被忽略）
+        """
+        if digest in self._entries:
+            return False
+        length = len(data)
+        self._write(data)
+        self._entries[digest] = (self._offset, length)
+        self._offset += length
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def finish(self) -> Optional[Tuple[Path, Path]]:
+        """
+        完成写入：回填头部、写入校验和，并原子地发布 pack 与 idx
+
+        Returns:
+            (pack 路径, idx 路径)，若没有任何对象则返回 None
+        """
+        count = len(self._entries)
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, count))
+        self._file.close()
+
+        if count == 0:
+            self._tmp_path.unlink()
+            return None
+
+        # 重新计算整个文件的校验和（头部已回填）
+        hasher = hashlib.sha256()
+        with open(self._tmp_path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                hasher.update(chunk)
+        checksum = hasher.digest()
+        with open(self._tmp_path, "ab") as f:
+            f.write(checksum)
+            f.flush()
+            os.fsync(f.fileno())
+
+        name = f"pack-{checksum.hex()}"
+        pack_path = self.pack_dir / f"{name}.pack"
+        idx_path = self.pack_dir / f"{name}.idx"
+
+        # 构建 idx
+        sorted_digests = sorted(self._entries)
+        fanout = [0] * 256
+        for digest in sorted_digests:
+            fanout[digest[0]] += 1
+        running = 0
+        for i in range(256):
+            running += fanout[i]
+            fanout[i] = running
+
+        idx_tmp = self.pack_dir / f"{name}.idx.tmp"
+        with open(idx_tmp, "wb") as f:
+            f.write(_HEADER.pack(IDX_MAGIC, PACK_VERSION, count))
+            f.write(_FANOUT.pack(*fanout))
+            for digest in sorted_digests:
+                offset, length = self._entries[digest]
+                f.write(_ENTRY.pack(digest, offset, length))
+            f.write(checksum)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # 先发布 pack 再发布 idx：读者只认带 idx 的 pack
+        os.replace(self._tmp_path, pack_path)
+        os.replace(idx_tmp, idx_path)
+        return pack_path, idx_path
+
+    def abort(self) -> None:
+        """放弃写入并删除临时文件"""
+        try:
+            self._file.close()
+        except Exception:
+            pass
+        if self._tmp_path.exists():
+            self._tmp_path.unlink()
+
+
+class PackReader:
+    """单个 pack（及其 idx）的只读访问器"""
+
+    def __init__(self, idx_path: Path):
+        """
+        打开 pack 与 idx
+
+        Args:
+            idx_path: idx 文件路径，pack 文件需位于同一目录且同名
+        """
+        self.idx_path = Path(idx_path)
+        self.pack_path = self.idx_path.with_suffix(".pack")
+        self._idx_file = open(self.idx_path, "rb")
+        self._pack_file = open(self.pack_path, "rb")
+        try:
+            self._idx = mmap.mmap(self._idx_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._pack = mmap.mmap(
+                self._pack_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        except Exception:
+            self._idx_file.close()
+            self._pack_file.close()
+            raise
+
+        magic, version, count = _HEADER.unpack_from(self._idx, 0)
+        if magic != IDX_MAGIC or version != PACK_VERSION:
+            self.close()
+            raise ValueError(f"Invalid pack index: {self.idx_path}")
+        pack_magic, _, pack_count = _HEADER.unpack_from(self._pack, 0)
+        if pack_magic != PACK_MAGIC or pack_count != count:
+            self.close()
+            raise ValueError(f"Pack does not match index: {self.pack_path}")
+
+        self.count = count
+        self._fanout = _FANOUT.unpack_from(self._idx, _HEADER.size)
+        self._entries_offset = _HEADER.size + _FANOUT.size
+        self._view = memoryview(self._pack)
+
+    def _entry(self, i: int) -> Tuple[bytes, int, int]:
+        return _ENTRY.unpack_from(self._idx, self._entries_offset + i * _ENTRY.size)
+
+    def _digest_at(self, i: int) -> bytes:
+        start = self._entries_offset + i * _ENTRY.size
+        return self._idx[start : start + 32]
+
+    def lookup(self, digest: bytes) -> Optional[Tuple[int, int]]:
+        """
+        二分查找对象
+
+        Args:
+            digest: 32 字节对象摘要
+
+        Returns:
+            (offset, length) 或 None
+        """
+        first = digest[0]
+        lo = self._fanout[first - 1] if first > 0 else 0
+        hi = self._fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self._digest_at(mid)
+            if current < digest:
+                lo = mid + 1
+            elif current > digest:
+                hi = mid
+            else:
+                _, offset, length = self._entry(mid)
+                return offset, length
+        return None
+
+    def __contains__(self, digest: bytes) -> bool:
+        return self.lookup(digest) is not None
+
+    def read(self, digest: bytes) -> Optional[memoryview]:
+        """零拷贝读取对象内容，返回指向 mmap 的 memoryview"""
+        location = self.lookup(digest)
+        if location is None:
+            return None
+        offset, length = location
+        return self._view[offset : offset + length]
+
+    def read_at(self, offset: int, length: int) -> memoryview:
+        """按 idx 中记录的位置零拷贝读取"""
+        return self._view[offset : offset + length]
+
+    def iter_entries(self) -> Iterator[Tuple[bytes, int, int]]:
+        """按 digest 顺序遍历 (digest, offset, length)"""
+        for i in range(self.count):
+            yield self._entry(i)
+
+    def close(self) -> None:
+        """释放映射和文件句柄"""
+        try:
+            if hasattr(self, "_view"):
+                self._view.release()
+            self._pack.close()
+            self._idx.close()
+        except Exception:
+            pass
+        self._pack_file.close()
+        self._idx_file.close()
+
+
+class PackStore:
+    """某个目录下所有 pack 的集合视图"""
+
+    def __init__(self, pack_dir: Path):
+        """
+        初始化 pack 集合
+
+        Args:
+            pack_dir: pack 文件所在目录（不存在时视为空集合）
+        """
+        self.pack_dir = Path(pack_dir)
+        self._readers: List[PackReader] = []
+        self._loaded_names: set = set()
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> None:
+        """重新扫描目录，加载新出现的 pack，卸载已被删除的 pack"""
+        with self._lock:
+            if not self.pack_dir.exists():
+                current = set()
+            else:
+                current = {
+                    p.name
+                    for p in self.pack_dir.glob("pack-*.idx")
+                    if p.with_suffix(".pack").exists()
+                }
+
+            kept = []
+            for reader in self._readers:
+                if reader.idx_path.name in current:
+                    kept.append(reader)
+                else:
+                    reader.close()
+            self._readers = kept
+            self._loaded_names = {r.idx_path.name for r in kept}
+
+            for name in sorted(current - self._loaded_names):
+                try:
+                    self._readers.append(PackReader(self.pack_dir / name))
+                    self._loaded_names.add(name)
+                except Exception as e:
+                    EventEmitter.log("warn", f"Failed to open pack {name}: {str(e)}")
+
+    @property
+    def readers(self) -> List[PackReader]:
+        return list(self._readers)
+
+    def lookup(self, oid: str) -> Optional[Tuple[PackReader, int, int]]:
+        """查找对象所在的 pack 及位置"""
+        digest = oid_to_digest(oid)
+        for reader in self._readers:
+            location = reader.lookup(digest)
+            if location is not None:
+                return reader, location[0], location[1]
+        return None
+
+    def contains(self, oid: str) -> bool:
+        """检查对象是否存在于任何 pack 中"""
+        return self.lookup(oid) is not None
+
+    def read(self, oid: str) -> Optional[memoryview]:
+        """零拷贝读取对象，返回 memoryview；不存在返回 None"""
+        digest = oid_to_digest(oid)
+        for reader in self._readers:
+            data = reader.read(digest)
+            if data is not None:
+                return data
+        return None
+
+    def size(self, oid: str) -> Optional[int]:
+        """返回打包对象的字节数"""
+        found = self.lookup(oid)
+        return found[2] if found else None
+
+    def iter_digests(self) -> Iterator[bytes]:
+        """遍历所有打包对象的摘要（可能包含跨 pack 的重复）"""
+        for reader in self._readers:
+            for digest, _, _ in reader.iter_entries():
+                yield digest
+
+    def pack_files(self) -> List[Path]:
+        """返回当前所有 pack 与 idx 文件路径"""
+        files = []
+        for reader in self._readers:
+            files.extend([reader.pack_path, reader.idx_path])
+        return files
+
+    def close(self) -> None:
+        """关闭所有 pack"""
+        with self._lock:
+            for reader in self._readers:
+                reader.close()
+            self._readers = []
+            self._loaded_names = set()
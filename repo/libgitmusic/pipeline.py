@@ -0,0 +1,181 @@
+"""
+流式管道（Pipeline）
+
+把逐项处理拆成若干阶段，每个阶段在自己的工作线程中运行，阶段之间用有界队列连接：
+
+    source ──q0──> stage 1 ──q1──> stage 2 ──q2──> 调用方迭代
+
+    - 流式：上游产出一项，下游即可开始处理，不等待整个阶段完成
+    - 背压：队列满时上游阻塞，内存中滞留的项数不超过各队列容量之和
+    - 重叠：阶段并发运行，总耗时趋近最慢的阶段，而不是各阶段之和
+    - 错误：任一阶段（或 source）抛出异常时取消整条管道，原始异常在调用方的迭代中重新抛出
+
+阶段函数处理的是 ffmpeg 子进程、文件读写等释放 GIL 的工作，因此使用线程。
+每个阶段 workers=1 时输出保持输入顺序；workers>1 时不保序。
+"""
+
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+# 阶段之间队列的默认容量
+DEFAULT_QUEUE_SIZE = 4
+# 阻塞的 put/get 检查取消标志的间隔（秒）
+_POLL_INTERVAL = 0.1
+
+# 队列结束标记
+_END = object()
+
+
+@dataclass
+class Stage:
+    """
+    管道阶段
+
+    Attributes:
+        name: 阶段名（用于线程名与错误信息）
+        func: 处理函数，接收一项返回一项；返回 None 表示丢弃该项
+        workers: 工作线程数（大于 1 时不保序）
+        queue_size: 本阶段输出队列的容量
+    """
+
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: int = DEFAULT_QUEUE_SIZE
+
+
+class _Run:
+    """一次管道运行的共享状态"""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        # 第一个失败的异常（其余线程随后因取消而退出）
+        self.failure: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def fail(self, error: BaseException) -> None:
+        with self._lock:
+            if self.failure is None:
+                self.failure = error
+        self.cancelled.set()
+
+    def put(self, q: queue.Queue, item: Any) -> bool:
+        """放入队列（满时阻塞），管道已取消时返回 False"""
+        while not self.cancelled.is_set():
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, q: queue.Queue) -> Any:
+        """取出一项（空时阻塞），管道已取消时返回 _END"""
+        while not self.cancelled.is_set():
+            try:
+                return q.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _END
+
+
+def _feed(run: _Run, source: Iterable, out: queue.Queue) -> None:
+    try:
+        for item in source:
+            if not run.put(out, item):
+                return
+    except BaseException as e:
+        run.fail(e)
+        return
+    run.put(out, _END)
+
+
+def _work(
+    run: _Run,
+    stage: Stage,
+    inp: queue.Queue,
+    out: queue.Queue,
+    remaining: List[int],
+    lock: threading.Lock,
+) -> None:
+    while True:
+        item = run.get(inp)
+        if item is _END:
+            break
+        try:
+            result = stage.func(item)
+        except BaseException as e:
+            run.fail(e)
+            return
+        if result is not None and not run.put(out, result):
+            return
+    if run.cancelled.is_set():
+        return
+    # 把结束标记还给同阶段的其他线程；最后一个退出的线程向下游传递结束标记
+    run.put(inp, _END)
+    with lock:
+        remaining[0] -= 1
+        last = remaining[0] == 0
+    if last:
+        run.put(out, _END)
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: List[Stage],
+    source_queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> Iterator[Any]:
+    """
+    并发运行管道，按完成顺序产出最后一个阶段的结果
+
+    调用方提前结束迭代（break、异常、close）时管道被取消，工作线程在当前项处理完后退出。
+
+    Args:
+        source: 输入项的可迭代对象（在独立线程中迭代，可以是生成器）
+        stages: 阶段列表，按顺序连接
+        source_queue_size: source 输出队列的容量
+
+    Returns:
+        结果迭代器
+
+    Raises:
+        任一阶段或 source 抛出的第一个异常
+    """
+    run = _Run()
+    queues = [queue.Queue(maxsize=max(1, source_queue_size))]
+    threads = [
+        threading.Thread(
+            target=_feed, args=(run, source, queues[0]), name="pipeline-source", daemon=True
+        )
+    ]
+    for stage in stages:
+        out = queue.Queue(maxsize=max(1, stage.queue_size))
+        workers = max(1, stage.workers)
+        remaining, lock = [workers], threading.Lock()
+        for i in range(workers):
+            threads.append(
+                threading.Thread(
+                    target=_work,
+                    args=(run, stage, queues[-1], out, remaining, lock),
+                    name=f"pipeline-{stage.name}-{i}",
+                    daemon=True,
+                )
+            )
+        queues.append(out)
+
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            item = run.get(queues[-1])
+            if item is _END:
+                break
+            yield item
+    finally:
+        run.cancelled.set()
+        for thread in threads:
+            thread.join()
+    if run.failure is not None:
+        raise run.failure
@@ -0,0 +1,233 @@
+"""
+命令级性能剖析（cli.py --profile）
+
+CommandProfiler 在 cProfile 下运行一个命令，可选地用 tracemalloc 统计内存分配、
+记录外部进程（ffmpeg / ssh / scp 等）的次数与耗时，结束时在日志目录写出：
+
+- <命令>-<时间戳>.prof：pstats 格式，可用 snakeviz 或 python -m pstats 查看
+- <命令>-<时间戳>.profile.txt：按累计时间排序的函数、内存分配热点与外部进程统计
+
+cProfile 只剖析调用命令的线程；线程池 / 进程池中的调用只体现为等待时间，
+外部进程统计覆盖所有线程，但不含进程池子进程启动的进程。
+"""
+
+import cProfile
+import datetime
+import io
+import os
+import pstats
+import subprocess
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class SubprocessRecorder:
+    """统计外部进程的启动次数与运行时长（按程序名聚合）
+
+    启动期间替换 subprocess.Popen 的 __init__ / wait / poll，停止时恢复；
+    进程在 wait() 或 poll() 观察到退出时计时，从未等待的进程不计入。
+    """
+
+    def __init__(self):
+        # 程序名 -> [次数, 总秒数, 最长秒数]
+        self.stats: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._originals = None
+
+    def start(self):
+        """开始记录"""
+        if self._originals is not None:
+            return
+        recorder = self
+        popen = subprocess.Popen
+        orig_init, orig_wait, orig_poll = popen.__init__, popen.wait, popen.poll
+
+        def __init__(process, *args, **kwargs):
+            process._gitmusic_started = time.perf_counter()
+            orig_init(process, *args, **kwargs)
+
+        def wait(process, *args, **kwargs):
+            returncode = orig_wait(process, *args, **kwargs)
+            recorder._finish(process)
+            return returncode
+
+        def poll(process):
+            returncode = orig_poll(process)
+            if returncode is not None:
+                recorder._finish(process)
+            return returncode
+
+        self._originals = (orig_init, orig_wait, orig_poll)
+        popen.__init__, popen.wait, popen.poll = __init__, wait, poll
+
+    def stop(self):
+        """停止记录并恢复 subprocess.Popen"""
+        if self._originals is None:
+            return
+        popen = subprocess.Popen
+        popen.__init__, popen.wait, popen.poll = self._originals
+        self._originals = None
+
+    def _finish(self, process):
+        started = process.__dict__.pop("_gitmusic_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        args = process.args
+        if isinstance(args, (str, bytes)):
+            program = os.fsdecode(args).split()[0] if args.strip() else ""
+        else:
+            program = os.fsdecode(args[0]) if args else ""
+        name = Path(program).name or "unknown"
+        with self._lock:
+            stats = self.stats.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+    def summary(self) -> List[Dict]:
+        """
+        Returns:
+            [{program, count, total_sec, max_sec}, ...]，按总耗时降序
+        """
+        with self._lock:
+            items = sorted(self.stats.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            {
+                "program": name,
+                "count": count,
+                "total_sec": round(total, 3),
+                "max_sec": round(longest, 3),
+            }
+            for name, (count, total, longest) in items
+        ]
+
+
+class CommandProfiler:
+    """在 cProfile 下运行命令的上下文管理器，退出时写出剖析报告"""
+
+    def __init__(
+        self,
+        logs_dir: Path,
+        command_name: str,
+        memory: bool = False,
+        subprocesses: bool = False,
+        top: int = 20,
+    ):
+        """
+        初始化剖析器
+
+        Args:
+            logs_dir: 报告输出目录
+            command_name: 命令名，用于报告文件名
+            memory: 是否用 tracemalloc 统计内存分配
+            subprocesses: 是否记录外部进程次数与耗时
+            top: 摘要中保留的条目数
+        """
+        self.logs_dir = Path(logs_dir)
+        self.command_name = command_name
+        self.memory = memory
+        self.top = top
+        self.recorder = SubprocessRecorder() if subprocesses else None
+        self.profile = cProfile.Profile()
+        self.prof_path: Optional[Path] = None
+        self.report_path: Optional[Path] = None
+        # 结束后填充：functions / allocations / peak_memory / subprocesses / elapsed_sec
+        self.summary: Dict = {}
+        self._owns_tracemalloc = False
+        self._started = 0.0
+
+    def __enter__(self) -> "CommandProfiler":
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        if self.recorder is not None:
+            self.recorder.start()
+        self._started = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profile.disable()
+        elapsed = time.perf_counter() - self._started
+        if self.recorder is not None:
+            self.recorder.stop()
+        snapshot = None
+        peak = None
+        if self.memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+        self._write_reports(elapsed, snapshot, peak)
+        return False
+
+    def _write_reports(self, elapsed: float, snapshot, peak: Optional[int]):
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
+        base = self.logs_dir / f"{self.command_name}-{timestamp}"
+        self.prof_path = base.with_suffix(".prof")
+        self.report_path = base.with_suffix(".profile.txt")
+        self.profile.dump_stats(str(self.prof_path))
+
+        stats = pstats.Stats(self.profile)
+        functions = []
+        for (filename, line, func), (_, calls, tottime, cumtime, _) in sorted(
+            stats.stats.items(), key=lambda item: item[1][3], reverse=True
+        )[: self.top]:
+            functions.append(
+                {
+                    "function": f"{Path(filename).name}:{line}({func})",
+                    "calls": calls,
+                    "tottime": round(tottime, 4),
+                    "cumtime": round(cumtime, 4),
+                }
+            )
+
+        allocations = []
+        if snapshot is not None:
+            snapshot = snapshot.filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),)
+            )
+            for stat in snapshot.statistics("lineno")[: self.top]:
+                frame = stat.traceback[0]
+                allocations.append(
+                    {
+                        "location": f"{frame.filename}:{frame.lineno}",
+                        "size": stat.size,
+                        "count": stat.count,
+                    }
+                )
+
+        self.summary = {
+            "elapsed_sec": round(elapsed, 3),
+            "functions": functions,
+            "allocations": allocations,
+            "peak_memory": peak,
+            "subprocesses": self.recorder.summary() if self.recorder else [],
+        }
+
+        text = io.StringIO()
+        text.write(f"command: {self.command_name}\nelapsed: {elapsed:.3f}s\n\n")
+        pstats.Stats(self.profile, stream=text).sort_stats("cumulative").print_stats(
+            self.top
+        )
+        if snapshot is not None:
+            text.write(f"Top allocations (peak {peak} bytes):\n")
+            for item in allocations:
+                text.write(
+                    f"  {item['size']:>12} B {item['count']:>8} blocks  {item['location']}\n"
+                )
+            text.write("\n")
+        if self.recorder is not None:
+            text.write("Subprocesses:\n")
+            for item in self.summary["subprocesses"]:
+                text.write(
+                    f"  {item['program']:<16} count={item['count']:<6} "
+                    f"total={item['total_sec']:.3f}s max={item['max_sec']:.3f}s\n"
+                )
+        self.report_path.write_text(text.getvalue(), encoding="utf-8")
@@ -0,0 +1,199 @@
+"""
+发布清单（ReleaseManifest）
+
+记录 release_dir 中每个发布文件的生成信息，持久化为 release_dir/.release-manifest.json：
+
+    {
+        "version": 1,
+        "entries": {
+            "<文件名>": {
+                "audio_oid": "sha256:...",
+                "metadata_hash": "sha256:...",
+                "size": 1234,
+                "mtime_ns": 1700000000000000000
+            }
+        }
+    }
+
+增量发布时先用 stat 的 (size, mtime_ns) 与清单比对，一致即直接采用记录的
+metadata_hash，只有不一致（文件被外部修改或清单缺失）时才回退到读取 ID3 标签。
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .events import EventEmitter
+
+MANIFEST_FILE = ".release-manifest.json"
+MANIFEST_VERSION = 1
+
+
+class ReleaseManifest:
+    """发布清单：文件名 -> (audio_oid, metadata_hash, size, mtime_ns)"""
+
+    def __init__(self, release_dir: Path, track_changes: bool = False):
+        """
+        初始化并加载清单
+
+        Args:
+            release_dir: 发布目录
+            track_changes: 是否记录变更日志（见 drain_changes）
+        """
+        self.release_dir = Path(release_dir)
+        self.path = self.release_dir / MANIFEST_FILE
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        # 自上次 drain_changes 以来的变更，用于把子进程中的记录合并回父进程
+        self._track_changes = track_changes
+        self._changes: List[Tuple[str, Optional[Dict]]] = []
+        self.load()
+
+    def load(self) -> None:
+        """从磁盘加载清单，文件不存在或损坏时视为空清单"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            EventEmitter.log("warn", f"Ignoring unreadable release manifest: {str(e)}")
+            return
+
+        if data.get("version") != MANIFEST_VERSION:
+            EventEmitter.log("warn", "Ignoring release manifest with unknown version")
+            return
+        entries = data.get("entries")
+        if isinstance(entries, dict):
+            self._entries = entries
+
+    def save(self) -> None:
+        """原子地写回清单（无变化时跳过）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {"version": MANIFEST_VERSION, "entries": self._entries}
+            self.release_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def get(self, filename: str) -> Optional[Dict]:
+        """返回文件的清单记录"""
+        return self._entries.get(filename)
+
+    def cached_hash(self, filename: str, st: os.stat_result) -> Optional[str]:
+        """
+        stat 与清单记录一致时返回记录的元数据哈希
+
+        Args:
+            filename: 发布文件名
+            st: 文件当前的 stat 结果
+
+        Returns:
+            元数据哈希，记录缺失或 stat 不一致时返回 None
+        """
+        record = self._entries.get(filename)
+        if (
+            record
+            and record.get("size") == st.st_size
+            and record.get("mtime_ns") == st.st_mtime_ns
+        ):
+            return record.get("metadata_hash")
+        return None
+
+    def record(
+        self,
+        filename: str,
+        metadata_hash: Optional[str],
+        audio_oid: Optional[str] = None,
+        st: Optional[os.stat_result] = None,
+    ) -> None:
+        """
+        记录（或刷新）一个发布文件
+
+        Args:
+            filename: 发布文件名
+            metadata_hash: 嵌入的元数据哈希
+            audio_oid: 音频对象 ID（从标签回读时未知）
+            st: 文件 stat 结果，缺省时重新 stat
+        """
+        if st is None:
+            st = os.stat(self.release_dir / filename)
+        record = {
+            "audio_oid": audio_oid,
+            "metadata_hash": metadata_hash,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+        }
+        with self._lock:
+            self._entries[filename] = record
+            if self._track_changes:
+                self._changes.append((filename, record))
+            self._dirty = True
+
+    def remove(self, filename: str) -> None:
+        """删除文件记录"""
+        with self._lock:
+            if self._entries.pop(filename, None) is not None:
+                if self._track_changes:
+                    self._changes.append((filename, None))
+                self._dirty = True
+
+    def rename(self, old: str, new: str) -> None:
+        """文件改名后迁移记录（rename 保留 size 与 mtime）"""
+        with self._lock:
+            record = self._entries.pop(old, None)
+            if record is None:
+                return
+            self._entries[new] = record
+            if self._track_changes:
+                self._changes.extend([(old, None), (new, record)])
+            self._dirty = True
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        """返回 (文件名, 记录) 列表的快照"""
+        with self._lock:
+            return list(self._entries.items())
+
+    def retain(self, filenames: Iterable[str]) -> None:
+        """只保留给定文件名的记录，用于清除已不存在的文件"""
+        keep = set(filenames)
+        with self._lock:
+            stale = [name for name in self._entries if name not in keep]
+            for name in stale:
+                del self._entries[name]
+            if stale:
+                self._dirty = True
+
+    def drain_changes(self) -> List[Tuple[str, Optional[Dict]]]:
+        """
+        取出并清空变更日志
+
+        Returns:
+            [(文件名, 记录或 None 表示删除), ...]
+        """
+        with self._lock:
+            changes, self._changes = self._changes, []
+        return changes
+
+    def apply_changes(self, changes: Iterable[Tuple[str, Optional[Dict]]]) -> None:
+        """合并 drain_changes 返回的变更"""
+        with self._lock:
+            for filename, record in changes:
+                if record is None:
+                    self._entries.pop(filename, None)
+                else:
+                    self._entries[filename] = record
+                self._dirty = True
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
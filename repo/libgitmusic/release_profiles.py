@@ -0,0 +1,247 @@
+"""
+发布配置（ReleaseProfile）
+
+一次 release 可以同时生成多套成品库布局，在 config.yaml 中声明：
+
+    release:
+      profiles:
+        default: {}                     # 平铺布局 "艺术家 - 标题.mp3"，写入 release_dir
+        albums:
+          dir: albums                   # 输出目录，相对路径基于 release_dir
+          path: "{first_artist}/{album}/{artist} - {title}.mp3"
+          tags: [title, artists, album, date]
+          cover_size: 600               # 封面最大宽度，0 表示不嵌入封面
+        mobile:
+          transcode: {codec: opus, bitrate: 96k}  # 转码，见 transcode.py
+
+未配置 release.profiles 时只有 default 一个配置，与单一布局的行为一致。
+
+路径模板可用字段：artist（多个艺术家以 ", " 连接）、first_artist、title、album、
+date、year、oid（audio_oid 前 12 位）。模板按 "/" 切分为目录层级，每一级单独清理非法字符。
+"""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .audio import AudioIO
+from .transcode import TranscodeSpec
+
+DEFAULT_PROFILE = "default"
+
+# 可嵌入的元数据字段（METADATA_HASH 总是写入，用于增量判断）
+TAG_FIELDS = ("title", "artists", "album", "date", "uslt")
+
+_TEMPLATE_SAMPLE = {
+    "audio_oid": "sha256:" + "0" * 64,
+    "title": "Title",
+    "artists": ["Artist"],
+    "album": "Album",
+    "date": "2000-01-01",
+}
+
+
+def flat_filename(metadata: Dict) -> str:
+    """
+    平铺布局文件名：艺术家 - 标题.mp3
+
+    Args:
+        metadata: 元数据字典
+
+    Returns:
+        安全的文件名
+    """
+    artists = metadata.get("artists", ["Unknown"])
+    if isinstance(artists, list):
+        artist_str = ", ".join(artists)
+    else:
+        artist_str = str(artists)
+
+    title = metadata.get("title", "Unknown")
+
+    if artist_str and artist_str != "Unknown":
+        filename = f"{artist_str} - {title}.mp3"
+    else:
+        filename = f"{title}.mp3"
+
+    return AudioIO.sanitize_filename(filename)
+
+
+def _template_fields(metadata: Dict) -> Dict[str, str]:
+    artists = metadata.get("artists") or ["Unknown"]
+    if not isinstance(artists, list):
+        artists = [str(artists)]
+    date = metadata.get("date") or ""
+    audio_oid = metadata.get("audio_oid") or ""
+    return {
+        "artist": ", ".join(artists),
+        "first_artist": artists[0],
+        "title": metadata.get("title") or "Unknown",
+        "album": metadata.get("album") or "Unknown Album",
+        "date": date or "Unknown",
+        "year": date[:4] or "Unknown",
+        "oid": audio_oid.replace("sha256:", "")[:12],
+    }
+
+
+@dataclass(frozen=True)
+class ReleaseProfile:
+    """一套成品库布局"""
+
+    name: str
+    release_dir: Path
+    # 路径模板，None 表示平铺布局
+    path: Optional[str] = None
+    # 嵌入的元数据字段，None 表示全部
+    tags: Optional[Tuple[str, ...]] = None
+    # 封面最大宽度，None 表示原图，0 表示不嵌入封面
+    cover_size: Optional[int] = None
+    # 转码参数，None 表示直接使用缓存中的 MP3
+    transcode: Optional[TranscodeSpec] = None
+
+    @classmethod
+    def default(cls, release_dir: Path) -> "ReleaseProfile":
+        """平铺布局、完整标签的默认配置"""
+        return cls(DEFAULT_PROFILE, Path(release_dir))
+
+    @property
+    def extension(self) -> str:
+        """发布文件扩展名"""
+        return self.transcode.extension if self.transcode is not None else ".mp3"
+
+    @property
+    def nested(self) -> bool:
+        """文件是否可能位于子目录中"""
+        return self.path is not None and "/" in self.path.strip("/")
+
+    def filename(self, metadata: Dict) -> str:
+        """
+        根据模板生成相对于 release_dir 的文件路径（使用 / 分隔）
+
+        Args:
+            metadata: 元数据字典
+
+        Returns:
+            相对路径
+        """
+        if self.path is None:
+            return self._with_extension(flat_filename(metadata))
+
+        fields = _template_fields(metadata)
+        parts = []
+        for component in self.path.strip("/").split("/"):
+            value = AudioIO.sanitize_filename(component.format_map(fields)).strip()
+            # 避免产生 "." / ".." 或隐藏目录
+            parts.append(value.lstrip(".") or "_")
+        return self._with_extension("/".join(parts))
+
+    def _with_extension(self, relative: str) -> str:
+        if relative.lower().endswith(".mp3"):
+            relative = relative[:-4]
+        return relative + self.extension
+
+    def tag_metadata(self, metadata: Dict) -> Dict:
+        """按配置裁剪要嵌入标签的元数据"""
+        if self.tags is None:
+            return dict(metadata)
+        return {
+            k: v for k, v in metadata.items() if k not in TAG_FIELDS or k in self.tags
+        }
+
+    def signature(self) -> Dict:
+        """影响文件内容的配置项（参与增量哈希，修改后文件会重新生成）"""
+        signature = {
+            "tags": list(self.tags) if self.tags is not None else None,
+            "cover_size": self.cover_size,
+        }
+        if self.transcode is not None:
+            signature["transcode"] = self.transcode.to_dict()
+        return signature
+
+    @property
+    def is_plain(self) -> bool:
+        """是否为完整标签、原图封面且不转码（文件内容与默认布局一致）"""
+        return self.tags is None and self.cover_size is None and self.transcode is None
+
+
+def load_release_profiles(config: Optional[Dict], release_dir: Path) -> List[ReleaseProfile]:
+    """
+    从配置 release.profiles 加载发布配置
+
+    Args:
+        config: 完整配置字典
+        release_dir: 默认发布目录，相对路径的 dir 基于此目录
+
+    Returns:
+        ReleaseProfile 列表（至少一个）
+
+    Raises:
+        ValueError: 配置无效（未知字段、模板错误、目录冲突）
+    """
+    release_dir = Path(release_dir)
+    release_config = (config or {}).get("release", {}) or {}
+    profiles_config = release_config.get("profiles")
+    if not profiles_config:
+        return [ReleaseProfile.default(release_dir)]
+    if not isinstance(profiles_config, dict):
+        raise ValueError("release.profiles must be a mapping")
+
+    profiles = []
+    for name, options in profiles_config.items():
+        options = options or {}
+        default_dir = "." if name == DEFAULT_PROFILE else name
+        profile_dir = Path(os.path.expanduser(str(options.get("dir", default_dir))))
+        if not profile_dir.is_absolute():
+            profile_dir = release_dir / profile_dir
+
+        tags = options.get("tags")
+        if tags is not None:
+            unknown = set(tags) - set(TAG_FIELDS)
+            if unknown:
+                raise ValueError(
+                    f"Profile {name}: unknown tag fields {sorted(unknown)}"
+                )
+            tags = tuple(tags)
+
+        cover_size = options.get("cover_size")
+        transcode = options.get("transcode")
+        try:
+            transcode = TranscodeSpec.from_config(transcode) if transcode else None
+        except ValueError as e:
+            raise ValueError(f"Profile {name}: {e}")
+        profile = ReleaseProfile(
+            name=str(name),
+            release_dir=profile_dir.resolve(),
+            path=options.get("path"),
+            tags=tags,
+            cover_size=int(cover_size) if cover_size is not None else None,
+            transcode=transcode,
+        )
+        try:
+            profile.filename(_TEMPLATE_SAMPLE)
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError(f"Profile {name}: invalid path template: {e}")
+        profiles.append(profile)
+
+    # 每个配置使用独立目录：清单与清理逻辑都以目录为单位
+    seen: Dict[Path, str] = {}
+    for profile in profiles:
+        if profile.release_dir in seen:
+            raise ValueError(
+                f"Profiles {seen[profile.release_dir]} and {profile.name} "
+                f"share directory {profile.release_dir}"
+            )
+        seen[profile.release_dir] = profile.name
+
+    # 含目录层级的配置会递归扫描自己的目录，不能包含其他配置的目录
+    for profile in profiles:
+        if not profile.nested:
+            continue
+        for other in profiles:
+            if other is not profile and profile.release_dir in other.release_dir.parents:
+                raise ValueError(
+                    f"Profile {other.name} directory is inside nested profile "
+                    f"{profile.name} ({profile.release_dir})"
+                )
+    return profiles
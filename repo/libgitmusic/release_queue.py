@@ -0,0 +1,547 @@
+"""
+服务器端发布队列（ReleaseQueue / QueueDaemon）
+
+post-receive 钩子每次推送向 queue.jsonl 追加一行请求，并向 queue.fifo 写入一个字节
+唤醒处理器。处理器的流程：
+
+    1. 阻塞等待 FIFO 唤醒（FIFO 不可用时按 poll_interval 轮询队列文件）
+    2. 去抖：收到请求后继续等待，直到 debounce 秒内没有新请求，
+       或自第一个请求起累计等待超过 max_delay
+    3. 认领：把 queue.jsonl 原子改名为 queue.jsonl.processing，
+       之后的推送写入新建的 queue.jsonl，不会丢失。钩子的追加与认领的改名都在
+       queue.jsonl.lock 的 flock 下进行：否则钩子打开旧文件之后、写入之前发生的改名
+       会让这一行写进已经读完的 .processing，随后被删除
+    4. 合并：本批全部请求只触发一次增量发布。请求带有推送前后的提交
+       （oldrev / newrev）时，只生成自第一个请求的 oldrev 以来变化的条目
+    5. 更新指标文件并删除 .processing
+
+处理器异常退出时 .processing 会保留，重启后优先处理。
+
+指标有两种输出：queue_metrics.json（QueueMetrics，最近一次构建的快照），以及传入
+MetricsRegistry 时的 Prometheus 指标（队列深度、构建耗时与排队延迟直方图、失败计数），
+可写成 textfile collector 文件，见 metrics.py。
+"""
+
+import json
+import os
+import select
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .events import EventEmitter
+from .metrics import MetricsRegistry
+
+try:
+    import fcntl
+except ImportError:
+    # 非 POSIX 平台：没有其他进程并发写入队列时无需加锁
+    fcntl = None
+
+# 默认去抖窗口与最长等待（秒）
+DEFAULT_DEBOUNCE = 10.0
+DEFAULT_MAX_DELAY = 120.0
+# FIFO 丢失唤醒时的兜底轮询间隔（秒）
+DEFAULT_POLL_INTERVAL = 60.0
+
+
+def _now_iso() -> str:
+    return datetime.now().astimezone().isoformat(timespec="seconds")
+
+
+@dataclass
+class QueueMetrics:
+    """队列处理指标，持久化为 JSON 供监控读取"""
+
+    started_at: str = field(default_factory=_now_iso)
+    requests_total: int = 0
+    invalid_requests_total: int = 0
+    builds_total: int = 0
+    builds_failed_total: int = 0
+    # 被合并进其他请求的构建、因而省去的构建次数
+    coalesced_total: int = 0
+    last_batch_size: int = 0
+    last_build_at: Optional[str] = None
+    last_build_seconds: float = 0.0
+    # 本批最早的请求到开始构建的等待时间
+    last_queue_latency_seconds: Optional[float] = None
+    last_result: Optional[Dict] = None
+
+    def record_build(
+        self,
+        batch_size: int,
+        seconds: float,
+        latency: Optional[float],
+        result: Optional[Tuple[int, int]],
+        error: Optional[str] = None,
+    ) -> None:
+        """记录一次构建"""
+        self.builds_total += 1
+        self.coalesced_total += max(0, batch_size - 1)
+        self.last_batch_size = batch_size
+        self.last_build_at = _now_iso()
+        self.last_build_seconds = round(seconds, 3)
+        self.last_queue_latency_seconds = (
+            round(latency, 3) if latency is not None else None
+        )
+        if error is not None:
+            self.builds_failed_total += 1
+            self.last_result = {"status": "error", "error": error}
+        else:
+            succeeded, total = result
+            status = "ok" if succeeded == total else "warn"
+            self.last_result = {"status": status, "succeeded": succeeded, "total": total}
+
+    def save(self, path: Path) -> None:
+        """原子地写入指标文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+class ReleaseQueue:
+    """基于 JSONL 文件的请求队列，认领通过原子改名完成"""
+
+    def __init__(self, queue_file: Path):
+        """
+        初始化队列
+
+        Args:
+            queue_file: 队列文件路径（钩子追加写入）
+        """
+        self.queue_file = Path(queue_file)
+        self.processing_file = self.queue_file.with_name(
+            self.queue_file.name + ".processing"
+        )
+        # 追加与认领互斥的锁文件（post-receive 钩子用 flock 获取同一把锁）
+        self.lock_file = self.queue_file.with_name(self.queue_file.name + ".lock")
+
+    @contextmanager
+    def _locked(self):
+        """持有队列锁（flock 排他锁）"""
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o664)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            # 关闭即释放锁
+            os.close(fd)
+
+    def pending(self) -> bool:
+        """是否有待处理的请求（含上次未完成的认领）"""
+        if self.processing_file.exists():
+            return True
+        try:
+            return self.queue_file.stat().st_size > 0
+        except FileNotFoundError:
+            return False
+
+    def depth(self) -> int:
+        """等待处理的请求数（含上次未完成的认领）"""
+        count = 0
+        for path in (self.processing_file, self.queue_file):
+            try:
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    count += sum(1 for line in f if line.strip())
+            except FileNotFoundError:
+                continue
+        return count
+
+    def claim(self) -> Optional[Path]:
+        """
+        认领当前队列中的全部请求
+
+        Returns:
+            已认领的文件路径；没有请求时返回 None。
+            存在上次未完成的认领时先返回它，新请求留待下一轮
+        """
+        if self.processing_file.exists():
+            return self.processing_file
+        # 持锁改名：正在追加的钩子写完之后才能移走队列文件
+        with self._locked():
+            try:
+                os.rename(self.queue_file, self.processing_file)
+            except FileNotFoundError:
+                return None
+        return self.processing_file
+
+    def read_claimed(self) -> Tuple[List[Dict], int]:
+        """
+        读取已认领的请求
+
+        Returns:
+            (请求列表, 无法解析的行数)
+        """
+        requests: List[Dict] = []
+        invalid = 0
+        try:
+            with open(self.processing_file, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return requests, invalid
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError:
+                EventEmitter.log("warn", f"Ignoring malformed queue line: {line[:200]}")
+                invalid += 1
+                continue
+            if isinstance(request, dict):
+                requests.append(request)
+            else:
+                invalid += 1
+        return requests, invalid
+
+    def complete(self) -> None:
+        """处理完成后删除已认领的文件"""
+        try:
+            self.processing_file.unlink()
+        except FileNotFoundError:
+            pass
+
+    def enqueue(self, request: Dict, fifo: Optional[Path] = None) -> None:
+        """
+        追加一条请求并唤醒处理器（与 post-receive 钩子的行为一致）
+
+        Args:
+            request: 请求字典
+            fifo: 唤醒 FIFO 路径（可选）
+        """
+        line = (json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._locked():
+            fd = os.open(self.queue_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                # 单次 O_APPEND 写入，与并发追加的其他请求不会交错
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        if fifo is not None:
+            notify_fifo(fifo)
+
+
+def notify_fifo(fifo: Path) -> bool:
+    """
+    向 FIFO 写入一个字节唤醒处理器，处理器未运行时直接返回
+
+    Returns:
+        是否已唤醒
+    """
+    try:
+        fd = os.open(fifo, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError:
+        # 不存在或没有读端（ENXIO）
+        return False
+    try:
+        os.write(fd, b"1")
+    except BlockingIOError:
+        # 缓冲区已满，处理器必定会被唤醒
+        pass
+    finally:
+        os.close(fd)
+    return True
+
+
+class FifoWakeup:
+    """通过命名管道接收唤醒信号"""
+
+    def __init__(self, path: Path):
+        """
+        打开（必要时创建）FIFO
+
+        Args:
+            path: FIFO 路径
+        """
+        self.path = Path(path)
+        if not self.path.exists():
+            os.mkfifo(self.path, 0o620)
+        self._read_fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        # 自身保持一个写端，避免所有写者关闭后 select 持续返回 EOF
+        self._keepalive_fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+
+    def wait(self, timeout: float) -> bool:
+        """
+        等待唤醒信号并清空管道
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            是否收到信号
+        """
+        readable, _, _ = select.select([self._read_fd], [], [], max(0.0, timeout))
+        if not readable:
+            return False
+        try:
+            while os.read(self._read_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def interrupt(self) -> None:
+        """唤醒正在等待的 wait()（用于退出）"""
+        try:
+            os.write(self._keepalive_fd, b"0")
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        for fd in (self._read_fd, self._keepalive_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class _QueueInstruments:
+    """QueueDaemon 的 Prometheus 指标"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.requests = registry.counter(
+            "gitmusic_queue_requests_total", "Release requests read from the queue"
+        )
+        self.invalid = registry.counter(
+            "gitmusic_queue_invalid_requests_total", "Malformed queue lines skipped"
+        )
+        self.builds = registry.counter(
+            "gitmusic_release_builds_total", "Release builds by outcome", ("status",)
+        )
+        self.entries = registry.counter(
+            "gitmusic_release_entries_total", "Release entries by outcome", ("result",)
+        )
+        self.duration = registry.histogram(
+            "gitmusic_release_duration_seconds", "Wall-clock duration of one release build"
+        )
+        self.latency = registry.histogram(
+            "gitmusic_queue_latency_seconds",
+            "Seconds from the oldest request in a batch to its build start",
+        )
+        self.depth = registry.gauge(
+            "gitmusic_queue_depth", "Requests waiting in the release queue"
+        )
+        self.last_success = registry.gauge(
+            "gitmusic_release_last_success_timestamp_seconds",
+            "Unix time of the last release build without failures",
+        )
+
+    def record_build(self, metrics: QueueMetrics, seconds: float, latency: Optional[float]) -> None:
+        status = metrics.last_result["status"]
+        self.builds.inc(status=status)
+        self.duration.observe(seconds)
+        if latency is not None:
+            self.latency.observe(latency)
+        if status == "error":
+            return
+        succeeded, total = metrics.last_result["succeeded"], metrics.last_result["total"]
+        self.entries.inc(succeeded, result="succeeded")
+        self.entries.inc(total - succeeded, result="failed")
+        if status == "ok":
+            self.last_success.set(time.time())
+
+
+class QueueDaemon:
+    """发布队列处理器：唤醒、去抖、认领、合并构建、记录指标"""
+
+    def __init__(
+        self,
+        queue: ReleaseQueue,
+        build: Callable[[List[Dict]], Tuple[int, int]],
+        wakeup: Optional[FifoWakeup] = None,
+        debounce: float = DEFAULT_DEBOUNCE,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        metrics_file: Optional[Path] = None,
+        registry: Optional[MetricsRegistry] = None,
+        metrics_textfile: Optional[Path] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        初始化处理器
+
+        Args:
+            queue: 请求队列
+            build: 构建函数 build(本批请求) -> (成功数, 总数)
+            wakeup: FIFO 唤醒（可选，缺省时轮询队列文件）
+            debounce: 去抖窗口（秒）
+            max_delay: 自第一个请求起的最长等待（秒）
+            poll_interval: 兜底轮询间隔（秒）
+            metrics_file: 指标文件路径（可选）
+            registry: Prometheus 指标注册表（可选，给出 metrics_textfile 时缺省新建）
+            metrics_textfile: Prometheus textfile collector 文件路径（可选）
+            clock: 单调时钟（测试注入）
+            sleep: 休眠函数（测试注入）
+        """
+        self.queue = queue
+        self.build = build
+        self.wakeup = wakeup
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.metrics_file = Path(metrics_file) if metrics_file else None
+        self.metrics = QueueMetrics()
+        self.metrics_textfile = Path(metrics_textfile) if metrics_textfile else None
+        if registry is None and self.metrics_textfile is not None:
+            registry = MetricsRegistry()
+        self.registry = registry
+        self._instruments = _QueueInstruments(registry) if registry is not None else None
+        self._clock = clock
+        self._sleep = sleep
+        self._stopping = False
+
+    def stop(self) -> None:
+        """请求在当前构建完成后退出"""
+        self._stopping = True
+        if self.wakeup is not None:
+            self.wakeup.interrupt()
+
+    def _wait(self, timeout: float) -> bool:
+        """等待唤醒信号；无 FIFO 时以短间隔检查队列文件是否增长"""
+        if self.wakeup is not None:
+            return self.wakeup.wait(timeout)
+        size = self._queue_size()
+        deadline = self._clock() + timeout
+        while self._clock() < deadline and not self._stopping:
+            self._sleep(min(1.0, max(0.0, deadline - self._clock())))
+            if self._queue_size() != size:
+                return True
+        return False
+
+    def _queue_size(self) -> int:
+        try:
+            return self.queue.queue_file.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def wait_for_work(self) -> bool:
+        """阻塞直到有待处理请求，收到 stop 时返回 False"""
+        while not self._stopping:
+            if self.queue.pending():
+                return True
+            self._wait(self.poll_interval)
+        return False
+
+    def settle(self) -> float:
+        """
+        去抖：持续吸收新的唤醒，直到 debounce 秒内无新请求或达到 max_delay
+
+        Returns:
+            等待的秒数
+        """
+        if self.queue.processing_file.exists():
+            # 上次未完成的认领无需等待
+            return 0.0
+        start = self._clock()
+        while not self._stopping:
+            remaining = self.max_delay - (self._clock() - start)
+            if remaining <= 0:
+                break
+            if not self._wait(min(self.debounce, remaining)):
+                break
+        return self._clock() - start
+
+    def run_once(self) -> bool:
+        """
+        认领并处理一批请求
+
+        Returns:
+            是否执行了构建
+        """
+        if self.queue.claim() is None:
+            return False
+        requests, invalid = self.queue.read_claimed()
+        self.metrics.requests_total += len(requests)
+        self.metrics.invalid_requests_total += invalid
+        if self._instruments is not None:
+            self._instruments.requests.inc(len(requests))
+            self._instruments.invalid.inc(invalid)
+        if not requests:
+            self.queue.complete()
+            self._save_metrics()
+            return False
+
+        latency = _queue_latency(requests)
+        EventEmitter.log(
+            "info", f"Processing {len(requests)} queued request(s) in one release"
+        )
+        started = self._clock()
+        result, error = None, None
+        try:
+            result = self.build(requests)
+        except Exception as e:
+            error = str(e)
+            EventEmitter.error(f"Queued release failed: {error}")
+        seconds = self._clock() - started
+        self.metrics.record_build(len(requests), seconds, latency, result, error)
+        if self._instruments is not None:
+            self._instruments.record_build(self.metrics, seconds, latency)
+        # 构建失败同样移除请求：请求只是触发信号，下次推送会重新触发
+        self.queue.complete()
+        self._save_metrics()
+        return True
+
+    def run_forever(self) -> None:
+        """主循环，直到 stop()"""
+        EventEmitter.log("info", f"Release queue handler watching {self.queue.queue_file}")
+        self._save_metrics()
+        while self.wait_for_work():
+            self.settle()
+            self.run_once()
+        EventEmitter.log("info", "Release queue handler stopped")
+
+    def _save_metrics(self) -> None:
+        if self._instruments is not None:
+            self._instruments.depth.set(self.queue.depth())
+        try:
+            if self.metrics_file is not None:
+                self.metrics.save(self.metrics_file)
+            if self.metrics_textfile is not None:
+                self.registry.write_textfile(self.metrics_textfile)
+        except OSError as e:
+            EventEmitter.log("warn", f"Failed to write queue metrics: {str(e)}")
+
+
+def _queue_latency(requests: List[Dict]) -> Optional[float]:
+    """本批最早请求的时间戳到现在的秒数（请求缺少时间戳时返回 None）"""
+    timestamps = []
+    for request in requests:
+        try:
+            timestamps.append(datetime.fromisoformat(request["timestamp"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    if not timestamps:
+        return None
+    oldest = min(timestamps)
+    now = datetime.now(oldest.tzinfo) if oldest.tzinfo else datetime.now()
+    return max(0.0, (now - oldest).total_seconds())
+
+
+def since_revision(requests: List[Dict]) -> Optional[str]:
+    """
+    合并后一批请求的起始提交：第一个请求的 oldrev
+
+    Args:
+        requests: 按入队顺序排列的请求
+
+    Returns:
+        起始提交；任一请求缺少 oldrev 或为新建引用（全零哈希）时返回 None，
+        此时需要完整的增量扫描
+    """
+    revisions = [request.get("oldrev") for request in requests]
+    if not revisions or any(
+        not isinstance(rev, str) or not rev or rev.strip("0") == "" for rev in revisions
+    ):
+        return None
+    return revisions[0]
@@ -0,0 +1,237 @@
+"""
+轻量级 span 计时（EventEmitter.span）
+
+span 记录墙钟时间、线程 CPU 时间、读写字节数（被测代码通过 add_bytes 上报）以及
+启动的子进程数（通过 sys.audit 的 subprocess.Popen 事件自动统计）。span 按
+"阶段/外层 span/内层 span" 的路径聚合，汇总随 result 事件输出；调用 start_trace 后
+每个 span 还会记录为 Chrome trace event，可导出后用 chrome://tracing 或 Perfetto 查看。
+
+外层 span 的字节数与子进程数包含内层 span。进程池子进程中的 span 不计入父进程的汇总。
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+# Chrome trace 最多保留的事件数，超出后丢弃并计数
+MAX_TRACE_EVENTS = 500000
+
+_local = threading.local()
+_lock = threading.Lock()
+# 路径 -> [次数, 墙钟秒, CPU 秒, 读字节, 写字节, 子进程数]
+_stats: Dict[str, list] = {}
+_phase: Optional[str] = None
+_trace: Optional[list] = None
+_trace_dropped = 0
+_audit_installed = False
+
+
+class Span:
+    """一个进行中的 span，由 span() 上下文管理器产出"""
+
+    __slots__ = ("name", "path", "attrs", "bytes_read", "bytes_written", "subprocesses")
+
+    def __init__(self, name: str, path: str, attrs: Dict):
+        self.name = name
+        self.path = path
+        self.attrs = attrs
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.subprocesses = 0
+
+    def add_bytes(self, read: int = 0, written: int = 0) -> None:
+        """记录本 span 读写的字节数"""
+        self.bytes_read += read
+        self.bytes_written += written
+
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _audit(event: str, args) -> None:
+    if event == "subprocess.Popen":
+        for active in getattr(_local, "stack", ()):
+            active.subprocesses += 1
+
+
+def _install_audit_hook() -> None:
+    # 审计钩子无法移除，首次使用 span 时才安装
+    global _audit_installed
+    if not _audit_installed:
+        with _lock:
+            if not _audit_installed:
+                sys.addaudithook(_audit)
+                _audit_installed = True
+
+
+def set_phase(phase: Optional[str]) -> None:
+    """设置当前阶段，之后开始的顶层 span 归入该阶段"""
+    global _phase
+    _phase = phase
+
+
+def add_bytes(read: int = 0, written: int = 0) -> None:
+    """向当前线程最内层的 span 上报读写字节数（没有进行中的 span 时忽略）"""
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].add_bytes(read, written)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Span]:
+    """
+    计时一段代码
+
+    Args:
+        name: span 名称
+        **attrs: 附加到 Chrome trace 事件的属性
+
+    Yields:
+        Span 对象，可调用 add_bytes 上报读写字节数
+    """
+    _install_audit_hook()
+    stack = _stack()
+    parent = stack[-1].path if stack else _phase
+    current = Span(name, f"{parent}/{name}" if parent else name, attrs)
+    stack.append(current)
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield current
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        stack.pop()
+        if stack:
+            stack[-1].add_bytes(current.bytes_read, current.bytes_written)
+        _record(current, wall_start, wall, cpu)
+
+
+def traced(name: str) -> Callable:
+    """装饰器：以 span(name) 包裹整个函数调用"""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _record(current: Span, start: float, wall: float, cpu: float) -> None:
+    global _trace_dropped
+    with _lock:
+        stats = _stats.get(current.path)
+        if stats is None:
+            stats = _stats[current.path] = [0, 0.0, 0.0, 0, 0, 0]
+        stats[0] += 1
+        stats[1] += wall
+        stats[2] += cpu
+        stats[3] += current.bytes_read
+        stats[4] += current.bytes_written
+        stats[5] += current.subprocesses
+
+        if _trace is None:
+            return
+        if len(_trace) >= MAX_TRACE_EVENTS:
+            _trace_dropped += 1
+            return
+        args = dict(current.attrs)
+        if current.bytes_read:
+            args["bytes_read"] = current.bytes_read
+        if current.bytes_written:
+            args["bytes_written"] = current.bytes_written
+        if current.subprocesses:
+            args["subprocesses"] = current.subprocesses
+        args["cpu_ms"] = round(cpu * 1000, 3)
+        _trace.append(
+            {
+                "name": current.name,
+                "cat": current.path.split("/", 1)[0],
+                "ph": "X",
+                "ts": round(start * 1e6, 3),
+                "dur": round(wall * 1e6, 3),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+
+def summary() -> Dict[str, Dict]:
+    """
+    按路径汇总已结束的 span
+
+    Returns:
+        字典：路径 -> {count, wall_sec, cpu_sec, bytes_read, bytes_written, subprocesses}，
+        按墙钟时间降序
+    """
+    with _lock:
+        items = sorted(_stats.items(), key=lambda item: item[1][1], reverse=True)
+    return {
+        path: {
+            "count": count,
+            "wall_sec": round(wall, 4),
+            "cpu_sec": round(cpu, 4),
+            "bytes_read": read,
+            "bytes_written": written,
+            "subprocesses": subprocesses,
+        }
+        for path, (count, wall, cpu, read, written, subprocesses) in items
+    }
+
+
+def reset() -> None:
+    """清空汇总与当前阶段（每个命令开始时调用），不影响已记录的 trace"""
+    global _phase
+    with _lock:
+        _stats.clear()
+    _phase = None
+
+
+def start_trace() -> None:
+    """开始记录 Chrome trace 事件"""
+    global _trace, _trace_dropped
+    with _lock:
+        _trace = []
+        _trace_dropped = 0
+
+
+def export_chrome_trace(path: Path) -> int:
+    """
+    写出 Chrome trace-event JSON（{"traceEvents": [...]}）
+
+    Args:
+        path: 输出文件路径
+
+    Returns:
+        写出的事件数
+    """
+    with _lock:
+        events = list(_trace or [])
+        dropped = _trace_dropped
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "traceEvents": events,
+                "displayTimeUnit": "ms",
+                "otherData": {"dropped_events": dropped},
+            },
+            f,
+        )
+    return len(events)
@@ -0,0 +1,373 @@
+"""
+发布转码（Transcode）
+
+发布配置可以声明转码参数，生成 AAC / Opus 等低码率副本：
+
+    release:
+      transcode_workers: 4            # 同时运行的 ffmpeg 进程数，缺省为 CPU 核数
+      profiles:
+        mobile:
+          dir: /path/to/mobile
+          transcode: {codec: opus, bitrate: 96k}
+
+转码结果不带任何标签，按 (audio_oid, codec, 参数) 内容寻址缓存：
+
+    cache_root/transcodes/<codec>-<参数摘要>/<hex[:2]>/<hex>.<ext>
+
+发布时从缓存复制（CoW 文件系统上为 reflink）后写入标签，因此仅元数据变化时
+只重写标签，只有新的音频对象才需要转码。转码缓存可以随时删除，下次发布时重建。
+"""
+
+import base64
+import concurrent.futures
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .audio import AudioIO
+from .events import EventEmitter
+
+TRANSCODE_DIR = "transcodes"
+# 单个文件的转码超时（秒）
+TRANSCODE_TIMEOUT = 600
+
+# codec -> (扩展名, ffmpeg 编码器, ffmpeg 封装格式)
+CODECS = {
+    "aac": (".m4a", "aac", "ipod"),
+    "opus": (".opus", "libopus", "opus"),
+    "mp3": (".mp3", "libmp3lame", "mp3"),
+}
+
+# MP4 自定义字段，与 ID3 的 TXXX:METADATA_HASH 对应
+_MP4_HASH_KEY = "----:com.apple.iTunes:METADATA_HASH"
+
+
+@dataclass(frozen=True)
+class TranscodeSpec:
+    """转码参数"""
+
+    codec: str
+    bitrate: Optional[str] = None
+    # 附加的 ffmpeg 输出参数
+    args: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        if self.codec not in CODECS:
+            raise ValueError(
+                f"Unknown transcode codec: {self.codec} (valid: {', '.join(CODECS)})"
+            )
+
+    @classmethod
+    def from_config(cls, options) -> "TranscodeSpec":
+        """
+        从配置构建转码参数
+
+        Args:
+            options: 字符串（仅 codec）或 {codec, bitrate, args} 字典
+
+        Returns:
+            TranscodeSpec 实例
+        """
+        if isinstance(options, str):
+            return cls(options)
+        return cls(
+            codec=str(options.get("codec", "")),
+            bitrate=str(options["bitrate"]) if options.get("bitrate") else None,
+            args=tuple(str(arg) for arg in options.get("args", ())),
+        )
+
+    @property
+    def extension(self) -> str:
+        return CODECS[self.codec][0]
+
+    def to_dict(self) -> Dict:
+        return {"codec": self.codec, "bitrate": self.bitrate, "args": list(self.args)}
+
+    @property
+    def key(self) -> str:
+        """缓存目录名：codec 与参数摘要，参数变化即使用新的缓存"""
+        digest = hashlib.sha256(
+            json.dumps(self.to_dict(), sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        return f"{self.codec}-{digest[:12]}"
+
+    def ffmpeg_command(self, src: Path, dst: Path) -> List[str]:
+        """构建 ffmpeg 命令：只保留音频流并去除源文件中的全部元数据"""
+        _, encoder, muxer = CODECS[self.codec]
+        cmd = [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-nostdin",
+            "-y",
+            "-i",
+            str(src),
+            "-map",
+            "0:a:0",
+            "-vn",
+            "-map_metadata",
+            "-1",
+            "-c:a",
+            encoder,
+        ]
+        if self.bitrate:
+            cmd += ["-b:a", self.bitrate]
+        if self.codec == "mp3":
+            cmd += ["-id3v2_version", "0", "-write_id3v1", "0"]
+        cmd += list(self.args)
+        cmd += ["-f", muxer, str(dst)]
+        return cmd
+
+
+class TranscodeCache:
+    """转码结果缓存：按 (audio_oid, TranscodeSpec) 内容寻址"""
+
+    def __init__(self, cache_root: Path):
+        """
+        初始化缓存
+
+        Args:
+            cache_root: 缓存根目录（转码结果位于其下的 transcodes/）
+        """
+        self.root = Path(cache_root) / TRANSCODE_DIR
+
+    def path(self, audio_oid: str, spec: TranscodeSpec) -> Path:
+        """转码结果路径"""
+        hexdigest = audio_oid.replace("sha256:", "")
+        return self.root / spec.key / hexdigest[:2] / f"{hexdigest}{spec.extension}"
+
+    def get(self, audio_oid: str, spec: TranscodeSpec) -> Optional[Path]:
+        """返回已缓存的转码结果，不存在返回 None"""
+        path = self.path(audio_oid, spec)
+        return path if path.exists() else None
+
+    def transcode(self, src: Path, audio_oid: str, spec: TranscodeSpec) -> Path:
+        """
+        转码并写入缓存（先写临时文件，完成后原子替换）
+
+        Args:
+            src: 源音频文件
+            audio_oid: 音频对象 ID
+            spec: 转码参数
+
+        Returns:
+            缓存中的转码结果路径
+
+        Raises:
+            RuntimeError: ffmpeg 不可用、失败或超时
+        """
+        target = self.path(audio_oid, spec)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp_fd, temp_path_str = tempfile.mkstemp(
+            dir=target.parent, suffix=".tmp" + spec.extension
+        )
+        os.close(temp_fd)
+        temp_path = Path(temp_path_str)
+        try:
+            run_ffmpeg(spec.ffmpeg_command(src, temp_path))
+            os.replace(temp_path, target)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        return target
+
+    def ensure(
+        self,
+        jobs: List[Tuple[str, Path, TranscodeSpec]],
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Dict[Tuple[str, TranscodeSpec], str]:
+        """
+        用有界的 ffmpeg 进程池补齐缺失的转码结果
+
+        Args:
+            jobs: [(audio_oid, 源音频路径, 转码参数), ...]，重复项只转码一次
+            workers: 同时运行的 ffmpeg 进程数，缺省为 CPU 核数
+            progress: 进度回调 (已完成数, 总数)
+
+        Returns:
+            失败的任务：(audio_oid, spec) -> 错误信息
+        """
+        pending: Dict[Tuple[str, TranscodeSpec], Path] = {}
+        for audio_oid, src, spec in jobs:
+            if (audio_oid, spec) not in pending and self.get(audio_oid, spec) is None:
+                pending[(audio_oid, spec)] = src
+
+        failures: Dict[Tuple[str, TranscodeSpec], str] = {}
+        if not pending:
+            return failures
+
+        workers = max(1, workers or os.cpu_count() or 1)
+        total = len(pending)
+        completed = 0
+        # 每个任务只是等待 ffmpeg 子进程，线程池的大小即并发的 ffmpeg 进程数
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(self.transcode, src, audio_oid, spec): (audio_oid, spec)
+                for (audio_oid, spec), src in pending.items()
+            }
+            for future in concurrent.futures.as_completed(futures):
+                audio_oid, spec = futures[future]
+                try:
+                    future.result()
+                    EventEmitter.item_event(audio_oid, "transcoded", spec.key)
+                except Exception as e:
+                    failures[(audio_oid, spec)] = str(e)
+                    EventEmitter.error(
+                        f"Failed to transcode {audio_oid[:16]}...: {str(e)}",
+                        {"audio_oid": audio_oid, "codec": spec.codec},
+                    )
+                completed += 1
+                if progress:
+                    progress(completed, total)
+        return failures
+
+
+def run_ffmpeg(cmd: List[str]) -> None:
+    """
+    运行 ffmpeg 命令
+
+    Raises:
+        RuntimeError: ffmpeg 不可用、返回非零或超时
+    """
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg not found")
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"ffmpeg timed out after {TRANSCODE_TIMEOUT}s")
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(stderr or f"ffmpeg exited with {result.returncode}")
+
+
+def _artists_list(metadata: Dict) -> List[str]:
+    artists = metadata.get("artists") or []
+    return list(artists) if isinstance(artists, list) else [str(artists)]
+
+
+def _write_mp4_tags(path: Path, metadata: Dict, cover_data: Optional[bytes]) -> None:
+    from mutagen.mp4 import MP4, MP4Cover, MP4FreeForm
+
+    audio = MP4(path)
+    if audio.tags is None:
+        audio.add_tags()
+    audio.tags.clear()
+    if title := metadata.get("title"):
+        audio.tags["\xa9nam"] = [title]
+    if artists := _artists_list(metadata):
+        audio.tags["\xa9ART"] = ["/".join(artists)]
+    if album := metadata.get("album"):
+        audio.tags["\xa9alb"] = [album]
+    if date := metadata.get("date"):
+        audio.tags["\xa9day"] = [date]
+    if uslt := metadata.get("uslt"):
+        audio.tags["\xa9lyr"] = [uslt]
+    if metadata_hash := metadata.get("metadata_hash"):
+        audio.tags[_MP4_HASH_KEY] = [MP4FreeForm(metadata_hash.encode("utf-8"))]
+    if cover_data:
+        audio.tags["covr"] = [MP4Cover(cover_data, imageformat=MP4Cover.FORMAT_JPEG)]
+    audio.save()
+
+
+def _write_opus_tags(path: Path, metadata: Dict, cover_data: Optional[bytes]) -> None:
+    from mutagen.oggopus import OggOpus
+    from mutagen.flac import Picture
+
+    audio = OggOpus(path)
+    audio.tags.clear()
+    if title := metadata.get("title"):
+        audio.tags["title"] = [title]
+    if artists := _artists_list(metadata):
+        audio.tags["artist"] = artists
+    if album := metadata.get("album"):
+        audio.tags["album"] = [album]
+    if date := metadata.get("date"):
+        audio.tags["date"] = [date]
+    if uslt := metadata.get("uslt"):
+        audio.tags["lyrics"] = [uslt]
+    if metadata_hash := metadata.get("metadata_hash"):
+        audio.tags["metadata_hash"] = [metadata_hash]
+    if cover_data:
+        picture = Picture()
+        picture.type = 3  # 封面（正面）
+        picture.mime = "image/jpeg"
+        picture.data = bytes(cover_data)
+        audio.tags["metadata_block_picture"] = [
+            base64.b64encode(picture.write()).decode("ascii")
+        ]
+    audio.save()
+
+
+def build_tagged_transcode(
+    src: Path, metadata: Dict, cover_data: Optional[bytes], out_path: Path
+) -> str:
+    """
+    由缓存的转码结果生成带标签的发布文件（缓存文件本身保持不带标签）
+
+    Args:
+        src: 缓存中的转码结果
+        metadata: 元数据字典（含 metadata_hash）
+        cover_data: 封面图片数据（可选）
+        out_path: 输出文件路径，扩展名决定标签格式
+
+    Returns:
+        数据的复制方式：reflink, copy_file_range 或 copy
+    """
+    if out_path.suffix.lower() == ".mp3":
+        return AudioIO.build_tagged_file(src, metadata, cover_data, out_path)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_fd, temp_path_str = tempfile.mkstemp(
+        dir=out_path.parent, suffix=".tmp" + out_path.suffix
+    )
+    temp_path = Path(temp_path_str)
+    try:
+        with open(src, "rb") as f:
+            method = AudioIO.copy_range(
+                f.fileno(), temp_fd, 0, os.fstat(f.fileno()).st_size, 0
+            )
+        os.close(temp_fd)
+        temp_fd = None
+        if out_path.suffix.lower() == ".m4a":
+            _write_mp4_tags(temp_path, metadata, cover_data)
+        else:
+            _write_opus_tags(temp_path, metadata, cover_data)
+        os.replace(temp_path, out_path)
+    finally:
+        if temp_fd is not None:
+            os.close(temp_fd)
+        if temp_path.exists():
+            temp_path.unlink()
+    return method
+
+
+def read_metadata_hash(path: Path) -> Optional[str]:
+    """
+    读取 m4a / opus 发布文件中的元数据哈希
+
+    Args:
+        path: 发布文件路径
+
+    Returns:
+        元数据哈希，不存在返回 None
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".m4a":
+        from mutagen.mp4 import MP4
+
+        tags = MP4(path).tags
+        values = tags.get(_MP4_HASH_KEY) if tags else None
+        return bytes(values[0]).decode("utf-8") if values else None
+    if suffix == ".opus":
+        from mutagen.oggopus import OggOpus
+
+        values = OggOpus(path).tags.get("metadata_hash")
+        return values[0] if values else None
+    return None
@@ -1,12 +1,15 @@
+import json
 import subprocess
 import os
+import shlex
 import hashlib
 import time
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from .events import EventEmitter
 from .results import RemoteResult
 from .exceptions import TransportError
+from .tracing import add_bytes, traced
 
 
 class TransportAdapter:
@@ -32,6 +35,7 @@ class TransportAdapter:
         self.timeout = transport_config.get("timeout", 60)
         self.workers = transport_config.get("workers", 4)
         self.context = context
+        self._remote_layout = None
 
     def list_remote_files(self, subpath: str) -> List[str]:
         """列出远端特定目录下的所有文件相对路径"""
@@ -40,7 +44,7 @@ class TransportAdapter:
         cmd = [
             "ssh",
             f"{self.user}@{self.host}",
-            f"find {remote_path} -type f \\( -name '*.mp3' -o -name '*.jpg' \\) | sed 's|{self.remote_data_root}/||'",
+            f"find {remote_path} -type f \\( -name '*.mp3' -o -name '*.jpg' -o -name '*.pack' -o -name '*.idx' \\) | sed 's|{self.remote_data_root}/||'",
         ]
         try:
             result = subprocess.run(
@@ -55,6 +59,114 @@ class TransportAdapter:
         except subprocess.CalledProcessError:
             return []
 
+    def list_remote_objects(self, subpath: str) -> Dict[str, float]:
+        """
+        列出远端对象及其修改时间（一次 find 调用，无需逐个 stat）
+
+        Args:
+            subpath: 相对于 remote_data_root 的目录，例如 "objects"
+
+        Returns:
+            字典：相对于 remote_data_root 的路径 -> mtime（Unix 时间戳）
+        """
+        remote_path = f"{self.remote_data_root}/{subpath}"
+        cmd = [
+            "ssh",
+            f"{self.user}@{self.host}",
+            f"find {remote_path} -type f \\( -name '*.mp3' -o -name '*.jpg' \\) "
+            f"-printf '%P\\t%T@\\n'",
+        ]
+        try:
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                errors="ignore",
+                check=True,
+                timeout=self.timeout,
+            )
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            return {}
+
+        objects = {}
+        for line in result.stdout.splitlines():
+            rel_path, _, mtime = line.strip().partition("\t")
+            if not rel_path:
+                continue
+            try:
+                objects[f"{subpath}/{rel_path}"] = float(mtime)
+            except ValueError:
+                objects[f"{subpath}/{rel_path}"] = 0.0
+        return objects
+
+    def delete_remote_files(self, rel_paths: List[str], batch_size: int = 200) -> int:
+        """
+        批量删除远端文件（每批一次 SSH 调用）
+
+        Args:
+            rel_paths: 相对于 remote_data_root 的路径列表
+            batch_size: 每批删除的文件数
+
+        Returns:
+            成功删除的文件数
+        """
+        deleted = 0
+        for start in range(0, len(rel_paths), batch_size):
+            batch = rel_paths[start : start + batch_size]
+            targets = " ".join(
+                shlex.quote(f"{self.remote_data_root}/{p}") for p in batch
+            )
+            try:
+                self._remote_exec(f"rm -f {targets}")
+                deleted += len(batch)
+                for p in batch:
+                    EventEmitter.item_event(p, "deleted_remote")
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                EventEmitter.error(
+                    f"Failed to delete remote files: {str(e)}",
+                    {"count": len(batch)},
+                )
+        return deleted
+
+    def get_remote_layout(self) -> "ShardLayout":
+        """
+        读取远端数据目录的分片布局（remote_data_root/layout.json）
+
+        Returns:
+            ShardLayout，远端没有 layout.json 时为历史默认布局
+
+        Raises:
+            TransportError: SSH 失败或超时（不能据此推断远端布局）
+            ValueError: layout.json 内容无效
+        """
+        from .layout import LAYOUT_FILE, ShardLayout
+
+        if self._remote_layout is not None:
+            return self._remote_layout
+        # 文件不存在时输出空对象，cat 本身失败时命令以非零状态退出
+        path = shlex.quote(f"{self.remote_data_root}/{LAYOUT_FILE}")
+        try:
+            stdout, _ = self._remote_exec(
+                f"if test -f {path}; then cat {path}; else echo '{{}}'; fi"
+            )
+        except subprocess.CalledProcessError as e:
+            raise TransportError(
+                f"Cannot read remote layout (exit {e.returncode}): {(e.stderr or '').strip()}"
+            ) from e
+        except subprocess.TimeoutExpired as e:
+            raise TransportError(f"Timed out reading remote layout: {str(e)}") from e
+        try:
+            data = json.loads(stdout)
+        except ValueError as e:
+            raise ValueError(f"Invalid remote layout file: {str(e)}") from e
+        if not isinstance(data, dict):
+            raise ValueError("Invalid remote layout file: not a JSON object")
+        layout = ShardLayout.from_dict(data) if data else ShardLayout.legacy()
+        self._remote_layout = layout
+        return layout
+
+    @traced("remote_exec")
     def _remote_exec(self, command: str) -> Tuple[str, str]:
         """执行远程命令，返回(stdout, stderr)"""
         cmd = ["ssh", f"{self.user}@{self.host}", command]
@@ -91,6 +203,7 @@ class TransportAdapter:
             EventEmitter.log("error", f"Timeout getting remote hash for {remote_path}")
             raise
 
+    @traced("transport_upload")
     def upload(self, local_path: Path, remote_subpath: str) -> RemoteResult:
         """上传文件到远端（原子操作），包含远端SHA256校验和重试机制"""
         remote_final_path = f"{self.remote_data_root}/{remote_subpath}"
@@ -99,7 +212,9 @@ class TransportAdapter:
         # 计算本地哈希
         try:
             with open(local_path, "rb") as f:
-                local_hash = hashlib.sha256(f.read()).hexdigest()
+                data = f.read()
+            local_hash = hashlib.sha256(data).hexdigest()
+            add_bytes(read=len(data))
             EventEmitter.log("debug", f"Local SHA256: {local_hash}")
         except Exception as e:
             EventEmitter.error(
@@ -181,6 +296,8 @@ class TransportAdapter:
                         f"Hash mismatch after upload (attempt {attempt + 1}): local {local_hash[:8]} != remote {tmp_hash[:8]}"
                     )
 
+                add_bytes(written=len(data))
+
                 # 原子替换
                 self._remote_exec(f"mv {remote_tmp_path} {remote_final_path}")
 
@@ -226,6 +343,7 @@ class TransportAdapter:
                         remote_path=remote_subpath
                     )
 
+    @traced("transport_download")
     def download(self, remote_subpath: str, local_path: Path):
         """从远端下载文件（原子操作）"""
         local_path.parent.mkdir(parents=True, exist_ok=True)
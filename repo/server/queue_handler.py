@@ -2,85 +2,226 @@
 """
 队列处理脚本
 监听队列并触发成品生成
+
+post-receive 钩子追加请求到 queue.jsonl 并写 queue.fifo 唤醒本进程。一段时间内的多次推送
+（去抖窗口）合并为一次增量发布；队列通过改名为 queue.jsonl.processing 原子认领。
+处理指标写入 queue_metrics.json；--metrics-textfile 另外写出 Prometheus textfile collector
+文件，--metrics-port 在本机提供 HTTP /metrics。详见 libgitmusic/release_queue.py 与
+libgitmusic/metrics.py。
+
+请求带有推送的 oldrev 时以 --since 只生成变化的条目；启动后的第一次构建以及上一次构建
+未全部成功时，执行完整的增量扫描，避免遗漏。
 """
 
-import os
 import json
 import logging
+import signal
 import subprocess
+import sys
 import time
 from pathlib import Path
-from datetime import datetime
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s',
-    handlers=[
-        logging.FileHandler('/srv/music/repo/server/queue_handler.log'),
-        logging.StreamHandler()
-    ]
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from libgitmusic.events import EventEmitter
+from libgitmusic.metrics import EventMetrics, MetricsRegistry, register_observer
+from libgitmusic.release_queue import (
+    DEFAULT_DEBOUNCE,
+    DEFAULT_MAX_DELAY,
+    DEFAULT_POLL_INTERVAL,
+    FifoWakeup,
+    QueueDaemon,
+    ReleaseQueue,
+    since_revision,
 )
-logger = logging.getLogger(__name__)
-
-QUEUE_FILE = '/srv/music/repo/server/queue.jsonl'
-REPO_DIR = '/srv/music/repo'
-CREATE_RELEASE_SCRIPT = '/srv/music/repo/release/create_release.py'
 
+SERVER_DIR = Path(__file__).resolve().parent
+REPO_DIR = SERVER_DIR.parent
+QUEUE_FILE = SERVER_DIR / "queue.jsonl"
+FIFO_FILE = SERVER_DIR / "queue.fifo"
+METRICS_FILE = SERVER_DIR / "queue_metrics.json"
+LOG_FILE = SERVER_DIR / "queue_handler.log"
+CREATE_RELEASE_SCRIPT = REPO_DIR / "release" / "create_release.py"
 
-def process_queue():
-    """处理队列中的请求"""
-    if not os.path.exists(QUEUE_FILE):
-        return
-
-    with open(QUEUE_FILE, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    if not lines:
-        return
+logger = logging.getLogger(__name__)
 
-    # 清空队列文件
-    with open(QUEUE_FILE, 'w', encoding='utf-8') as f:
-        f.write('')
 
-    for line in lines:
+def _forward_to_logger(event: Dict) -> None:
+    """把 EventEmitter 的日志与错误事件写入处理器日志"""
+    if event.get("type") == "log":
+        level = {"debug": logging.DEBUG, "warn": logging.WARNING, "error": logging.ERROR}
+        logger.log(level.get(event.get("level"), logging.INFO), event.get("message"))
+    elif event.get("type") == "error":
+        logger.error(event.get("message"))
+
+
+def run_create_release(
+    requests: List[Dict],
+    workers: int,
+    config: str = None,
+    since: Optional[str] = None,
+    observer: Optional[EventMetrics] = None,
+) -> Tuple[int, int]:
+    """
+    在子进程中运行一次增量发布（隔离内存占用，并每次读取最新配置）
+
+    Args:
+        requests: 本批合并的请求
+        workers: 并行数
+        config: config.yaml 路径（可选）
+        since: 起始提交（可选），只生成此后变化的条目
+        observer: 事件指标（可选），子进程的事件同样计入
+
+    Returns:
+        (成功数, 总数)
+
+    Raises:
+        RuntimeError: 子进程没有输出结果
+    """
+    cmd = [
+        sys.executable,
+        str(CREATE_RELEASE_SCRIPT),
+        "--mode",
+        "incremental",
+        "--workers",
+        str(workers),
+    ]
+    if config:
+        cmd += ["--config", config]
+    if since:
+        cmd += ["--since", since]
+    started = time.monotonic()
+    result = subprocess.run(cmd, cwd=REPO_DIR, capture_output=True, text=True)
+
+    summary = None
+    for line in result.stdout.splitlines():
         try:
-            request = json.loads(line.strip())
-            logger.info(f"处理请求: {request}")
-
-            # 切换到仓库目录
-            os.chdir(REPO_DIR)
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if observer is not None:
+            observer(event)
+        if event.get("type") == "error":
+            logger.error(event.get("message"))
+        elif event.get("type") == "result":
+            summary = event
+    if observer is not None:
+        # 每个子进程是一次独立的命令，span 累计值从零开始
+        observer.command_finished("create_release", time.monotonic() - started)
+    if summary is None:
+        raise RuntimeError(
+            f"create_release exited with {result.returncode}: {result.stderr[-2000:]}"
+        )
+
+    artifacts = summary.get("artifacts", {})
+    logger.info(f"{summary.get('message')} ({len(requests)} request(s))")
+    return artifacts.get("successful", 0), artifacts.get("processed", 0)
 
-            # 运行生成脚本
-            cmd = ['/usr/bin/python3', CREATE_RELEASE_SCRIPT, '--mode', 'server']
-            result = subprocess.run(cmd, capture_output=True, text=True)
 
-            if result.returncode == 0:
-                logger.info(f"请求处理成功: {request}")
-            else:
-                logger.error(f"请求处理失败: {request}")
-                logger.error(f"错误输出: {result.stderr}")
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="发布队列处理器")
+    parser.add_argument("--queue-file", default=str(QUEUE_FILE), help="队列文件")
+    parser.add_argument("--fifo", default=str(FIFO_FILE), help="唤醒 FIFO")
+    parser.add_argument("--metrics-file", default=str(METRICS_FILE), help="指标文件")
+    parser.add_argument(
+        "--metrics-textfile", help="Prometheus textfile collector 文件（.prom）"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, help="在 127.0.0.1 上提供 HTTP /metrics 的端口"
+    )
+    parser.add_argument("--log-file", default=str(LOG_FILE), help="日志文件")
+    parser.add_argument("--config", help="config.yaml 路径")
+    parser.add_argument("--workers", type=int, default=4, help="发布并行数")
+    parser.add_argument(
+        "--debounce", type=float, default=DEFAULT_DEBOUNCE, help="去抖窗口（秒）"
+    )
+    parser.add_argument(
+        "--max-delay",
+        type=float,
+        default=DEFAULT_MAX_DELAY,
+        help="自第一个请求起的最长等待（秒）",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help="兜底轮询间隔（秒）",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="立即处理当前队列后退出（不等待去抖）"
+    )
+    args = parser.parse_args()
+
+    # 配置日志
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(message)s",
+        handlers=[logging.FileHandler(args.log_file), logging.StreamHandler()],
+    )
+    EventEmitter.register_listener(_forward_to_logger)
+
+    registry = MetricsRegistry()
+    observer = register_observer(registry)
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = registry.serve_http(args.metrics_port)
+        logger.info(f"Metrics available at http://127.0.0.1:{args.metrics_port}/metrics")
+
+    queue = ReleaseQueue(Path(args.queue_file))
+    wakeup = None
+    if not args.once:
+        try:
+            wakeup = FifoWakeup(Path(args.fifo))
+        except (OSError, AttributeError) as e:
+            # 不支持 FIFO 的平台退回轮询
+            logger.warning(f"FIFO unavailable ({e}), polling {args.queue_file}")
+
+    # 上一次构建是否全部成功；失败后的条目只有完整扫描才能补上
+    state = {"clean": False}
+
+    def build(requests: List[Dict]) -> Tuple[int, int]:
+        since = since_revision(requests) if state["clean"] else None
+        state["clean"] = False
+        succeeded, total = run_create_release(
+            requests, args.workers, args.config, since, observer
+        )
+        state["clean"] = succeeded == total
+        return succeeded, total
+
+    daemon = QueueDaemon(
+        queue,
+        build=build,
+        wakeup=wakeup,
+        debounce=args.debounce,
+        max_delay=args.max_delay,
+        poll_interval=args.poll_interval,
+        metrics_file=Path(args.metrics_file),
+        registry=registry,
+        metrics_textfile=Path(args.metrics_textfile) if args.metrics_textfile else None,
+    )
+
+    if args.once:
+        while queue.pending():
+            daemon.run_once()
+        return
 
-        except json.JSONDecodeError as e:
-            logger.error(f"解析队列行失败: {line}, 错误: {e}")
-        except Exception as e:
-            logger.error(f"处理请求时发生错误: {e}")
+    def handle_signal(signum, frame):
+        logger.info("队列处理器停止")
+        daemon.stop()
 
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
 
-def main():
-    """主循环"""
     logger.info("队列处理器启动...")
-
-    while True:
-        try:
-            process_queue()
-            time.sleep(5)  # 每5秒检查一次队列
-        except KeyboardInterrupt:
-            logger.info("队列处理器停止")
-            break
-        except Exception as e:
-            logger.error(f"主循环错误: {e}")
-            time.sleep(10)
+    try:
+        daemon.run_forever()
+    finally:
+        if wakeup is not None:
+            wakeup.close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
 
 
 if __name__ == "__main__":
@@ -5,49 +5,37 @@ import time
 import subprocess
 import tempfile
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Callable, Iterator, Union
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Callable, Iterator, Union
 from datetime import datetime
 
-from rich.console import Console
-from rich.live import Live
-from rich.progress import (
-    Progress,
-    SpinnerColumn,
-    BarColumn,
-    TextColumn,
-    TimeElapsedColumn,
-    TimeRemainingColumn,
-)
-from rich.table import Table
-from rich.panel import Panel
-from rich.text import Text
-from prompt_toolkit import PromptSession
-from prompt_toolkit.history import FileHistory
-from prompt_toolkit.lexers import PygmentsLexer
-from pygments.lexers.shell import BashLexer
-
 # 导入核心库
 sys.path.append(str(Path(__file__).parent.parent))
 from libgitmusic.events import EventEmitter
+from libgitmusic.event_history import EventHistory
+from libgitmusic import tracing
 from libgitmusic.metadata import MetadataManager
 from libgitmusic.object_store import ObjectStore
-from libgitmusic.audio import AudioIO
-from libgitmusic.hash_utils import HashUtils
 from libgitmusic.locking import LockManager
-from libgitmusic.transport import TransportAdapter
 from libgitmusic.context import Context, create_context
-from libgitmusic.commands import publish as publish_cmd
-from libgitmusic.commands import checkout as checkout_cmd
-from libgitmusic.commands import sync as sync_cmd
-from libgitmusic.commands import verify as verify_cmd
-from libgitmusic.commands import cleanup as cleanup_cmd
-from libgitmusic.commands import release as release_cmd
-from libgitmusic.commands import analyze as analyze_cmd
-from libgitmusic.commands import download as download_cmd
-from libgitmusic.commands import compress_images as compress_cmd
-from libgitmusic.git import git_commit_and_push, git_pull
 
-console = Console()
+if TYPE_CHECKING:
+    from libgitmusic.profiling import CommandProfiler
+
+
+class _LazyConsole:
+    """首次使用时才导入 rich 并创建 Console，--log-only 的脚本调用不加载 rich"""
+
+    _console = None
+
+    def __getattr__(self, name):
+        if _LazyConsole._console is None:
+            from rich.console import Console
+
+            _LazyConsole._console = Console()
+        return getattr(_LazyConsole._console, name)
+
+
+console = _LazyConsole()
 
 
 class Command:
@@ -149,12 +137,22 @@ class GitMusicCLI:
         self.commands: Dict[str, Command] = {}
         self._register_all_commands()
 
-        # 事件日志
-        self.event_log = []
-        # 最近事件（用于滚动显示）
-        self.recent_events = []
+        # 事件历史（有界，完整历史见 JSONL 日志）与错误汇总
+        self.event_history = EventHistory()
         # 统计信息
         self.summary_stats = {}
+        # 性能剖析选项（--profile 等全局参数）
+        self.profile = False
+        self.profile_memory = False
+        self.profile_subprocess = False
+        self.profile_top = 20
+        # log-only 事件的输出目标（常驻进程把事件写回客户端套接字），None 表示标准输出
+        self.event_sink: Optional[Callable[[Dict], None]] = None
+        # 运行指标（--metrics-file / --metrics-port），None 表示不收集
+        self.metrics = None
+        # 当前命令发出的 error 事件数（决定退出码）
+        self.error_count = 0
+        self.metrics_file: Optional[Path] = None
 
     def _inject_env(self):
         """注入环境变量供子进程使用"""
@@ -206,6 +204,15 @@ class GitMusicCLI:
 
     def _process_event_stream(self, process: subprocess.Popen, phase_name: str) -> int:
         """处理事件流并显示进度"""
+        from rich.progress import (
+            Progress,
+            SpinnerColumn,
+            BarColumn,
+            TextColumn,
+            TimeElapsedColumn,
+            TimeRemainingColumn,
+        )
+
         # log-only模式：直接输出原始JSONL，不渲染进度
         if self.log_only:
             if process.stdout is None:
@@ -227,11 +234,7 @@ class GitMusicCLI:
                     event = json.loads(line)
                     from libgitmusic.events import EventEmitter
 
-                    filtered_event = EventEmitter._filter_sensitive_data(event)
-                    json_str = json.dumps(filtered_event, ensure_ascii=False)
-                    if EventEmitter._log_file is not None:
-                        EventEmitter._log_file.write(json_str + "\n")
-                        EventEmitter._log_file.flush()
+                    EventEmitter.write_log(event)
                 except json.JSONDecodeError:
                     # 非JSON行，忽略或写入原始行？
                     pass
@@ -263,7 +266,7 @@ class GitMusicCLI:
 
                 try:
                     event = json.loads(line)
-                    self.event_log.append(event)
+                    self.event_history.add(event)
                     etype = event.get("type")
 
                     if etype == "phase_start":
@@ -380,6 +383,8 @@ class GitMusicCLI:
         # 1. publish命令 - 发布本地改动
         def publish_scan(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
             """扫描工作目录，分析变更"""
+            from libgitmusic.commands import publish as publish_cmd
+
             # 解析参数
             changed_only = False
             preview = False
@@ -413,23 +418,31 @@ class GitMusicCLI:
                     # 单项进度（用于execute_publish）
                     pass
 
-            # 调用库函数
-            items, error_msg = publish_cmd.publish_logic(
-                ctx.metadata_mgr,
-                changed_only=changed_only,
-                progress_callback=progress_callback,
-            )
-
-            if error_msg:
+            # 列出文件（立即执行，空目录等错误在此抛出）
+            files = publish_cmd.list_publish_files(ctx.metadata_mgr.context.work_dir)
+            if not files:
+                error_msg = "工作目录为空"
                 error_detail = {"error_type": "scan_failed", "message": error_msg}
                 EventEmitter.error(f"扫描失败: {error_msg}", error_detail)
                 # publish命令使用stop策略，抛出异常
                 raise RuntimeError(f"扫描失败: {error_msg}")
+            ctx.artifacts["publish_files"] = len(files)
+
+            # 逐个分析文件的迭代器，由下游步骤驱动
+            items_iter = publish_cmd.iter_publish_items(
+                ctx.metadata_mgr,
+                files,
+                changed_only=changed_only,
+                progress_callback=progress_callback,
+            )
 
             # 如果是预览模式，输出结果但不执行
             if preview:
+                items = list(items_iter)
                 # 显示publish预览表格（仅在非log-only模式）
                 if items and not ctx.log_only:
+                    from rich.table import Table
+
                     table = Table(title="Publish 预览", show_lines=True)
                     table.add_column("#", style="cyan", justify="right")
                     table.add_column("change", style="yellow")
@@ -468,53 +481,68 @@ class GitMusicCLI:
                 )
                 return iter([])
 
-            # 将items转换为迭代器
-            for item in items:
-                yield item
+            def stream():
+                count = 0
+                for item in items_iter:
+                    count += 1
+                    yield item
+                EventEmitter.result("ok", message=f"扫描完成，发现 {count} 个待处理项")
 
-            EventEmitter.result("ok", message=f"扫描完成，发现 {len(items)} 个待处理项")
+            return stream()
 
         def publish_process(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
-            """处理扫描结果，存储对象并更新元数据"""
-            items = list(input_iter)
-            if not items:
-                EventEmitter.result("ok", message="没有需要处理的项")
-                return iter([])
-
-            # 定义进度回调
-            processed = [0]
-            total = len(items)
+            """处理扫描结果，存储对象并更新元数据
+
+            扫描（哈希）、存储对象、更新元数据三个阶段并发流水执行：
+            扫描第 k+1 个文件的同时存储第 k 个文件，阶段之间用有界队列背压。
+            """
+            from libgitmusic.commands import publish as publish_cmd
+            from libgitmusic.layout import ShardLayout
+            from libgitmusic.pipeline import Stage, run_pipeline
+
+            cache_root = ctx.metadata_mgr.context.cache_root
+            layout = ShardLayout.load(cache_root, ctx.metadata_mgr.context.config)
+            # 总数取工作目录文件数（--changed-only 时为上限）
+            total = ctx.artifacts.get("publish_files", 0)
             EventEmitter.phase_start("process", total_items=total)
 
-            def progress_callback(filename):
-                processed[0] += 1
-                EventEmitter.batch_progress("process", processed[0], total)
-                EventEmitter.item_event(filename, "processing", "")
+            def store(item):
+                EventEmitter.item_event(item["path"].name, "processing", "")
+                return publish_cmd.store_item_objects(item, cache_root, layout)
 
-            # 调用库函数
+            def commit(item):
+                return publish_cmd.commit_item(ctx.metadata_mgr, item)
+
+            processed_oids = []
             try:
-                publish_cmd.execute_publish(
-                    ctx.metadata_mgr,
-                    items,
-                    progress_callback=progress_callback,
-                )
+                for item in run_pipeline(
+                    input_iter, [Stage("store", store), Stage("commit", commit)]
+                ):
+                    processed_oids.append(item["audio_oid"])
+                    EventEmitter.batch_progress("process", len(processed_oids), total)
             except Exception as e:
                 error_msg = f"处理失败: {str(e)}"
-                EventEmitter.error(error_msg, {"exception": str(e), "items_count": len(items)})
+                EventEmitter.error(
+                    error_msg, {"exception": str(e), "items_count": len(processed_oids)}
+                )
                 # publish命令使用stop策略，抛出异常
                 raise RuntimeError(error_msg) from e
+            finally:
+                # 存储处理过的audio_oid供后续步骤使用（失败时为已提交的部分）
+                ctx.artifacts["processed_audio_oids"] = processed_oids
 
-            # 存储处理过的audio_oid供后续步骤使用
-            ctx.artifacts["processed_audio_oids"] = [
-                item["audio_oid"] for item in items
-            ]
+            if not processed_oids:
+                EventEmitter.result("ok", message="没有需要处理的项")
+                return iter([])
 
-            EventEmitter.result("ok", message=f"处理完成 {len(items)} 个项")
+            EventEmitter.result("ok", message=f"处理完成 {len(processed_oids)} 个项")
             return iter([])
 
         # 2. checkout命令 - 检出音乐到工作目录
         def checkout_filter(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
             """根据参数过滤元数据条目"""
+            from libgitmusic.commands import checkout as checkout_cmd
+
             args = ctx.args
             query = ""
             missing_fields = []
@@ -569,6 +597,8 @@ class GitMusicCLI:
 
         def checkout_execute(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
             """执行检出操作"""
+            from libgitmusic.commands import checkout as checkout_cmd
+
             items = list(input_iter)
             if not items:
                 EventEmitter.result("ok", message="没有需要检出的条目")
@@ -626,6 +656,9 @@ class GitMusicCLI:
         # 3. sync命令 - 同步缓存
         def sync_step(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
             """执行同步操作"""
+            from libgitmusic.transport import TransportAdapter
+            from libgitmusic.commands import sync as sync_cmd
+
             # 解析参数
             direction = "both"
             dry_run = False
@@ -698,6 +731,8 @@ class GitMusicCLI:
         # verify命令 - 验证本地和远程文件完整性
         def verify_step(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
             """验证文件完整性"""
+            from libgitmusic.commands import verify as verify_cmd
+
             # 解析参数
             mode = "local"
             custom_path = None
@@ -746,6 +781,8 @@ class GitMusicCLI:
             # 显示verify报告表格（这里需要从verify_cmd获取详细结果）
             # 暂时显示摘要信息（仅在非log-only模式）
             if not ctx.log_only:
+                from rich.table import Table
+
                 table = Table(title="Verify 报告", show_lines=True)
                 table.add_column("file", style="white")
                 table.add_column("expected_oid", style="dim")
@@ -768,6 +805,8 @@ class GitMusicCLI:
         # git提交步骤 - 提交元数据更改
         def commit_step(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
             """提交元数据更改到Git"""
+            from libgitmusic.git import git_commit_and_push
+
             # 获取处理的audio_oids数量
             processed_audio_oids = ctx.artifacts.get("processed_audio_oids", [])
             count = len(processed_audio_oids)
@@ -821,10 +860,14 @@ class GitMusicCLI:
         # cleanup命令 - 清理孤立对象
         def cleanup_step(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
             """清理孤立对象"""
+            from libgitmusic.commands import cleanup as cleanup_cmd
+
             # 解析参数
             mode = "local"
             confirm = False
             dry_run = False
+            grace_period_days = None
+            include_history = None
             args = ctx.args
 
             i = 0
@@ -838,28 +881,31 @@ class GitMusicCLI:
                 elif args[i] == "--dry-run":
                     dry_run = True
                     i += 1
+                elif args[i] == "--grace-days" and i + 1 < len(args):
+                    try:
+                        grace_period_days = float(args[i + 1])
+                    except ValueError:
+                        EventEmitter.error(f"Invalid grace days: {args[i + 1]}")
+                        return iter([])
+                    i += 2
+                elif args[i] == "--history":
+                    include_history = True
+                    i += 1
+                elif args[i] == "--no-history":
+                    include_history = False
+                    i += 1
                 else:
                     i += 1
 
-            # 获取配置
-            cache_root = self.context.cache_root
-            metadata_file = self.context.metadata_file
-            transport_cfg = self.config.get("transport", {})
-            remote_user = transport_cfg.get("user")
-            remote_host = transport_cfg.get("host")
-            remote_data_root = transport_cfg.get("remote_data_root", "/srv/music/data")
-
             # 调用库函数
             try:
                 exit_code = cleanup_cmd.cleanup_logic(
-                    metadata_file=metadata_file,
-                    cache_root=cache_root,
+                    self.context,
                     mode=mode,
                     confirm=confirm,
                     dry_run=dry_run,
-                    remote_user=remote_user,
-                    remote_host=remote_host,
-                    remote_data_root=remote_data_root,
+                    grace_period_days=grace_period_days,
+                    include_history=include_history,
                 )
             except Exception as e:
                 error_msg = f"清理逻辑异常: {str(e)}"
@@ -872,6 +918,10 @@ class GitMusicCLI:
         # release命令 - 生成发布文件
         def release_step(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
             """生成发布文件"""
+            from libgitmusic.git import git_pull
+            from libgitmusic.release_profiles import load_release_profiles
+            from libgitmusic.commands import release as release_cmd
+
             # 解析参数
             mode = "local"
             conflict_strategy = "suffix"
@@ -882,6 +932,10 @@ class GitMusicCLI:
             search_filter = None
             force = False
             workers = 1
+            copy_mode = "auto"
+            executor = "auto"
+            since = None
+            selected_profiles: List[str] = []
             args = ctx.args
 
             i = 0
@@ -913,22 +967,66 @@ class GitMusicCLI:
                 elif args[i] == "--workers" and i + 1 < len(args):
                     workers = int(args[i + 1])
                     i += 2
+                elif args[i] == "--copy-mode" and i + 1 < len(args):
+                    copy_mode = args[i + 1]
+                    i += 2
+                elif args[i] == "--executor" and i + 1 < len(args):
+                    executor = args[i + 1]
+                    i += 2
+                elif args[i] == "--since" and i + 1 < len(args):
+                    since = args[i + 1]
+                    i += 2
+                elif args[i] == "--profile" and i + 1 < len(args):
+                    selected_profiles.extend(
+                        name.strip() for name in args[i + 1].split(",") if name.strip()
+                    )
+                    i += 2
                 else:
                     i += 1
 
-            # 获取发布目录
+            if copy_mode not in release_cmd.RELEASE_COPY_MODES:
+                EventEmitter.error(
+                    f"Invalid copy mode: {copy_mode}",
+                    {"valid_modes": list(release_cmd.RELEASE_COPY_MODES)},
+                )
+                return iter([])
+            if executor not in release_cmd.RELEASE_EXECUTORS:
+                EventEmitter.error(
+                    f"Invalid executor: {executor}",
+                    {"valid_executors": list(release_cmd.RELEASE_EXECUTORS)},
+                )
+                return iter([])
+
+            # 获取发布目录与发布配置
             release_dir = self.context.release_dir
-            if force and release_dir.exists():
-                # 清空目录
-                import shutil
-
-                for item in release_dir.iterdir():
-                    if item.is_file():
-                        item.unlink()
-                    elif item.is_dir():
-                        shutil.rmtree(item)
-                EventEmitter.log("info", f"Cleared release directory: {release_dir}")
-            release_dir.mkdir(parents=True, exist_ok=True)
+            try:
+                profiles = load_release_profiles(self.context.config, release_dir)
+            except ValueError as e:
+                EventEmitter.error(f"Invalid release profiles: {str(e)}")
+                return iter([])
+            if selected_profiles:
+                known = {profile.name for profile in profiles}
+                unknown = [name for name in selected_profiles if name not in known]
+                if unknown:
+                    EventEmitter.error(
+                        f"Unknown release profile: {', '.join(unknown)}",
+                        {"valid_profiles": sorted(known)},
+                    )
+                    return iter([])
+                profiles = [p for p in profiles if p.name in selected_profiles]
+
+            for profile_dir in [profile.release_dir for profile in profiles]:
+                if force and profile_dir.exists():
+                    # 清空目录
+                    import shutil
+
+                    for item in profile_dir.iterdir():
+                        if item.is_file():
+                            item.unlink()
+                        elif item.is_dir():
+                            shutil.rmtree(item)
+                    EventEmitter.log("info", f"Cleared release directory: {profile_dir}")
+                profile_dir.mkdir(parents=True, exist_ok=True)
 
             # 执行git pull（规范要求）
             try:
@@ -944,7 +1042,12 @@ class GitMusicCLI:
                 return iter([])
 
             # 调用库函数
+            plans = None
             try:
+                # 文件名基于全部元数据预先分配，release_logic 与 execute_release 共用
+                plans = release_cmd.build_release_plans(
+                    ctx.metadata_mgr.load_all(), profiles, conflict_strategy
+                )
                 entries_to_process, error_msg = release_cmd.release_logic(
                     metadata_mgr=ctx.metadata_mgr,
                     object_store=self.object_store,
@@ -956,6 +1059,9 @@ class GitMusicCLI:
                     hash_filter=hash_filter,
                     search_filter=search_filter,
                     dry_run=dry_run,
+                    plans=plans,
+                    profiles=profiles,
+                    since=since,
                 )
 
                 if error_msg:
@@ -974,12 +1080,20 @@ class GitMusicCLI:
                     "total_entries": len(entries_to_process),
                     "release_dir": str(release_dir),
                     "mode": mode,
+                    "profiles": [profile.name for profile in profiles],
                     "sample_entries": [
                         {
                             "title": e.get("title"),
                             "artists": e.get("artists"),
                             "audio_oid": e.get("audio_oid"),
-                            "filename": release_cmd.generate_release_filename(e),
+                            "filenames": {
+                                profile.name: (
+                                    plans[profile.name].filename_for(e)
+                                    if plans
+                                    else profile.filename(e)
+                                )
+                                for profile in profiles
+                            },
                         }
                         for e in entries_to_process[:5]
                     ],
@@ -1010,8 +1124,16 @@ class GitMusicCLI:
                     object_store=self.object_store,
                     release_dir=release_dir,
                     conflict_strategy=conflict_strategy,
-                    incremental=(mode == "incremental"),
+                    incremental=(mode == "incremental" or bool(since)),
                     progress_callback=progress_callback,
+                    workers=workers,
+                    copy_mode=copy_mode,
+                    executor=executor,
+                    plans=plans,
+                    profiles=profiles,
+                    transcode_workers=(
+                        self.context.config.get("release", {}) or {}
+                    ).get("transcode_workers"),
                 )
             except Exception as e:
                 # 对于release命令，使用continue策略，记录错误但不停止
@@ -1046,6 +1168,8 @@ class GitMusicCLI:
 
             # 显示release结果表格（仅在非log-only模式）
             if success_count > 0 and not ctx.log_only:
+                from rich.table import Table
+
                 table = Table(title="Release 结果", show_lines=True)
                 table.add_column("#", style="cyan", justify="right")
                 table.add_column("file", style="white")
@@ -1107,6 +1231,8 @@ class GitMusicCLI:
             ctx: StepContext, input_iter: Iterator
         ) -> Iterator[Dict]:
             """压缩封面图片"""
+            from libgitmusic.commands import compress_images as compress_cmd
+
             # 解析参数
             quality = 85
             max_width = 800
@@ -1251,6 +1377,8 @@ class GitMusicCLI:
         # analyze命令 - 分析元数据
         def analyze_step(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
             """分析元数据"""
+            from libgitmusic.commands import analyze as analyze_cmd
+
             # 解析参数
             query = ""
             search_field = None
@@ -1329,6 +1457,8 @@ class GitMusicCLI:
         # download命令 - 下载音频文件
         def download_step(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
             """下载音频文件"""
+            from libgitmusic.commands import download as download_cmd
+
             # 解析参数
             url = None
             batch_file = None
@@ -1431,71 +1561,190 @@ class GitMusicCLI:
             on_error="stop",
         )
 
+        # repack命令 - 将松散封面打包
+        def repack_step(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
+            """将松散封面合并进pack文件"""
+            from libgitmusic.commands import repack as repack_cmd
+
+            dry_run = "--dry-run" in ctx.args
+            repack_cmd.repack_logic(self.object_store, dry_run=dry_run)
+            return iter([])
+
+        self.register_command(
+            name="repack",
+            desc="将松散封面对象打包为pack文件",
+            steps=[repack_step],
+            requires_lock=True,
+            on_error="stop",
+        )
+
+        # reshard命令 - 迁移对象存储分片布局
+        def reshard_step(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
+            """迁移对象存储分片布局"""
+            from libgitmusic.commands import reshard as reshard_cmd
+
+            store_cfg = self.config.get("object_store", {}) or {}
+            depth = store_cfg.get("shard_depth", 1)
+            width = store_cfg.get("shard_width", 2)
+            dry_run = False
+            args = ctx.args
+
+            i = 0
+            while i < len(args):
+                if args[i] == "--depth" and i + 1 < len(args):
+                    depth = args[i + 1]
+                    i += 2
+                elif args[i] == "--width" and i + 1 < len(args):
+                    width = args[i + 1]
+                    i += 2
+                elif args[i] == "--dry-run":
+                    dry_run = True
+                    i += 1
+                else:
+                    i += 1
+
+            try:
+                depth = int(depth)
+                width = int(width)
+            except ValueError:
+                EventEmitter.error(f"Invalid shard layout: {depth}/{width}")
+                return iter([])
+
+            reshard_cmd.reshard_logic(
+                self.object_store, depth=depth, width=width, dry_run=dry_run
+            )
+            return iter([])
+
+        self.register_command(
+            name="reshard",
+            desc="迁移对象存储分片布局（硬链接在线迁移）",
+            steps=[reshard_step],
+            requires_lock=True,
+            on_error="stop",
+        )
+
+        # logs命令 - 查询与归档事件日志
+        def logs_step(ctx: StepContext, input_iter: Iterator) -> Iterator[Dict]:
+            """查询、归档或列出事件日志"""
+            from libgitmusic.commands import logs as logs_cmd
+
+            args = ctx.args
+            action = "query"
+            if args and not args[0].startswith("-"):
+                action, args = args[0], args[1:]
+            types: List[str] = []
+            levels: List[str] = []
+            options: Dict[str, Any] = {}
+            limit = logs_cmd.DEFAULT_QUERY_LIMIT
+
+            i = 0
+            while i < len(args):
+                if args[i] == "--type" and i + 1 < len(args):
+                    types.extend(t for t in args[i + 1].split(",") if t)
+                    i += 2
+                elif args[i] == "--level" and i + 1 < len(args):
+                    levels.extend(lv for lv in args[i + 1].split(",") if lv)
+                    i += 2
+                elif args[i] in ("--item", "--command", "--since", "--until", "--grep") and i + 1 < len(args):
+                    options[args[i][2:]] = args[i + 1]
+                    i += 2
+                elif args[i] == "--limit" and i + 1 < len(args):
+                    try:
+                        limit = int(args[i + 1])
+                    except ValueError:
+                        EventEmitter.error(f"Invalid limit: {args[i + 1]}")
+                        return iter([])
+                    i += 2
+                else:
+                    i += 1
+
+            log_file = EventEmitter._log_file
+            result = logs_cmd.logs_logic(
+                self.context.logs_dir,
+                self._archive_policy(),
+                action=action,
+                types=types or None,
+                levels=levels or None,
+                item=options.get("item"),
+                command=options.get("command"),
+                since=options.get("since"),
+                until=options.get("until"),
+                text=options.get("grep"),
+                limit=limit,
+                exclude=Path(log_file.name) if log_file is not None else None,
+            )
+
+            if result.get("events") and not ctx.log_only:
+                from rich.table import Table
+
+                table = Table(title="日志查询")
+                table.add_column("ts", style="dim")
+                table.add_column("type", style="cyan")
+                table.add_column("detail", style="white")
+                table.add_column("log", style="dim")
+                for event in result["events"]:
+                    detail = event.get("message") or event.get("id") or event.get("phase") or ""
+                    if event.get("type") == "item_event":
+                        detail = f"{event.get('id', '')} [{event.get('status', '')}]"
+                    elif event.get("type") == "log":
+                        detail = f"[{event.get('level', '')}] {detail}"
+                    table.add_row(
+                        str(event.get("ts", ""))[:19],
+                        str(event.get("type", "")),
+                        str(detail)[:100],
+                        event.get("_log", ""),
+                    )
+                console.print(table)
+            return iter([])
+
+        self.register_command(
+            name="logs",
+            desc="查询事件日志（跨归档），或压缩归档旧日志",
+            steps=[logs_step],
+            requires_lock=False,
+            on_error="continue",
+        )
+
+    def _archive_policy(self):
+        """配置中的日志归档策略（logging.archive），配置无效时使用默认值"""
+        from libgitmusic.log_archive import ArchivePolicy
+
+        try:
+            return ArchivePolicy.from_config(self.config)
+        except (ValueError, TypeError) as e:
+            EventEmitter.log("warn", f"Invalid logging.archive config: {e}")
+            return ArchivePolicy()
+
+    def _maintain_logs(self, policy):
+        """命令结束时归档旧日志（失败不影响命令结果）"""
+        from libgitmusic.log_archive import LogArchive
+
+        try:
+            LogArchive(self.context.logs_dir, policy).maintain()
+        except Exception as e:
+            EventEmitter.log("warn", f"Log archive maintenance failed: {e}")
+
     def _handle_event(self, event):
         """处理单个事件，更新日志和统计"""
+        if event.get("type") == "error":
+            self.error_count += 1
         # log-only模式：直接输出JSONL
         if self.log_only:
             from libgitmusic.events import EventEmitter
 
-            filtered_event = EventEmitter._filter_sensitive_data(event)
-            import json
-
-            json_str = json.dumps(filtered_event, ensure_ascii=False)
-            try:
-                sys.stdout.buffer.write(json_str.encode("utf-8"))
-                sys.stdout.buffer.write(b"\n")
-                sys.stdout.buffer.flush()
-            except:
-                print(json_str, flush=True)
+            if self.event_sink is not None:
+                self.event_sink(EventEmitter._filter_sensitive_data(event))
+            else:
+                # 由后台写线程批量写出，与日志文件共用一次过滤与序列化
+                EventEmitter.write_stdout(event)
             # 注意：不执行后续的rich渲染和统计更新
             return
 
-        # 添加到事件日志
-        self.event_log.append(event)
-
-        # 添加到最近事件列表（限制大小）
-        self.recent_events.append(event)
-        if len(self.recent_events) > 20:
-            self.recent_events.pop(0)
+        # 记录到有界事件历史（同时累加统计、收集错误汇总）
+        self.event_history.add(event)
 
-        # 收集错误信息（用于错误汇总）
         etype = event.get("type")
-        if etype == "error":
-            error_info = {
-                "type": "event_error",
-                "message": event.get("message", ""),
-                "context": event.get("context", {}),
-                "timestamp": event.get("ts", "")
-            }
-            if hasattr(self, 'command_errors'):
-                self.command_errors.append(error_info)
-        elif etype == "item_event":
-            status = event.get("status", "")
-            if status == "error":
-                error_info = {
-                    "type": "item_error",
-                    "item_id": event.get("id", ""),
-                    "message": event.get("message", ""),
-                    "timestamp": event.get("ts", "")
-                }
-                if hasattr(self, 'command_errors'):
-                    self.command_errors.append(error_info)
-
-        # 更新统计信息
-        if etype == "item_event":
-            self.summary_stats["items_processed"] = (
-                self.summary_stats.get("items_processed", 0) + 1
-            )
-            status = event.get("status", "")
-            if status == "error":
-                self.summary_stats["errors"] = self.summary_stats.get("errors", 0) + 1
-            elif status == "warn":
-                self.summary_stats["warnings"] = (
-                    self.summary_stats.get("warnings", 0) + 1
-                )
-        elif etype == "error":
-            self.summary_stats["errors"] = self.summary_stats.get("errors", 0) + 1
-        elif etype == "phase_start":
+        if etype == "phase_start":
             # 记录阶段开始时间
             phase = event.get("phase")
             if "phase_start_times" not in self.summary_stats:
@@ -1553,7 +1802,7 @@ class GitMusicCLI:
                             "error": str(e),
                             "type": "step_exception"
                         }
-                        self.command_errors.append(error_info)
+                        self.event_history.add_error(error_info)
                         EventEmitter.error(f"步骤 {i} 执行失败: {str(e)}", error_info)
                         
                         # 如果是continue或notify，尝试继续执行（返回空迭代器）
@@ -1578,7 +1827,7 @@ class GitMusicCLI:
                         "error": str(e),
                         "type": "step_exception"
                     }
-                    self.command_errors.append(error_info)
+                    self.event_history.add_error(error_info)
                     EventEmitter.error(f"步骤执行失败: {str(e)}", error_info)
 
     def _handle_command_exception(self, cmd, exception):
@@ -1597,24 +1846,28 @@ class GitMusicCLI:
             raise  # 重新抛出，中止执行
         else:
             # continue或notify：记录错误但不停止
-            self.command_errors.append(error_info)
+            self.event_history.add_error(error_info)
             EventEmitter.error(f"命令执行错误（继续执行）: {str(exception)}", error_info)
             if not self.log_only:
                 console.print(f"[yellow]命令执行错误（按{cmd.on_error}策略继续）: {str(exception)}[/yellow]")
 
     def _display_error_summary(self):
         """显示错误汇总"""
-        if not self.command_errors:
+        history = self.event_history
+        if not history.errors:
             return
             
         from rich.table import Table
         
-        table = Table(title=f"错误汇总 ({len(self.command_errors)} 个错误)", show_lines=True)
+        title = f"错误汇总 ({history.error_total} 个错误)"
+        if history.errors_dropped:
+            title += f"，仅显示最近 {len(history.errors)} 个，完整记录见日志文件"
+        table = Table(title=title, show_lines=True)
         table.add_column("类型", style="red")
         table.add_column("步骤", style="yellow")
         table.add_column("错误信息", style="white")
         
-        for error in self.command_errors:
+        for error in history.errors:
             error_type = error.get("type", "unknown")
             step_info = str(error.get("step", "-"))
             if "step_name" in error:
@@ -1627,12 +1880,14 @@ class GitMusicCLI:
 
     def _display_summary(self):
         """显示命令执行摘要"""
+        from rich.panel import Panel
+
         if not self.summary_stats:
             return
 
-        items_processed = self.summary_stats.get("items_processed", 0)
-        errors = self.summary_stats.get("errors", 0)
-        warnings = self.summary_stats.get("warnings", 0)
+        items_processed = self.event_history.items_processed
+        errors = self.event_history.error_count
+        warnings = self.event_history.warning_count
 
         # 计算耗时
         start_time = self.summary_stats.get("start_time")
@@ -1669,7 +1924,8 @@ class GitMusicCLI:
         console.print(summary_panel)
 
         # 显示最近事件（如果有）
-        if self.recent_events:
+        recent_events = self.event_history.tail(10)
+        if recent_events:
             from rich.table import Table as RichTable
 
             recent_table = RichTable(title="最近事件（最多20条）", show_lines=True)
@@ -1678,7 +1934,7 @@ class GitMusicCLI:
             recent_table.add_column("状态", style="yellow")
             recent_table.add_column("消息", style="white")
 
-            for event in self.recent_events[-10:]:  # 只显示最后10条
+            for event in recent_events:  # 只显示最后10条
                 ts = event.get("ts", "")[:19]  # 截取日期时间部分
                 etype = event.get("type", "")
                 status = event.get("status", "")
@@ -1687,30 +1943,97 @@ class GitMusicCLI:
 
             console.print(recent_table)
 
-    def run_command(self, name: str, args: List[str]):
-        """执行命令"""
+    def _report_profile(self, profiler: "CommandProfiler"):
+        """记录剖析报告路径，并在非log-only模式下显示热点摘要"""
+        from rich.table import Table
+
+        if profiler.report_path is None:
+            return
+        EventEmitter.log(
+            "info",
+            f"Profile written: {profiler.prof_path} ({profiler.report_path.name})",
+        )
+        if self.log_only:
+            return
+
+        summary = profiler.summary
+        table = Table(title=f"性能剖析（耗时 {summary['elapsed_sec']:.2f}秒，按累计时间）")
+        table.add_column("函数", style="cyan")
+        table.add_column("调用次数", justify="right")
+        table.add_column("自身耗时", justify="right")
+        table.add_column("累计耗时", justify="right", style="yellow")
+        for item in summary["functions"]:
+            table.add_row(
+                item["function"],
+                str(item["calls"]),
+                f"{item['tottime']:.3f}",
+                f"{item['cumtime']:.3f}",
+            )
+        console.print(table)
+
+        if summary["allocations"]:
+            table = Table(title=f"内存分配热点（峰值 {summary['peak_memory']} 字节）")
+            table.add_column("位置", style="cyan")
+            table.add_column("字节", justify="right", style="yellow")
+            table.add_column("块数", justify="right")
+            for item in summary["allocations"]:
+                table.add_row(item["location"], str(item["size"]), str(item["count"]))
+            console.print(table)
+
+        if summary["subprocesses"]:
+            table = Table(title="外部进程")
+            table.add_column("程序", style="cyan")
+            table.add_column("次数", justify="right")
+            table.add_column("总耗时", justify="right", style="yellow")
+            table.add_column("最长", justify="right")
+            for item in summary["subprocesses"]:
+                table.add_row(
+                    item["program"],
+                    str(item["count"]),
+                    f"{item['total_sec']:.3f}",
+                    f"{item['max_sec']:.3f}",
+                )
+            console.print(table)
+
+        console.print(f"[dim]剖析报告: {profiler.report_path}[/dim]")
+
+    def run_command(self, name: str, args: List[str]) -> int:
+        """
+        执行命令
+
+        Args:
+            name: 命令名
+            args: 命令参数
+
+        Returns:
+            退出码：0 成功，1 命令期间发出过 error 事件或无法获取锁，2 未知命令
+            （本进程与常驻进程执行使用同一退出码）
+        """
         if name == "help":
             self.show_help()
-            return
+            return 0
 
         if name not in self.commands:
             console.print(f"[red]未知命令: {name}[/red]")
-            return
+            return 2
 
         cmd = self.commands[name]
 
         # 重置统计信息和事件日志
-        self.event_log.clear()
-        self.recent_events.clear()
+        self.error_count = 0
+        self.event_history.clear()
         self.summary_stats.clear()
-        
-        # 重置错误收集
-        self.command_errors = []
+        tracing.reset()
+        # 上一个命令之后对象目录可能被其他途径改动（transport 下载、外部进程）：
+        # 指纹变化时丢弃索引，下次需要时重建
+        self.object_store.refresh_index()
 
         # 注册事件监听器
         from libgitmusic.events import EventEmitter
 
-        # 启动日志文件记录
+        # 启动日志文件记录（超过大小上限时切换分片）
+        archive_policy = self._archive_policy()
+        EventEmitter.set_log_rotation(int(archive_policy.max_file_mb * 1024 * 1024))
         EventEmitter.start_log_file(command_name=name)
 
         EventEmitter.register_listener(self._handle_event)
@@ -1730,15 +2053,13 @@ class GitMusicCLI:
         # 处理帮助请求
         if "--help" in args or "-h" in args:
             self.show_command_help(name)
-            return
+            return 0
 
         # 处理命令别名重定向
         if name == "push":
-            self.run_command("sync", ["--direction=upload"] + args)
-            return
+            return self.run_command("sync", ["--direction=upload"] + args)
         elif name == "pull":
-            self.run_command("sync", ["--direction=download"] + args)
-            return
+            return self.run_command("sync", ["--direction=download"] + args)
 
         # 创建执行上下文
         ctx = StepContext(
@@ -1752,12 +2073,17 @@ class GitMusicCLI:
             log_only=self.log_only,
         )
 
+        # 指标只在命令执行期间监听事件（常驻监听器会接管无监听时的标准输出）
+        if self.metrics is not None:
+            self.metrics.command = name
+            EventEmitter.register_listener(self.metrics)
+
         try:
             # 获取锁（如果需要）
             if cmd.requires_lock:
                 if not self.lock_manager.acquire_metadata_lock(timeout=30):
                     console.print("[red]无法获取元数据锁，可能有其他进程正在运行[/red]")
-                    return
+                    return 1
 
             # 执行步骤链
             if cmd.steps:
@@ -1765,7 +2091,23 @@ class GitMusicCLI:
                     console.print(f"[bold cyan]执行命令: {name}[/bold cyan]")
 
                 # 根据on_error策略执行步骤
-                self._execute_steps_with_error_handling(cmd, ctx)
+                if self.profile:
+                    from libgitmusic.profiling import CommandProfiler
+
+                    profiler = CommandProfiler(
+                        self.context.logs_dir,
+                        name,
+                        memory=self.profile_memory,
+                        subprocesses=self.profile_subprocess,
+                        top=self.profile_top,
+                    )
+                    try:
+                        with profiler:
+                            self._execute_steps_with_error_handling(cmd, ctx)
+                    finally:
+                        self._report_profile(profiler)
+                else:
+                    self._execute_steps_with_error_handling(cmd, ctx)
 
                 if not self.log_only:
                     console.print(f"[green]命令执行完成: {name}[/green]")
@@ -1785,20 +2127,109 @@ class GitMusicCLI:
             if not self.log_only:
                 self._display_summary()
                 # 显示错误汇总（如果有错误且on_error不是stop）
-                if self.command_errors and cmd.on_error in ["continue", "notify"]:
+                if self.event_history.errors and cmd.on_error in ["continue", "notify"]:
                     self._display_error_summary()
+            # 压缩旧日志（在注销监听器之前，维护事件记入本次日志）
+            self._maintain_logs(archive_policy)
             # 注销事件监听器
             from libgitmusic.events import EventEmitter
 
             EventEmitter.unregister_listener(self._handle_event)
+            if self.metrics is not None:
+                self._finish_metrics(name)
             # 停止日志记录
             EventEmitter.stop_logging()
             # 释放锁
             if cmd.requires_lock:
                 self.lock_manager.release_metadata_lock()
+        return 1 if self.error_count else 0
+
+    def _finish_metrics(self, name: str):
+        """记录命令耗时并写出指标文件"""
+        from libgitmusic.events import EventEmitter
+
+        EventEmitter.unregister_listener(self.metrics)
+        self.metrics.command_finished(name, time.time() - self.summary_stats["start_time"])
+        self.metrics.command = None
+        if self.metrics_file is not None:
+            try:
+                self.metrics.registry.write_textfile(self.metrics_file)
+            except OSError as e:
+                EventEmitter.log("warn", f"Failed to write metrics file: {str(e)}")
+
+    def handle_request(self, request: Dict, send: Callable[[Dict], None]) -> int:
+        """
+        常驻进程的请求处理：在客户端的工作目录执行命令，事件写回客户端
+
+        Args:
+            request: 请求（command、args、cwd）
+            send: 事件发送函数
+
+        Returns:
+            run_command 的退出码（与本进程内执行相同）
+        """
+        name = request["command"]
+        args = [str(a) for a in request.get("args", [])]
+        if name not in self.commands:
+            send({"type": "error", "message": f"Unknown command: {name}"})
+            return 2
+
+        cwd = os.getcwd()
+        self.event_sink = send
+        try:
+            os.chdir(request.get("cwd") or cwd)
+            return self.run_command(name, args)
+        finally:
+            self.event_sink = None
+            os.chdir(cwd)
+
+    def serve(self, socket_path: Path) -> int:
+        """
+        以常驻进程运行：元数据与对象索引保持在内存中，通过本地套接字接受命令
+
+        Args:
+            socket_path: Unix 套接字路径
+
+        Returns:
+            退出码
+        """
+        import signal
+        import threading
+        from libgitmusic.daemon import DaemonServer
+
+        server = DaemonServer(socket_path, self.handle_request)
+        try:
+            server.bind()
+        except (RuntimeError, OSError) as e:
+            EventEmitter.error(str(e), {"socket": str(socket_path)})
+            return 1
+
+        # 预热：解析元数据（写入缓存）并扫描对象目录
+        self.metadata_mgr.load_all()
+        self.object_store.build_index()
+
+        # SIGTERM 时从其他线程停止服务（信号处理函数运行在 serve_forever 所在线程）
+        signal.signal(
+            signal.SIGTERM,
+            lambda *_: threading.Thread(target=server.shutdown, daemon=True).start(),
+        )
+        EventEmitter.log("info", f"Daemon listening on {socket_path} (pid {os.getpid()})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        EventEmitter.log("info", "Daemon stopped")
+        return 0
 
     def repl(self):
         """REPL交互模式"""
+        from prompt_toolkit import PromptSession
+        from prompt_toolkit.history import FileHistory
+        from prompt_toolkit.lexers import PygmentsLexer
+        from pygments.lexers.shell import BashLexer
+        from rich.panel import Panel
+        from rich.text import Text
+
         # 延迟初始化PromptSession，避免Windows终端问题
         if self.session is None:
             self.session = PromptSession(
@@ -1834,6 +2265,9 @@ class GitMusicCLI:
 
     def show_command_help(self, name: str):
         """显示命令详细帮助"""
+        from rich.panel import Panel
+        from rich.text import Text
+
         if name not in self.commands:
             console.print(f"[red]未知命令: {name}[/red]")
             return
@@ -1857,6 +2291,15 @@ class GitMusicCLI:
   --dry-run       仅显示差异
   --timeout <n>   单文件超时时间
   --workers <n>   并行线程数""",
+            "logs": """[bold]用法:[/bold] logs [query|archive|index] [选项]
+  --type <t,...>   事件类型 (log,error,item_event,result...)
+  --level <l,...>  日志级别 (debug,info,warn,error)
+  --item <id>      item id（子串匹配）
+  --command <c>    命令名
+  --since <t>      起始时间（ISO 或 30m/12h/7d）
+  --until <t>      结束时间
+  --grep <text>    子串过滤
+  --limit <n>      最多返回的事件数（默认100）""",
             "push": "[bold]别名:[/bold] sync --direction=upload",
             "pull": "[bold]别名:[/bold] sync --direction=download",
         }
@@ -1868,6 +2311,8 @@ class GitMusicCLI:
 
     def show_help(self):
         """显示所有命令帮助"""
+        from rich.table import Table
+
         table = Table(title="可用命令")
         table.add_column("命令", style="cyan")
         table.add_column("描述", style="green")
@@ -1880,6 +2325,41 @@ class GitMusicCLI:
         console.print("\n使用 'help <命令名>' 查看详细选项")
 
 
+def _use_daemon(args) -> bool:
+    """是否尝试把命令交给常驻进程（只有纯 JSONL 输出的调用可以原样转发）"""
+    return bool(
+        args.log_only
+        and args.command
+        and args.command not in ("serve", "help")
+        and "--help" not in args.args
+        and "-h" not in args.args
+        and not args.no_daemon
+        # 以下选项作用于本进程（日志目录、trace、剖析），不转发
+        and not (args.logs_dir or args.trace or args.progress_rate is not None)
+        and not (args.tool_output or args.profile or args.profile_memory)
+        and not args.profile_subprocess
+        and not (args.metrics_file or args.metrics_port is not None)
+    )
+
+
+def _run_via_daemon(command: str, args: List[str]) -> Optional[int]:
+    """
+    通过常驻进程执行命令，事件原样输出到标准输出
+
+    Returns:
+        退出码；没有常驻进程在监听时返回 None
+    """
+    from libgitmusic import daemon
+
+    def write(event: Dict) -> None:
+        sys.stdout.buffer.write(json.dumps(event, ensure_ascii=False).encode("utf-8"))
+        sys.stdout.buffer.write(b"\n")
+        sys.stdout.buffer.flush()
+
+    project_root = Path(__file__).resolve().parent.parent.parent
+    return daemon.request(daemon.default_socket_path(project_root), command, args, write)
+
+
 def main():
     """主函数"""
     import argparse
@@ -1910,25 +2390,112 @@ def main():
         "--log-only", action="store_true", help="仅输出JSONL日志，不渲染人类友好界面"
     )
     parser.add_argument("--logs-dir", help="日志目录路径")
+    parser.add_argument(
+        "--progress-rate",
+        type=float,
+        help="每个阶段每秒最多输出的进度事件数（0表示不限制，默认4）",
+    )
+    parser.add_argument(
+        "--tool-output",
+        action="store_true",
+        help="把ffmpeg等外部工具的输出记录为debug日志事件",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="把各阶段span写出为Chrome trace-event JSON（chrome://tracing / Perfetto）",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="在cProfile下运行命令，把.prof和文本报告写入日志目录并显示热点摘要",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="同时用tracemalloc统计内存分配热点（隐含--profile）",
+    )
+    parser.add_argument(
+        "--profile-subprocess",
+        action="store_true",
+        help="同时记录ffmpeg/ssh/scp等外部进程的次数与耗时（隐含--profile）",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=20,
+        help="剖析摘要显示的条目数（默认20）",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="FILE",
+        help="每个命令结束后写出Prometheus textfile指标（.prom，供node_exporter采集）",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="在127.0.0.1上提供HTTP /metrics（配合serve常驻进程使用）",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="不连接常驻进程（serve），始终在本进程内执行",
+    )
     parser.add_argument("command", nargs="?", help="命令名称")
     parser.add_argument("args", nargs=argparse.REMAINDER, help="命令参数")
 
     args = parser.parse_args()
 
+    # 脚本化调用（--log-only）优先交给常驻进程执行，没有常驻进程时在本进程内执行
+    if _use_daemon(args):
+        exit_code = _run_via_daemon(args.command, args.args)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
     # 创建CLI实例，传递log_only参数
-    cli = GitMusicCLI(log_only=args.log_only)
+    cli = GitMusicCLI(log_only=args.log_only or args.command == "serve")
+
+    if args.progress_rate is not None:
+        EventEmitter.set_progress_rate(args.progress_rate)
+    if args.tool_output:
+        EventEmitter.set_tool_output(True)
+    if args.trace:
+        tracing.start_trace()
+    cli.profile = args.profile or args.profile_memory or args.profile_subprocess
+    cli.profile_memory = args.profile_memory
+    cli.profile_subprocess = args.profile_subprocess
+    cli.profile_top = args.profile_top
+    if args.metrics_file or args.metrics_port is not None:
+        from libgitmusic.metrics import EventMetrics, MetricsRegistry
+
+        cli.metrics = EventMetrics(MetricsRegistry())
+        if args.metrics_file:
+            cli.metrics_file = Path(args.metrics_file).resolve()
+        if args.metrics_port is not None:
+            cli.metrics.registry.serve_http(args.metrics_port)
 
     # 覆盖日志目录配置（如果命令行指定）
     if args.logs_dir:
         cli.context.logs_dir = Path(args.logs_dir).resolve()
-        from libgitmusic.events import EventEmitter
-
         EventEmitter.setup_logging(logs_dir=cli.context.logs_dir, log_only=cli.log_only)
 
-    if args.command:
-        cli.run_command(args.command, args.args)
-    else:
-        cli.repl()
+    if args.command == "serve":
+        from libgitmusic.daemon import default_socket_path
+
+        sys.exit(cli.serve(default_socket_path(cli.project_root.resolve())))
+
+    exit_code = 0
+    try:
+        if args.command:
+            exit_code = cli.run_command(args.command, args.args)
+        else:
+            cli.repl()
+    finally:
+        if args.trace:
+            count = tracing.export_chrome_trace(Path(args.trace))
+            if not cli.log_only:
+                console.print(f"[dim]trace: {count} spans -> {args.trace}[/dim]")
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,372 @@
+"""
+发布吞吐基准测试
+
+在临时目录中生成合成对象存储（进程内构造的合法 MP3 帧、按对数正态分布取大小的封面、
+N 条元数据），然后分别测量 release_logic 与 execute_release 在以下模式下的耗时：
+
+    full         - 空发布目录全量生成
+    incremental  - 无变化的增量运行（扫描与清单命中开销）
+    touched      - 修改 --touch 比例的条目后增量运行（原地重写标签路径）
+
+每个 (模式, workers) 组合在独立的 spawn 子进程中运行，以便分别统计峰值 RSS。
+结果以 JSON 输出：条目数/秒、文件数/秒、字节数/秒、峰值 RSS。
+
+用法:
+    python tests/benchmarks/release_benchmark.py --entries 2000 --max-workers 4
+    python tests/benchmarks/release_benchmark.py --workers 1,4 --output bench.json
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "repo"))
+from libgitmusic.commands import release as release_cmd
+from libgitmusic.context import Context
+from libgitmusic.events import EventEmitter
+from libgitmusic.metadata import MetadataManager
+from libgitmusic.object_store import ObjectStore
+from libgitmusic.release_profiles import ReleaseProfile
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz 帧头；每帧 417 字节，约 26ms
+FRAME_HEADER = b"\xff\xfb\x90\x64"
+FRAME_SIZE = 417
+# 封面大小分布：中位数约 120KB，截断到 [8KB, 3MB]
+COVER_MEDIAN = 120 * 1024
+COVER_SIGMA = 0.8
+COVER_MIN = 8 * 1024
+COVER_MAX = 3 * 1024 * 1024
+
+MODES = ("full", "incremental", "touched")
+
+
+def _context(root: Path, release_dir: Optional[Path] = None) -> Context:
+    return Context(
+        project_root=root,
+        config={},
+        work_dir=root / "work",
+        cache_root=root / "cache",
+        metadata_file=root / "metadata.jsonl",
+        release_dir=release_dir or root / "release",
+        logs_dir=root / "logs",
+    )
+
+
+def discard_event(event: Dict) -> None:
+    """空监听器：注册后事件不再以 JSONL 写到标准输出"""
+
+
+def _silence_events() -> None:
+    EventEmitter.unregister_listener(discard_event)
+    EventEmitter.register_listener(discard_event)
+
+
+def make_audio(rng: random.Random, frames: int) -> bytes:
+    """生成由相同帧头、随机负载组成的 MP3 数据（负载按条目不同，保证哈希唯一）"""
+    payload = rng.randbytes(FRAME_SIZE - len(FRAME_HEADER))
+    return (FRAME_HEADER + payload) * frames
+
+
+def make_cover(rng: random.Random) -> bytes:
+    """生成带 JPEG SOI/EOI 标记的随机封面数据"""
+    size = int(rng.lognormvariate(0, COVER_SIGMA) * COVER_MEDIAN)
+    size = max(COVER_MIN, min(COVER_MAX, size))
+    return b"\xff\xd8\xff\xe0" + rng.randbytes(size - 6) + b"\xff\xd9"
+
+
+def build_corpus(
+    root: Path,
+    entries: int,
+    frames: int = 400,
+    tracks_per_album: int = 10,
+    seed: int = 1,
+) -> Dict:
+    """
+    在 root 下生成对象存储与 metadata.jsonl
+
+    Args:
+        root: 语料根目录
+        entries: 条目数量
+        frames: 每个音频的平均帧数（实际在 0.5x ~ 1.5x 之间）
+        tracks_per_album: 每张专辑的曲目数（同专辑共用封面）
+        seed: 随机种子
+
+    Returns:
+        语料统计（条目数、封面数、音频与封面字节数、生成耗时）
+    """
+    _silence_events()
+    rng = random.Random(seed)
+    context = _context(root)
+    store = ObjectStore(context)
+    staging = root / "staging"
+    staging.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    stats = {"entries": entries, "covers": 0, "audio_bytes": 0, "cover_bytes": 0}
+    metadata = []
+    cover_oid = None
+    for i in range(entries):
+        album = i // tracks_per_album
+        if i % tracks_per_album == 0:
+            cover = make_cover(rng)
+            cover_oid = store.store_cover(cover).oid
+            stats["covers"] += 1
+            stats["cover_bytes"] += len(cover)
+
+        audio = make_audio(rng, max(1, int(frames * rng.uniform(0.5, 1.5))))
+        path = staging / f"{hashlib.sha256(audio).hexdigest()}.mp3"
+        path.write_bytes(audio)
+        audio_oid = store.store_audio(path, compute_hash=False).oid
+        path.unlink()
+        stats["audio_bytes"] += len(audio)
+
+        metadata.append(
+            {
+                "audio_oid": audio_oid,
+                "cover_oid": cover_oid,
+                "title": f"Track {i:05d}",
+                "artists": [f"Artist {album % 97}"],
+                "album": f"Album {album}",
+                "date": f"{2000 + album % 25}-01-01",
+                "created_at": "2024-01-01T00:00:00Z",
+            }
+        )
+
+    MetadataManager(context).save_all(metadata)
+    staging.rmdir()
+    stats["build_seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def touch_metadata(root: Path, fraction: float, seed: int) -> int:
+    """切换一部分条目的专辑名（重复调用总会产生变化），返回修改的条目数"""
+    metadata_mgr = MetadataManager(_context(root))
+    entries = metadata_mgr.load_all()
+    rng = random.Random(seed)
+    count = max(1, int(len(entries) * fraction)) if entries else 0
+    for entry in rng.sample(entries, count):
+        album = entry["album"]
+        entry["album"] = (
+            album[: -len(" (Remastered)")]
+            if album.endswith(" (Remastered)")
+            else album + " (Remastered)"
+        )
+    metadata_mgr.save_all(entries)
+    return count
+
+
+def _peak_rss() -> Optional[int]:
+    """本进程及其已回收子进程（进程池 worker）的峰值 RSS，单位字节"""
+    if resource is None:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * scale
+
+
+def run_case(
+    root: Path,
+    mode: str,
+    workers: int,
+    executor: str = "auto",
+    touch: float = 0.05,
+    seed: int = 1,
+) -> Dict:
+    """
+    运行一次发布并计时
+
+    Args:
+        root: build_corpus 生成的语料根目录
+        mode: full / incremental / touched
+        workers: 并行数
+        executor: 并行方式
+        touch: touched 模式下修改的条目比例
+        seed: touched 模式选择条目的随机种子
+
+    Returns:
+        单次运行的计时结果
+    """
+    _silence_events()
+    release_dir = root / f"release-w{workers}"
+    if mode == "full" and release_dir.exists():
+        shutil.rmtree(release_dir)
+    release_dir.mkdir(parents=True, exist_ok=True)
+    if mode == "touched":
+        touch_metadata(root, touch, seed + workers)
+
+    context = _context(root, release_dir)
+    metadata_mgr = MetadataManager(context)
+    store = ObjectStore(context)
+    profiles = [ReleaseProfile.default(release_dir)]
+
+    started = time.perf_counter()
+    all_entries = metadata_mgr.load_all()
+    plans = release_cmd.build_release_plans(all_entries, profiles, "suffix")
+    entries, error = release_cmd.release_logic(
+        metadata_mgr,
+        store,
+        release_dir,
+        mode="local" if mode == "full" else "incremental",
+        plans=plans,
+        profiles=profiles,
+    )
+    if error:
+        raise RuntimeError(error)
+    planned = time.perf_counter()
+    succeeded, total = release_cmd.execute_release(
+        entries,
+        store,
+        release_dir,
+        incremental=(mode != "full"),
+        workers=workers,
+        executor=executor,
+        plans=plans,
+        profiles=profiles,
+    )
+    finished = time.perf_counter()
+
+    plan = plans[profiles[0].name]
+    written = 0
+    for entry in entries:
+        filename = plan.filename_for(entry)
+        if filename and (release_dir / filename).exists():
+            written += (release_dir / filename).stat().st_size
+
+    seconds = finished - started
+    return {
+        "mode": mode,
+        "workers": workers,
+        "executor": release_cmd.resolve_executor(executor, workers, total),
+        "entries": len(all_entries),
+        "files": total,
+        "succeeded": succeeded,
+        "bytes": written,
+        "plan_seconds": round(planned - started, 4),
+        "execute_seconds": round(finished - planned, 4),
+        "seconds": round(seconds, 4),
+        # 无变化的增量运行没有生成文件，以条目数/秒衡量扫描开销
+        "entries_per_second": round(len(all_entries) / seconds, 2) if seconds else None,
+        "files_per_second": round(total / seconds, 2) if seconds else None,
+        "bytes_per_second": round(written / seconds) if seconds else None,
+        "peak_rss_bytes": _peak_rss(),
+    }
+
+
+def _worker_counts(args: argparse.Namespace) -> List[int]:
+    if args.workers:
+        return sorted({int(w) for w in args.workers.split(",") if w.strip()})
+    counts = []
+    workers = 1
+    while workers < args.max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(args.max_workers)
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="发布吞吐基准测试")
+    parser.add_argument("--entries", type=int, default=500, help="条目数量")
+    parser.add_argument("--frames", type=int, default=400, help="每个音频的平均帧数")
+    parser.add_argument(
+        "--tracks-per-album", type=int, default=10, help="每张专辑的曲目数"
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="最大并行数 K（测量 1, 2, 4 ... K）",
+    )
+    parser.add_argument("--workers", help="逗号分隔的并行数列表（覆盖 --max-workers）")
+    parser.add_argument(
+        "--executor",
+        choices=list(release_cmd.RELEASE_EXECUTORS),
+        default="auto",
+        help="并行方式",
+    )
+    parser.add_argument(
+        "--touch", type=float, default=0.05, help="touched 模式修改的条目比例"
+    )
+    parser.add_argument(
+        "--modes", default=",".join(MODES), help="逗号分隔的模式列表"
+    )
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--root", help="语料目录（保留，缺省使用临时目录）")
+    parser.add_argument("--output", help="结果 JSON 文件（缺省输出到标准输出）")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"unknown mode: {', '.join(unknown)}")
+
+    root = Path(args.root) if args.root else Path(tempfile.mkdtemp(prefix="gitmusic_bench_"))
+    spawn = multiprocessing.get_context("spawn")
+    try:
+        print(f"Building corpus of {args.entries} entries in {root}", file=sys.stderr)
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=spawn) as pool:
+            corpus = pool.submit(
+                build_corpus,
+                root,
+                args.entries,
+                args.frames,
+                args.tracks_per_album,
+                args.seed,
+            ).result()
+
+        results = []
+        for workers in _worker_counts(args):
+            for mode in modes:
+                # 每个组合使用新的子进程，峰值 RSS 互不影响
+                with concurrent.futures.ProcessPoolExecutor(
+                    1, mp_context=spawn
+                ) as pool:
+                    result = pool.submit(
+                        run_case, root, mode, workers, args.executor, args.touch, args.seed
+                    ).result()
+                print(
+                    f"{mode:>12} workers={workers:<3} {result['files']:>6} files "
+                    f"{result['seconds']:>8.3f}s {result['files_per_second'] or 0:>9.1f} files/s",
+                    file=sys.stderr,
+                )
+                results.append(result)
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "corpus": corpus,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
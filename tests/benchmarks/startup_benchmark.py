@@ -0,0 +1,182 @@
+"""
+CLI 冷启动基准测试
+
+每个用例在新的解释器进程中重复运行，报告墙钟耗时的最小值 / 中位数（毫秒），
+并用 -X importtime 列出该用例导入的重量级依赖（rich、prompt_toolkit、mutagen、yaml 等），
+用于发现意外的提前导入。用例在当前工作树上运行（使用 repo/metadata.jsonl）。
+
+    import        - import libgitmusic
+    cli-import    - 导入 tools/cli.py 模块并创建 GitMusicCLI（不含脚本编译）
+    analyze-stats - python tools/cli.py --log-only analyze --mode stats
+    verify        - python tools/cli.py --log-only verify
+
+直接运行脚本时 tools/cli.py 作为 __main__ 每次都要重新编译（无字节码缓存），
+因此脚本用例比 cli-import 多出这部分时间。
+
+用法:
+    python tests/benchmarks/startup_benchmark.py --runs 20
+    python tests/benchmarks/startup_benchmark.py --budget-ms 150 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+REPO_DIR = Path(__file__).resolve().parent.parent.parent / "repo"
+CLI = REPO_DIR / "tools" / "cli.py"
+# 脚本用例的事件日志写到临时目录，不污染项目的 logs/
+LOGS_DIR = Path(tempfile.gettempdir()) / "gitmusic_startup_bench"
+
+# 不应在脚本化调用中出现的重量级依赖
+HEAVY_MODULES = ("rich", "prompt_toolkit", "pygments", "mutagen", "yaml", "PIL")
+
+CASES = {
+    "import": ["-c", f"import sys; sys.path.insert(0, {str(REPO_DIR)!r}); import libgitmusic"],
+    "cli-import": [
+        "-c",
+        f"import sys; sys.path.insert(0, {str(CLI.parent)!r}); import cli; "
+        "cli.GitMusicCLI(log_only=True)",
+    ],
+    "analyze-stats": [
+        str(CLI), "--log-only", "--logs-dir", str(LOGS_DIR), "analyze", "--mode", "stats"
+    ],
+    "verify": [str(CLI), "--log-only", "--logs-dir", str(LOGS_DIR), "verify"],
+}
+# 计入 --budget-ms 检查的用例
+BUDGET_CASES = ("analyze-stats", "verify")
+
+
+def measure(args: List[str], runs: int) -> Dict:
+    """
+    在新进程中重复运行一个用例
+
+    Args:
+        args: python 之后的命令行参数
+        runs: 运行次数
+
+    Returns:
+        {runs, min_ms, median_ms, max_ms}
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            cwd=REPO_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": runs,
+        "min_ms": round(min(timings), 1),
+        "median_ms": round(statistics.median(timings), 1),
+        "max_ms": round(max(timings), 1),
+    }
+
+
+def loaded_modules(args: List[str]) -> List[str]:
+    """
+    用 -X importtime 运行一次用例，返回导入的全部模块名
+
+    Args:
+        args: python 之后的命令行参数
+
+    Returns:
+        模块名列表（按导入完成顺序）
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=REPO_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    pattern = re.compile(r"^import time:\s+\d+ \|\s+\d+ \|\s*(\S+)")
+    return [m.group(1) for m in map(pattern.match, result.stderr.splitlines()) if m]
+
+
+def heavy_imports(modules: List[str]) -> List[str]:
+    """返回 modules 中出现的重量级顶层包"""
+    top = {name.split(".")[0] for name in modules}
+    return [name for name in HEAVY_MODULES if name in top]
+
+
+def run_case(name: str, runs: int) -> Dict:
+    """测量一个用例的耗时与重量级导入"""
+    args = CASES[name]
+    result = {"case": name, **measure(args, runs)}
+    result["heavy_imports"] = heavy_imports(loaded_modules(args))
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="CLI 冷启动基准测试")
+    parser.add_argument("--runs", type=int, default=10, help="每个用例的运行次数")
+    parser.add_argument(
+        "--cases", default=",".join(CASES), help="逗号分隔的用例列表"
+    )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        help="脚本用例中位数的上限（毫秒），超出时返回非零退出码",
+    )
+    parser.add_argument("--output", help="结果 JSON 文件（缺省输出到标准输出）")
+    args = parser.parse_args()
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case: {', '.join(unknown)}")
+
+    results = []
+    for name in cases:
+        result = run_case(name, args.runs)
+        print(
+            f"{name:>14} min={result['min_ms']:>7.1f}ms median={result['median_ms']:>7.1f}ms "
+            f"heavy={','.join(result['heavy_imports']) or '-'}",
+            file=sys.stderr,
+        )
+        results.append(result)
+
+    baseline = measure(["-c", "pass"], args.runs)
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "interpreter_ms": baseline["median_ms"],
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+    shutil.rmtree(LOGS_DIR, ignore_errors=True)
+    if args.budget_ms is not None:
+        over = [
+            r["case"]
+            for r in results
+            if r["case"] in BUDGET_CASES and r["median_ms"] > args.budget_ms
+        ]
+        if over:
+            print(f"over budget ({args.budget_ms}ms): {', '.join(over)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
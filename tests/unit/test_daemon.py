@@ -0,0 +1,228 @@
+import json
+import os
+import pytest
+import tempfile
+import threading
+import sys
+import time
+from pathlib import Path
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic import daemon
+from libgitmusic.context import Context
+from libgitmusic.metadata import MetadataManager
+from libgitmusic.object_store import ObjectStore
+
+pytestmark = pytest.mark.skipif(
+    not daemon.is_supported(), reason="Unix sockets are not available"
+)
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+@pytest.fixture
+def context(temp_dir):
+    """Create a Context object with temporary paths."""
+    for name in ["work", "cache", "release", "logs"]:
+        (temp_dir / name).mkdir()
+    return Context(
+        project_root=temp_dir,
+        config={},
+        work_dir=temp_dir / "work",
+        cache_root=temp_dir / "cache",
+        metadata_file=temp_dir / "metadata.jsonl",
+        release_dir=temp_dir / "release",
+        logs_dir=temp_dir / "logs",
+    )
+
+
+@pytest.fixture
+def server(temp_dir):
+    """Run a daemon whose handler echoes the request as events."""
+
+    def handler(request, send):
+        for arg in request["args"]:
+            send({"type": "log", "message": arg})
+        return 3 if "fail" in request["args"] else 0
+
+    socket_path = temp_dir / "d.sock"
+    srv = daemon.DaemonServer(socket_path, handler)
+    srv.bind()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    thread.join(timeout=5)
+
+
+def _age(root: Path, seconds: float = 10.0) -> None:
+    """Backdate mtimes so the racy-write guards allow caching."""
+    past = time.time() - seconds
+    for path in [root, *root.rglob("*")]:
+        os.utime(path, (past, past))
+
+
+def _entry(digit: str, artists):
+    return {
+        "audio_oid": "sha256:" + digit * 64,
+        "title": "Song " + digit,
+        "artists": artists,
+        "created_at": "2024-01-01T00:00:00Z",
+    }
+
+
+def test_request_streams_events_and_exit_code(server):
+    """A request gets its events followed by the handler's exit code."""
+    events = []
+    code = daemon.request(server.socket_path, "echo", ["a", "b"], events.append)
+    assert code == 0
+    assert [e["message"] for e in events] == ["a", "b"]
+
+    assert daemon.request(server.socket_path, "echo", ["fail"]) == 3
+    status = daemon.ping(server.socket_path)
+    assert status["type"] == "daemon_status"
+    assert status["requests_served"] == 2
+    assert oct(server.socket_path.stat().st_mode & 0o777) == "0o600"
+
+
+def test_request_without_daemon_returns_none(temp_dir):
+    """Clients fall back to in-process execution when nothing is listening."""
+    assert daemon.request(temp_dir / "missing.sock", "analyze") is None
+    assert daemon.ping(temp_dir / "missing.sock") is None
+
+
+def test_shutdown_removes_socket(temp_dir):
+    """shutdown stops the server and cleans up the socket file."""
+    socket_path = temp_dir / "d.sock"
+    srv = daemon.DaemonServer(socket_path, lambda request, send: 0)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if daemon.ping(socket_path):
+            break
+        time.sleep(0.02)
+    assert daemon.request(socket_path, "shutdown") == 0
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert not socket_path.exists()
+
+
+def test_bind_replaces_stale_socket_but_not_live_daemon(server, temp_dir):
+    """A leftover socket file is reused; a running daemon is not displaced."""
+    with pytest.raises(RuntimeError):
+        daemon.DaemonServer(server.socket_path, lambda r, s: 0).bind()
+
+    stale = temp_dir / "stale.sock"
+    stale.write_text("")
+    srv = daemon.DaemonServer(stale, lambda r, s: 0)
+    srv.bind()
+    srv._server.server_close()
+
+
+def test_invalid_request_is_rejected(server):
+    """A malformed request line gets an error event and exit code 2."""
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(server.socket_path))
+        sock.sendall(b"not json\n")
+        lines = sock.makefile("rb").read().splitlines()
+    events = [json.loads(line) for line in lines]
+    assert events[0]["type"] == "error"
+    assert events[-1] == {"type": daemon.DONE_EVENT, "exit_code": 2}
+
+
+@pytest.fixture
+def cli(temp_dir):
+    """A log-only CLI whose paths live in the temporary directory."""
+    from libgitmusic.events import EventEmitter
+    from tools.cli import GitMusicCLI
+
+    config = temp_dir / "config.yaml"
+    config.write_text(f"paths:\n  metadata_file: {temp_dir / 'metadata.jsonl'}\n")
+    logs_dir, log_only = EventEmitter._logs_dir, EventEmitter._log_only_mode
+    yield GitMusicCLI(config_path=str(config), log_only=True)
+    EventEmitter._logs_dir, EventEmitter._log_only_mode = logs_dir, log_only
+
+
+def test_cli_exit_code_is_the_same_with_and_without_daemon(cli, temp_dir):
+    """A command reporting errors without raising exits 1 either way."""
+    from libgitmusic.events import EventEmitter
+    from tools.cli import Command
+
+    def step(ctx, _):
+        EventEmitter.error("one file failed")
+        EventEmitter.result("warn", message="done with errors")
+
+    cli.commands["flaky"] = Command("flaky", "emits an error", [step], on_error="continue")
+    cli.commands["clean"] = Command("clean", "emits nothing", [lambda ctx, _: None])
+
+    srv = daemon.DaemonServer(temp_dir / "cli.sock", cli.handle_request)
+    srv.bind()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    try:
+        for name, expected in (("flaky", 1), ("clean", 0), ("missing", 2)):
+            events = []
+            via_daemon = daemon.request(srv.socket_path, name, [], events.append)
+            in_process = cli.run_command(name, [])
+            assert via_daemon == in_process == expected
+            if name == "flaky":
+                assert [e["type"] for e in events if e["type"] in ("error", "result")] == [
+                    "error",
+                    "result",
+                ]
+    finally:
+        srv.shutdown()
+        thread.join(timeout=5)
+
+
+def test_metadata_cache_hit_and_invalidation(context):
+    """load_all reuses parsed entries until the file changes."""
+    mgr = MetadataManager(context)
+    context.metadata_file.write_text(
+        json.dumps(_entry("a", ["A"])) + "\n",
+        encoding="utf-8",
+    )
+    _age(context.metadata_file)
+
+    first = mgr.load_all()
+    cached = mgr._cache[1]
+    first[0]["artists"].append("mutated")
+    second = mgr.load_all()
+    assert mgr._cache[1] is cached
+    assert second[0]["artists"] == ["A"]
+
+    mgr.save_all(second + [_entry("b", ["B"])])
+    assert len(mgr.load_all()) == 2
+    # A file written just now is not cached
+    assert mgr._cache is None
+
+
+def test_refresh_index_keeps_unchanged_inventory(context):
+    """The object index survives refresh until the object directories change."""
+    store = ObjectStore(context)
+    _age(context.cache_root)
+    store.build_index()
+    assert store.refresh_index()
+    assert store.has_index
+
+    shard = store.objects_dir / "sha256" / "ab"
+    shard.mkdir(parents=True)
+    (shard / ("ab" + "0" * 62 + ".mp3")).write_bytes(b"x")
+    assert not store.refresh_index()
+    assert not store.has_index
+
+
+def test_refresh_index_drops_freshly_built_index(context):
+    """An index built right after a write is not trusted across requests."""
+    store = ObjectStore(context)
+    (store.objects_dir / "sha256" / "ab").mkdir(parents=True)
+    store.build_index()
+    assert not store.refresh_index()
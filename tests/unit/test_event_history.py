@@ -0,0 +1,59 @@
+import json
+import pytest
+import tempfile
+import sys
+from pathlib import Path
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.event_history import EventHistory
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+def test_history_is_bounded_but_counters_are_exact():
+    """Only recent events are kept while summary counters cover every event."""
+    history = EventHistory(maxlen=50, max_errors=5)
+    for i in range(10000):
+        status = "error" if i % 100 == 0 else ("warn" if i % 10 == 0 else "done")
+        history.add({"type": "item_event", "id": str(i), "status": status})
+    history.add({"type": "error", "message": "boom"})
+
+    assert len(history.events) == 50
+    assert history.tail(2)[0]["id"] == "9999"
+    assert history.items_processed == 10000
+    assert history.error_count == 101
+    assert history.warning_count == 900
+    assert len(history.errors) == 5
+    assert history.error_total == 101
+    assert history.errors_dropped == 96
+    assert history.errors[-1] == {
+        "type": "event_error",
+        "message": "boom",
+        "context": {},
+        "timestamp": "",
+    }
+
+
+def test_clear_resets_everything():
+    """clear() starts a fresh command."""
+    history = EventHistory()
+    history.add({"type": "item_event", "id": "a", "status": "error"})
+    history.add_error({"type": "step_exception", "error": "x"})
+    history.clear()
+    assert history.tail(10) == []
+    assert history.error_count == 0 and history.error_total == 0
+
+
+def test_read_log_returns_full_history(temp_dir):
+    """The on-disk JSONL log holds the complete history."""
+    path = temp_dir / "verify.jsonl"
+    lines = [json.dumps({"type": "item_event", "id": str(i)}) for i in range(3)]
+    path.write_text("\n".join(lines + ["not json", ""]) + "\n", encoding="utf-8")
+
+    assert [e["id"] for e in EventHistory.read_log(path)] == ["0", "1", "2"]
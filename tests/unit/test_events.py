@@ -0,0 +1,175 @@
+import json
+import pytest
+import subprocess
+import tempfile
+import sys
+import time
+from pathlib import Path
+
+# Import the modules to test
+REPO_DIR = Path(__file__).parent.parent.parent / "repo"
+sys.path.insert(0, str(REPO_DIR))
+from libgitmusic.events import EventEmitter, _EventWriter
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+@pytest.fixture
+def log_file(temp_dir, monkeypatch):
+    """Route events to a log file with a listener registered (no stdout)."""
+    monkeypatch.setattr(EventEmitter, "_logs_dir", temp_dir)
+    listener = lambda event: None
+    EventEmitter.register_listener(listener)
+    EventEmitter.start_log_file(command_name="test")
+    path = Path(EventEmitter._log_file.name)
+    yield path
+    EventEmitter.stop_logging()
+    EventEmitter.unregister_listener(listener)
+
+
+def _read_events(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_events_are_written_in_order(log_file):
+    """Buffered events reach the log file in order once logging stops."""
+    for i in range(5000):
+        EventEmitter.item_event(f"item-{i}", "done")
+    EventEmitter.stop_logging()
+
+    written = _read_events(log_file)
+    assert [e["id"] for e in written] == [f"item-{i}" for i in range(5000)]
+
+
+def test_urgent_events_are_flushed_immediately(log_file):
+    """error and result events are on disk when emit returns."""
+    EventEmitter.item_event("a", "done")
+    EventEmitter.error("boom")
+
+    written = _read_events(log_file)
+    assert [e["type"] for e in written] == ["item_event", "error"]
+    assert written[1]["message"] == "boom"
+
+
+def test_flush_interval(temp_dir):
+    """Idle writers flush after the interval without an explicit flush."""
+    writer = _EventWriter(flush_interval=0.01)
+    path = temp_dir / "out.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        writer.write(f, '{"n": 1}')
+        for _ in range(200):
+            if path.read_text(encoding="utf-8"):
+                break
+            time.sleep(0.01)
+        assert path.read_text(encoding="utf-8") == '{"n": 1}\n'
+        writer.close()
+
+        # After close, writes are synchronous
+        writer.write(f, '{"n": 2}')
+        assert path.read_text(encoding="utf-8").splitlines()[-1] == '{"n": 2}'
+
+
+def test_stdout_is_drained_at_exit():
+    """Events written to stdout without listeners survive interpreter exit."""
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from libgitmusic.events import EventEmitter\n"
+        "for i in range(2000):\n"
+        "    EventEmitter.item_event(str(i + 1), 'ok')\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script, str(REPO_DIR)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lines = result.stdout.splitlines()
+    assert len(lines) == 2000
+    assert json.loads(lines[-1])["id"] == "2000"
+
+
+def test_listener_stdout_passthrough_is_buffered_and_filtered():
+    """A listener forwarding to write_stdout gets buffered, filtered output."""
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from unittest.mock import patch\n"
+        "from libgitmusic.events import EventEmitter\n"
+        "EventEmitter.register_listener(EventEmitter.write_stdout)\n"
+        "with patch.object(sys.stdout.buffer, 'flush', wraps=sys.stdout.buffer.flush) as flush:\n"
+        "    for i in range(2000):\n"
+        "        EventEmitter.item_event(str(i + 1), 'ok')\n"
+        "    EventEmitter.emit('result', status='ok', api_token='t0p')\n"
+        "    sys.stderr.write(str(flush.call_count))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script, str(REPO_DIR)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert len(lines) == 2001
+    assert lines[-1]["api_token"] == "[FILTERED]"
+    # Far fewer flushes than events: the writer thread batches them
+    assert int(result.stderr) < 100
+
+
+@pytest.fixture
+def captured():
+    """Capture events through a listener (nothing reaches stdout)."""
+    events = []
+    EventEmitter.register_listener(events.append)
+    yield events
+    EventEmitter.unregister_listener(events.append)
+    EventEmitter.set_progress_rate(4.0)
+    EventEmitter.set_tool_output(False)
+
+
+def test_progress_is_throttled_per_phase(captured):
+    """Only the first and the final progress events of a fast loop are emitted."""
+    EventEmitter.set_progress_rate(1)
+    EventEmitter.phase_start("scan", 1000)
+    for i in range(1000):
+        EventEmitter.batch_progress("scan", i + 1, 1000)
+
+    progress = [e for e in captured if e["type"] == "batch_progress"]
+    assert [e["processed"] for e in progress] == [1, 1000]
+    assert progress[-1]["rate_per_sec"] > 0
+    assert progress[-1]["eta_sec"] == 0
+
+
+def test_suppressed_progress_is_flushed_by_result(captured):
+    """A throttled progress value is emitted before the result event."""
+    EventEmitter.set_progress_rate(1)
+    for i in range(10):
+        EventEmitter.batch_progress("verify", i + 1, 100)
+    EventEmitter.result("ok")
+
+    assert [(e["type"], e.get("processed")) for e in captured] == [
+        ("batch_progress", 1),
+        ("batch_progress", 10),
+        ("result", None),
+    ]
+
+
+def test_progress_rate_zero_disables_throttling(captured):
+    """Every progress event is emitted when throttling is off."""
+    EventEmitter.set_progress_rate(0)
+    for i in range(50):
+        EventEmitter.batch_progress("sync", i + 1, 50)
+    assert len(captured) == 50
+
+
+def test_tool_output_is_debug_only(captured):
+    """ffmpeg chatter is dropped unless tool output is enabled."""
+    EventEmitter.tool_output("ffmpeg", "size=  1024kB time=00:00:10.00")
+    assert captured == []
+
+    EventEmitter.set_tool_output(True)
+    EventEmitter.tool_output("ffmpeg", "size=  1024kB time=00:00:10.00")
+    assert captured[0]["level"] == "debug" and captured[0]["source"] == "ffmpeg"
@@ -0,0 +1,225 @@
+import pytest
+import tempfile
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.gc import GarbageCollector, extract_referenced_oids
+from libgitmusic.object_store import ObjectStore
+from libgitmusic.context import Context
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+@pytest.fixture
+def context(temp_dir):
+    """Create a Context object with temporary paths."""
+    return Context(
+        project_root=temp_dir,
+        config={},
+        work_dir=temp_dir / "work",
+        cache_root=temp_dir / "cache",
+        metadata_file=temp_dir / "metadata.jsonl",
+        release_dir=temp_dir / "release",
+        logs_dir=temp_dir / "logs",
+    )
+
+
+@pytest.fixture
+def object_store(context):
+    return ObjectStore(context)
+
+
+def _write_metadata(context, entries):
+    with open(context.metadata_file, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def _age(path: Path, days: float):
+    ts = time.time() - days * 86400
+    os.utime(path, (ts, ts))
+
+
+def test_extract_referenced_oids():
+    """Both audio and cover OIDs are collected without prefix."""
+    entries = [
+        {"audio_oid": "sha256:aa", "cover_oid": "sha256:bb"},
+        {"audio_oid": "sha256:cc"},
+        {"audio_oid": ""},
+    ]
+    assert extract_referenced_oids(entries) == {"aa", "bb", "cc"}
+
+
+def test_collect_respects_grace_period(context, object_store):
+    """Only old unreferenced objects are collected."""
+    kept = object_store.store_cover(b"referenced").oid
+    old = object_store.store_cover(b"old orphan").oid
+    young = object_store.store_cover(b"young orphan").oid
+    _age(object_store._get_object_path(old + ".jpg"), 30)
+    _age(object_store._get_object_path(kept + ".jpg"), 30)
+    _write_metadata(context, [{"audio_oid": "sha256:" + "0" * 64, "cover_oid": kept}])
+
+    gc = GarbageCollector(context, object_store=object_store, grace_period_days=7)
+    plan = gc.collect("local")
+
+    assert [c[1] for c in plan["local"]] == [old[7:]]
+    assert young[7:] not in [c[1] for c in plan["local"]]
+    assert plan["young_local"] == 1
+
+    result = gc.delete(plan)
+    assert result.data["local_deleted"] == 1
+
+
+def test_depth_zero_layout_is_rejected(context, object_store):
+    """A layout without shard directories, which the scan would see as empty, is refused."""
+    from libgitmusic.commands.reshard import reshard_logic
+
+    orphan = object_store.store_cover(b"orphan").oid
+    _age(object_store._get_object_path(orphan + ".jpg"), 30)
+    assert reshard_logic(object_store, depth=0, width=2) == 1
+    assert object_store.layout.depth == 1
+
+    # Collection still sees the loose objects
+    _write_metadata(context, [])
+    gc = GarbageCollector(context, object_store=object_store, grace_period_days=7)
+    assert [c[1] for c in gc.collect("local")["local"]] == [orphan[7:]]
+
+    # A layout.json written with depth 0 fails loudly instead of hiding every object
+    (context.cache_root / "layout.json").write_text('{"depth": 0, "width": 2}')
+    with pytest.raises(ValueError):
+        GarbageCollector(context, grace_period_days=7)
+
+
+def test_state_reuses_unchanged_shards(context, object_store):
+    """A second run does not rescan shards whose directory did not change."""
+    object_store.store_cover(b"one")
+    _write_metadata(context, [])
+
+    gc = GarbageCollector(context, object_store=object_store, grace_period_days=0)
+    gc.collect("local")
+    gc.save_state()
+    assert (context.cache_root / "gc-state.json").exists()
+
+    gc2 = GarbageCollector(context, object_store=object_store, grace_period_days=0)
+    real_scandir = os.scandir
+    scanned = []
+
+    def tracking_scandir(path):
+        scanned.append(str(path))
+        return real_scandir(path)
+
+    with patch("libgitmusic.gc.os.scandir", side_effect=tracking_scandir):
+        plan = gc2.collect("local")
+
+    # Only the two shard roots are listed, no individual shard directory
+    assert all(p.endswith("sha256") for p in scanned)
+    assert len(plan["local"]) == 1
+
+
+def test_first_seen_is_kept_across_runs(context, object_store):
+    """The grace period is measured from when GC first saw the object."""
+    oid = object_store.store_cover(b"orphan").oid
+    _write_metadata(context, [])
+
+    gc = GarbageCollector(context, object_store=object_store, grace_period_days=7)
+    assert gc.collect("local")["young_local"] == 1
+    gc.save_state()
+
+    # Age is read from the persisted first_seen, not from the file mtime
+    shard_key = f"cover/{oid[7:9]}"
+    gc.state["local"][shard_key]["objects"][oid[7:]] -= 30 * 86400
+    gc.save_state()
+
+    gc2 = GarbageCollector(context, object_store=object_store, grace_period_days=7)
+    assert len(gc2.collect("local")["local"]) == 1
+
+
+def test_packed_orphans_are_dropped_by_repack(context, object_store):
+    """Unreferenced covers inside packs are removed through repack."""
+    kept = object_store.store_cover(b"packed keep").oid
+    orphan = object_store.store_cover(b"packed orphan").oid
+    object_store.repack_covers()
+    _write_metadata(context, [{"audio_oid": "sha256:" + "0" * 64, "cover_oid": kept}])
+
+    gc = GarbageCollector(context, object_store=object_store, grace_period_days=0)
+    plan = gc.collect("local")
+    assert plan["local"] == [("cover", orphan[7:], None)]
+
+    result = gc.delete(plan)
+    assert result.data["packed_deleted"] == 1
+    assert object_store.read_cover(kept) == b"packed keep"
+    assert object_store.read_cover(orphan) is None
+
+
+def test_remote_sweep_uses_listing(context, object_store):
+    """Remote candidates come from a single listing with mtimes."""
+    _write_metadata(context, [{"audio_oid": "sha256:" + "a" * 64}])
+    old = time.time() - 30 * 86400
+    transport = Mock()
+    transport.list_remote_objects.side_effect = lambda sub: (
+        {
+            f"objects/sha256/aa/{'a' * 64}.mp3": old,
+            f"objects/sha256/bb/{'b' * 64}.mp3": old,
+            f"objects/sha256/cc/{'c' * 64}.mp3": time.time(),
+        }
+        if sub == "objects"
+        else {}
+    )
+    transport.delete_remote_files.return_value = 1
+
+    gc = GarbageCollector(
+        context, object_store=object_store, transport=transport, grace_period_days=7
+    )
+    plan = gc.collect("server")
+    assert plan["remote"] == [("audio", f"objects/sha256/bb/{'b' * 64}.mp3")]
+    assert plan["young_remote"] == 1
+    assert plan["local"] == []
+
+    result = gc.delete(plan)
+    assert result.data["remote_deleted"] == 1
+    transport.delete_remote_files.assert_called_once()
+
+
+def test_history_marks_old_revisions(context, object_store, temp_dir):
+    """Objects referenced by earlier metadata revisions stay protected."""
+    try:
+        subprocess.run(["git", "init", "-q"], cwd=temp_dir, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("git not available")
+
+    def commit(msg):
+        subprocess.run(["git", "add", "metadata.jsonl"], cwd=temp_dir, check=True)
+        subprocess.run(
+            ["git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", msg],
+            cwd=temp_dir,
+            check=True,
+        )
+
+    old_oid = object_store.store_cover(b"old version cover").oid
+    _write_metadata(context, [{"audio_oid": "sha256:" + "0" * 64, "cover_oid": old_oid}])
+    commit("v1")
+    _write_metadata(context, [{"audio_oid": "sha256:" + "0" * 64}])
+    commit("v2")
+
+    without = GarbageCollector(
+        context, object_store=object_store, grace_period_days=0, include_history=False
+    )
+    assert [c[1] for c in without.collect("local")["local"]] == [old_oid[7:]]
+
+    with_history = GarbageCollector(
+        context, object_store=object_store, grace_period_days=0, include_history=True
+    )
+    assert with_history.collect("local")["local"] == []
+    assert len(with_history.state["history"]["revisions"]) == 2
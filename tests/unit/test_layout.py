@@ -0,0 +1,232 @@
+import pytest
+import tempfile
+import hashlib
+import json
+import shutil
+import sys
+from pathlib import Path
+from unittest.mock import Mock
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.layout import ShardLayout, parse_relative_path
+from libgitmusic.object_store import ObjectStore
+from libgitmusic.context import Context
+from libgitmusic.commands.sync import analyze_sync_diff
+from libgitmusic.packfile import PackWriter
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+def _context(temp_dir, config=None):
+    return Context(
+        project_root=temp_dir,
+        config=config or {},
+        work_dir=temp_dir / "work",
+        cache_root=temp_dir / "cache",
+        metadata_file=temp_dir / "metadata.jsonl",
+        release_dir=temp_dir / "release",
+        logs_dir=temp_dir / "logs",
+    )
+
+
+def test_layout_paths():
+    """Shard parts follow depth and width."""
+    hexdigest = "abcdef" + "0" * 58
+    layout = ShardLayout(2, 2)
+    assert layout.shard_parts(hexdigest) == ("ab", "cd")
+    assert layout.relative_path("audio", hexdigest) == (
+        f"objects/sha256/ab/cd/{hexdigest}.mp3"
+    )
+    assert ShardLayout.legacy().relative_path("cover", hexdigest) == (
+        f"covers/sha256/ab/{hexdigest}.jpg"
+    )
+    with pytest.raises(ValueError):
+        ShardLayout(0, 0)
+    with pytest.raises(ValueError):
+        ShardLayout(0, 2)
+
+
+def test_parse_relative_path_any_depth():
+    """Relative paths are parsed independently of the layout."""
+    hexdigest = "1" * 64
+    assert parse_relative_path(f"objects/sha256/11/{hexdigest}.mp3") == (
+        "audio",
+        hexdigest,
+    )
+    assert parse_relative_path(f"covers/sha256/11/11/{hexdigest}.jpg") == (
+        "cover",
+        hexdigest,
+    )
+    assert parse_relative_path("covers/pack/pack-x.pack") is None
+
+
+def test_configured_layout_applies_to_empty_cache(temp_dir):
+    """A fresh cache adopts the configured layout and records it."""
+    ctx = _context(temp_dir, {"object_store": {"shard_depth": 2, "shard_width": 1}})
+    store = ObjectStore(ctx)
+    assert store.layout == ShardLayout(2, 1)
+    assert json.loads((ctx.cache_root / "layout.json").read_text()) == {
+        "depth": 2,
+        "width": 1,
+    }
+
+    oid = store.store_cover(b"cover").oid
+    hexdigest = oid[7:]
+    expected = store.covers_dir / "sha256" / hexdigest[0] / hexdigest[1]
+    assert store.get_cover_path(oid).parent == expected
+
+
+def test_existing_cache_keeps_legacy_layout(temp_dir):
+    """Config alone does not switch a populated cache to a new layout."""
+    ObjectStore(_context(temp_dir)).store_cover(b"legacy")
+    ctx = _context(temp_dir, {"object_store": {"shard_depth": 2, "shard_width": 2}})
+    store = ObjectStore(ctx)
+    assert store.layout.is_legacy
+    assert not (ctx.cache_root / "layout.json").exists()
+
+
+def test_reshard_migrates_objects(temp_dir):
+    """Resharding moves every object and keeps it readable."""
+    store = ObjectStore(_context(temp_dir))
+    covers = [f"cover-{i}".encode() for i in range(20)]
+    oids = [store.store_cover(c).oid for c in covers]
+    audio_hex = hashlib.sha256(b"audio").hexdigest()
+    audio = temp_dir / f"{audio_hex}.mp3"
+    audio.write_bytes(b"audio")
+    audio_oid = store.store_audio(audio, compute_hash=False).oid
+
+    dry = store.reshard(ShardLayout(2, 2), dry_run=True)
+    assert dry.data["objects"] == 21
+    assert store.layout.is_legacy
+
+    result = store.reshard(ShardLayout(2, 2))
+    assert result.success is True
+    assert result.data["removed"] == 21
+    assert store.layout == ShardLayout(2, 2)
+
+    # A new store instance picks up the layout from layout.json
+    reopened = ObjectStore(_context(temp_dir))
+    assert reopened.layout == ShardLayout(2, 2)
+    for oid, data in zip(oids, covers):
+        assert reopened.read_cover(oid) == data
+    assert reopened.get_audio_path(audio_oid).parts[-3:-1] == (
+        audio_hex[:2],
+        audio_hex[2:4],
+    )
+    # Legacy shard directories are pruned
+    legacy_dirs = [
+        p for p in (reopened.covers_dir / "sha256").iterdir() if any(p.glob("*.jpg"))
+    ]
+    assert legacy_dirs == []
+
+    total, errors, _ = reopened.verify_integrity()
+    assert (total, errors) == (21, 0)
+
+
+def test_store_falls_back_to_legacy_path(temp_dir):
+    """Objects still at the legacy path are found after a layout switch."""
+    store = ObjectStore(_context(temp_dir))
+    oid = store.store_cover(b"late writer").oid
+    ShardLayout(2, 2).save(store.cache_root)
+    reopened = ObjectStore(_context(temp_dir))
+    assert reopened.read_cover(oid) == b"late writer"
+    assert reopened.exists(oid + ".jpg")
+
+
+def test_sync_maps_between_layouts(temp_dir):
+    """Sync compares objects by hash and uploads into the remote layout."""
+    ctx = _context(temp_dir)
+    store = ObjectStore(ctx)
+    store.store_cover(b"local only")
+    shared = store.store_cover(b"shared").oid[7:]
+    local_only = hashlib.sha256(b"local only").hexdigest()
+    remote_only = "f" * 64
+
+    transport = Mock()
+    transport.get_remote_layout.return_value = ShardLayout(2, 2)
+    transport.list_remote_files.side_effect = lambda sub: (
+        [
+            ShardLayout(2, 2).relative_path("cover", shared),
+            ShardLayout(2, 2).relative_path("cover", remote_only),
+        ]
+        if sub == "covers"
+        else []
+    )
+
+    analysis = analyze_sync_diff(ctx.cache_root, transport)
+    assert analysis["to_upload_list"] == [
+        ShardLayout.legacy().relative_path("cover", local_only)
+    ]
+    assert analysis["upload_targets"] == {
+        ShardLayout.legacy().relative_path("cover", local_only): ShardLayout(
+            2, 2
+        ).relative_path("cover", local_only)
+    }
+    remote_rel = ShardLayout(2, 2).relative_path("cover", remote_only)
+    assert analysis["download_targets"] == {
+        remote_rel: ShardLayout.legacy().relative_path("cover", remote_only)
+    }
+
+
+def test_sync_fails_when_remote_layout_is_unreadable(temp_dir):
+    """A transport error reading layout.json aborts sync instead of assuming legacy."""
+    from libgitmusic.commands.sync import sync_logic
+    from libgitmusic.exceptions import TransportError
+
+    ctx = _context(temp_dir)
+    ObjectStore(ctx).store_cover(b"local only")
+    transport = Mock()
+    transport.list_remote_files.return_value = []
+    transport.get_remote_layout.side_effect = TransportError("Connection reset")
+
+    assert sync_logic(ctx.cache_root, transport, direction="upload") == 1
+    transport.upload.assert_not_called()
+
+
+def test_sync_treats_packed_covers_as_present(temp_dir):
+    """Packed covers count as present on either side; redundant packs stay put."""
+    ctx = _context(temp_dir)
+    store = ObjectStore(ctx)
+    a, b = (store.store_cover(data).oid[7:] for data in (b"cover a", b"cover b"))
+    store.repack_covers()
+    old_pack = sorted(p.name for p in store.cover_pack_dir.iterdir())
+
+    # The remote still has the covers loose plus the first pack
+    remote = temp_dir / "remote"
+    shutil.copytree(store.cover_pack_dir, remote / "covers" / "pack")
+    legacy = ShardLayout.legacy()
+    remote_only = "f" * 64
+    remote_files = [legacy.relative_path("cover", h) for h in (a, b, remote_only)]
+    remote_files += [f"covers/pack/{name}" for name in old_pack]
+
+    # Repacking locally replaces the first pack with one that also holds c
+    c = store.store_cover(b"cover c").oid[7:]
+    store.repack_covers()
+    new_pack = sorted(p.name for p in store.cover_pack_dir.iterdir())
+    assert set(new_pack).isdisjoint(old_pack)
+    assert store.cover_packs.contains(c)
+
+    # A cover loose locally but packed on the remote
+    e = store.store_cover(b"cover e").oid[7:]
+    writer = PackWriter(remote / "covers" / "pack")
+    writer.add(bytes.fromhex(e), b"cover e")
+    remote_files += [f"covers/pack/{p.name}" for p in writer.finish()]
+
+    transport = Mock()
+    transport.get_remote_layout.return_value = legacy
+    transport.list_remote_files.side_effect = lambda sub: (
+        remote_files if sub == "covers" else []
+    )
+    transport.download.side_effect = lambda rel, dst: shutil.copy(remote / rel, dst)
+
+    analysis = analyze_sync_diff(ctx.cache_root, transport)
+    # Only the remote-only loose cover comes back; neither pack is re-downloaded
+    assert analysis["to_download_list"] == [legacy.relative_path("cover", remote_only)]
+    # The new pack carries c, which the remote lacks; loose e is already packed remotely
+    assert sorted(analysis["to_upload_list"]) == [f"covers/pack/{n}" for n in new_pack]
@@ -0,0 +1,209 @@
+import gzip
+import json
+import os
+import pytest
+import tempfile
+import sys
+import time
+from pathlib import Path
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.events import EventEmitter
+from libgitmusic.log_archive import (
+    ArchivePolicy,
+    LogArchive,
+    parse_time,
+    summarize,
+)
+from libgitmusic.commands.logs import logs_logic
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+def _write_log(logs_dir: Path, name: str, events, age: float = 3600.0) -> Path:
+    """Write a finished command log and backdate it past the idle threshold."""
+    path = logs_dir / name
+    with open(path, "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    past = time.time() - age
+    os.utime(path, (past, past))
+    return path
+
+
+def _events(day: int, command: str = "publish"):
+    ts = f"2026-01-{day:02d}T10:00:0{{}}+00:00"
+    return [
+        {"type": "phase_start", "ts": ts.format(0), "cmd": command, "phase": "scan"},
+        {"type": "item_event", "ts": ts.format(1), "id": f"Song {day}.mp3", "status": "done"},
+        {"type": "log", "ts": ts.format(2), "level": "warn", "message": f"warn {day}"},
+        {"type": "error", "ts": ts.format(3), "message": f"failed {day}"},
+    ]
+
+
+@pytest.fixture
+def archive(temp_dir):
+    """Three old publish logs and one recent verify log."""
+    for day in (1, 2, 3):
+        _write_log(temp_dir, f"publish-202601{day:02d}-100000.jsonl", _events(day), age=86400 * (10 - day))
+    _write_log(temp_dir, "verify-20260110-100000.jsonl", _events(10, "verify"), age=700)
+    return LogArchive(temp_dir, ArchivePolicy(keep_recent=1))
+
+
+def test_summarize_counts_types_levels_and_items():
+    """The index summary records time range, counts and item ids."""
+    summary = summarize(_events(5))
+    assert summary["events"] == 4
+    assert summary["start"] == "2026-01-05T10:00:00.000000+00:00"
+    assert summary["end"] == "2026-01-05T10:00:03.000000+00:00"
+    assert summary["levels"] == {"warn": 1, "error": 1}
+    assert summary["errors"] == 1
+    assert summary["item_ids"] == ["Song 5.mp3"]
+
+
+def test_maintain_compresses_all_but_recent(archive, temp_dir):
+    """Old logs move to gzip archives with an index; the newest stays raw."""
+    result = archive.maintain()
+    assert len(result["archived"]) == 3
+    assert [p.name for p in archive.raw_logs()] == ["verify-20260110-100000.jsonl"]
+
+    index = archive.index()
+    assert [e["command"] for e in index] == ["publish"] * 3
+    first = temp_dir / "archive" / index[0]["file"]
+    with gzip.open(first, "rt", encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == _events(1)
+    # A second pass does not archive anything again
+    assert archive.maintain()["archived"] == []
+
+
+def test_recently_written_logs_are_not_archived(temp_dir):
+    """A log modified within the idle window may still be open."""
+    _write_log(temp_dir, "publish-20260101-100000.jsonl", _events(1), age=10)
+    _write_log(temp_dir, "verify-20260102-100000.jsonl", _events(2), age=10)
+    assert LogArchive(temp_dir, ArchivePolicy(keep_recent=0)).maintain()["archived"] == []
+
+
+def test_prune_by_age_and_total_size(archive, temp_dir):
+    """Archives older than max_age_days are removed and the index rewritten."""
+    archive.maintain()
+    for entry in archive.index():
+        day = int(entry["file"].split("-")[1][-2:])
+        past = time.time() - 86400 * (40 - day * 10)
+        os.utime(temp_dir / "archive" / entry["file"], (past, past))
+
+    archive.policy.max_age_days = 15
+    removed = archive.prune()
+    assert removed == ["publish-20260101-100000.jsonl.gz", "publish-20260102-100000.jsonl.gz"]
+    assert [e["file"] for e in archive.index()] == ["publish-20260103-100000.jsonl.gz"]
+
+    archive.policy.max_total_mb = 0
+    assert archive.prune() == ["publish-20260103-100000.jsonl.gz"]
+    assert archive.index() == []
+
+
+def test_query_filters_across_archives_and_raw_logs(archive):
+    """Queries combine archived and raw logs and use the index to skip files."""
+    archive.maintain()
+
+    errors = list(archive.query(types=["error"]))
+    assert [e["message"] for e in errors] == ["failed 1", "failed 2", "failed 3", "failed 10"]
+    assert errors[0]["_log"] == "publish-20260101-100000.jsonl.gz"
+
+    warns = list(archive.query(levels=["warn"], command="verify"))
+    assert [e["message"] for e in warns] == ["warn 10"]
+
+    stats = {}
+    items = list(archive.query(item="Song 2", stats=stats))
+    assert [e["id"] for e in items] == ["Song 2.mp3"]
+    # Indexed item ids rule out the other two archives; only the hit and the raw log are read
+    assert stats == {"files_scanned": 2, "files_skipped": 2}
+
+    since = parse_time("2026-01-02T12:00:00+00:00")
+    until = parse_time("2026-01-03T12:00:00+00:00")
+    ranged = list(archive.query(types=["error"], since=since, until=until))
+    assert [e["message"] for e in ranged] == ["failed 3"]
+
+    assert len(list(archive.query(limit=3))) == 3
+    assert [e["message"] for e in archive.query(text="failed 2")] == ["failed 2"]
+
+
+def test_query_limit_returns_newest_matches(temp_dir):
+    """A limited query keeps the most recent matches, in chronological order."""
+    for day in range(1, 6):
+        _write_log(
+            temp_dir, f"publish-202601{day:02d}-100000.jsonl", _events(day), age=86400 * (10 - day)
+        )
+    archive = LogArchive(temp_dir, ArchivePolicy(keep_recent=2))
+    archive.maintain()
+
+    stats = {}
+    errors = list(archive.query(levels=["error"], limit=2, stats=stats))
+    assert [e["message"] for e in errors] == ["failed 4", "failed 5"]
+    # The older logs are never opened
+    assert stats["files_scanned"] == 2
+
+    # A limit spanning archives and raw logs still returns the newest three
+    errors = list(archive.query(types=["error"], limit=3))
+    assert [e["message"] for e in errors] == ["failed 3", "failed 4", "failed 5"]
+    assert errors[0]["_log"] == "publish-20260103-100000.jsonl.gz"
+
+    # Within one log only the last matches are kept
+    events = list(archive.query(command="publish", limit=2))
+    assert [e["type"] for e in events] == ["log", "error"]
+    assert {e["_log"] for e in events} == {"publish-20260105-100000.jsonl"}
+
+
+def test_parse_relative_time():
+    """Relative times count back from now."""
+    now = time.time()
+    assert abs(parse_time("2h", now=now).timestamp() - (now - 7200)) < 1e-3
+    with pytest.raises(ValueError):
+        parse_time("yesterday")
+
+
+def test_policy_from_config():
+    """logging.archive overrides defaults; unknown compression is rejected."""
+    policy = ArchivePolicy.from_config(
+        {"logging": {"archive": {"keep_recent": "5", "max_age_days": 30}}}
+    )
+    assert policy.keep_recent == 5
+    assert policy.max_age_days == 30
+    assert ArchivePolicy.from_config(None).compression == "gzip"
+    with pytest.raises(ValueError):
+        ArchivePolicy.from_config({"logging": {"archive": {"compression": "lz4"}}})
+
+
+def test_logs_logic_query_reports_matches(archive, temp_dir):
+    """The logs command returns matching events and skips its own earlier logs."""
+    _write_log(temp_dir, "logs-20260111-100000.jsonl", _events(11, "logs"))
+    result = logs_logic(temp_dir, archive.policy, types=["error"], limit=10)
+    assert [e["message"] for e in result["events"]] == ["failed 1", "failed 2", "failed 3", "failed 10"]
+    assert result["files_skipped"] == 1
+
+    bad = logs_logic(temp_dir, archive.policy, since="not a time")
+    assert "error" in bad
+
+
+def test_log_file_rotates_by_size(temp_dir):
+    """A log exceeding the size limit continues in numbered part files."""
+    EventEmitter.setup_logging(logs_dir=temp_dir)
+    EventEmitter.set_log_rotation(2000)
+    try:
+        EventEmitter.start_log_file(command_name="rotate")
+        for i in range(100):
+            EventEmitter.write_log({"type": "log", "message": f"line {i:03d}" + "x" * 40})
+        EventEmitter.stop_logging()
+    finally:
+        EventEmitter.set_log_rotation(64 * 1024 * 1024)
+
+    parts = sorted(temp_dir.glob("rotate-*.jsonl"), key=lambda p: (len(p.name), p.name))
+    assert len(parts) > 1
+    assert all(p.stat().st_size <= 2100 for p in parts)
+    lines = [json.loads(line) for p in parts for line in p.read_text().splitlines()]
+    assert [e["message"][:8] for e in lines] == [f"line {i:03d}" for i in range(100)]
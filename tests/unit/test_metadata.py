@@ -9,7 +9,12 @@ from unittest.mock import Mock
 
 # Import the modules to test
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
-from libgitmusic.metadata import MetadataManager, ValidationError
+from libgitmusic.metadata import (
+    MetadataManager,
+    ValidationError,
+    diff_metadata,
+    parse_metadata_lines,
+)
 from libgitmusic.context import Context
 
 
@@ -456,5 +461,27 @@ def test_update_entry_new(metadata_manager, temp_dir):
     assert loaded[0]["title"] == "New Song"
 
 
+def test_diff_metadata():
+    """Entries are compared by audio_oid; field changes are reported."""
+    old = parse_metadata_lines(
+        '{"audio_oid": "sha256:a", "title": "A"}\n'
+        "\n"
+        "not json\n"
+        '{"audio_oid": "sha256:b", "title": "B"}\n'
+        '{"audio_oid": "sha256:c", "title": "C"}\n'
+    )
+    new = [
+        {"audio_oid": "sha256:a", "title": "A"},
+        {"audio_oid": "sha256:b", "title": "B2"},
+        {"audio_oid": "sha256:d", "title": "D"},
+    ]
+    assert len(old) == 3
+    assert diff_metadata(old, new) == {
+        "added": {"sha256:d"},
+        "changed": {"sha256:b"},
+        "removed": {"sha256:c"},
+    }
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
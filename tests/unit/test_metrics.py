@@ -0,0 +1,215 @@
+import pytest
+import tempfile
+import sys
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.events import EventEmitter
+from libgitmusic.metrics import EventMetrics, MetricsRegistry, register_observer
+from libgitmusic.release_queue import QueueDaemon, ReleaseQueue
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def _samples(text):
+    """Parse exposition text into {series: value}, skipping comments."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            samples[series] = float(value)
+    return samples
+
+
+def test_counter_and_gauge_render_with_labels(registry):
+    """Series are rendered with HELP/TYPE headers and escaped label values."""
+    counter = registry.counter("jobs_total", "Jobs run", ("status",))
+    counter.inc(status="ok")
+    counter.inc(2, status='say "hi"')
+    registry.gauge("queue_depth", "Waiting jobs").set(3)
+
+    text = registry.render()
+    assert "# HELP jobs_total Jobs run\n# TYPE jobs_total counter\n" in text
+    assert "# TYPE queue_depth gauge" in text
+    samples = _samples(text)
+    assert samples['jobs_total{status="ok"}'] == 1
+    assert samples['jobs_total{status="say \\"hi\\""}'] == 2
+    assert samples["queue_depth"] == 3
+
+
+def test_metric_validation(registry):
+    """Label sets, negative increments and type clashes are rejected."""
+    counter = registry.counter("jobs_total", "Jobs run", ("status",))
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        counter.inc(-1, status="ok")
+    assert registry.counter("jobs_total", "Jobs run", ("status",)) is counter
+    with pytest.raises(ValueError):
+        registry.gauge("jobs_total", "Jobs run", ("status",))
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    """Bucket counts accumulate up to +Inf alongside _sum and _count."""
+    hist = registry.histogram("build_seconds", "Build time", buckets=(1, 10))
+    for value in (0.5, 1, 5, 50):
+        hist.observe(value)
+
+    samples = _samples(registry.render())
+    assert samples['build_seconds_bucket{le="1"}'] == 2
+    assert samples['build_seconds_bucket{le="10"}'] == 3
+    assert samples['build_seconds_bucket{le="+Inf"}'] == 4
+    assert samples["build_seconds_sum"] == 56.5
+    assert samples["build_seconds_count"] == 4
+
+
+def test_write_textfile_replaces_atomically(registry, temp_dir):
+    """The textfile is written in place of the old one without leftovers."""
+    path = temp_dir / "textfile" / "gitmusic.prom"
+    registry.counter("jobs_total", "Jobs run").inc()
+    registry.write_textfile(path)
+    registry.counter("jobs_total", "Jobs run").inc()
+    registry.write_textfile(path)
+
+    assert _samples(path.read_text())["jobs_total"] == 2
+    assert [p.name for p in path.parent.iterdir()] == ["gitmusic.prom"]
+
+
+def test_event_metrics_from_events(registry):
+    """Item, error and result events update counters; spans add work totals."""
+    observer = EventMetrics(registry)
+    observer.command = "sync"
+    observer({"type": "item_event", "cmd": "cli", "status": "done"})
+    observer({"type": "item_event", "cmd": "cli", "status": "failed"})
+    observer({"type": "error", "cmd": "cli", "message": "scp failed"})
+    observer(
+        {
+            "type": "result",
+            "cmd": "cli",
+            "status": "warn",
+            "spans": {
+                "upload/transport_upload": {
+                    "count": 2,
+                    "wall_sec": 1.5,
+                    "bytes_read": 0,
+                    "bytes_written": 4096,
+                },
+                "hash/hash_audio_frames": {"count": 7, "wall_sec": 0.25},
+            },
+        }
+    )
+    observer.command_finished("sync", 2.0)
+
+    samples = _samples(registry.render())
+    assert samples['gitmusic_items_total{command="sync",status="failed"}'] == 1
+    assert samples['gitmusic_errors_total{command="sync"}'] == 1
+    assert samples['gitmusic_results_total{command="sync",status="warn"}'] == 1
+    assert samples['gitmusic_span_calls_total{span="hash_audio_frames"}'] == 7
+    assert (
+        samples['gitmusic_span_bytes_total{span="transport_upload",direction="written"}']
+        == 4096
+    )
+    assert samples['gitmusic_command_duration_seconds_count{command="sync"}'] == 1
+
+    # Without an explicit command the event's cmd field is used
+    observer.command = None
+    observer({"type": "error", "cmd": "create_release", "message": "x"})
+    assert observer.errors.value(command="create_release") == 1
+
+
+def test_event_metrics_count_cumulative_spans_once(registry):
+    """Span totals repeated on later results of one command are not re-added."""
+    observer = EventMetrics(registry)
+    spans = {"hash/hash_audio_frames": {"count": 1, "wall_sec": 0.5}}
+    observer({"type": "result", "cmd": "cli", "status": "ok", "spans": spans})
+    observer({"type": "result", "cmd": "cli", "status": "ok", "spans": spans})
+    assert observer.span_calls.value(span="hash_audio_frames") == 1
+
+    # Later results of the same command only add what was traced since
+    grown = {"hash/hash_audio_frames": {"count": 3, "wall_sec": 1.5}}
+    observer({"type": "result", "cmd": "cli", "status": "ok", "spans": grown})
+    assert observer.span_calls.value(span="hash_audio_frames") == 3
+    assert observer.span_seconds.value(span="hash_audio_frames") == 1.5
+
+    # The next command starts its summary from zero again
+    observer.command_finished("publish", 1.0)
+    observer({"type": "result", "cmd": "cli", "status": "ok", "spans": spans})
+    assert observer.span_calls.value(span="hash_audio_frames") == 4
+
+
+def test_register_observer_listens_to_emitter(registry):
+    """A registered observer receives EventEmitter events."""
+    observer = register_observer(registry)
+    try:
+        EventEmitter.error("boom")
+    finally:
+        EventEmitter.unregister_listener(observer)
+    errors = [
+        value
+        for series, value in _samples(registry.render()).items()
+        if series.startswith("gitmusic_errors_total{")
+    ]
+    assert errors == [1]
+
+
+def test_serve_http_exposes_metrics(registry):
+    """GET /metrics returns the exposition text; other paths are 404."""
+    registry.counter("jobs_total", "Jobs run").inc(3)
+    server = registry.serve_http(0)
+    try:
+        host, port = server.server_address[:2]
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert _samples(resp.read().decode())["jobs_total"] == 3
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://{host}:{port}/other", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_queue_daemon_exports_prometheus_metrics(temp_dir):
+    """Builds, failures, latency and queue depth reach the textfile."""
+    queue = ReleaseQueue(temp_dir / "queue.jsonl")
+    for i in range(3):
+        queue.enqueue({"timestamp": "2024-01-01T00:00:00+00:00", "n": i})
+
+    outcomes = [(4, 5), RuntimeError("boom")]
+
+    def build(requests):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        queue.enqueue({"n": "late"})
+        return outcome
+
+    textfile = temp_dir / "gitmusic_queue.prom"
+    daemon = QueueDaemon(queue, build=build, metrics_textfile=textfile)
+    assert daemon.run_once()
+    samples = _samples(textfile.read_text())
+    assert samples["gitmusic_queue_requests_total"] == 3
+    assert samples['gitmusic_release_builds_total{status="warn"}'] == 1
+    assert samples['gitmusic_release_entries_total{result="failed"}'] == 1
+    assert samples["gitmusic_release_duration_seconds_count"] == 1
+    assert samples["gitmusic_queue_latency_seconds_count"] == 1
+    # The request pushed during the build is still waiting
+    assert samples["gitmusic_queue_depth"] == 1
+
+    assert daemon.run_once()
+    samples = _samples(textfile.read_text())
+    assert samples['gitmusic_release_builds_total{status="error"}'] == 1
+    assert samples["gitmusic_queue_depth"] == 0
+    assert "gitmusic_release_last_success_timestamp_seconds" not in samples
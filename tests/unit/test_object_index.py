@@ -0,0 +1,136 @@
+import pytest
+import tempfile
+import hashlib
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.object_index import ObjectIndex, BloomFilter
+from libgitmusic.object_store import ObjectStore
+from libgitmusic.context import Context
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+@pytest.fixture
+def object_store(temp_dir):
+    """Create an ObjectStore instance with temporary paths."""
+    ctx = Context(
+        project_root=temp_dir,
+        config={},
+        work_dir=temp_dir / "work",
+        cache_root=temp_dir / "cache",
+        metadata_file=temp_dir / "metadata.jsonl",
+        release_dir=temp_dir / "release",
+        logs_dir=temp_dir / "logs",
+    )
+    return ObjectStore(ctx)
+
+
+def _digest(i: int) -> bytes:
+    return hashlib.sha256(str(i).encode()).digest()
+
+
+@pytest.mark.parametrize("bloom", [True, False])
+def test_index_membership(bloom):
+    """Base digests, added digests and discarded digests are tracked."""
+    index = ObjectIndex([_digest(i) for i in range(1000)], bloom=bloom)
+    assert len(index) == 1000
+    assert all(_digest(i) in index for i in range(1000))
+    assert not any(_digest(i) in index for i in range(1000, 2000))
+
+    index.add(_digest(5000))
+    assert _digest(5000) in index
+    index.discard(_digest(3))
+    assert _digest(3) not in index
+    assert len(index) == 1000
+    assert set(index) == {_digest(i) for i in range(1000) if i != 3} | {
+        _digest(5000)
+    }
+
+
+def test_index_from_oids_ignores_invalid():
+    """Malformed OIDs are skipped when building from an inventory."""
+    hexdigest = _digest(1).hex()
+    index = ObjectIndex.from_oids([f"sha256:{hexdigest}", "", "sha256:zz", "abc"])
+    assert len(index) == 1
+    assert index.contains_oid(f"sha256:{hexdigest}")
+    assert index.contains_oid(f"sha256:{hexdigest}.jpg")
+    assert not index.contains_oid("not-a-hash")
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Every inserted digest is reported as possibly present."""
+    bloom = BloomFilter(capacity=500)
+    for i in range(500):
+        bloom.add(_digest(i))
+    assert all(_digest(i) in bloom for i in range(500))
+    false_positives = sum(_digest(i) in bloom for i in range(500, 10500))
+    assert false_positives < 500
+
+
+def test_store_lookups_use_index_without_stat(object_store):
+    """After build_index, existence checks do not touch the filesystem."""
+    cover_oid = object_store.store_cover(b"cover").oid
+    object_store.build_index()
+    missing = f"sha256:{'f' * 64}"
+
+    with patch.object(Path, "exists", side_effect=AssertionError("stat called")):
+        assert object_store.exists(cover_oid + ".jpg")
+        assert object_store.get_cover_path(cover_oid) is not None
+        assert object_store.get_audio_path(missing) is None
+        assert not object_store.exists(missing)
+
+
+def test_index_tracks_new_objects(object_store, temp_dir):
+    """Objects stored after build_index are visible through the index."""
+    object_store.build_index()
+    oid = object_store.store_cover(b"late cover").oid
+    assert object_store.exists(oid + ".jpg")
+
+    audio = temp_dir / f"{'c' * 64}.mp3"
+    audio.write_bytes(b"data")
+    result = object_store.store_audio(audio, compute_hash=False)
+    assert object_store.get_audio_path(result.oid) is not None
+
+
+def test_index_includes_packed_covers(object_store):
+    """Packed covers are indexed and dropped ones are forgotten."""
+    keep_oid = object_store.store_cover(b"keep").oid
+    drop_oid = object_store.store_cover(b"drop").oid
+    object_store.repack_covers()
+    object_store.build_index()
+
+    assert object_store.read_cover(keep_oid) == b"keep"
+    object_store.repack_covers(keep={keep_oid[7:]})
+    assert object_store.exists(keep_oid + ".jpg")
+    assert not object_store.exists(drop_oid + ".jpg")
+
+
+def test_ensure_index_sees_objects_written_elsewhere(object_store):
+    """Objects written outside store_* are found once the index is re-checked."""
+    assert object_store.ensure_index(ObjectStore.INDEX_MIN_LOOKUPS)
+    oid = f"sha256:{'d' * 64}"
+    path = object_store._get_object_path(oid)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"pulled")
+
+    assert object_store.ensure_index(ObjectStore.INDEX_MIN_LOOKUPS)
+    assert object_store.get_audio_path(oid) == path
+
+
+def test_ensure_index_threshold(object_store):
+    """Small batches keep using stat; large batches build the index."""
+    assert object_store.ensure_index(1) is False
+    assert object_store.has_index is False
+    assert object_store.ensure_index(ObjectStore.INDEX_MIN_LOOKUPS) is True
+    assert object_store.has_index is True
+    object_store.drop_index()
+    assert object_store.has_index is False
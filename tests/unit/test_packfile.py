@@ -0,0 +1,169 @@
+import pytest
+import tempfile
+import hashlib
+import sys
+from pathlib import Path
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.packfile import (
+    PackWriter,
+    PackReader,
+    PackStore,
+    oid_to_digest,
+    read_idx_digests,
+)
+from libgitmusic.object_store import ObjectStore
+from libgitmusic.context import Context
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+@pytest.fixture
+def object_store(temp_dir):
+    """Create an ObjectStore instance with temporary paths."""
+    ctx = Context(
+        project_root=temp_dir,
+        config={},
+        work_dir=temp_dir / "work",
+        cache_root=temp_dir / "cache",
+        metadata_file=temp_dir / "metadata.jsonl",
+        release_dir=temp_dir / "release",
+        logs_dir=temp_dir / "logs",
+    )
+    return ObjectStore(ctx)
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()
+
+
+def test_write_and_read_pack(temp_dir):
+    """Objects written to a pack can be looked up and read back."""
+    blobs = [f"cover-{i}".encode() * (i + 1) for i in range(50)]
+    writer = PackWriter(temp_dir / "pack")
+    for blob in blobs:
+        assert writer.add(_digest(blob), blob) is True
+    # Duplicate objects are ignored
+    assert writer.add(_digest(blobs[0]), blobs[0]) is False
+
+    pack_path, idx_path = writer.finish()
+    assert pack_path.exists() and idx_path.exists()
+    assert pack_path.stem == idx_path.stem
+
+    reader = PackReader(idx_path)
+    try:
+        assert reader.count == len(blobs)
+        for blob in blobs:
+            assert bytes(reader.read(_digest(blob))) == blob
+        assert reader.read(_digest(b"missing")) is None
+        digests = [d for d, _, _ in reader.iter_entries()]
+        assert digests == sorted(digests)
+    finally:
+        reader.close()
+
+
+def test_read_idx_digests_without_pack(temp_dir):
+    """Index digests can be read even when the pack file is absent."""
+    blobs = [b"a", b"b", b"c"]
+    writer = PackWriter(temp_dir / "pack")
+    for blob in blobs:
+        writer.add(_digest(blob), blob)
+    pack_path, idx_path = writer.finish()
+    pack_path.unlink()
+
+    assert read_idx_digests(idx_path) == sorted(_digest(b) for b in blobs)
+    idx_path.write_bytes(b"GMIX" + b"\0" * 10)
+    with pytest.raises(ValueError):
+        read_idx_digests(idx_path)
+
+
+def test_empty_pack_is_not_published(temp_dir):
+    """Finishing a writer with no objects leaves no files behind."""
+    writer = PackWriter(temp_dir / "pack")
+    assert writer.finish() is None
+    assert list((temp_dir / "pack").iterdir()) == []
+
+
+def test_pack_store_ignores_idx_without_pack(temp_dir):
+    """An idx file without its pack is not visible to readers."""
+    writer = PackWriter(temp_dir / "pack")
+    writer.add(_digest(b"x"), b"x")
+    pack_path, idx_path = writer.finish()
+    pack_path.unlink()
+
+    store = PackStore(temp_dir / "pack")
+    assert store.readers == []
+    assert store.contains(_digest(b"x").hex()) is False
+
+
+def test_oid_to_digest():
+    """OIDs with prefix and suffix map to the raw digest."""
+    hexdigest = "ab" * 32
+    assert oid_to_digest(f"sha256:{hexdigest}") == bytes.fromhex(hexdigest)
+    assert oid_to_digest(f"sha256:{hexdigest}.jpg") == bytes.fromhex(hexdigest)
+    assert oid_to_digest(hexdigest) == bytes.fromhex(hexdigest)
+
+
+def test_repack_covers_moves_loose_objects(object_store):
+    """Repacking removes loose covers and keeps them readable."""
+    covers = [f"jpeg-{i}".encode() for i in range(10)]
+    oids = [object_store.store_cover(c).oid for c in covers]
+
+    result = object_store.repack_covers()
+    assert result.success is True
+    assert list(object_store.iter_loose_covers()) == []
+    assert len(object_store.cover_packs.readers) == 1
+
+    for oid, data in zip(oids, covers):
+        assert object_store.exists(oid + ".jpg")
+        assert object_store.read_cover(oid) == data
+        assert object_store.cover_size(oid) == len(data)
+        # Packed covers have no file of their own and are not extracted anywhere
+        assert object_store.get_cover_path(oid) is None
+    assert not (object_store.context.tmp_dir / "covers").exists()
+
+    # Storing a packed cover again is a no-op
+    again = object_store.store_cover(covers[0])
+    assert again.message == "Cover object already exists"
+    assert list(object_store.iter_loose_covers()) == []
+
+    total, error_count, _ = object_store.verify_integrity()
+    assert total == len(covers)
+    assert error_count == 0
+
+
+def test_repack_merges_packs_and_drops_unreferenced(object_store):
+    """A second repack merges existing packs and honors the keep set."""
+    first = [object_store.store_cover(f"a-{i}".encode()).oid for i in range(3)]
+    object_store.repack_covers()
+    second = [object_store.store_cover(f"b-{i}".encode()).oid for i in range(3)]
+
+    keep = {oid[7:] for oid in first[:2] + second}
+    result = object_store.repack_covers(keep=keep)
+    assert result.success is True
+    assert result.data["dropped"] == 1
+    assert len(object_store.cover_packs.readers) == 1
+
+    assert object_store.read_cover(first[2]) is None
+    for oid in first[:2] + second:
+        assert object_store.read_cover(oid) is not None
+
+
+def test_repack_skips_corrupted_loose_cover(object_store):
+    """Loose covers whose content does not match their hash stay loose."""
+    oid = object_store.store_cover(b"good").oid
+    bad_oid = object_store.store_cover(b"bad").oid
+    bad_path = object_store._get_object_path(bad_oid + ".jpg")
+    bad_path.write_bytes(b"tampered")
+
+    result = object_store.repack_covers()
+    assert result.data["corrupted"] == 1
+    assert bad_path.exists()
+    assert object_store.cover_packs.contains(oid)
+    assert not object_store.cover_packs.contains(bad_oid)
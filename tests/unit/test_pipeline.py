@@ -0,0 +1,98 @@
+import pytest
+import threading
+import sys
+import time
+from pathlib import Path
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.pipeline import Stage, run_pipeline
+
+
+def test_stages_preserve_order_with_single_workers():
+    """Items flow through every stage in input order."""
+    stages = [Stage("double", lambda x: x * 2), Stage("inc", lambda x: x + 1)]
+    assert list(run_pipeline(range(20), stages)) == [x * 2 + 1 for x in range(20)]
+
+
+def test_none_results_are_dropped():
+    """A stage returning None filters the item out."""
+    stages = [Stage("even", lambda x: x if x % 2 == 0 else None)]
+    assert list(run_pipeline(range(10), stages)) == [0, 2, 4, 6, 8]
+
+
+def test_multiple_workers_process_every_item():
+    """Several workers in one stage share the input and end cleanly."""
+    stages = [Stage("square", lambda x: x * x, workers=3)]
+    assert sorted(run_pipeline(range(50), stages)) == [x * x for x in range(50)]
+
+
+def test_stages_overlap():
+    """Total time approaches the slowest stage rather than the sum of stages."""
+    delay, count = 0.03, 10
+
+    def slow(x):
+        time.sleep(delay)
+        return x
+
+    start = time.perf_counter()
+    result = list(run_pipeline(range(count), [Stage("a", slow), Stage("b", slow)]))
+    elapsed = time.perf_counter() - start
+    assert result == list(range(count))
+    assert elapsed < 2 * delay * count * 0.8
+
+
+def test_bounded_queues_apply_backpressure():
+    """A slow consumer keeps the source from running far ahead."""
+    produced = []
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    it = run_pipeline(source(), [Stage("id", lambda x: x, queue_size=2)], source_queue_size=2)
+    assert next(it) == 0
+    time.sleep(0.2)
+    # source queue + one item in the stage + output queue + the item handed out
+    assert len(produced) <= 2 + 1 + 2 + 2
+    it.close()
+
+
+def test_stage_error_cancels_pipeline_and_reraises():
+    """The first stage exception propagates to the consumer and stops other stages."""
+    seen = []
+
+    def boom(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    def record(x):
+        seen.append(x)
+        return x
+
+    with pytest.raises(ValueError, match="bad item"):
+        list(run_pipeline(range(100), [Stage("boom", boom), Stage("record", record)]))
+    # items after the failing one never reach later stages
+    assert seen == [0, 1, 2][: len(seen)]
+
+
+def test_source_error_is_reraised():
+    """Errors raised while iterating the source reach the consumer."""
+
+    def source():
+        yield 1
+        raise RuntimeError("scan failed")
+
+    with pytest.raises(RuntimeError, match="scan failed"):
+        list(run_pipeline(source(), [Stage("id", lambda x: x)]))
+
+
+def test_early_close_stops_worker_threads():
+    """Abandoning the iterator cancels the pipeline and joins its threads."""
+    before = threading.active_count()
+    it = run_pipeline(iter(range(10**6)), [Stage("id", lambda x: x)])
+    assert next(it) == 0
+    it.close()
+    assert threading.active_count() == before
@@ -0,0 +1,77 @@
+import pstats
+import pytest
+import subprocess
+import tempfile
+import sys
+from pathlib import Path
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.profiling import CommandProfiler, SubprocessRecorder
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+def _busy():
+    return sum(i * i for i in range(20000))
+
+
+def _allocate():
+    return [bytearray(1024) for _ in range(200)]
+
+
+def test_profiler_writes_reports(temp_dir):
+    """A profiled command leaves a .prof file and a text report in logs_dir."""
+    with CommandProfiler(temp_dir, "release", memory=True, top=10) as profiler:
+        _busy()
+        kept = _allocate()
+
+    assert profiler.prof_path.parent == temp_dir
+    assert profiler.prof_path.name.startswith("release-")
+    assert pstats.Stats(str(profiler.prof_path)).total_calls > 0
+    report = profiler.report_path.read_text(encoding="utf-8")
+    assert "command: release" in report and "Top allocations" in report
+
+    summary = profiler.summary
+    assert any("_busy" in item["function"] for item in summary["functions"])
+    assert len(summary["functions"]) <= 10
+    assert summary["peak_memory"] >= 200 * 1024
+    assert summary["allocations"]
+    assert summary["subprocesses"] == []
+    del kept
+
+
+def test_profiler_reports_on_exception(temp_dir):
+    """Reports are still written when the command raises."""
+    profiler = CommandProfiler(temp_dir, "sync")
+    with pytest.raises(RuntimeError):
+        with profiler:
+            raise RuntimeError("boom")
+    assert profiler.report_path.exists()
+
+
+def test_subprocess_recorder_counts_and_restores():
+    """Processes are counted per program and Popen is restored on stop."""
+    original_init = subprocess.Popen.__init__
+    recorder = SubprocessRecorder()
+    recorder.start()
+    try:
+        for _ in range(2):
+            subprocess.run([sys.executable, "-c", "pass"], check=True)
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        while process.poll() is None:
+            pass
+        process.wait()
+    finally:
+        recorder.stop()
+
+    assert subprocess.Popen.__init__ is original_init
+    (entry,) = recorder.summary()
+    assert entry["program"] == Path(sys.executable).name
+    assert entry["count"] == 3
+    assert entry["total_sec"] >= entry["max_sec"] > 0
@@ -0,0 +1,76 @@
+import hashlib
+import pytest
+import tempfile
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.commands import publish as publish_cmd
+from libgitmusic.context import Context
+from libgitmusic.events import EventEmitter
+from libgitmusic.metadata import MetadataManager
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+@pytest.fixture
+def context(temp_dir):
+    """Create a Context object with temporary paths."""
+    for name in ["work", "cache", "release", "logs"]:
+        (temp_dir / name).mkdir()
+    return Context(
+        project_root=temp_dir,
+        config={},
+        work_dir=temp_dir / "work",
+        cache_root=temp_dir / "cache",
+        metadata_file=temp_dir / "metadata.jsonl",
+        release_dir=temp_dir / "release",
+        logs_dir=temp_dir / "logs",
+    )
+
+
+@pytest.fixture
+def captured():
+    """Capture events through a listener (nothing reaches stdout)."""
+    events = []
+    EventEmitter.register_listener(events.append)
+    yield events
+    EventEmitter.unregister_listener(events.append)
+
+
+def _fake_audio_hash(path):
+    data = Path(path).read_bytes()
+    if data.startswith(b"corrupt"):
+        raise RuntimeError("ffmpeg could not read audio frames")
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+def test_unreadable_file_is_skipped(context, captured):
+    """A file that fails analysis is reported and skipped; the others are still yielded."""
+    for name, data in (("a.mp3", b"first"), ("b.mp3", b"corrupt"), ("c.mp3", b"third")):
+        (context.work_dir / name).write_bytes(data)
+    files = sorted(publish_cmd.list_publish_files(context.work_dir))
+
+    progress = []
+    with patch.object(publish_cmd.AudioIO, "get_audio_hash", side_effect=_fake_audio_hash):
+        items = list(
+            publish_cmd.iter_publish_items(
+                MetadataManager(context),
+                files,
+                progress_callback=lambda current, total: progress.append(current),
+            )
+        )
+
+    assert [item["path"].name for item in items] == ["a.mp3", "c.mp3"]
+    assert progress == [1, 2, 3]
+    failed = [e for e in captured if e["type"] == "item_event" and e["status"] == "failed"]
+    assert [e["id"] for e in failed] == ["b.mp3"]
+    errors = [e for e in captured if e["type"] == "error"]
+    assert len(errors) == 1 and "b.mp3" in errors[0]["message"]
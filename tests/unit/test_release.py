@@ -0,0 +1,853 @@
+import os
+import pytest
+import subprocess
+import tempfile
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.audio import AudioIO, ID3_ALIGNMENT
+from libgitmusic.commands import release as release_cmd
+from libgitmusic.object_store import ObjectStore
+from libgitmusic.context import Context
+from libgitmusic.metadata import MetadataManager
+from libgitmusic.release_manifest import ReleaseManifest, MANIFEST_FILE
+from libgitmusic.release_profiles import ReleaseProfile, load_release_profiles
+from libgitmusic.transcode import TranscodeCache, TranscodeSpec
+from mutagen.mp3 import MP3
+from mutagen.id3 import ID3
+
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz frame (417 bytes)
+FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+def _make_audio(path: Path, frames: int = 40) -> Path:
+    path.write_bytes(FRAME * frames)
+    return path
+
+
+def _entry(**overrides):
+    entry = {
+        "audio_oid": "sha256:" + "a" * 64,
+        "title": "Song",
+        "artists": ["Artist"],
+        "album": "Album",
+        "date": "2024-01-01",
+    }
+    entry.update(overrides)
+    return entry
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+@pytest.fixture
+def context(temp_dir):
+    """Create a test context."""
+    return Context(
+        project_root=temp_dir,
+        config={},
+        work_dir=temp_dir / "work",
+        cache_root=temp_dir / "cache",
+        metadata_file=temp_dir / "metadata.jsonl",
+        release_dir=temp_dir / "release",
+        logs_dir=temp_dir / "logs",
+    )
+
+
+def test_render_id3_tag_is_aligned():
+    """Rendered tags are padded to the alignment with spare room."""
+    tag = AudioIO.render_id3_tag(
+        _entry(metadata_hash="sha256:" + "b" * 64), b"\xff\xd8" + b"x" * 5000
+    )
+    assert tag[:3] == b"ID3"
+    assert len(tag) % ID3_ALIGNMENT == 0
+    assert len(tag) >= 5000 + 1024
+
+
+def test_audio_payload_range_skips_tags(temp_dir):
+    """Existing ID3v2 and ID3v1 tags are excluded from the payload."""
+    src = _make_audio(temp_dir / "src.mp3", frames=4)
+    payload = src.read_bytes()
+    tag = AudioIO.render_id3_tag({"title": "x"}, None)
+    tagged = temp_dir / "tagged.mp3"
+    tagged.write_bytes(tag + payload + b"TAG" + b"\x00" * 125)
+
+    assert AudioIO.audio_payload_range(src) == (0, len(payload))
+    assert AudioIO.audio_payload_range(tagged) == (len(tag), len(tag) + len(payload))
+
+
+@pytest.mark.parametrize("copy_method", ["auto", "copy"])
+def test_build_tagged_file_matches_payload(temp_dir, copy_method):
+    """The release file is tag + untouched audio bytes and readable by mutagen."""
+    src = _make_audio(temp_dir / "src.mp3")
+    out = temp_dir / "out" / "song.mp3"
+
+    if copy_method == "copy":
+        # Force the plain read/write fallback
+        with patch("libgitmusic.audio.fcntl", None), patch.object(
+            os, "copy_file_range", create=True, side_effect=OSError
+        ):
+            method = AudioIO.build_tagged_file(src, _entry(), b"cover", out)
+        assert method == "copy"
+    else:
+        method = AudioIO.build_tagged_file(src, _entry(), b"cover", out)
+        assert method in ("reflink", "copy_file_range", "copy")
+
+    data = out.read_bytes()
+    tag_len = len(AudioIO.render_id3_tag(_entry(), b"cover"))
+    assert data[tag_len:] == src.read_bytes()
+
+    audio = MP3(out, ID3=ID3)
+    assert audio.tags["TIT2"].text == ["Song"]
+    assert audio.tags.getall("APIC")[0].data == b"cover"
+    assert release_cmd.extract_existing_metadata_hash(out) is None
+    assert not list(out.parent.glob("*.tmp"))
+
+
+def test_copy_modes_produce_same_tags(context, temp_dir):
+    """auto and legacy copy modes embed identical metadata."""
+    store = ObjectStore(context)
+    src = _make_audio(temp_dir / "src.mp3")
+    with patch.object(AudioIO, "get_audio_hash", return_value="sha256:" + "c" * 64):
+        oid = store.store_audio(src).oid
+
+    results = {}
+    for mode in release_cmd.RELEASE_COPY_MODES:
+        release_dir = temp_dir / f"release-{mode}"
+        release_dir.mkdir()
+        assert release_cmd.process_single_entry(
+            _entry(audio_oid=oid), store, release_dir, copy_mode=mode
+        )
+        path = release_dir / "Artist - Song.mp3"
+        tags = MP3(path, ID3=ID3).tags
+        results[mode] = sorted(
+            (key, str(frame)) for key, frame in tags.items()
+        )
+    assert results["auto"] == results["legacy"]
+
+
+def test_execute_release_rejects_unknown_copy_mode(context):
+    """Unknown copy modes are rejected before any work starts."""
+    store = ObjectStore(context)
+    with pytest.raises(ValueError):
+        release_cmd.execute_release(
+            [_entry()], store, context.release_dir, copy_mode="zerocopy"
+        )
+
+
+@pytest.fixture
+def released(context, temp_dir):
+    """Store one audio object and release a single entry for it."""
+    store = ObjectStore(context)
+    src = _make_audio(temp_dir / "src.mp3")
+    with patch.object(AudioIO, "get_audio_hash", return_value="sha256:" + "c" * 64):
+        oid = store.store_audio(src).oid
+    entry = _entry(audio_oid=oid, created_at="2024-01-01T00:00:00Z")
+    assert release_cmd.execute_release([entry], store, context.release_dir) == (1, 1)
+    return store, entry
+
+
+def test_release_embeds_metadata_hash(context, released):
+    """Generated files carry the METADATA_HASH used by incremental mode."""
+    _, entry = released
+    path = context.release_dir / "Artist - Song.mp3"
+    expected = release_cmd.calculate_metadata_hash(entry)
+    assert release_cmd.extract_existing_metadata_hash(path) == expected
+
+
+def test_execute_release_writes_manifest(context, released):
+    """The manifest records oid, hash and stat of each generated file."""
+    _, entry = released
+    path = context.release_dir / "Artist - Song.mp3"
+    record = ReleaseManifest(context.release_dir).get(path.name)
+    st = path.stat()
+    assert record == {
+        "audio_oid": entry["audio_oid"],
+        "metadata_hash": release_cmd.calculate_metadata_hash(entry),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+
+
+def test_incremental_noop_skips_tag_reads(context, released):
+    """An unchanged release is decided from stat + manifest alone."""
+    store, entry = released
+    metadata_mgr = MetadataManager(context)
+    metadata_mgr.save_all([entry])
+
+    with patch.object(release_cmd, "extract_existing_metadata_hash") as read_tag:
+        to_process, error = release_cmd.release_logic(
+            metadata_mgr, store, context.release_dir, mode="incremental"
+        )
+    assert error is None
+    assert to_process == []
+    read_tag.assert_not_called()
+
+
+def test_incremental_falls_back_to_tags_on_stat_change(context, released):
+    """Files modified outside the manifest are re-read from their tags."""
+    store, entry = released
+    path = context.release_dir / "Artist - Song.mp3"
+    os.utime(path, (0, 0))
+
+    manifest = ReleaseManifest(context.release_dir)
+    hashes = release_cmd.scan_existing_releases(context.release_dir, manifest)
+    assert hashes == {path.name: release_cmd.calculate_metadata_hash(entry)}
+    # The refreshed record keeps the oid and matches the new stat
+    assert manifest.get(path.name)["mtime_ns"] == 0
+    assert manifest.get(path.name)["audio_oid"] == entry["audio_oid"]
+
+
+def test_scan_prunes_missing_files(context, released):
+    """Records for deleted release files are dropped from the manifest."""
+    (context.release_dir / "Artist - Song.mp3").unlink()
+    manifest = ReleaseManifest(context.release_dir)
+    assert release_cmd.scan_existing_releases(context.release_dir, manifest) == {}
+    assert len(manifest) == 0
+
+
+def test_corrupt_manifest_is_ignored(context):
+    """An unreadable manifest behaves like an empty one."""
+    (context.release_dir / MANIFEST_FILE).write_text("{not json")
+    manifest = ReleaseManifest(context.release_dir)
+    assert len(manifest) == 0
+
+
+def test_chunk_entries_groups_by_cover():
+    """Entries sharing a cover land in the same chunk."""
+    entries = []
+    for i in range(6):
+        entries.append(_entry(title=f"a{i}", cover_oid="sha256:" + "1" * 64))
+        entries.append(_entry(title=f"b{i}", cover_oid="sha256:" + "2" * 64))
+    entries.append(_entry(title="loose", album="Solo"))
+
+    chunks = release_cmd.chunk_entries(entries, chunk_size=6)
+    assert sum(len(c) for c in chunks) == len(entries)
+    for chunk in chunks:
+        assert len(chunk) <= 6
+    covers = [{e.get("cover_oid") for e in chunk} for chunk in chunks]
+    assert {"sha256:" + "1" * 64} in covers
+    assert {"sha256:" + "2" * 64} in covers
+
+
+def test_resolve_executor():
+    """auto picks serial, thread or process from workers and batch size."""
+    resolve = release_cmd.resolve_executor
+    assert resolve("auto", 1, 1000) == "serial"
+    assert resolve("auto", 4, 10) == "thread"
+    assert resolve("auto", 4, release_cmd.PROCESS_MIN_ENTRIES) == "process"
+    assert resolve("thread", 4, 1000) == "thread"
+    with pytest.raises(ValueError):
+        resolve("fibers", 4, 1000)
+
+
+def test_cover_cache_lru(context):
+    """Covers are read once and evicted least-recently-used first."""
+    store = ObjectStore(context)
+    oids = [store.store_cover(f"cover-{i}".encode()).oid for i in range(3)]
+    cache = release_cmd.CoverCache(store, maxsize=2)
+
+    with patch.object(store, "read_cover", wraps=store.read_cover) as read:
+        assert cache.get(oids[0]) == b"cover-0"
+        assert cache.get(oids[0]) == b"cover-0"
+        cache.get(oids[1])
+        cache.get(oids[2])  # evicts oids[0]
+        cache.get(oids[0])
+    assert read.call_count == 4
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_process_executor_generates_files(context, temp_dir):
+    """The process pool writes files, merges the manifest and forwards events."""
+    store = ObjectStore(context)
+    cover_oid = store.store_cover(b"shared cover").oid
+    entries = []
+    for i in range(4):
+        src = _make_audio(temp_dir / f"src{i}.mp3", frames=10 + i)
+        oid = "sha256:" + f"{i:x}" * 64
+        with patch.object(AudioIO, "get_audio_hash", return_value=oid):
+            store.store_audio(src)
+        entries.append(_entry(audio_oid=oid, title=f"Song {i}", cover_oid=cover_oid))
+
+    events = []
+    listener = events.append
+    from libgitmusic.events import EventEmitter
+
+    EventEmitter.register_listener(listener)
+    try:
+        result = release_cmd.execute_release(
+            entries, store, context.release_dir, workers=2, executor="process"
+        )
+    finally:
+        EventEmitter.unregister_listener(listener)
+
+    assert result == (4, 4)
+    manifest = ReleaseManifest(context.release_dir)
+    for entry in entries:
+        path = context.release_dir / f"Artist - {entry['title']}.mp3"
+        assert MP3(path, ID3=ID3).tags.getall("APIC")[0].data == b"shared cover"
+        assert manifest.get(path.name)["audio_oid"] == entry["audio_oid"]
+    succeeded = [e for e in events if e.get("status") == "success"]
+    assert len(succeeded) == 4
+
+
+def _dupes():
+    """Three entries with the same artist/title, listed out of order."""
+    return [
+        _entry(audio_oid="sha256:" + "3" * 64, created_at="2024-03-01T00:00:00Z"),
+        _entry(audio_oid="sha256:" + "1" * 64, created_at="2024-01-01T00:00:00Z"),
+        _entry(audio_oid="sha256:" + "2" * 64, created_at="2024-01-01T00:00:00Z"),
+    ]
+
+
+def test_plan_assigns_deterministic_suffixes():
+    """Collisions get _1, _2 in (created_at, oid) order regardless of input order."""
+    entries = _dupes()
+    plan = release_cmd.build_release_plan(entries)
+    assert plan.filenames == {
+        "sha256:" + "1" * 64: "Artist - Song.mp3",
+        "sha256:" + "2" * 64: "Artist - Song_1.mp3",
+        "sha256:" + "3" * 64: "Artist - Song_2.mp3",
+    }
+    assert release_cmd.build_release_plan(entries[::-1]).filenames == plan.filenames
+
+
+def test_plan_avoids_existing_names_and_case_collisions():
+    """Suffixes skip names owned by other entries; case-only differences collide."""
+    entries = _dupes()[:2] + [
+        _entry(audio_oid="sha256:" + "4" * 64, title="Song_1"),
+        _entry(audio_oid="sha256:" + "5" * 64, title="SONG"),
+    ]
+    plan = release_cmd.build_release_plan(entries)
+    names = plan.filenames.values()
+    assert len({n.casefold() for n in names}) == 4
+    assert plan.filenames["sha256:" + "4" * 64] == "Artist - Song_1.mp3"
+    # Entries without created_at sort first and keep the base name
+    assert plan.filenames["sha256:" + "5" * 64] == "Artist - SONG.mp3"
+    assert plan.filenames["sha256:" + "1" * 64] == "Artist - Song_2.mp3"
+    assert plan.filenames["sha256:" + "3" * 64] == "Artist - Song_3.mp3"
+
+
+@pytest.mark.parametrize(
+    "strategy, kept", [("overwrite", "3" * 64), ("skip", "1" * 64)]
+)
+def test_plan_overwrite_and_skip_keep_one(strategy, kept):
+    """overwrite keeps the newest entry, skip keeps the oldest."""
+    plan = release_cmd.build_release_plan(_dupes(), strategy)
+    assert plan.filenames == {"sha256:" + kept: "Artist - Song.mp3"}
+    assert len(plan.dropped) == 2
+    assert plan.filename_for(_dupes()[1 if strategy == "overwrite" else 0]) is None
+
+
+def test_plan_rejects_unknown_strategy():
+    with pytest.raises(ValueError):
+        release_cmd.build_release_plan(_dupes(), "rename")
+
+
+def test_parallel_release_writes_planned_names(context, temp_dir):
+    """Colliding entries are written concurrently without racing for names."""
+    store = ObjectStore(context)
+    entries = []
+    for i in range(8):
+        src = _make_audio(temp_dir / f"src{i}.mp3", frames=5 + i)
+        oid = "sha256:" + f"{i:x}" * 64
+        with patch.object(AudioIO, "get_audio_hash", return_value=oid):
+            store.store_audio(src)
+        entries.append(_entry(audio_oid=oid))
+
+    with patch.object(Path, "exists", wraps=Path.exists, autospec=True) as exists:
+        result = release_cmd.execute_release(
+            entries, store, context.release_dir, workers=4, executor="thread"
+        )
+    assert result == (8, 8)
+    names = sorted(p.name for p in context.release_dir.glob("*.mp3"))
+    assert names == ["Artist - Song.mp3"] + [
+        f"Artist - Song_{i}.mp3" for i in range(1, 8)
+    ]
+    # No per-file probing of release targets
+    probed = [c.args[0] for c in exists.call_args_list]
+    assert not [p for p in probed if p.parent == context.release_dir]
+
+
+@pytest.fixture
+def library(context, temp_dir):
+    """Release three entries and return (store, metadata_mgr, entries)."""
+    store = ObjectStore(context)
+    entries = []
+    for i in range(3):
+        src = _make_audio(temp_dir / f"src{i}.mp3", frames=5 + i)
+        oid = "sha256:" + f"{i + 1:x}" * 64
+        with patch.object(AudioIO, "get_audio_hash", return_value=oid):
+            store.store_audio(src)
+        entries.append(
+            _entry(audio_oid=oid, title=f"Song {i}", created_at="2024-01-01T00:00:00Z")
+        )
+    metadata_mgr = MetadataManager(context)
+    metadata_mgr.save_all(entries)
+    to_process, _ = release_cmd.release_logic(
+        metadata_mgr, store, context.release_dir, mode="incremental"
+    )
+    assert release_cmd.execute_release(to_process, store, context.release_dir) == (
+        3,
+        3,
+    )
+    return store, metadata_mgr, entries
+
+
+def _names(release_dir):
+    return sorted(p.name for p in release_dir.glob("*.mp3"))
+
+
+def test_renamed_entry_moves_file(context, library):
+    """A title change renames the existing file instead of leaving it behind."""
+    store, metadata_mgr, entries = library
+    old_path = context.release_dir / "Artist - Song 0.mp3"
+    inode = old_path.stat().st_ino
+    entries[0]["title"] = "Renamed"
+    metadata_mgr.save_all(entries)
+
+    to_process, _ = release_cmd.release_logic(
+        metadata_mgr, store, context.release_dir, mode="incremental"
+    )
+    assert _names(context.release_dir) == [
+        "Artist - Renamed.mp3",
+        "Artist - Song 1.mp3",
+        "Artist - Song 2.mp3",
+    ]
+    assert (context.release_dir / "Artist - Renamed.mp3").stat().st_ino == inode
+    manifest = ReleaseManifest(context.release_dir)
+    assert "Artist - Song 0.mp3" not in manifest
+    # Tags still carry the old title, so the entry is regenerated in place
+    assert [e["audio_oid"] for e in to_process] == [entries[0]["audio_oid"]]
+
+
+def test_swapped_names_are_renamed(context, library):
+    """Two entries exchanging titles swap files via temporary names."""
+    store, metadata_mgr, entries = library
+    inode0 = (context.release_dir / "Artist - Song 0.mp3").stat().st_ino
+    inode1 = (context.release_dir / "Artist - Song 1.mp3").stat().st_ino
+    entries[0]["title"], entries[1]["title"] = "Song 1", "Song 0"
+    metadata_mgr.save_all(entries)
+
+    release_cmd.release_logic(metadata_mgr, store, context.release_dir)
+    assert (context.release_dir / "Artist - Song 1.mp3").stat().st_ino == inode0
+    assert (context.release_dir / "Artist - Song 0.mp3").stat().st_ino == inode1
+    assert not list(context.release_dir.glob(".rename-*"))
+
+
+def test_rename_target_held_by_untracked_file(context, library):
+    """An untracked file at the rename target goes to .trash, not overwritten."""
+    store, metadata_mgr, entries = library
+    inode = (context.release_dir / "Artist - Song 0.mp3").stat().st_ino
+    (context.release_dir / "Artist - Renamed.mp3").write_bytes(b"user file")
+    entries[0]["title"] = "Renamed"
+    metadata_mgr.save_all(entries)
+
+    release_cmd.release_logic(metadata_mgr, store, context.release_dir)
+    assert (context.release_dir / "Artist - Renamed.mp3").stat().st_ino == inode
+    trashed = list((context.release_dir / ".trash").iterdir())
+    assert [p.read_bytes() for p in trashed] == [b"user file"]
+
+
+def test_rename_target_held_by_unselected_entry(context, library):
+    """A tracked occupant outside the selection is renamed along with it."""
+    store, metadata_mgr, entries = library
+    inode0 = (context.release_dir / "Artist - Song 0.mp3").stat().st_ino
+    inode1 = (context.release_dir / "Artist - Song 1.mp3").stat().st_ino
+    oid0, oid1, oid2 = (e["audio_oid"] for e in entries)
+    plan = release_cmd.ReleasePlan(
+        filenames={
+            oid0: "Artist - Song 1.mp3",
+            oid1: "Artist - Other.mp3",
+            oid2: "Artist - Song 2.mp3",
+        }
+    )
+    manifest = ReleaseManifest(context.release_dir)
+
+    stats = release_cmd.reconcile_release_dir(
+        context.release_dir, plan, manifest, [entries[0]], remove_stale=False
+    )
+    assert stats == {"renamed": 2, "trashed": 0}
+    assert (context.release_dir / "Artist - Song 1.mp3").stat().st_ino == inode0
+    assert (context.release_dir / "Artist - Other.mp3").stat().st_ino == inode1
+    manifest = ReleaseManifest(context.release_dir)
+    assert manifest.get("Artist - Song 1.mp3")["audio_oid"] == oid0
+    assert manifest.get("Artist - Other.mp3")["audio_oid"] == oid1
+    assert "Artist - Song 0.mp3" not in manifest
+    assert not list(context.release_dir.glob(".rename-*"))
+
+
+def test_removed_entry_is_trashed(context, library):
+    """Files whose oid left the metadata move to .trash on unfiltered runs."""
+    store, metadata_mgr, entries = library
+    metadata_mgr.save_all(entries[1:])
+
+    # Filtered runs never remove files
+    release_cmd.release_logic(
+        metadata_mgr, store, context.release_dir, search_filter="Song 1"
+    )
+    assert "Artist - Song 0.mp3" in _names(context.release_dir)
+
+    release_cmd.release_logic(metadata_mgr, store, context.release_dir, dry_run=True)
+    assert "Artist - Song 0.mp3" in _names(context.release_dir)
+
+    release_cmd.release_logic(metadata_mgr, store, context.release_dir)
+    assert _names(context.release_dir) == ["Artist - Song 1.mp3", "Artist - Song 2.mp3"]
+    trashed = list((context.release_dir / ".trash").iterdir())
+    assert [p.name.endswith("Artist - Song 0.mp3") for p in trashed] == [True]
+    assert len(ReleaseManifest(context.release_dir)) == 2
+
+
+def test_untracked_files_are_left_alone(context, library):
+    """Files not recorded in the manifest are never trashed."""
+    store, metadata_mgr, entries = library
+    (context.release_dir / "manual.mp3").write_bytes(b"user file")
+    release_cmd.release_logic(metadata_mgr, store, context.release_dir)
+    assert (context.release_dir / "manual.mp3").exists()
+
+
+def test_retag_in_place_keeps_audio(temp_dir):
+    """Retagging rewrites only the tag region within the reserved padding."""
+    src = _make_audio(temp_dir / "src.mp3")
+    out = temp_dir / "song.mp3"
+    AudioIO.build_tagged_file(src, _entry(), None, out)
+    before = out.read_bytes()
+    inode = out.stat().st_ino
+
+    assert AudioIO.retag_in_place(out, _entry(artists=["Someone Else"]), b"jpg")
+    after = out.read_bytes()
+    assert len(after) == len(before)
+    assert out.stat().st_ino == inode
+    tag_len = AudioIO._id3v2_size(after[:10])
+    assert after[tag_len:] == before[tag_len:] == src.read_bytes()
+    tags = MP3(out, ID3=ID3).tags
+    assert tags["TPE1"].text == ["Someone Else"]
+    assert tags.getall("APIC")[0].data == b"jpg"
+
+
+def test_retag_in_place_refuses_when_padding_too_small(temp_dir):
+    """A tag that no longer fits leaves the file untouched."""
+    src = _make_audio(temp_dir / "src.mp3")
+    out = temp_dir / "song.mp3"
+    AudioIO.build_tagged_file(src, _entry(), None, out)
+    before = out.read_bytes()
+
+    assert not AudioIO.retag_in_place(out, _entry(), b"x" * (2 * ID3_ALIGNMENT))
+    assert out.read_bytes() == before
+    assert not AudioIO.retag_in_place(src, _entry(), None)
+
+
+def test_incremental_metadata_change_retags(context, library):
+    """Metadata-only updates go through the in-place path, not a rebuild."""
+    store, metadata_mgr, entries = library
+    path = context.release_dir / "Artist - Song 1.mp3"
+    inode = path.stat().st_ino
+    entries[1]["album"] = "Remastered"
+    metadata_mgr.save_all(entries)
+
+    to_process, _ = release_cmd.release_logic(
+        metadata_mgr, store, context.release_dir, mode="incremental"
+    )
+    assert [e["audio_oid"] for e in to_process] == [entries[1]["audio_oid"]]
+    with patch.object(AudioIO, "build_tagged_file") as rebuild:
+        result = release_cmd.execute_release(
+            to_process, store, context.release_dir, incremental=True
+        )
+    assert result == (1, 1)
+    rebuild.assert_not_called()
+    assert path.stat().st_ino == inode
+    assert MP3(path, ID3=ID3).tags["TALB"].text == ["Remastered"]
+
+    # The manifest now matches, so the next pass is a no-op
+    to_process, _ = release_cmd.release_logic(
+        metadata_mgr, store, context.release_dir, mode="incremental"
+    )
+    assert to_process == []
+
+
+def test_file_without_recorded_oid_is_rebuilt(context, library):
+    """Files released before the manifest existed are rebuilt, not retagged."""
+    store, metadata_mgr, entries = library
+    path = context.release_dir / "Artist - Song 2.mp3"
+    (context.release_dir / MANIFEST_FILE).unlink()
+    entries[2]["album"] = "Other"
+    metadata_mgr.save_all(entries)
+
+    to_process, _ = release_cmd.release_logic(
+        metadata_mgr, store, context.release_dir, mode="incremental"
+    )
+    with patch.object(AudioIO, "retag_in_place") as retag:
+        release_cmd.execute_release(
+            to_process, store, context.release_dir, incremental=True
+        )
+    retag.assert_not_called()
+    assert MP3(path, ID3=ID3).tags["TALB"].text == ["Other"]
+
+
+def test_load_release_profiles():
+    """Profiles come from release.profiles; no config means the flat default."""
+    release_dir = Path("/srv/release")
+    assert load_release_profiles({}, release_dir) == [
+        ReleaseProfile.default(release_dir)
+    ]
+
+    config = {
+        "release": {
+            "profiles": {
+                "default": {},
+                "albums": {"path": "{first_artist}/{album}/{title}.mp3"},
+                "mobile": {"dir": "/srv/mobile", "tags": ["title"], "cover_size": 0},
+            }
+        }
+    }
+    default, albums, mobile = load_release_profiles(config, release_dir)
+    assert default.release_dir == release_dir and default.is_plain
+    assert albums.release_dir == release_dir / "albums" and albums.nested
+    assert mobile.release_dir == Path("/srv/mobile")
+    assert mobile.tags == ("title",) and not mobile.is_plain
+
+
+@pytest.mark.parametrize(
+    "profiles",
+    [
+        {"a": {"path": "{genre}/{title}"}},
+        {"a": {"tags": ["lyrics"]}},
+        {"a": {"dir": "x"}, "b": {"dir": "x"}},
+        {"a": {"dir": ".", "path": "{album}/{title}"}, "b": {"dir": "sub"}},
+    ],
+)
+def test_load_release_profiles_rejects_invalid(profiles):
+    """Unknown fields and overlapping directories are configuration errors."""
+    with pytest.raises(ValueError):
+        load_release_profiles({"release": {"profiles": profiles}}, Path("/srv/r"))
+
+
+def test_profile_filename_template():
+    """Each template component is sanitized on its own."""
+    profile = ReleaseProfile(
+        "albums", Path("/r"), path="{first_artist}/{year} {album}/{artist} - {title}"
+    )
+    entry = _entry(artists=["A/B", "C"], album="..", title="T?")
+    assert profile.filename(entry) == "A_B/2024 ../A_B, C - T_.mp3"
+    assert ReleaseProfile("x", Path("/r"), path="{album}").filename(
+        _entry(album="..")
+    ) == "_.mp3"
+
+
+@pytest.fixture
+def profiles(context):
+    """A flat default profile plus a nested, stripped-down album view."""
+    return load_release_profiles(
+        {
+            "release": {
+                "profiles": {
+                    "default": {},
+                    "albums": {
+                        "path": "{first_artist}/{album}/{title}.mp3",
+                        "tags": ["title", "artists"],
+                        "cover_size": 0,
+                    },
+                }
+            }
+        },
+        context.release_dir,
+    )
+
+
+def test_release_fans_out_to_profiles(context, library, profiles):
+    """One pass writes every profile with its own tags and manifest."""
+    store, metadata_mgr, entries = library
+    cover_oid = store.store_cover(b"\xff\xd8cover").oid
+    for entry in entries:
+        entry["cover_oid"] = cover_oid
+    metadata_mgr.save_all(entries)
+
+    to_process, _ = release_cmd.release_logic(
+        metadata_mgr, store, context.release_dir, mode="incremental", profiles=profiles
+    )
+    with patch.object(store, "read_cover", wraps=store.read_cover) as read_cover:
+        assert release_cmd.execute_release(
+            to_process, store, context.release_dir, incremental=True, profiles=profiles
+        ) == (3, 3)
+    read_cover.assert_called_once_with(cover_oid)
+
+    album_file = context.release_dir / "albums" / "Artist" / "Album" / "Song 0.mp3"
+    tags = ID3(album_file)
+    assert str(tags["TIT2"]) == "Song 0"
+    assert "TALB" not in tags and not tags.getall("APIC")
+    assert ID3(context.release_dir / "Artist - Song 0.mp3").getall("APIC")
+
+    manifest = ReleaseManifest(context.release_dir / "albums")
+    assert "Artist/Album/Song 0.mp3" in manifest
+    assert release_cmd.extract_existing_metadata_hash(album_file) == (
+        release_cmd.profile_metadata_hash(entries[0], profiles[1])
+    )
+
+    # Everything is up to date in both profiles
+    to_process, _ = release_cmd.release_logic(
+        metadata_mgr, store, context.release_dir, mode="incremental", profiles=profiles
+    )
+    assert to_process == []
+
+
+def test_nested_profile_follows_renames(context, library, profiles):
+    """Renames in a nested layout move the file and prune empty directories."""
+    store, metadata_mgr, entries = library
+    to_process, _ = release_cmd.release_logic(
+        metadata_mgr, store, context.release_dir, mode="incremental", profiles=profiles
+    )
+    release_cmd.execute_release(
+        to_process, store, context.release_dir, incremental=True, profiles=profiles
+    )
+    albums = context.release_dir / "albums"
+    inode = (albums / "Artist" / "Album" / "Song 0.mp3").stat().st_ino
+
+    for entry in entries:
+        entry["album"] = "Other"
+    metadata_mgr.save_all(entries)
+    release_cmd.release_logic(
+        metadata_mgr, store, context.release_dir, mode="incremental", profiles=profiles
+    )
+    assert (albums / "Artist" / "Other" / "Song 0.mp3").stat().st_ino == inode
+    assert not (albums / "Artist" / "Album").exists()
+    # The flat default profile only scans its top level
+    assert "albums/Artist/Other/Song 0.mp3" not in ReleaseManifest(context.release_dir)
+
+
+def test_transcode_spec_cache_key():
+    """Cache keys change with every parameter; unknown codecs are rejected."""
+    opus = TranscodeSpec.from_config({"codec": "opus", "bitrate": "96k"})
+    assert opus.extension == ".opus"
+    assert opus.key.startswith("opus-")
+    assert opus.key != TranscodeSpec("opus", "128k").key
+    assert TranscodeSpec.from_config("aac").extension == ".m4a"
+    with pytest.raises(ValueError):
+        TranscodeSpec("flac")
+
+    profile = ReleaseProfile("m", Path("/r"), path="{title}", transcode=opus)
+    assert profile.filename(_entry()) == "Song.opus"
+    assert not profile.is_plain
+
+
+def _fake_ffmpeg(cmd):
+    """Stand-in for ffmpeg: copy the input to the output path."""
+    src = Path(cmd[cmd.index("-i") + 1])
+    Path(cmd[-1]).write_bytes(src.read_bytes()[: len(FRAME) * 2])
+
+
+@pytest.fixture
+def mobile(context):
+    spec = TranscodeSpec("mp3", "64k")
+    return [ReleaseProfile("mobile", context.release_dir / "mobile", transcode=spec)]
+
+
+def test_transcode_is_cached_by_audio(context, library, mobile):
+    """Only new audio is encoded; metadata changes re-tag the cached transcode."""
+    store, metadata_mgr, entries = library
+    spec = mobile[0].transcode
+
+    def release():
+        to_process, _ = release_cmd.release_logic(
+            metadata_mgr, store, context.release_dir, mode="incremental", profiles=mobile
+        )
+        return release_cmd.execute_release(
+            to_process, store, context.release_dir, incremental=True, profiles=mobile
+        )
+
+    with patch("libgitmusic.transcode.run_ffmpeg", side_effect=_fake_ffmpeg) as ffmpeg:
+        assert release() == (3, 3)
+        assert ffmpeg.call_count == 3
+        cache = TranscodeCache(context.cache_root)
+        cached = cache.get(entries[0]["audio_oid"], spec)
+        assert cached.parent.parent.parent == context.cache_root / "transcodes"
+
+        entries[0]["album"] = "Remaster"
+        metadata_mgr.save_all(entries)
+        assert release() == (1, 1)
+        assert ffmpeg.call_count == 3
+
+    path = context.release_dir / "mobile" / "Artist - Song 0.mp3"
+    assert str(ID3(path)["TALB"]) == "Remaster"
+    # The cached transcode itself stays untagged
+    assert AudioIO.audio_payload_range(cached) == (0, cached.stat().st_size)
+
+
+def test_failed_transcode_is_reported_once(context, library, mobile):
+    """A failing ffmpeg marks the entry failed without a second attempt."""
+    store, _, entries = library
+    with patch(
+        "libgitmusic.transcode.run_ffmpeg", side_effect=RuntimeError("boom")
+    ) as ffmpeg:
+        result = release_cmd.execute_release(
+            entries[:1], store, context.release_dir, profiles=mobile
+        )
+    assert result == (0, 1)
+    assert ffmpeg.call_count == 1
+    assert not (context.release_dir / "mobile").exists() or not list(
+        (context.release_dir / "mobile").glob("*.mp3")
+    )
+
+
+def test_run_release_is_incremental(context, library):
+    """run_release drives the whole pipeline; an up-to-date tree is a no-op."""
+    store, metadata_mgr, entries = library
+    assert release_cmd.run_release(context, mode="incremental") == (0, 0)
+
+    entries[1]["album"] = "Changed"
+    metadata_mgr.save_all(entries)
+    assert release_cmd.run_release(context, mode="incremental", dry_run=True) == (0, 1)
+    assert release_cmd.run_release(context, mode="incremental") == (1, 1)
+
+
+def _commit_metadata(repo: Path) -> str:
+    """Commit metadata.jsonl in a throwaway git repo and return the revision."""
+    git = ["git", "-c", "user.name=test", "-c", "user.email=test@example.com"]
+    if not (repo / ".git").exists():
+        subprocess.run(git + ["init", "-q"], cwd=repo, check=True)
+    subprocess.run(git + ["add", "metadata.jsonl"], cwd=repo, check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "metadata"], cwd=repo, check=True)
+    return subprocess.run(
+        ["git", "rev-parse", "HEAD"], cwd=repo, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def test_release_since_revision(context, library, temp_dir):
+    """--since regenerates only changed entries and trashes removed ones without a scan."""
+    store, metadata_mgr, entries = library
+    since = _commit_metadata(temp_dir)
+
+    entries[0]["title"] = "Renamed"
+    removed = entries.pop(2)
+    metadata_mgr.save_all(entries)
+
+    with patch.object(release_cmd, "scan_existing_releases") as scan:
+        to_process, error = release_cmd.release_logic(
+            metadata_mgr, store, context.release_dir, mode="local", since=since
+        )
+    assert error is None
+    scan.assert_not_called()
+    assert [e["audio_oid"] for e in to_process] == [entries[0]["audio_oid"]]
+    assert not (context.release_dir / release_cmd.generate_release_filename(removed)).exists()
+
+    assert release_cmd.execute_release(
+        to_process, store, context.release_dir, incremental=True
+    ) == (1, 1)
+    assert (context.release_dir / "Artist - Renamed.mp3").exists()
+
+
+def test_release_since_unknown_revision_scans(context, library):
+    """An unreadable revision falls back to a full incremental scan."""
+    store, metadata_mgr, entries = library
+    to_process, error = release_cmd.release_logic(
+        metadata_mgr, store, context.release_dir, since="deadbeef"
+    )
+    assert error is None
+    assert to_process == []
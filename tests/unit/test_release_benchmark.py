@@ -0,0 +1,32 @@
+import pytest
+import tempfile
+import sys
+from pathlib import Path
+
+# Import the benchmark module to test
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+from release_benchmark import build_corpus, discard_event, run_case
+from libgitmusic.events import EventEmitter
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+    EventEmitter.unregister_listener(discard_event)
+
+
+def test_benchmark_cases(temp_dir):
+    """A tiny synthetic corpus runs through every benchmark mode."""
+    corpus = build_corpus(temp_dir, entries=6, frames=4, tracks_per_album=3)
+    assert corpus["entries"] == 6 and corpus["covers"] == 2
+
+    full = run_case(temp_dir, "full", workers=1, touch=0.5)
+    assert (full["files"], full["succeeded"], full["entries"]) == (6, 6, 6)
+    assert full["bytes"] > corpus["audio_bytes"]
+
+    assert run_case(temp_dir, "incremental", workers=1)["files"] == 0
+
+    touched = run_case(temp_dir, "touched", workers=1, touch=0.5)
+    assert touched["files"] == touched["succeeded"] == 3
@@ -0,0 +1,193 @@
+import json
+import pytest
+import tempfile
+import sys
+from pathlib import Path
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic.release_queue import (
+    FifoWakeup,
+    QueueDaemon,
+    ReleaseQueue,
+    since_revision,
+)
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+@pytest.fixture
+def queue(temp_dir):
+    return ReleaseQueue(temp_dir / "queue.jsonl")
+
+
+class FakeClock:
+    """Monotonic clock advanced by the fake wakeup."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeWakeup:
+    """Signals on the given wait() calls, advancing the clock each time."""
+
+    def __init__(self, clock, signals):
+        self.clock = clock
+        self.signals = list(signals)
+        self.waits = []
+
+    def wait(self, timeout):
+        self.waits.append(timeout)
+        signalled = self.signals.pop(0) if self.signals else False
+        self.clock.now += 1.0 if signalled else timeout
+        return signalled
+
+    def interrupt(self):
+        pass
+
+
+def test_claim_is_atomic_rename(queue):
+    """Requests appended after a claim land in a fresh queue file."""
+    queue.enqueue({"action": "generate_releases", "n": 1})
+    assert queue.claim() == queue.processing_file
+    assert not queue.queue_file.exists()
+
+    queue.enqueue({"action": "generate_releases", "n": 2})
+    requests, invalid = queue.read_claimed()
+    assert [r["n"] for r in requests] == [1] and invalid == 0
+
+    queue.complete()
+    assert queue.pending()
+    queue.claim()
+    assert [r["n"] for r in queue.read_claimed()[0]] == [2]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="flock is POSIX only")
+def test_claim_waits_for_an_append_in_progress(queue):
+    """A hook that opened queue.jsonl under the lock cannot write into a claimed file."""
+    import fcntl
+    import threading
+
+    queue.enqueue({"n": 1})
+    with open(queue.lock_file, "a") as lock:
+        # What post-receive does: take the lock, open the queue, then write
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        hook = open(queue.queue_file, "a", encoding="utf-8")
+        claimer = threading.Thread(target=queue.claim)
+        claimer.start()
+        claimer.join(timeout=0.2)
+        assert claimer.is_alive()
+        hook.write(json.dumps({"n": 2}) + "\n")
+        hook.close()
+    claimer.join(timeout=5)
+
+    # Both lines were claimed together; nothing is lost when the claim completes
+    assert [r["n"] for r in queue.read_claimed()[0]] == [1, 2]
+    queue.complete()
+    assert not queue.pending()
+
+
+def test_burst_is_coalesced_into_one_build(queue, temp_dir):
+    """Ten pushes trigger a single build and are reported in the metrics."""
+    for i in range(10):
+        queue.enqueue({"timestamp": "2024-01-01T00:00:00+00:00", "n": i})
+    queue.queue_file.open("a").write("not json\n")
+
+    builds = []
+    metrics_file = temp_dir / "metrics.json"
+    daemon = QueueDaemon(
+        queue,
+        build=lambda requests: builds.append(requests) or (5, 5),
+        metrics_file=metrics_file,
+    )
+    assert daemon.run_once()
+    assert [len(b) for b in builds] == [10]
+    assert not queue.pending()
+
+    metrics = json.loads(metrics_file.read_text())
+    assert metrics["requests_total"] == 10
+    assert metrics["invalid_requests_total"] == 1
+    assert metrics["builds_total"] == 1
+    assert metrics["coalesced_total"] == 9
+    assert metrics["last_result"] == {"status": "ok", "succeeded": 5, "total": 5}
+    assert metrics["last_queue_latency_seconds"] > 0
+
+
+def test_leftover_claim_is_processed_first(queue):
+    """A .processing file left by a crash is handled before new requests."""
+    queue.processing_file.write_text(json.dumps({"n": "old"}) + "\n")
+    queue.enqueue({"n": "new"})
+
+    builds = []
+    daemon = QueueDaemon(queue, build=lambda r: builds.append(r) or (0, 0))
+    assert daemon.settle() == 0.0
+    daemon.run_once()
+    daemon.run_once()
+    assert [[r["n"] for r in b] for b in builds] == [["old"], ["new"]]
+
+
+def test_failed_build_is_recorded(queue, temp_dir):
+    """Build errors are counted and the claimed requests are released."""
+    queue.enqueue({"n": 1})
+
+    def build(requests):
+        raise RuntimeError("boom")
+
+    daemon = QueueDaemon(queue, build=build, metrics_file=temp_dir / "m.json")
+    assert daemon.run_once()
+    assert not queue.pending()
+    assert daemon.metrics.builds_failed_total == 1
+    assert daemon.metrics.last_result == {"status": "error", "error": "boom"}
+
+
+def test_settle_waits_for_quiet_period(queue):
+    """Each wakeup extends the debounce window until it stays quiet."""
+    clock = FakeClock()
+    wakeup = FakeWakeup(clock, [True, True, True, False])
+    daemon = QueueDaemon(
+        queue, build=None, wakeup=wakeup, debounce=5, max_delay=100, clock=clock
+    )
+    assert daemon.settle() == 8.0
+    assert wakeup.waits == [5, 5, 5, 5]
+
+
+def test_settle_is_bounded_by_max_delay(queue):
+    """A steady stream of pushes is still built after max_delay."""
+    clock = FakeClock()
+    wakeup = FakeWakeup(clock, [True] * 100)
+    daemon = QueueDaemon(
+        queue, build=None, wakeup=wakeup, debounce=5, max_delay=20, clock=clock
+    )
+    assert daemon.settle() == 20.0
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="FIFOs require POSIX")
+def test_fifo_wakeup(queue, temp_dir):
+    """enqueue() wakes a FifoWakeup; the pipe is drained after each wait."""
+    fifo = temp_dir / "queue.fifo"
+    wakeup = FifoWakeup(fifo)
+    try:
+        assert not wakeup.wait(0)
+        queue.enqueue({"n": 1}, fifo=fifo)
+        queue.enqueue({"n": 2}, fifo=fifo)
+        assert wakeup.wait(1)
+        assert not wakeup.wait(0)
+    finally:
+        wakeup.close()
+
+
+def test_since_revision():
+    """A coalesced batch starts at the first push's oldrev."""
+    a, b, c = "a" * 40, "b" * 40, "c" * 40
+    assert since_revision([{"oldrev": a, "newrev": b}, {"oldrev": b, "newrev": c}]) == a
+    assert since_revision([{"oldrev": a}, {"action": "generate_releases"}]) is None
+    assert since_revision([{"oldrev": "0" * 40, "newrev": a}]) is None
+    assert since_revision([]) is None
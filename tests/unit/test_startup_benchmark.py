@@ -0,0 +1,42 @@
+import shutil
+import sys
+from pathlib import Path
+
+# Import the benchmark module to test
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+from startup_benchmark import CASES, LOGS_DIR, heavy_imports, loaded_modules, run_case
+
+
+def test_package_import_is_lazy():
+    """import libgitmusic loads no submodules until an attribute is used."""
+    modules = loaded_modules(CASES["import"])
+    assert "libgitmusic" in modules
+    assert not [m for m in modules if m.startswith("libgitmusic.")]
+
+
+def test_lazy_attributes_resolve():
+    """Public names still resolve through the package and the commands package."""
+    import libgitmusic
+    import libgitmusic.commands as commands
+    from libgitmusic.audio import AudioIO
+    from libgitmusic.commands.release import release_logic
+
+    assert libgitmusic.AudioIO is AudioIO
+    assert commands.release_logic is release_logic
+    assert set(libgitmusic.__all__) <= set(dir(libgitmusic))
+
+
+def test_scripted_cli_skips_interactive_dependencies():
+    """A --log-only analyze run does not import rich, prompt_toolkit or mutagen."""
+    modules = loaded_modules(CASES["analyze-stats"])
+    shutil.rmtree(LOGS_DIR, ignore_errors=True)
+    assert "libgitmusic.commands.analyze" in modules
+    assert heavy_imports(modules) == []
+
+
+def test_run_case_reports_timings():
+    """The benchmark measures a case and lists its heavy imports."""
+    result = run_case("import", runs=2)
+    assert result["runs"] == 2
+    assert 0 < result["min_ms"] <= result["median_ms"] <= result["max_ms"]
+    assert result["heavy_imports"] == []
@@ -0,0 +1,88 @@
+import json
+import pytest
+import subprocess
+import tempfile
+import sys
+from pathlib import Path
+
+# Import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "repo"))
+from libgitmusic import tracing
+from libgitmusic.events import EventEmitter
+
+
+@pytest.fixture
+def temp_dir():
+    """Create a temporary directory for test data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp)
+
+
+@pytest.fixture
+def captured():
+    """Capture events through a listener and start from empty span stats."""
+    tracing.reset()
+    events = []
+    EventEmitter.register_listener(events.append)
+    yield events
+    EventEmitter.unregister_listener(events.append)
+    tracing.reset()
+
+
+def test_spans_nest_under_phase(captured):
+    """Spans aggregate by phase/parent/name and bytes roll up to the parent."""
+    EventEmitter.phase_start("release", 2)
+    for _ in range(2):
+        with EventEmitter.span("release_entry"):
+            with EventEmitter.span("embed_metadata") as span:
+                span.add_bytes(read=100, written=150)
+
+    stats = tracing.summary()
+    assert stats["release/release_entry"]["count"] == 2
+    assert stats["release/release_entry/embed_metadata"]["bytes_written"] == 300
+    assert stats["release/release_entry"]["bytes_read"] == 200
+    assert stats["release/release_entry"]["wall_sec"] >= 0
+
+
+def test_subprocesses_are_counted():
+    """Processes started inside a span are counted automatically."""
+    tracing.reset()
+
+    @tracing.traced("spawn")
+    def spawn():
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        tracing.add_bytes(read=7)
+
+    spawn()
+    assert tracing.summary()["spawn"]["subprocesses"] == 1
+    assert tracing.summary()["spawn"]["bytes_read"] == 7
+    tracing.reset()
+
+
+def test_result_event_carries_span_summary(captured):
+    """The result event includes the span summary only when spans were recorded."""
+    EventEmitter.result("ok")
+    with EventEmitter.span("metadata_load"):
+        pass
+    EventEmitter.result("ok")
+
+    results = [e for e in captured if e["type"] == "result"]
+    assert "spans" not in results[0]
+    assert results[1]["spans"]["metadata_load"]["count"] == 1
+
+
+def test_chrome_trace_export(temp_dir):
+    """Exported traces are complete events loadable by chrome://tracing."""
+    tracing.start_trace()
+    tracing.set_phase("hash")
+    with EventEmitter.span("hash_audio_frames", file="a.mp3") as span:
+        span.add_bytes(read=4096)
+    path = temp_dir / "trace.json"
+    assert tracing.export_chrome_trace(path) == 1
+    tracing.reset()
+
+    event = json.loads(path.read_text(encoding="utf-8"))["traceEvents"][0]
+    assert event["ph"] == "X" and event["name"] == "hash_audio_frames"
+    assert event["cat"] == "hash"
+    assert event["args"]["file"] == "a.mp3"
+    assert event["args"]["bytes_read"] == 4096
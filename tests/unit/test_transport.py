@@ -198,6 +198,41 @@ def test_get_remote_hash_timeout(transport_adapter):
             transport_adapter._get_remote_hash("/tmp/test/file.txt")
 
 
+def test_get_remote_layout(transport_adapter):
+    """A missing layout.json means the legacy layout; an existing one is parsed."""
+    from libgitmusic.layout import ShardLayout
+
+    with patch.object(transport_adapter, '_remote_exec') as mock_exec:
+        mock_exec.return_value = ("{}\n", "")
+        assert transport_adapter.get_remote_layout() == ShardLayout.legacy()
+
+    transport_adapter._remote_layout = None
+    with patch.object(transport_adapter, '_remote_exec') as mock_exec:
+        mock_exec.return_value = ('{"depth": 2, "width": 2}\n', "")
+        assert transport_adapter.get_remote_layout() == ShardLayout(2, 2)
+        # Cached for the rest of the run
+        assert transport_adapter.get_remote_layout() == ShardLayout(2, 2)
+        mock_exec.assert_called_once()
+
+
+def test_get_remote_layout_transport_failure(transport_adapter):
+    """An ssh failure or timeout is an error, not a legacy layout, and is not cached."""
+    from libgitmusic.layout import ShardLayout
+
+    with patch.object(transport_adapter, '_remote_exec') as mock_exec:
+        mock_exec.side_effect = subprocess.CalledProcessError(255, "ssh", stderr="Connection reset")
+        with pytest.raises(TransportError):
+            transport_adapter.get_remote_layout()
+
+        mock_exec.side_effect = subprocess.TimeoutExpired("ssh", 60)
+        with pytest.raises(TransportError):
+            transport_adapter.get_remote_layout()
+
+        mock_exec.side_effect = None
+        mock_exec.return_value = ('{"depth": 2, "width": 2}\n', "")
+        assert transport_adapter.get_remote_layout() == ShardLayout(2, 2)
+
+
 def test_upload_success(transport_adapter, temp_dir):
     """Test successful file upload."""
     test_file = temp_dir / "test.txt"